@@ -16,6 +16,13 @@ def _load_config(config_path: Path):
     return load_config(config_path)
 
 
+def _shadow_store(cfg):
+    """Shadow sidecar store for read-only sources, if paths.shadow_store is set."""
+    from romtholos.collect.shadow import ShadowStore
+
+    return ShadowStore(cfg.shadow_store) if cfg.shadow_store else None
+
+
 @app.command()
 def scan(
     config: Annotated[Path, typer.Argument(help="Path to config YAML")],
@@ -28,13 +35,33 @@ def scan(
             help="Restrict scanning to this subfolder of a configured source",
         )
     ] = None,
+    workers: Annotated[
+        int, typer.Option("--workers", min=1,
+                          help="Hash/extract N files in parallel")
+    ] = 1,
+    deep: Annotated[
+        bool, typer.Option("--deep",
+                           help="List every romroot directory, ignoring the "
+                                "unchanged-directory cache")
+    ] = False,
+    complete: Annotated[
+        bool, typer.Option("--complete-hashes",
+                           help="Afterwards compute every digest a source's "
+                                "hashes: policy deferred")
+    ] = False,
+    restart: Annotated[
+        bool, typer.Option("--restart",
+                           help="Discard an interrupted scan's progress and "
+                                "scan from the top")
+    ] = False,
 ) -> None:
     """Phase 1: Scan all sources, populate DB cache."""
     cfg = _load_config(config)
 
     from romtholos.collect.backup import backup_db
     from romtholos.collect.db import CacheDB
-    from romtholos.collect.scan import scan_all
+    from romtholos.collect.iosched import IOScheduler
+    from romtholos.collect.scan import complete_hashes, scan_all
 
     # Validate --path: must be within a configured source
     path_filter: Path | None = None
@@ -51,10 +78,14 @@ def scan(
 
     print("=== Scan Phase ===", file=sys.stderr)
 
-    with CacheDB(cfg.db_cache) as db:
+    with CacheDB(cfg.db_cache, profile=cfg.db_profile) as db:
+        if cfg.archive_prefilter:
+            _load_dats_for_prefilter(cfg, db)
         results = scan_all(
             cfg.sources, db, cfg.work_dir,
             force_rescan=force_rescan, path_filter=path_filter,
+            workers=workers, deep=deep, prefilter=cfg.archive_prefilter,
+            restart=restart, shadow=_shadow_store(cfg),
         )
 
         total_hashed = sum(s.files_hashed for s in results.values())
@@ -66,6 +97,13 @@ def scan(
             file=sys.stderr,
         )
 
+        if complete:
+            n = complete_hashes(
+                db, cfg.work_dir, workers=workers,
+                io=IOScheduler.from_sources(cfg.sources),
+            )
+            print(f"  Completed hashes for {n} file(s)/archive(s)", file=sys.stderr)
+
         stats = db.stats()
         print(
             f"  DB: {stats['scanned_files']} files, "
@@ -83,13 +121,13 @@ def plan(
 
     from romtholos.collect.db import CacheDB
     from romtholos.collect.match import (
-        count_relocations, find_orphaned_romroot, match_all_dats, print_plan,
+        count_relocations, find_orphaned_romroot, print_plan,
     )
 
     print("=== Match Phase ===", file=sys.stderr)
 
-    with CacheDB(cfg.db_cache) as db:
-        match_results = match_all_dats(cfg.selection, db)
+    with CacheDB(cfg.db_cache, profile=cfg.db_profile) as db:
+        match_results = _match(cfg, db, complete=False)
         print_plan(match_results)
 
         relocations = count_relocations(match_results, cfg.romroot_for_system)
@@ -137,7 +175,7 @@ def execute(
     from romtholos.collect.backup import backup_db
     from romtholos.collect.db import CacheDB
     from romtholos.collect.lock import CollectorLockError, acquire_lock, release_lock
-    from romtholos.collect.match import match_all_dats, print_plan
+    from romtholos.collect.match import print_plan
 
     try:
         lock_path = acquire_lock(cfg.romroot)
@@ -148,7 +186,7 @@ def execute(
     try:
         backup_db(cfg.db_cache, cfg.db_backup_dir)
 
-        with CacheDB(cfg.db_cache) as db:
+        with CacheDB(cfg.db_cache, profile=cfg.db_profile) as db:
             # Precondition: DB must have scan data
             stats = db.stats()
             if stats['scanned_files'] == 0:
@@ -161,7 +199,7 @@ def execute(
 
             # Match (cheap, always fresh from current DB state)
             print("=== Match ===", file=sys.stderr)
-            match_results = match_all_dats(cfg.selection, db)
+            match_results = _match(cfg, db, for_execute=True)
 
             # Filter by system if requested
             if system is not None:
@@ -192,6 +230,16 @@ def execute(
         release_lock(lock_path)
 
 
+def _end_phase(db) -> None:
+    """Refresh the planner statistics and truncate the WAL after a phase.
+
+    The next phase then queries with statistics that include this one's
+    writes, and a multi-hour run's WAL is reset at every phase boundary.
+    """
+    db.optimize()
+    db.checkpoint()
+
+
 @app.command()
 def run(
     config: Annotated[Path, typer.Argument(help="Path to config YAML")],
@@ -206,6 +254,20 @@ def run(
         int, typer.Option("--limit",
                           help="Stop after processing N games (0 = no limit)")
     ] = 0,
+    workers: Annotated[
+        int, typer.Option("--workers", min=1,
+                          help="Hash/extract N files in parallel during scan")
+    ] = 1,
+    deep: Annotated[
+        bool, typer.Option("--deep",
+                           help="List every romroot directory, ignoring the "
+                                "unchanged-directory cache")
+    ] = False,
+    restart: Annotated[
+        bool, typer.Option("--restart",
+                           help="Discard an interrupted scan's progress and "
+                                "scan from the top")
+    ] = False,
 ) -> None:
     """Full pipeline: scan, match, execute."""
     cfg = _load_config(config)
@@ -219,7 +281,10 @@ def run(
         raise typer.Exit(code=1) from None
 
     try:
-        _run_pipeline(cfg, force_rescan, verify_roundtrip, limit)
+        _run_pipeline(
+            cfg, force_rescan, verify_roundtrip, limit, workers, deep=deep,
+            restart=restart,
+        )
     finally:
         release_lock(lock_path)
 
@@ -233,6 +298,7 @@ def _execute_and_quarantine(
     Shared by ``run`` (full pipeline) and ``execute`` (standalone).
     """
     from romtholos.collect.execute import execute_plan, quarantine_orphans
+    from romtholos.collect.iosched import IOScheduler
     from romtholos.collect.match import (
         find_orphaned_romroot, group_by_game, match_all_dats,
     )
@@ -240,6 +306,7 @@ def _execute_and_quarantine(
     print("\n=== Execute ===", file=sys.stderr)
 
     source_modes = {str(s.path): s.source_type for s in cfg.sources}
+    io = IOScheduler.from_sources(cfg.sources)
 
     for system, dat_folder, ops in sorted(match_results):
         game_plans = group_by_game(ops)
@@ -278,6 +345,8 @@ def _execute_and_quarantine(
             extraction_cache_mb=cfg.extraction_cache_mb,
             compression_map=comp_map,
             global_fallback=cfg.default_compression,
+            io=io,
+            romroot_manifest=cfg.romroot_manifest,
         )
 
         relocated = result.get('relocated', 0)
@@ -306,29 +375,209 @@ def _execute_and_quarantine(
     print(f"  Romroot: {final['romroot_files']} files", file=sys.stderr)
 
 
-def _run_pipeline(cfg, force_rescan: bool, verify_roundtrip: bool, limit: int) -> None:
+def _load_dats_for_prefilter(cfg, db) -> None:
+    """Load selection DATs so the scan prefilter knows the wanted CRC32s."""
+    from romtholos.collect.match import load_selection_dats
+
+    loaded = load_selection_dats(cfg.selection, db)
+    print(f"  Archive prefilter: {loaded} DAT(s) loaded", file=sys.stderr)
+
+
+def _match(
+    cfg, db, *, workers: int = 1, for_execute: bool = False,
+    complete: bool = True,
+):
+    """Match all DATs, filling in lazily deferred hashes where needed.
+
+    With a reduced ``hashes:`` policy on some source, DAT entries left
+    missing may only be findable through a digest that was never computed:
+    those digests are computed for same-size candidates and match re-runs.
+    for_execute also completes every matched source, so romroot sidecars
+    built from DB rows (copy-as-is) carry all five hashes.
+
+    complete=False leaves source files alone (``plan`` runs without the
+    collector lock) and only reports which deferred digests are wanted.
+    """
+    from romtholos.collect.iosched import IOScheduler
+    from romtholos.collect.match import lazy_hash_demand, match_all_dats
+    from romtholos.collect.scan import complete_hashes
+
+    match_results = match_all_dats(cfg.selection, db)
+    if not cfg.lazy_hashes:
+        return match_results
+
+    types, sizes = lazy_hash_demand(db)
+    if not complete:
+        if types:
+            print(
+                "\n  Deferred hashes: missing entries may match on "
+                f"{', '.join(sorted(types))} digests not computed yet "
+                "(run, execute or scan --complete-hashes compute them)",
+                file=sys.stderr,
+            )
+        return match_results
+
+    io = IOScheduler.from_sources(cfg.sources)
+    if types and complete_hashes(
+        db, cfg.work_dir, hash_types=types, sizes=sizes, workers=workers,
+        io=io,
+    ):
+        match_results = match_all_dats(cfg.selection, db)
+
+    if for_execute:
+        sources = {
+            op.source_path
+            for _system, _folder, ops in match_results
+            for op in ops
+            if op.status == "matched" and op.source_path
+        }
+        complete_hashes(
+            db, cfg.work_dir, paths=sources, workers=workers, io=io,
+        )
+    return match_results
+
+
+def _run_pipeline(
+    cfg, force_rescan: bool, verify_roundtrip: bool, limit: int,
+    workers: int = 1,
+    *,
+    deep: bool = False,
+    restart: bool = False,
+) -> None:
     """Execute the full pipeline (called under lock)."""
     from romtholos.collect.backup import backup_db
     from romtholos.collect.db import CacheDB
-    from romtholos.collect.match import match_all_dats, print_plan
+    from romtholos.collect.match import print_plan
     from romtholos.collect.scan import scan_all
 
     backup_db(cfg.db_cache, cfg.db_backup_dir)
 
-    with CacheDB(cfg.db_cache) as db:
+    with CacheDB(cfg.db_cache, profile=cfg.db_profile) as db:
         # Phase 1: Scan
         print("=== Phase 1: Scan ===", file=sys.stderr)
-        scan_all(cfg.sources, db, cfg.work_dir, force_rescan=force_rescan)
+        if cfg.archive_prefilter:
+            _load_dats_for_prefilter(cfg, db)
+        scan_all(
+            cfg.sources, db, cfg.work_dir,
+            force_rescan=force_rescan, workers=workers, deep=deep,
+            prefilter=cfg.archive_prefilter, restart=restart,
+            shadow=_shadow_store(cfg),
+        )
+        _end_phase(db)
 
         # Phase 2: Match
         print("\n=== Phase 2: Match ===", file=sys.stderr)
-        match_results = match_all_dats(cfg.selection, db)
+        match_results = _match(cfg, db, workers=workers, for_execute=True)
         print_plan(match_results)
+        _end_phase(db)
 
         # Phase 3+4: Execute + Quarantine
         _execute_and_quarantine(cfg, db, match_results, verify_roundtrip, limit)
 
 
+@app.command()
+def watch(
+    config: Annotated[Path, typer.Argument(help="Path to config YAML")],
+    settle: Annotated[
+        float, typer.Option("--settle", min=0.1,
+                            help="Seconds a new file must stay unchanged "
+                                 "before it is scanned")
+    ] = 5.0,
+    workers: Annotated[
+        int, typer.Option("--workers", min=1,
+                          help="Hash/extract N files in parallel")
+    ] = 1,
+    execute_: Annotated[
+        bool, typer.Option("--execute",
+                           help="Match each batch and collect the systems "
+                                "it affects")
+    ] = False,
+) -> None:
+    """Watch ingest, disposal and readonly sources; scan files as they land.
+
+    Uses inotify (Linux). Runs an initial stat-cached scan of the watched
+    sources, then hashes only new or rewritten files once they have
+    settled. With --execute, each batch is matched and only the systems
+    that gained a matched file are executed (quarantine is left to
+    'collect run'). Stop with Ctrl-C.
+    """
+    cfg = _load_config(config)
+
+    from romtholos.collect.backup import backup_db
+    from romtholos.collect.db import CacheDB
+    from romtholos.collect.watch import WatchUnsupported, watch_sources
+
+    backup_db(cfg.db_cache, cfg.db_backup_dir)
+
+    print("=== Watch ===", file=sys.stderr)
+
+    with CacheDB(cfg.db_cache, profile=cfg.db_profile) as db:
+        if cfg.archive_prefilter:
+            _load_dats_for_prefilter(cfg, db)
+        on_batch = _affected_executor(cfg, db, workers) if execute_ else None
+        try:
+            watch_sources(
+                cfg.sources, db, cfg.work_dir, settle=settle, workers=workers,
+                prefilter=cfg.archive_prefilter, on_batch=on_batch,
+                shadow=_shadow_store(cfg),
+            )
+        except WatchUnsupported as exc:
+            print(f"Error: {exc}", file=sys.stderr)
+            raise typer.Exit(code=1) from None
+        except KeyboardInterrupt:
+            print("\nWatch stopped", file=sys.stderr)
+
+
+def _affected_executor(cfg, db, workers: int):
+    """Build watch's on_batch: match, then execute the affected systems.
+
+    Takes the collector lock per batch. While another collector holds it,
+    the batch's paths are kept and executed with the next one.
+    """
+    from romtholos.collect.lock import CollectorLockError, acquire_lock, release_lock
+    from romtholos.collect.match import print_plan
+
+    deferred: set[str] = set()
+    everything = False
+
+    def on_batch(paths: list[Path] | None) -> None:
+        nonlocal everything
+        if paths is None:
+            everything = True
+        else:
+            deferred.update(str(p) for p in paths)
+
+        try:
+            lock_path = acquire_lock(cfg.romroot)
+        except CollectorLockError as exc:
+            print(f"  Execute postponed: {exc}", file=sys.stderr)
+            return
+
+        try:
+            print("\n=== Match ===", file=sys.stderr)
+            match_results = _match(cfg, db, workers=workers, for_execute=True)
+            match_results = [
+                (s, d, ops) for s, d, ops in match_results
+                if any(op.status == "matched"
+                       and (everything or op.source_path in deferred)
+                       for op in ops)
+            ]
+            deferred.clear()
+            everything = False
+            if not match_results:
+                print("  No DAT wants the new files", file=sys.stderr)
+                return
+            print_plan(match_results)
+            _execute_and_quarantine(
+                cfg, db, match_results, verify_roundtrip=False, limit=0,
+                skip_quarantine=True,
+            )
+        finally:
+            release_lock(lock_path)
+
+    return on_batch
+
+
 @app.command()
 def verify(
     config: Annotated[Path, typer.Argument(help="Path to config YAML")],
@@ -344,15 +593,18 @@ def verify(
     cfg = _load_config(config)
 
     from romtholos.collect.db import CacheDB
+    from romtholos.collect.iosched import IOScheduler
     from romtholos.collect.verify import verify_romroot
 
     print("=== Verify Romroot Integrity ===", file=sys.stderr)
 
-    with CacheDB(cfg.db_cache) as db:
+    with CacheDB(cfg.db_cache, profile=cfg.db_profile) as db:
         result = verify_romroot(
             romroot=cfg.romroot,
             db=db,
             romroot_overrides=cfg.romroot_overrides,
+            stat_workers=cfg.stat_workers,
+            io=IOScheduler.from_sources(cfg.sources),
         )
 
     print(file=sys.stderr)
@@ -381,19 +633,165 @@ def verify(
 def status(
     config: Annotated[Path, typer.Argument(help="Path to config YAML")],
 ) -> None:
-    """Show current status of DB cache."""
+    """Show current status of DB cache.
+
+    Reads a snapshot without the collector lock, so it works (and never
+    waits) while a scan or run is writing.
+    """
+    cfg = _load_config(config)
+
+    from romtholos.collect.db import (
+        CacheDB, ReaderPool, SchemaMismatchError, wal_size,
+    )
+
+    try:
+        with (ReaderPool(cfg.db_cache, profile=cfg.db_profile) as pool,
+              pool.snapshot() as db):
+            stats = db.stats()
+    except (FileNotFoundError, SchemaMismatchError):
+        # No DB yet, or one from an older version: create or migrate it
+        with CacheDB(cfg.db_cache, profile=cfg.db_profile) as db:
+            stats = db.stats()
+
+    print(f"Scanned files:    {stats['scanned_files']}")
+    print(f"Scanned dirs:     {stats['scanned_dirs']}")
+    print(f"Archive entries:  {stats['archive_contents']}")
+    print(f"  provisional:    {stats['archive_provisional']}")
+    print(f"Partially hashed: {stats['partially_hashed']}")
+    print(f"DAT entries:      {stats['dat_entries']}")
+    print(f"Matched:          {stats['matched']}")
+    print(f"Missing:          {stats['missing']}")
+    print(f"Romroot files:    {stats['romroot_files']}")
+    print(f"Distinct content: {stats['contents']}")
+    print(f"WAL:              {_format_size(wal_size(cfg.db_cache))}")
+
+
+@app.command("rebuild-cache")
+def rebuild_cache(
+    config: Annotated[Path, typer.Argument(help="Path to config YAML")],
+    workers: Annotated[
+        int, typer.Option("--workers", min=1,
+                          help="Parse sidecars in N processes")
+    ] = 1,
+) -> None:
+    """Rebuild the DB cache from RSCF sidecars and selection DATs.
+
+    The new DB replaces the current one only once complete. Files without
+    a sidecar are hashed by the next scan.
+    """
+    cfg = _load_config(config)
+
+    from romtholos.collect.backup import backup_db
+    from romtholos.collect.lock import CollectorLockError, acquire_lock, release_lock
+    from romtholos.collect.rebuild import rebuild_cache as rebuild
+
+    try:
+        lock_path = acquire_lock(cfg.romroot)
+    except CollectorLockError as exc:
+        print(f"Error: {exc}", file=sys.stderr)
+        raise typer.Exit(code=1) from None
+
+    try:
+        backup_db(cfg.db_cache, cfg.db_backup_dir)
+        print("=== Rebuild Cache ===", file=sys.stderr)
+        stats = rebuild(
+            cfg.sources, cfg.db_cache, selection_dir=cfg.selection,
+            shadow=_shadow_store(cfg), workers=workers,
+            profile=cfg.db_profile,
+        )
+    finally:
+        release_lock(lock_path)
+
+    print(
+        f"\nRebuilt: {stats.files} file(s) "
+        f"({stats.sidecars_read} sidecars read, "
+        f"{stats.from_manifest} via manifest), "
+        f"{stats.archive_entries} archive entries, "
+        f"{stats.romroot_entries} romroot entries, "
+        f"{stats.dats_loaded} DAT(s)",
+        file=sys.stderr,
+    )
+    if stats.without_sidecar:
+        print(
+            f"  {stats.without_sidecar} file(s) without a usable sidecar "
+            f"— the next scan hashes them",
+            file=sys.stderr,
+        )
+
+
+cache_app = typer.Typer(no_args_is_help=True)
+app.add_typer(
+    cache_app, name="cache", help="Share scan hashes with another collector host.",
+)
+
+
+@cache_app.command("export")
+def cache_export(
+    config: Annotated[Path, typer.Argument(help="Path to config YAML")],
+    output: Annotated[Path, typer.Argument(help="Cache file to write")],
+) -> None:
+    """Export hashes of ingest, disposal and readonly sources to a file."""
     cfg = _load_config(config)
 
     from romtholos.collect.db import CacheDB
+    from romtholos.collect.hashcache import export_cache
 
-    with CacheDB(cfg.db_cache) as db:
-        stats = db.stats()
-        print(f"Scanned files:    {stats['scanned_files']}")
-        print(f"Archive entries:  {stats['archive_contents']}")
-        print(f"DAT entries:      {stats['dat_entries']}")
-        print(f"Matched:          {stats['matched']}")
-        print(f"Missing:          {stats['missing']}")
-        print(f"Romroot files:    {stats['romroot_files']}")
+    with CacheDB(cfg.db_cache, profile=cfg.db_profile) as db:
+        stats = export_cache(db, output)
+
+    print(
+        f"Exported {stats.files} file(s), {stats.contents} distinct, "
+        f"{stats.archive_entries} archive entries -> {output}",
+        file=sys.stderr,
+    )
+
+
+@cache_app.command("import")
+def cache_import(
+    config: Annotated[Path, typer.Argument(help="Path to config YAML")],
+    cache_file: Annotated[Path, typer.Argument(help="Cache file to load")],
+    remap: Annotated[
+        list[str] | None,
+        typer.Option("--map", help="OLD=NEW: exporting host's path prefix "
+                                   "and where it is mounted here (repeatable)"),
+    ] = None,
+) -> None:
+    """Import hashes exported on another host (all or nothing).
+
+    Only files that still have the exported size and mtime, inside a
+    configured ingest, disposal or readonly source, are taken over.
+    """
+    cfg = _load_config(config)
+
+    from romtholos.collect.backup import backup_db
+    from romtholos.collect.db import CacheDB
+    from romtholos.collect.hashcache import CacheFileError, import_cache
+
+    prefixes: list[tuple[str, str]] = []
+    for spec in remap or []:
+        old, sep, new = spec.partition("=")
+        if not sep or not old or not new:
+            print(f"Error: --map {spec!r} is not OLD=NEW", file=sys.stderr)
+            raise typer.Exit(code=1)
+        prefixes.append((old, new))
+
+    backup_db(cfg.db_cache, cfg.db_backup_dir)
+
+    with CacheDB(cfg.db_cache, profile=cfg.db_profile) as db:
+        try:
+            stats = import_cache(db, cache_file, cfg.sources, prefixes)
+        except CacheFileError as exc:
+            print(f"Error: {exc} — nothing imported", file=sys.stderr)
+            raise typer.Exit(code=1) from None
+
+    print(
+        f"Imported {stats.files_imported} file(s) "
+        f"({stats.archive_entries} archive entries), "
+        f"{stats.files_current} already current, "
+        f"{stats.files_stale} changed or missing, "
+        f"{stats.files_outside} outside configured sources",
+        file=sys.stderr,
+    )
 
 
 def _format_size(size_bytes: int) -> str:
@@ -420,7 +818,7 @@ def purge(
 
     from romtholos.collect.purge import list_orphans, purge_orphan
 
-    entries = list_orphans(cfg.romroot)
+    entries = list_orphans(cfg.romroot, stat_workers=cfg.stat_workers)
     if not entries:
         print("No orphaned files found.", file=sys.stderr)
         return
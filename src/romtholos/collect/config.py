@@ -7,6 +7,9 @@ from pathlib import Path
 
 import strictyaml as sy
 
+from romtholos.collect.db import HASH_TYPES, TEMP_STORES, DBProfile
+from romtholos.collect.layout import READ_ORDERS
+
 # Map YAML mode values to internal source types
 _MODE_TO_SOURCE_TYPE = {
     "read-only": "readonly",
@@ -30,6 +33,12 @@ class SourceDir:
 
     path: Path
     source_type: str = "readonly"  # "romroot" | "ingest" | "readonly" | "disposal"
+    stat_workers: int = 1  # concurrent stat calls while walking (NFS/CIFS)
+    trust_fingerprint: bool = False  # stat miss + fingerprint match → keep hashes
+    hash_types: tuple[str, ...] = HASH_TYPES  # computed at scan; rest lazily
+    read_order: str = "path"  # "path" | "inode" | "extent" (HDD sources)
+    max_reads: int = 0  # reads in flight on this source's device (0 = unlimited)
+    read_mb_per_s: float = 0.0  # read bandwidth cap for the device (0 = unlimited)
 
 
 @dataclass
@@ -54,6 +63,8 @@ class CollectorConfig:
     db_cache: Path = Path("collector.db")
     db_backup_dir: Path = Path("backup")  # default: next to db_cache
     sbi_dir: Path | None = None
+    shadow_store: Path | None = None  # sidecars for read-only sources
+    db_profile: DBProfile = field(default_factory=DBProfile)  # SQLite tuning
 
     # Sources (includes implicit romroot sources)
     sources: list[SourceDir] = field(default_factory=list)
@@ -64,6 +75,9 @@ class CollectorConfig:
     partial_min_ratio: float = 0.0  # minimum fraction of ROMs for partial games
     extraction_cache_mb: int = 2048  # extraction cache size in MiB
     verify_roundtrip: bool = False
+    stat_workers: int = 1  # walker stat concurrency for implicit sources
+    archive_prefilter: bool = False  # list archives, hash only DAT-wanted ones
+    romroot_manifest: bool = False  # execute keeps a sidecar manifest per system
 
     # Per-system
     systems: dict[str, SystemConfig] = field(default_factory=dict)
@@ -71,6 +85,13 @@ class CollectorConfig:
     # Per-system romroot overrides
     romroot_overrides: dict[str, Path] = field(default_factory=dict)
 
+    @property
+    def lazy_hashes(self) -> bool:
+        """True if any source defers some hash types to on-demand passes."""
+        return any(
+            set(s.hash_types) != set(HASH_TYPES) for s in self.sources
+        )
+
     def romroot_for_system(self, system: str) -> Path:
         """Resolve the romroot path for a system, considering overrides."""
         if system in self.romroot_overrides:
@@ -124,11 +145,18 @@ _CONFIG_SCHEMA = sy.Map({
         sy.Optional("upstream"): sy.Str(),
         sy.Optional("db_backup_dir"): sy.Str(),
         sy.Optional("sbi_dir"): sy.Str(),
+        sy.Optional("shadow_store"): sy.Str(),
     }),
     sy.Optional("romroot_overrides"): sy.MapPattern(sy.Str(), sy.Str()),
     sy.Optional("sources"): sy.Seq(sy.Map({
         "path": sy.Str(),
         sy.Optional("mode"): sy.Str(),
+        sy.Optional("stat_workers"): sy.Int(),
+        sy.Optional("trust_fingerprint"): sy.Bool(),
+        sy.Optional("hashes"): sy.Seq(sy.Str()),
+        sy.Optional("read_order"): sy.Str(),
+        sy.Optional("max_reads"): sy.Int(),
+        sy.Optional("read_mb_per_s"): sy.Float(),
     })),
     sy.Optional("defaults"): sy.Map({
         sy.Optional("compression"): sy.Str(),
@@ -139,6 +167,18 @@ _CONFIG_SCHEMA = sy.Map({
         sy.Optional("languages"): sy.Seq(sy.Str()),
         sy.Optional("include_fallback"): sy.Bool(),
         sy.Optional("verify_roundtrip"): sy.Bool(),
+        sy.Optional("stat_workers"): sy.Int(),
+        sy.Optional("archive_prefilter"): sy.Bool(),
+        sy.Optional("romroot_manifest"): sy.Bool(),
+        sy.Optional("trust_fingerprint"): sy.Seq(sy.Str()),
+        sy.Optional("hashes"): sy.Seq(sy.Str()),
+        sy.Optional("read_order"): sy.Str(),
+    }),
+    sy.Optional("db"): sy.Map({
+        sy.Optional("cache_mb"): sy.Int(),
+        sy.Optional("mmap_mb"): sy.Int(),
+        sy.Optional("temp_store"): sy.Str(),
+        sy.Optional("checkpoint_every"): sy.Int(),
     }),
     sy.Optional("systems"): sy.MapPattern(
         sy.Str(),
@@ -156,6 +196,50 @@ _CONFIG_SCHEMA = sy.Map({
 })
 
 
+def _parse_hash_types(values: list[str], where: str) -> tuple[str, ...]:
+    """Validate a ``hashes:`` list; returns it in canonical order.
+
+    BLAKE3 is mandatory — sidecars, fingerprints and container identity
+    are keyed on it.
+    """
+    unknown = set(values) - set(HASH_TYPES)
+    assert not unknown, (
+        f"{where}: unknown hash type(s) {', '.join(sorted(unknown))}. "
+        f"Valid: {', '.join(HASH_TYPES)}"
+    )
+    assert "blake3" in values, f"{where}: hashes must include blake3"
+    return tuple(ht for ht in HASH_TYPES if ht in values)
+
+
+def _parse_read_order(value: str, where: str) -> str:
+    """Validate a ``read_order:`` value."""
+    assert value in READ_ORDERS, (
+        f"{where}: unknown read_order {value!r}. "
+        f"Valid: {', '.join(READ_ORDERS)}"
+    )
+    return value
+
+
+def _parse_db_profile(data: dict) -> DBProfile:
+    """Validate the ``db:`` section; unset keys keep DBProfile's defaults."""
+    defaults = DBProfile()
+    profile = DBProfile(
+        cache_mb=int(data.get("cache_mb", defaults.cache_mb)),
+        mmap_mb=int(data.get("mmap_mb", defaults.mmap_mb)),
+        temp_store=data.get("temp_store", defaults.temp_store),
+        checkpoint_every=int(data.get("checkpoint_every", defaults.checkpoint_every)),
+    )
+    assert profile.cache_mb >= 1, f"db.cache_mb must be >= 1, got {profile.cache_mb}"
+    assert profile.mmap_mb >= 0 and profile.checkpoint_every >= 0, (
+        "db.mmap_mb and db.checkpoint_every must be >= 0 (0 = off)"
+    )
+    assert profile.temp_store in TEMP_STORES, (
+        f"db: unknown temp_store {profile.temp_store!r}. "
+        f"Valid: {', '.join(TEMP_STORES)}"
+    )
+    return profile
+
+
 def load_config(config_path: Path) -> CollectorConfig:
     """Load collector configuration from YAML."""
     text = config_path.read_text(encoding="utf-8")
@@ -169,19 +253,43 @@ def load_config(config_path: Path) -> CollectorConfig:
 
     romroot_path = Path(paths.get("romroot", "romroot"))
     romroot_overrides = {k: Path(v) for k, v in overrides_data.items()}
+    stat_workers = int(defaults.get("stat_workers", 1))
+    assert stat_workers >= 1, f"stat_workers must be >= 1, got {stat_workers}"
+    # Source modes whose files may be recognised by content fingerprint
+    # after a stat-cache miss (romroot has sidecars for that)
+    trusted_modes = set(defaults.get("trust_fingerprint", []))
+    unknown = trusted_modes - (_MODE_TO_SOURCE_TYPE.keys() - {"romroot"})
+    assert not unknown, (
+        f"trust_fingerprint: unknown or unsupported mode(s) "
+        f"{', '.join(sorted(unknown))}. "
+        f"Valid: disposal, read-only, read-write"
+    )
+    # Hash types computed eagerly by scan (untrusted sources); the rest
+    # are filled in on demand
+    default_hashes = (
+        _parse_hash_types(list(defaults["hashes"]), "defaults.hashes")
+        if "hashes" in defaults else HASH_TYPES
+    )
+    # Order untrusted sources are hashed in (physical order for HDDs)
+    default_read_order = _parse_read_order(
+        defaults.get("read_order", "path"), "defaults.read_order",
+    )
 
     # Build implicit romroot sources (main + overrides)
     romroot_paths_seen: set[Path] = set()
     implicit_sources: list[SourceDir] = []
 
-    implicit_sources.append(SourceDir(path=romroot_path, source_type="romroot"))
+    implicit_sources.append(SourceDir(
+        path=romroot_path, source_type="romroot", stat_workers=stat_workers,
+    ))
     romroot_paths_seen.add(romroot_path)
 
     for override_path in romroot_overrides.values():
         if override_path not in romroot_paths_seen:
-            implicit_sources.append(
-                SourceDir(path=override_path, source_type="romroot")
-            )
+            implicit_sources.append(SourceDir(
+                path=override_path, source_type="romroot",
+                stat_workers=stat_workers,
+            ))
             romroot_paths_seen.add(override_path)
 
     # Add _orphaned/ directories as implicit ingest sources.
@@ -190,9 +298,13 @@ def load_config(config_path: Path) -> CollectorConfig:
     # subject to orphan detection.
     for rr_path in romroot_paths_seen:
         orphaned_dir = rr_path / ORPHANED_DIR_NAME
-        implicit_sources.append(
-            SourceDir(path=orphaned_dir, source_type="ingest")
-        )
+        implicit_sources.append(SourceDir(
+            path=orphaned_dir, source_type="ingest",
+            stat_workers=stat_workers,
+            trust_fingerprint="read-write" in trusted_modes,
+            hash_types=default_hashes,
+            read_order=default_read_order,
+        ))
 
     # Build explicit sources from config
     explicit_sources: list[SourceDir] = []
@@ -204,12 +316,42 @@ def load_config(config_path: Path) -> CollectorConfig:
             f"Valid: {', '.join(sorted(_MODE_TO_SOURCE_TYPE))}"
         )
         source_path = Path(s["path"])
-        # Skip if already covered by implicit romroot
+        # Device read limits (I/O scheduler)
+        max_reads = int(s.get("max_reads", 0))
+        read_mb_per_s = float(s.get("read_mb_per_s", 0.0))
+        assert max_reads >= 0 and read_mb_per_s >= 0, (
+            f"max_reads and read_mb_per_s must be >= 0 for source "
+            f"{source_path} (0 = unlimited)"
+        )
+        # Skip if already covered by implicit romroot — but keep its limits
         if source_path in romroot_paths_seen:
+            for implicit in implicit_sources:
+                if implicit.path == source_path:
+                    implicit.max_reads = max_reads
+                    implicit.read_mb_per_s = read_mb_per_s
             continue
-        explicit_sources.append(
-            SourceDir(path=source_path, source_type=source_type)
+        source_stat_workers = int(s.get("stat_workers", stat_workers))
+        assert source_stat_workers >= 1, (
+            f"stat_workers must be >= 1 for source {source_path}, "
+            f"got {source_stat_workers}"
         )
+        explicit_sources.append(SourceDir(
+            path=source_path, source_type=source_type,
+            stat_workers=source_stat_workers,
+            trust_fingerprint=s.get(
+                "trust_fingerprint", mode in trusted_modes,
+            ),
+            hash_types=(
+                _parse_hash_types(list(s["hashes"]), f"source {source_path}")
+                if "hashes" in s else default_hashes
+            ),
+            read_order=_parse_read_order(
+                s.get("read_order", default_read_order),
+                f"source {source_path}",
+            ),
+            max_reads=max_reads,
+            read_mb_per_s=read_mb_per_s,
+        ))
 
     systems = {}
     for name, sys_data in systems_data.items():
@@ -226,6 +368,8 @@ def load_config(config_path: Path) -> CollectorConfig:
 
     sbi_dir_str = paths.get("sbi_dir")
     sbi_dir = Path(sbi_dir_str) if sbi_dir_str else None
+    shadow_store_str = paths.get("shadow_store")
+    shadow_store = Path(shadow_store_str) if shadow_store_str else None
 
     db_cache = Path(paths.get("db_cache", "collector.db"))
     db_backup_dir_str = paths.get("db_backup_dir")
@@ -241,12 +385,17 @@ def load_config(config_path: Path) -> CollectorConfig:
         db_cache=db_cache,
         db_backup_dir=db_backup_dir,
         sbi_dir=sbi_dir,
+        shadow_store=shadow_store,
+        db_profile=_parse_db_profile(data.get("db", {})),
         sources=implicit_sources + explicit_sources,
         default_compression=defaults.get("compression", "zstd-19"),
         partial_fallback=defaults.get("partial_fallback", ""),
         partial_min_ratio=float(defaults.get("partial_min_ratio", 0.0)),
         extraction_cache_mb=int(defaults.get("extraction_cache_mb", 2048)),
         verify_roundtrip=defaults.get("verify_roundtrip", False),
+        stat_workers=stat_workers,
+        archive_prefilter=defaults.get("archive_prefilter", False),
+        romroot_manifest=defaults.get("romroot_manifest", False),
         systems=systems,
         romroot_overrides=romroot_overrides,
     )
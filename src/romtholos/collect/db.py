@@ -6,54 +6,157 @@ Not the source of truth. Rebuilt from RSCF files + DATs if lost.
 from __future__ import annotations
 
 import contextlib
+import hashlib
 import sqlite3
+import sys
+import threading
+import time
+from collections.abc import Iterable, Iterator, Mapping
+from dataclasses import dataclass
 from pathlib import Path
+from typing import NamedTuple
+
+_SCHEMA_VERSION = 13
+
+# How long a connection waits on a lock (WAL recovery, a writer resetting
+# the log, a reader holding back a checkpoint) before giving up, in seconds
+_BUSY_TIMEOUT = 5.0
+
+# Rows per index ANALYZE and PRAGMA optimize sample. Approximate
+# statistics pick the same plans as exact ones, at a fraction of the
+# cost on multi-million-row tables.
+_ANALYSIS_LIMIT = 1000
+
+TEMP_STORES = ("default", "file", "memory")
+
+
+@dataclass(frozen=True)
+class DBProfile:
+    """SQLite tuning of CacheDB connections (the ``db:`` config section).
+
+    The page cache and memory map are per connection. Sizes in MiB.
+    """
+
+    cache_mb: int = 256  # page cache (cache_size)
+    mmap_mb: int = 1024  # memory-mapped reads (mmap_size), 0 = off
+    temp_store: str = "memory"  # temp tables and sorts: one of TEMP_STORES
+    # wal_checkpoint(TRUNCATE) every this many writer commits, 0 = only
+    # between pipeline phases and on close
+    checkpoint_every: int = 200
+
+    def apply(self, conn: sqlite3.Connection) -> None:
+        """Set this profile's pragmas on conn."""
+        assert self.temp_store in TEMP_STORES, (
+            f"unknown temp_store {self.temp_store!r}"
+        )
+        conn.execute(f"PRAGMA cache_size = {-self.cache_mb * 1024}")  # KiB
+        conn.execute(f"PRAGMA mmap_size = {self.mmap_mb * 1024 * 1024}")
+        conn.execute(f"PRAGMA temp_store = {self.temp_store.upper()}")
+        conn.execute(f"PRAGMA analysis_limit = {_ANALYSIS_LIMIT}")
+
+
+def wal_size(db_path: Path | str) -> int:
+    """Size of db_path's write-ahead log in bytes, 0 if it has none."""
+    try:
+        return Path(f"{db_path}-wal").stat().st_size
+    except FileNotFoundError:
+        return 0
 
-_SCHEMA_VERSION = 4
 
 # Canonical hash types — used for assertions and iteration across all stages.
 HASH_TYPES: tuple[str, ...] = ("crc32", "md5", "sha1", "sha256", "blake3")
 
-_SCHEMA = """
-CREATE TABLE IF NOT EXISTS scanned_files (
+
+def hash_mask(hash_types) -> int:
+    """Bitmask of hash types (bit i = HASH_TYPES[i]) for the ``hashed`` column."""
+    mask = 0
+    for ht in hash_types:
+        assert ht in HASH_TYPES, f"unknown hash type {ht!r}"
+        mask |= 1 << HASH_TYPES.index(ht)
+    return mask
+
+
+ALL_HASHES = hash_mask(HASH_TYPES)
+
+
+def mask_hash_types(mask: int) -> tuple[str, ...]:
+    """Hash types set in a ``hashed`` bitmask, in canonical order."""
+    return tuple(ht for i, ht in enumerate(HASH_TYPES) if mask & (1 << i))
+
+
+# Row tables joined with their digests. Digests are stored as BLOBs
+# (NULL when unknown) and read back as upper-case hex, '' when unknown —
+# the form every caller passes in. The views below and the hash lookups
+# share these; lookups filter on the BLOB columns of c so the (partial)
+# hash indexes apply.
+_HEX_DIGESTS = ", ".join(f"hex(c.{ht}) AS {ht}" for ht in HASH_TYPES)
+
+_SCANNED_SELECT = f"""SELECT f.path, f.size, f.mtime_ns, f.ctime_ns, f.inode,
+           f.device, f.source_type, {_HEX_DIGESTS},
+           f.fingerprint, f.hashed, f.is_archive, f.scanned_at
+    FROM scanned_files_base f JOIN contents c ON c.id = f.content_id"""
+
+_ARCHIVE_SELECT = f"""SELECT a.archive_path, a.entry_name, a.entry_size,
+           {_HEX_DIGESTS}, a.hashed, a.provisional
+    FROM archive_contents_base a JOIN contents c ON c.id = a.content_id"""
+
+_DAT_SELECT = f"""SELECT d.dat_path, d.system, d.game_name, d.rom_name,
+           d.rom_size, {_HEX_DIGESTS}
+    FROM dat_entries_base d JOIN contents c ON c.id = d.content_id"""
+
+_ROMROOT_SELECT = f"""SELECT r.path, r.system, r.game_name, r.rom_name,
+           {_HEX_DIGESTS}, r.rscf_path
+    FROM romroot_files_base r JOIN contents c ON c.id = r.content_id"""
+
+# Each distinct digest combination is stored once, in contents. The row
+# tables (*_base) refer to it by content_id, so the five hash indexes
+# exist once instead of per table, and a romroot entry recorded in both
+# archive_contents and romroot_files shares one contents row. Reads use
+# views with the old table names and columns; writes go through CacheDB,
+# which interns digests (_content, _intern) before inserting rows.
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS contents (
+    id      INTEGER PRIMARY KEY,
+    key     BLOB NOT NULL UNIQUE,
+    crc32   BLOB,
+    md5     BLOB,
+    sha1    BLOB,
+    sha256  BLOB,
+    blake3  BLOB
+);
+
+CREATE TABLE IF NOT EXISTS scanned_files_base (
     path        TEXT PRIMARY KEY,
     size        INTEGER NOT NULL,
     mtime_ns    INTEGER NOT NULL,
     ctime_ns    INTEGER NOT NULL DEFAULT 0,
     inode       INTEGER NOT NULL DEFAULT 0,
+    device      INTEGER NOT NULL DEFAULT 0,
     source_type TEXT NOT NULL DEFAULT 'readonly',
-    crc32       TEXT,
-    md5         TEXT,
-    sha1        TEXT,
-    sha256      TEXT,
-    blake3      TEXT,
+    content_id  INTEGER NOT NULL REFERENCES contents(id),
+    fingerprint TEXT NOT NULL DEFAULT '',
+    hashed      INTEGER NOT NULL DEFAULT 31,
     is_archive  INTEGER DEFAULT 0,
     scanned_at  TEXT NOT NULL
 );
 
-CREATE TABLE IF NOT EXISTS archive_contents (
+CREATE TABLE IF NOT EXISTS archive_contents_base (
     archive_path    TEXT NOT NULL,
     entry_name      TEXT NOT NULL,
     entry_size      INTEGER,
-    crc32           TEXT,
-    md5             TEXT,
-    sha1            TEXT,
-    sha256          TEXT,
-    blake3          TEXT,
+    content_id      INTEGER NOT NULL REFERENCES contents(id),
+    hashed          INTEGER NOT NULL DEFAULT 31,
+    provisional     INTEGER NOT NULL DEFAULT 0,
     PRIMARY KEY (archive_path, entry_name)
 );
 
-CREATE TABLE IF NOT EXISTS dat_entries (
+CREATE TABLE IF NOT EXISTS dat_entries_base (
     dat_path    TEXT NOT NULL,
     system      TEXT NOT NULL,
     game_name   TEXT NOT NULL,
     rom_name    TEXT NOT NULL,
     rom_size    INTEGER,
-    crc32       TEXT,
-    md5         TEXT,
-    sha1        TEXT,
-    sha256      TEXT,
-    blake3      TEXT,
+    content_id  INTEGER NOT NULL REFERENCES contents(id),
     PRIMARY KEY (dat_path, game_name, rom_name)
 );
 
@@ -68,81 +171,523 @@ CREATE TABLE IF NOT EXISTS matches (
     PRIMARY KEY (dat_path, game_name, rom_name)
 );
 
-CREATE TABLE IF NOT EXISTS romroot_files (
+CREATE TABLE IF NOT EXISTS romroot_files_base (
     path        TEXT NOT NULL,
     system      TEXT NOT NULL,
     game_name   TEXT NOT NULL,
     rom_name    TEXT NOT NULL,
-    crc32       TEXT,
-    md5         TEXT,
-    sha1        TEXT,
-    sha256      TEXT,
-    blake3      TEXT,
+    content_id  INTEGER NOT NULL REFERENCES contents(id),
     rscf_path   TEXT,
     PRIMARY KEY (path, rom_name)
 );
 
-CREATE INDEX IF NOT EXISTS idx_scanned_crc32 ON scanned_files(crc32);
-CREATE INDEX IF NOT EXISTS idx_scanned_md5 ON scanned_files(md5);
-CREATE INDEX IF NOT EXISTS idx_scanned_sha1 ON scanned_files(sha1);
-CREATE INDEX IF NOT EXISTS idx_scanned_sha256 ON scanned_files(sha256);
-CREATE INDEX IF NOT EXISTS idx_scanned_blake3 ON scanned_files(blake3);
-CREATE INDEX IF NOT EXISTS idx_archive_crc32 ON archive_contents(crc32);
-CREATE INDEX IF NOT EXISTS idx_archive_md5 ON archive_contents(md5);
-CREATE INDEX IF NOT EXISTS idx_archive_sha1 ON archive_contents(sha1);
-CREATE INDEX IF NOT EXISTS idx_archive_sha256 ON archive_contents(sha256);
-CREATE INDEX IF NOT EXISTS idx_archive_blake3 ON archive_contents(blake3);
-CREATE INDEX IF NOT EXISTS idx_dat_crc32 ON dat_entries(crc32);
-CREATE INDEX IF NOT EXISTS idx_dat_md5 ON dat_entries(md5);
-CREATE INDEX IF NOT EXISTS idx_dat_sha1 ON dat_entries(sha1);
-CREATE INDEX IF NOT EXISTS idx_dat_sha256 ON dat_entries(sha256);
-CREATE INDEX IF NOT EXISTS idx_dat_blake3 ON dat_entries(blake3);
-CREATE INDEX IF NOT EXISTS idx_romroot_crc32 ON romroot_files(crc32);
-CREATE INDEX IF NOT EXISTS idx_romroot_md5 ON romroot_files(md5);
-CREATE INDEX IF NOT EXISTS idx_romroot_sha1 ON romroot_files(sha1);
-CREATE INDEX IF NOT EXISTS idx_romroot_sha256 ON romroot_files(sha256);
-CREATE INDEX IF NOT EXISTS idx_romroot_blake3 ON romroot_files(blake3);
-CREATE INDEX IF NOT EXISTS idx_romroot_game ON romroot_files(system, game_name);
+CREATE TABLE IF NOT EXISTS scanned_dirs (
+    path        TEXT PRIMARY KEY,
+    parent      TEXT NOT NULL,
+    mtime_ns    INTEGER NOT NULL,
+    ctime_ns    INTEGER NOT NULL,
+    inode       INTEGER NOT NULL,
+    entry_count INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS scan_cursors (
+    root         TEXT PRIMARY KEY,
+    position     TEXT NOT NULL DEFAULT '',
+    in_flight    TEXT NOT NULL DEFAULT '',
+    force_rescan INTEGER NOT NULL DEFAULT 0,
+    complete     INTEGER NOT NULL DEFAULT 0
+);
+
+-- Hash lookups go through contents; the row tables only index content_id.
+-- Partial: unknown digests (NULL) stay out of the hash indexes.
+CREATE INDEX IF NOT EXISTS idx_contents_crc32 ON contents(crc32)
+    WHERE crc32 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_contents_md5 ON contents(md5)
+    WHERE md5 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_contents_sha1 ON contents(sha1)
+    WHERE sha1 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_contents_sha256 ON contents(sha256)
+    WHERE sha256 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_contents_blake3 ON contents(blake3)
+    WHERE blake3 IS NOT NULL;
+CREATE INDEX IF NOT EXISTS idx_scanned_content ON scanned_files_base(content_id);
+CREATE INDEX IF NOT EXISTS idx_scanned_identity
+    ON scanned_files_base(inode, device, size, mtime_ns);
+CREATE INDEX IF NOT EXISTS idx_scanned_size ON scanned_files_base(size);
+CREATE INDEX IF NOT EXISTS idx_archive_content ON archive_contents_base(content_id);
+CREATE INDEX IF NOT EXISTS idx_dat_content ON dat_entries_base(content_id);
+CREATE INDEX IF NOT EXISTS idx_romroot_content ON romroot_files_base(content_id);
+CREATE INDEX IF NOT EXISTS idx_romroot_game ON romroot_files_base(system, game_name);
+CREATE INDEX IF NOT EXISTS idx_dirs_parent ON scanned_dirs(parent);
+
+-- Denormalized views under the pre-v12 table names (same columns, same
+-- order): every read, and ad-hoc SQL, sees rows with their hashes.
+CREATE VIEW IF NOT EXISTS scanned_files AS {_SCANNED_SELECT};
+
+CREATE VIEW IF NOT EXISTS archive_contents AS {_ARCHIVE_SELECT};
+
+CREATE VIEW IF NOT EXISTS dat_entries AS {_DAT_SELECT};
+
+CREATE VIEW IF NOT EXISTS romroot_files AS {_ROMROOT_SELECT};
+
+CREATE TRIGGER IF NOT EXISTS scanned_files_delete
+    INSTEAD OF DELETE ON scanned_files
+BEGIN
+    DELETE FROM scanned_files_base WHERE path = OLD.path;
+END;
+
+CREATE TRIGGER IF NOT EXISTS archive_contents_delete
+    INSTEAD OF DELETE ON archive_contents
+BEGIN
+    DELETE FROM archive_contents_base
+    WHERE archive_path = OLD.archive_path AND entry_name = OLD.entry_name;
+END;
+
+CREATE TRIGGER IF NOT EXISTS dat_entries_delete
+    INSTEAD OF DELETE ON dat_entries
+BEGIN
+    DELETE FROM dat_entries_base
+    WHERE dat_path = OLD.dat_path AND game_name = OLD.game_name
+      AND rom_name = OLD.rom_name;
+END;
+
+CREATE TRIGGER IF NOT EXISTS romroot_files_delete
+    INSTEAD OF DELETE ON romroot_files
+BEGIN
+    DELETE FROM romroot_files_base
+    WHERE path = OLD.path AND rom_name = OLD.rom_name;
+END;
 """
 
+# Keys per "key IN (...)" lookup when resolving contents ids — below
+# SQLite's host parameter limit on every build
+_KEYS_PER_LOOKUP = 500
+
+
+# Digest width per hash type, in bytes
+_DIGEST_SIZES = {"crc32": 4, "md5": 16, "sha1": 20, "sha256": 32, "blake3": 32}
+
+
+def _digest(hash_type: str, value: str | None) -> bytes | None:
+    """A hex digest (either case) as stored: its fixed-width bytes.
+
+    None if empty or malformed (not hex, or the wrong width for
+    hash_type) — DAT attributes and sidecar digests reach the DB
+    unvalidated, and a malformed one matches nothing.
+    """
+    size = _DIGEST_SIZES[hash_type]
+    if not value or len(value) != 2 * size:
+        return None
+    try:
+        digest = bytes.fromhex(value)
+    except ValueError:
+        return None
+    # fromhex() skips whitespace: a padded value comes out short
+    return digest if len(digest) == size else None
+
+
+def _content_key(*digests: bytes | None) -> bytes:
+    """contents.key of a digest combination.
+
+    A 16-byte BLAKE2b of the digests, each prefixed with its length, so
+    the unique index stays small.
+    """
+    data = b"".join(bytes((len(d),)) + d if d else b"\0" for d in digests)
+    return hashlib.blake2b(data, digest_size=16).digest()
+
+
+def _content_mask(content: tuple) -> int:
+    """``hashed`` mask of a _content() tuple: its known digests."""
+    return hash_mask(ht for ht, d in zip(HASH_TYPES, content[1:]) if d)
+
+
+def _content(values: Mapping) -> tuple:
+    """(key, crc32, md5, sha1, sha256, blake3) of a row's digests.
+
+    Malformed digests are stored as unknown (NULL), with a warning.
+    """
+    digests = []
+    for ht in HASH_TYPES:
+        value = values.get(ht)
+        digest = _digest(ht, value) if value else None
+        if digest is None and value:
+            name = (values.get("rom_name") or values.get("entry_name")
+                    or values.get("path"))
+            print(f"  WARNING: ignoring malformed {ht} {value!r} of {name}",
+                  file=sys.stderr)
+        digests.append(digest)
+    return (_content_key(*digests), *digests)
+
+
+# --- Schema migrations ---
+#
+# _MIGRATIONS[v] takes a DB from schema v to v + 1, in place. A DB older
+# than the current version runs every step from its version up, then
+# _SCHEMA, all in one transaction; any failure leaves it as it was.
+#
+# - Steps only change tables. Views (with their triggers) are dropped
+#   before the first step; indexes, views and triggers come from _SCHEMA
+#   (IF NOT EXISTS) after the last one. A step that redefines an index
+#   under the same name drops the old one first.
+# - Steps are frozen: they hold the DDL of their own version, never
+#   _SCHEMA's, so later steps still find the layout they expect.
+# - A destructive step (rows cannot be carried over) discards the cache
+#   instead: the DB is recreated and rebuilt by the next scan, as for
+#   versions without a path to the current one.
+
+
+class _Migration(NamedTuple):
+    """One schema step: from its key in _MIGRATIONS to the next version."""
+
+    description: str
+    script: str
+    destructive: bool = False
+
+
+# hashed mask of a pre-v9 row: the digests it has (bit i = HASH_TYPES[i])
+_PRESENT_MASK_SQL = " | ".join(
+    f"((COALESCE({ht}, '') != '') << {i})" for i, ht in enumerate(HASH_TYPES)
+)
+
+_V11_DIGESTS = "crc32, md5, sha1, sha256, blake3"
+
+_MIGRATIONS: dict[int, _Migration] = {
+    4: _Migration("directory state for romroot walk pruning", """
+        CREATE TABLE scanned_dirs (
+            path        TEXT PRIMARY KEY,
+            parent      TEXT NOT NULL,
+            mtime_ns    INTEGER NOT NULL,
+            ctime_ns    INTEGER NOT NULL,
+            inode       INTEGER NOT NULL,
+            entry_count INTEGER NOT NULL
+        );
+    """),
+    5: _Migration("provisional (listing-only) archive entries", """
+        ALTER TABLE archive_contents
+            ADD COLUMN provisional INTEGER NOT NULL DEFAULT 0;
+    """),
+    6: _Migration("device of scanned files", """
+        ALTER TABLE scanned_files ADD COLUMN device INTEGER NOT NULL DEFAULT 0;
+    """),
+    7: _Migration("content fingerprints", """
+        ALTER TABLE scanned_files ADD COLUMN fingerprint TEXT NOT NULL DEFAULT '';
+    """),
+    8: _Migration("hashed masks, backfilled from the digests present", f"""
+        ALTER TABLE scanned_files ADD COLUMN hashed INTEGER NOT NULL DEFAULT 31;
+        ALTER TABLE archive_contents
+            ADD COLUMN hashed INTEGER NOT NULL DEFAULT 31;
+        UPDATE scanned_files SET hashed = {_PRESENT_MASK_SQL};
+        UPDATE archive_contents
+            SET hashed = CASE WHEN provisional THEN 0 ELSE {_PRESENT_MASK_SQL} END;
+    """),
+    9: _Migration("scan cursors", """
+        CREATE TABLE scan_cursors (
+            root         TEXT PRIMARY KEY,
+            position     TEXT NOT NULL DEFAULT '',
+            in_flight    TEXT NOT NULL DEFAULT '',
+            force_rescan INTEGER NOT NULL DEFAULT 0,
+            complete     INTEGER NOT NULL DEFAULT 0
+        );
+    """),
+    10: _Migration("index on scanned file size", ""),  # index only
+    11: _Migration("distinct contents moved into the contents table", f"""
+        CREATE TABLE contents (
+            id      INTEGER PRIMARY KEY,
+            key     BLOB NOT NULL UNIQUE,
+            crc32   TEXT NOT NULL DEFAULT '',
+            md5     TEXT NOT NULL DEFAULT '',
+            sha1    TEXT NOT NULL DEFAULT '',
+            sha256  TEXT NOT NULL DEFAULT '',
+            blake3  TEXT NOT NULL DEFAULT ''
+        );
+        INSERT OR IGNORE INTO contents (key, {_V11_DIGESTS})
+            SELECT v12_content_key({_V11_DIGESTS}), COALESCE(crc32, ''),
+                   COALESCE(md5, ''), COALESCE(sha1, ''),
+                   COALESCE(sha256, ''), COALESCE(blake3, '')
+            FROM (SELECT {_V11_DIGESTS} FROM scanned_files
+                  UNION ALL SELECT {_V11_DIGESTS} FROM archive_contents
+                  UNION ALL SELECT {_V11_DIGESTS} FROM dat_entries
+                  UNION ALL SELECT {_V11_DIGESTS} FROM romroot_files);
+
+        CREATE TABLE scanned_files_base (
+            path        TEXT PRIMARY KEY,
+            size        INTEGER NOT NULL,
+            mtime_ns    INTEGER NOT NULL,
+            ctime_ns    INTEGER NOT NULL DEFAULT 0,
+            inode       INTEGER NOT NULL DEFAULT 0,
+            device      INTEGER NOT NULL DEFAULT 0,
+            source_type TEXT NOT NULL DEFAULT 'readonly',
+            content_id  INTEGER NOT NULL REFERENCES contents(id),
+            fingerprint TEXT NOT NULL DEFAULT '',
+            hashed      INTEGER NOT NULL DEFAULT 31,
+            is_archive  INTEGER DEFAULT 0,
+            scanned_at  TEXT NOT NULL
+        );
+        INSERT INTO scanned_files_base
+            SELECT path, size, mtime_ns, ctime_ns, inode, device, source_type,
+                   (SELECT id FROM contents
+                    WHERE key = v12_content_key(t.crc32, t.md5, t.sha1,
+                                                t.sha256, t.blake3)),
+                   fingerprint, hashed, is_archive, scanned_at
+            FROM scanned_files t;
+        DROP TABLE scanned_files;
+
+        CREATE TABLE archive_contents_base (
+            archive_path    TEXT NOT NULL,
+            entry_name      TEXT NOT NULL,
+            entry_size      INTEGER,
+            content_id      INTEGER NOT NULL REFERENCES contents(id),
+            hashed          INTEGER NOT NULL DEFAULT 31,
+            provisional     INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (archive_path, entry_name)
+        );
+        INSERT INTO archive_contents_base
+            SELECT archive_path, entry_name, entry_size,
+                   (SELECT id FROM contents
+                    WHERE key = v12_content_key(t.crc32, t.md5, t.sha1,
+                                                t.sha256, t.blake3)),
+                   hashed, provisional
+            FROM archive_contents t;
+        DROP TABLE archive_contents;
+
+        CREATE TABLE dat_entries_base (
+            dat_path    TEXT NOT NULL,
+            system      TEXT NOT NULL,
+            game_name   TEXT NOT NULL,
+            rom_name    TEXT NOT NULL,
+            rom_size    INTEGER,
+            content_id  INTEGER NOT NULL REFERENCES contents(id),
+            PRIMARY KEY (dat_path, game_name, rom_name)
+        );
+        INSERT INTO dat_entries_base
+            SELECT dat_path, system, game_name, rom_name, rom_size,
+                   (SELECT id FROM contents
+                    WHERE key = v12_content_key(t.crc32, t.md5, t.sha1,
+                                                t.sha256, t.blake3))
+            FROM dat_entries t;
+        DROP TABLE dat_entries;
+
+        CREATE TABLE romroot_files_base (
+            path        TEXT NOT NULL,
+            system      TEXT NOT NULL,
+            game_name   TEXT NOT NULL,
+            rom_name    TEXT NOT NULL,
+            content_id  INTEGER NOT NULL REFERENCES contents(id),
+            rscf_path   TEXT,
+            PRIMARY KEY (path, rom_name)
+        );
+        INSERT INTO romroot_files_base
+            SELECT path, system, game_name, rom_name,
+                   (SELECT id FROM contents
+                    WHERE key = v12_content_key(t.crc32, t.md5, t.sha1,
+                                                t.sha256, t.blake3)),
+                   rscf_path
+            FROM romroot_files t;
+        DROP TABLE romroot_files;
+    """),
+    12: _Migration("hex digests stored as BLOBs", """
+        CREATE TABLE contents_v13 (
+            id      INTEGER PRIMARY KEY,
+            key     BLOB NOT NULL UNIQUE,
+            crc32   BLOB,
+            md5     BLOB,
+            sha1    BLOB,
+            sha256  BLOB,
+            blake3  BLOB
+        );
+        INSERT INTO contents_v13 (id, key, crc32, md5, sha1, sha256, blake3)
+            SELECT id, v13_content_key(crc32, md5, sha1, sha256, blake3),
+                   crc32, md5, sha1, sha256, blake3
+            FROM (SELECT id, digest_blob('crc32', crc32) AS crc32,
+                         digest_blob('md5', md5) AS md5,
+                         digest_blob('sha1', sha1) AS sha1,
+                         digest_blob('sha256', sha256) AS sha256,
+                         digest_blob('blake3', blake3) AS blake3
+                  FROM contents);
+        DROP TABLE contents;
+        ALTER TABLE contents_v13 RENAME TO contents;
+    """),
+}
+
+
+def _v12_content_key(*digests: str | None) -> bytes:
+    """contents.key of schema v12: BLAKE2b of the hex digests."""
+    joined = "\0".join(d or "" for d in digests)
+    return hashlib.blake2b(joined.encode(), digest_size=16).digest()
+
+
+# SQL functions the migration scripts use
+_MIGRATION_FUNCTIONS = {
+    "v12_content_key": (5, _v12_content_key),
+    "v13_content_key": (5, _content_key),
+    "digest_blob": (2, _digest),
+}
+
+
+def _migration_path(version: int) -> list[tuple[int, _Migration]] | None:
+    """Steps from version to _SCHEMA_VERSION, or None to recreate the DB.
+
+    None when a step is missing (too old, or newer than this code) or
+    declared destructive.
+    """
+    if not 0 < version < _SCHEMA_VERSION:
+        return None  # new DB, or written by a newer version
+    steps = []
+    for v in range(version, _SCHEMA_VERSION):
+        migration = _MIGRATIONS.get(v)
+        if migration is None or migration.destructive:
+            return None
+        steps.append((v, migration))
+    return steps
+
+
+def _statements(script: str) -> Iterator[str]:
+    """The SQL statements of script, one by one.
+
+    execute() runs single statements inside the caller's transaction,
+    where executescript() would commit it first.
+    """
+    stmt = ""
+    for line in script.splitlines(keepends=True):
+        stmt += line
+        if sqlite3.complete_statement(stmt):
+            yield stmt
+            stmt = ""
+
+
+class SchemaMismatchError(RuntimeError):
+    """A read-only CacheDB found a schema other than _SCHEMA_VERSION.
+
+    Readers never migrate; opening the DB with a writable CacheDB does.
+    """
+
 
 class CacheDB:
     """SQLite cache database for the collector.
 
     Disposable — rebuild from RSCF + DATs if lost.
+
+    readonly=True opens an existing DB for queries only (see ReaderPool):
+    no migration, no schema changes, and every write fails.
+
+    profile tunes the connection (see DBProfile). A writer checkpoints
+    the WAL every profile.checkpoint_every commits, so a run of many
+    small transactions does not grow it without bound, and refreshes the
+    planner statistics (PRAGMA optimize) on close.
     """
 
-    def __init__(self, db_path: Path | str) -> None:
+    def __init__(
+        self,
+        db_path: Path | str,
+        *,
+        readonly: bool = False,
+        profile: DBProfile | None = None,
+    ) -> None:
         self.db_path = Path(db_path)
+        self.readonly = readonly
+        self._profile = profile if profile is not None else DBProfile()
+        self._in_batch = False
+        self._commits = 0
+        if readonly:
+            self._connect_reader()
+            return
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._conn = sqlite3.connect(str(self.db_path))
+        self._conn = sqlite3.connect(str(self.db_path), timeout=_BUSY_TIMEOUT)
         self._conn.execute("PRAGMA journal_mode=WAL")
         self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._profile.apply(self._conn)
         self._conn.row_factory = sqlite3.Row
-        self._in_batch = False
         self._migrate_if_needed()
 
+    def _connect_reader(self) -> None:
+        """Open a query_only connection on the existing DB file.
+
+        The DB is in WAL mode (set by every writer), so reads never wait
+        for the writer and the writer never waits for them. Usable from
+        any one thread at a time; ReaderPool keeps one per thread.
+        """
+        if not self.db_path.is_file():
+            raise FileNotFoundError(f"no DB cache at {self.db_path}")
+        self._conn = sqlite3.connect(
+            f"{self.db_path.resolve().as_uri()}?mode=ro", uri=True,
+            timeout=_BUSY_TIMEOUT, check_same_thread=False,
+        )
+        self._conn.execute("PRAGMA query_only=ON")
+        self._profile.apply(self._conn)
+        self._conn.row_factory = sqlite3.Row
+        ver = self._conn.execute("PRAGMA user_version").fetchone()[0]
+        if ver != _SCHEMA_VERSION:
+            self._conn.close()
+            raise SchemaMismatchError(
+                f"{self.db_path} has schema v{ver}, this version reads "
+                f"v{_SCHEMA_VERSION}",
+            )
+
     def _migrate_if_needed(self) -> None:
-        """Check schema version and recreate if stale."""
+        """Check schema version; migrate in place, or recreate if stale."""
         ver = self._conn.execute("PRAGMA user_version").fetchone()[0]
         if ver == _SCHEMA_VERSION:
             return
 
-        # Drop all tables and recreate — DB is disposable
-        tables = [
-            r[0]
-            for r in self._conn.execute(
-                "SELECT name FROM sqlite_master WHERE type='table'"
-            ).fetchall()
-        ]
-        for table in tables:
-            self._conn.execute(f"DROP TABLE IF EXISTS {table}")
+        steps = _migration_path(ver)
+        if steps is not None:
+            try:
+                self._migrate(ver, steps)
+                return
+            except sqlite3.Error as e:
+                self._conn.rollback()
+                print(f"  WARNING: migrating {self.db_path} from schema v{ver} "
+                      f"failed ({e}), recreating it", file=sys.stderr)
+
+        # Drop all views and tables and recreate — DB is disposable
+        for kind in ("view", "table"):
+            names = [
+                r[0]
+                for r in self._conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type = ?", (kind,),
+                ).fetchall()
+            ]
+            for name in names:
+                self._conn.execute(f"DROP {kind.upper()} IF EXISTS {name}")
 
         self._conn.executescript(_SCHEMA)
         self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
         self._conn.commit()
 
+    def _migrate(self, version: int, steps: list[tuple[int, _Migration]]) -> None:
+        """Run steps (see _MIGRATIONS) and _SCHEMA in one transaction."""
+        conn = self._conn
+        for name, (nargs, func) in _MIGRATION_FUNCTIONS.items():
+            conn.create_function(name, nargs, func, deterministic=True)
+
+        print(f"  Migrating {self.db_path} from schema v{version} to "
+              f"v{_SCHEMA_VERSION}", file=sys.stderr)
+        conn.execute("BEGIN")
+        views = conn.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'view'"
+        ).fetchall()
+        for (name,) in views:
+            conn.execute(f"DROP VIEW {name}")
+
+        for i, (v, migration) in enumerate(steps, 1):
+            t0 = time.monotonic()
+            for stmt in _statements(migration.script):
+                conn.execute(stmt)
+            print(f"    [{i}/{len(steps)}] v{v} -> v{v + 1}: "
+                  f"{migration.description} ({time.monotonic() - t0:.1f}s)",
+                  file=sys.stderr)
+
+        t0 = time.monotonic()
+        for stmt in _statements(_SCHEMA):
+            conn.execute(stmt)
+        conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+        conn.commit()
+        print(f"    indexes and views ({time.monotonic() - t0:.1f}s)",
+              file=sys.stderr)
+
     def close(self) -> None:
+        if not self.readonly and not self._conn.in_transaction:
+            self.optimize()
         self._conn.close()
 
     def __enter__(self) -> CacheDB:
@@ -151,10 +696,53 @@ class CacheDB:
     def __exit__(self, *args) -> None:
         self.close()
 
+    def _commit(self) -> None:
+        """Commit; checkpoint every profile.checkpoint_every commits."""
+        self._conn.commit()
+        self._commits += 1
+        every = self._profile.checkpoint_every
+        if every and self._commits % every == 0:
+            try:
+                self.checkpoint(wait=False)
+            except sqlite3.OperationalError:
+                pass  # a cursor of ours is still open; next interval then
+
     def _auto_commit(self) -> None:
         """Commit if not inside a batch() context."""
         if not self._in_batch:
-            self._conn.commit()
+            self._commit()
+
+    def checkpoint(self, *, wait: bool = True) -> tuple[int, int, int]:
+        """Copy the WAL into the DB file and truncate it to zero bytes.
+
+        A reader still in an older snapshot keeps the WAL from being
+        reset. wait=True waits up to the busy timeout for such readers;
+        wait=False copies what it can now and leaves the truncation to a
+        later checkpoint. Returns SQLite's (busy, WAL frames, frames
+        checkpointed); busy is 1 if the WAL could not be truncated.
+        """
+        assert not self._conn.in_transaction, "checkpoint inside a transaction"
+        if not wait:
+            self._conn.execute("PRAGMA busy_timeout = 0")
+        try:
+            row = self._conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchone()
+        finally:
+            if not wait:
+                self._conn.execute(
+                    f"PRAGMA busy_timeout = {int(_BUSY_TIMEOUT * 1000)}",
+                )
+        return tuple(row)
+
+    def optimize(self, *, analyze: bool = False) -> None:
+        """Refresh the query planner's statistics.
+
+        PRAGMA optimize re-analyzes only the tables whose statistics are
+        missing or stale, and is cheap otherwise. analyze=True runs a
+        full ANALYZE instead, for a freshly bulk-loaded DB.
+        """
+        assert not self._conn.in_transaction, "optimize inside a transaction"
+        self._conn.execute("ANALYZE" if analyze else "PRAGMA optimize")
+        self._conn.commit()
 
     @contextlib.contextmanager
     def batch(self):
@@ -170,7 +758,7 @@ class CacheDB:
         self._in_batch = True
         try:
             yield
-            self._conn.commit()
+            self._commit()
         except BaseException:
             self._conn.rollback()
             raise
@@ -218,19 +806,381 @@ class CacheDB:
         blake3: str = "",
         is_archive: bool = False,
         scanned_at: str = "",
+        device: int = 0,
+        fingerprint: str = "",
+    ) -> None:
+        """Insert or update a scanned file record.
+
+        The ``hashed`` mask (authoritative hash types) is the set of
+        digests given — empty ones were not computed.
+        """
+        self.upsert_many_scanned([dict(
+            path=path, size=size, mtime_ns=mtime_ns, ctime_ns=ctime_ns,
+            inode=inode, device=device, source_type=source_type,
+            crc32=crc32, md5=md5, sha1=sha1, sha256=sha256, blake3=blake3,
+            fingerprint=fingerprint, is_archive=is_archive,
+            scanned_at=scanned_at,
+        )])
+
+    def upsert_many_scanned(self, rows: Iterable[Mapping]) -> None:
+        """upsert_scanned() for many files in one executemany().
+
+        Each row maps upsert_scanned()'s keyword arguments; omitted ones
+        take the same defaults. The digests are interned in contents
+        first; all rows are written in one transaction (committed unless
+        in a batch()).
+        """
+        rows = list(rows)
+        contents = [_content(r) for r in rows]
+        ids = self._intern(contents)
+        self._conn.executemany(
+            """INSERT OR REPLACE INTO scanned_files_base
+               (path, size, mtime_ns, ctime_ns, inode, device, source_type,
+                content_id, fingerprint, hashed, is_archive, scanned_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (r["path"], r["size"], r["mtime_ns"], r.get("ctime_ns", 0),
+                 r.get("inode", 0), r.get("device", 0),
+                 r.get("source_type", "readonly"), ids[content[0]],
+                 r.get("fingerprint", ""), _content_mask(content),
+                 1 if r.get("is_archive") else 0, r.get("scanned_at", ""))
+                for r, content in zip(rows, contents)
+            ],
+        )
+        self._auto_commit()
+
+    def _intern(self, contents: list[tuple]) -> dict[bytes, int]:
+        """contents ids of _content() tuples, by key; adds missing rows.
+
+        One pass per batch: the batch's distinct keys are resolved with a
+        few "key IN (...)" lookups, and only the missing ones are
+        inserted, under ids allocated past the current maximum. The row
+        tables are then written with plain ids.
+        """
+        distinct = {content[0]: content for content in contents}
+        keys = list(distinct)
+        ids: dict[bytes, int] = {}
+        for i in range(0, len(keys), _KEYS_PER_LOOKUP):
+            chunk = keys[i:i + _KEYS_PER_LOOKUP]
+            cur = self._conn.execute(
+                "SELECT key, id FROM contents WHERE key IN "
+                f"({', '.join('?' * len(chunk))})",
+                chunk,
+            )
+            ids.update((key, content_id) for key, content_id in cur)
+
+        missing = [key for key in keys if key not in ids]
+        if missing:
+            # The single writer allocates ids itself: no second lookup
+            next_id = self._conn.execute(
+                "SELECT COALESCE(MAX(id), 0) + 1 FROM contents"
+            ).fetchone()[0]
+            for offset, key in enumerate(missing):
+                ids[key] = next_id + offset
+            self._conn.executemany(
+                """INSERT INTO contents (id, key, crc32, md5, sha1, sha256, blake3)
+                   VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                [(ids[key], *distinct[key]) for key in missing],
+            )
+        return ids
+
+    def prune_contents(self) -> int:
+        """Delete contents rows no other table refers to any more.
+
+        Left behind by deleted rows and by hashes filled in later.
+        Returns the number of rows deleted.
+        """
+        cur = self._conn.execute(
+            """DELETE FROM contents WHERE
+                   NOT EXISTS (SELECT 1 FROM scanned_files_base
+                               WHERE content_id = contents.id)
+               AND NOT EXISTS (SELECT 1 FROM archive_contents_base
+                               WHERE content_id = contents.id)
+               AND NOT EXISTS (SELECT 1 FROM dat_entries_base
+                               WHERE content_id = contents.id)
+               AND NOT EXISTS (SELECT 1 FROM romroot_files_base
+                               WHERE content_id = contents.id)""",
+        )
+        self._auto_commit()
+        return cur.rowcount
+
+    def update_scanned_hashes(self, path: str, hashes) -> None:
+        """Fill in digests computed later (lazy hash policy).
+
+        hashes is a FileHashes; its empty digests leave the row alone.
+        """
+        self._update_hashes(
+            "scanned_files", "path = ?", (path,), hashes,
+        )
+
+    def _update_hashes(
+        self, table: str, where: str, params: tuple, hashes,
+    ) -> None:
+        """Point the matching rows of table at their digests merged with hashes."""
+        values = {ht: getattr(hashes, ht) for ht in HASH_TYPES}
+        present = [ht for ht in HASH_TYPES if values[ht]]
+        if not present:
+            return
+        base = f"{table}_base"
+        rows = self._conn.execute(
+            f"SELECT t.rowid AS row_id, {_HEX_DIGESTS} FROM {base} t "
+            f"JOIN contents c ON c.id = t.content_id WHERE {where}",
+            params,
+        ).fetchall()
+        contents = [
+            _content({ht: values[ht] or row[ht] for ht in HASH_TYPES})
+            for row in rows
+        ]
+        ids = self._intern(contents)
+        self._conn.executemany(
+            f"UPDATE {base} SET content_id = ?, "
+            f"hashed = hashed | ? WHERE rowid = ?",
+            [
+                (ids[content[0]], hash_mask(present), row["row_id"])
+                for content, row in zip(contents, rows)
+            ],
+        )
+        self._auto_commit()
+
+    def scanned_missing_hashes(self, mask: int) -> list[sqlite3.Row]:
+        """Plain files in non-romroot sources lacking any hash in mask."""
+        cur = self._conn.execute(
+            "SELECT * FROM scanned_files "
+            "WHERE hashed & ? != ? AND is_archive = 0 "
+            "AND source_type != 'romroot'",
+            (mask, mask),
+        )
+        return cur.fetchall()
+
+    def archive_contents_missing_hashes(self, mask: int) -> list[sqlite3.Row]:
+        """Hashed archive entries (non-romroot archives) lacking any hash in mask.
+
+        Rows carry the archive's scanned_files stat as archive_size and
+        archive_mtime_ns.
+        """
+        cur = self._conn.execute(
+            """SELECT ac.*, sf.size AS archive_size,
+                      sf.mtime_ns AS archive_mtime_ns
+               FROM archive_contents ac
+               JOIN scanned_files sf ON sf.path = ac.archive_path
+               WHERE ac.hashed & ? != ? AND ac.provisional = 0
+                 AND sf.source_type != 'romroot'
+               ORDER BY ac.archive_path""",
+            (mask, mask),
+        )
+        return cur.fetchall()
+
+    def refresh_scanned_stat(
+        self,
+        path: str,
+        mtime_ns: int,
+        ctime_ns: int,
+        inode: int,
+        device: int,
+        scanned_at: str,
+    ) -> None:
+        """Update a row's stat identity, keeping its hashes.
+
+        Used when the content fingerprint vouches for a file whose
+        inode/ctime (and possibly mtime) changed — e.g. after a restore.
+        """
+        self._conn.execute(
+            """UPDATE scanned_files_base
+               SET mtime_ns = ?, ctime_ns = ?, inode = ?, device = ?,
+                   scanned_at = ?
+               WHERE path = ?""",
+            (mtime_ns, ctime_ns, inode, device, scanned_at, path),
+        )
+        self._auto_commit()
+
+    def find_by_identity(
+        self, device: int, inode: int, size: int, mtime_ns: int,
+    ) -> list[sqlite3.Row]:
+        """Find scanned files with this (device, inode, size, mtime_ns).
+
+        A hit at another path is the same file renamed/moved, or a
+        hardlink to it. Rows recorded without a device (0) never match.
+        """
+        if not device or not inode:
+            return []
+        cur = self._conn.execute(
+            "SELECT * FROM scanned_files "
+            "WHERE inode = ? AND device = ? AND size = ? AND mtime_ns = ?",
+            (inode, device, size, mtime_ns),
+        )
+        return cur.fetchall()
+
+    def copy_scanned(
+        self,
+        src_path: str,
+        dst_path: str,
+        *,
+        ctime_ns: int,
+        source_type: str,
+        scanned_at: str,
+        move: bool = False,
+    ) -> None:
+        """Give dst_path the hashes and archive_contents of src_path.
+
+        move=True re-points the rows (src_path is gone); otherwise they are
+        copied (hardlink — both paths stay valid). Any rows already held
+        by dst_path are replaced. ctime_ns is refreshed because a rename
+        changes it.
+        """
+        assert src_path != dst_path, f"copy onto itself: {src_path}"
+        self._conn.execute(
+            "DELETE FROM scanned_files_base WHERE path = ?", (dst_path,),
+        )
+        self._conn.execute(
+            "DELETE FROM archive_contents_base WHERE archive_path = ?",
+            (dst_path,),
+        )
+        self._conn.execute(
+            """INSERT INTO scanned_files_base
+               (path, size, mtime_ns, ctime_ns, inode, device, source_type,
+                content_id, fingerprint, hashed, is_archive, scanned_at)
+               SELECT ?, size, mtime_ns, ?, inode, device, ?,
+                      content_id, fingerprint, hashed, is_archive, ?
+               FROM scanned_files_base WHERE path = ?""",
+            (dst_path, ctime_ns, source_type, scanned_at, src_path),
+        )
+        if move:
+            self._conn.execute(
+                "UPDATE archive_contents_base SET archive_path = ? "
+                "WHERE archive_path = ?",
+                (dst_path, src_path),
+            )
+            self._conn.execute(
+                "DELETE FROM scanned_files_base WHERE path = ?", (src_path,),
+            )
+        else:
+            self._conn.execute(
+                """INSERT INTO archive_contents_base
+                   (archive_path, entry_name, entry_size, content_id,
+                    hashed, provisional)
+                   SELECT ?, entry_name, entry_size, content_id,
+                          hashed, provisional
+                   FROM archive_contents_base WHERE archive_path = ?""",
+                (dst_path, src_path),
+            )
+        self._auto_commit()
+
+    def iter_scanned_by_content(self) -> sqlite3.Cursor:
+        """Stream hashed untrusted-source rows ordered by (size, BLAKE3).
+
+        Rows of one content are adjacent (cache export groups them).
+        Romroot rows are left out: they pair with romroot_files and come
+        back from romroot's own sidecars.
+        """
+        return self._conn.execute(
+            f"{_SCANNED_SELECT} "
+            "WHERE f.source_type != 'romroot' AND c.blake3 IS NOT NULL "
+            "ORDER BY f.size, c.blake3, f.is_archive, f.path"
+        )
+
+    def count_scanned_by_dir(self, root: str) -> dict[str, int]:
+        """Count scanned_files rows per parent directory under root."""
+        counts: dict[str, int] = {}
+        cur = self._conn.execute(
+            "SELECT path FROM scanned_files WHERE path > ? AND path < ?",
+            _subtree_bounds(root),
+        )
+        for (path,) in cur:
+            parent = path.rsplit("/", 1)[0]
+            counts[parent] = counts.get(parent, 0) + 1
+        return counts
+
+    # --- Scanned directories (romroot walk pruning) ---
+
+    def get_scanned_dirs(self, root: str) -> dict[str, sqlite3.Row]:
+        """Return directory rows for root and everything below it."""
+        cur = self._conn.execute(
+            "SELECT * FROM scanned_dirs WHERE path = ? "
+            "OR (path > ? AND path < ?)",
+            (root, *_subtree_bounds(root)),
+        )
+        return {row["path"]: row for row in cur.fetchall()}
+
+    def upsert_scanned_dir(
+        self,
+        path: str,
+        parent: str,
+        mtime_ns: int,
+        ctime_ns: int,
+        inode: int,
+        entry_count: int,
     ) -> None:
-        """Insert or update a scanned file record."""
+        """Record a fully listed directory and its file count."""
+        self._conn.execute(
+            """INSERT OR REPLACE INTO scanned_dirs
+               (path, parent, mtime_ns, ctime_ns, inode, entry_count)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            (path, parent, mtime_ns, ctime_ns, inode, entry_count),
+        )
+        self._auto_commit()
+
+    def delete_scanned_dir(self, path: str) -> None:
+        """Forget a directory (it vanished or must be re-listed)."""
         self._conn.execute(
-            """INSERT OR REPLACE INTO scanned_files
-               (path, size, mtime_ns, ctime_ns, inode, source_type,
-                crc32, md5, sha1, sha256, blake3, is_archive, scanned_at)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (path, size, mtime_ns, ctime_ns, inode, source_type,
-             crc32, md5, sha1, sha256, blake3,
-             1 if is_archive else 0, scanned_at),
+            "DELETE FROM scanned_dirs WHERE path = ?", (path,)
         )
         self._auto_commit()
 
+    # --- Scan cursors (resumable scans) ---
+
+    def get_scan_cursor(self, root: str) -> sqlite3.Row | None:
+        """Progress of an interrupted scan of root, if any."""
+        return self._conn.execute(
+            "SELECT * FROM scan_cursors WHERE root = ?", (root,)
+        ).fetchone()
+
+    def set_scan_cursor(
+        self,
+        root: str,
+        position: str,
+        *,
+        in_flight: list[str] | None = None,
+        force_rescan: bool = False,
+        complete: bool = False,
+    ) -> None:
+        """Record scan progress for root.
+
+        position is the last walk path whose results are committed; write
+        it in the same transaction as those results. in_flight lists the
+        archives still being hashed at that point.
+        """
+        self._conn.execute(
+            """INSERT OR REPLACE INTO scan_cursors
+               (root, position, in_flight, force_rescan, complete)
+               VALUES (?, ?, ?, ?, ?)""",
+            (root, position, "\n".join(in_flight or ()),
+             int(force_rescan), int(complete)),
+        )
+        self._auto_commit()
+
+    def clear_scan_cursors(
+        self, roots: list[str] | None = None, *, subtrees: bool = False,
+    ) -> None:
+        """Forget scan progress for roots (None = every root).
+
+        subtrees=True also forgets the cursors of roots below them
+        (those of --path scans within a fully scanned source).
+        """
+        if roots is None:
+            self._conn.execute("DELETE FROM scan_cursors")
+        elif subtrees:
+            self._conn.executemany(
+                "DELETE FROM scan_cursors WHERE root = ? "
+                "OR (root > ? AND root < ?)",
+                [(r, *_subtree_bounds(r)) for r in roots],
+            )
+        else:
+            self._conn.executemany(
+                "DELETE FROM scan_cursors WHERE root = ?",
+                [(r,) for r in roots],
+            )
+        self._auto_commit()
+
     # --- Archive contents ---
 
     def upsert_archive_content(
@@ -243,18 +1193,61 @@ class CacheDB:
         sha1: str = "",
         sha256: str = "",
         blake3: str = "",
+        provisional: bool = False,
     ) -> None:
-        """Record an archive content entry with all hashes."""
-        self._conn.execute(
-            """INSERT OR REPLACE INTO archive_contents
-               (archive_path, entry_name, entry_size, crc32, md5, sha1, sha256, blake3)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?)""",
-            (archive_path, entry_name, entry_size, crc32, md5, sha1, sha256, blake3),
+        """Record an archive content entry with all hashes.
+
+        provisional=True marks a listing-derived row (size + CRC32 from the
+        archive header, nothing hashed). Provisional rows are never returned
+        by hash lookups or get_archive_contents().
+
+        As for scanned_files, the ``hashed`` mask is the set of digests
+        given (provisional rows: none — the CRC32 is the archive's claim).
+        """
+        self.upsert_many_archive_contents([dict(
+            archive_path=archive_path, entry_name=entry_name,
+            entry_size=entry_size, crc32=crc32, md5=md5, sha1=sha1,
+            sha256=sha256, blake3=blake3, provisional=provisional,
+        )])
+
+    def upsert_many_archive_contents(self, rows: Iterable[Mapping]) -> None:
+        """upsert_archive_content() for many entries in one executemany().
+
+        Each row maps upsert_archive_content()'s keyword arguments,
+        written in one transaction like upsert_many_scanned().
+        """
+        rows = list(rows)
+        contents = [_content(r) for r in rows]
+        ids = self._intern(contents)
+        self._conn.executemany(
+            """INSERT OR REPLACE INTO archive_contents_base
+               (archive_path, entry_name, entry_size, content_id, hashed,
+                provisional)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            [
+                (r["archive_path"], r["entry_name"], r.get("entry_size"),
+                 ids[content[0]],
+                 0 if r.get("provisional") else _content_mask(content),
+                 1 if r.get("provisional") else 0)
+                for r, content in zip(rows, contents)
+            ],
         )
         self._auto_commit()
 
+    def update_archive_content_hashes(
+        self, archive_path: str, entry_name: str, hashes,
+    ) -> None:
+        """Fill in digests of an archive entry computed later."""
+        self._update_hashes(
+            "archive_contents", "archive_path = ? AND entry_name = ?",
+            (archive_path, entry_name), hashes,
+        )
+
     def has_archive_contents(self, archive_path: str) -> bool:
-        """Check if we have any hashed archive content entries for this archive."""
+        """Check if we have any archive content entries for this archive.
+
+        Includes provisional rows — the archive has been looked at.
+        """
         cur = self._conn.execute(
             "SELECT 1 FROM archive_contents WHERE archive_path = ? LIMIT 1",
             (archive_path,),
@@ -264,27 +1257,76 @@ class CacheDB:
     def delete_archive_contents(self, archive_path: str) -> None:
         """Delete all archive content entries for an archive (before re-extraction)."""
         self._conn.execute(
-            "DELETE FROM archive_contents WHERE archive_path = ?",
+            "DELETE FROM archive_contents_base WHERE archive_path = ?",
             (archive_path,),
         )
         self._auto_commit()
 
     def get_archive_contents(self, archive_path: str) -> list[sqlite3.Row]:
-        """Get all content entries for an archive."""
+        """Get all fully hashed content entries for an archive."""
+        cur = self._conn.execute(
+            "SELECT * FROM archive_contents "
+            "WHERE archive_path = ? AND provisional = 0",
+            (archive_path,),
+        )
+        return cur.fetchall()
+
+    def get_provisional_contents(self, archive_path: str) -> list[sqlite3.Row]:
+        """Get listing-derived (size + CRC32 only) entries for an archive."""
         cur = self._conn.execute(
-            "SELECT * FROM archive_contents WHERE archive_path = ?",
+            "SELECT * FROM archive_contents "
+            "WHERE archive_path = ? AND provisional = 1",
             (archive_path,),
         )
         return cur.fetchall()
 
+    def find_archives_by_size(
+        self, size: int, exclude_path: str, mask: int = ALL_HASHES,
+    ) -> dict[str, str]:
+        """Container BLAKE3 → path of known archives of this size.
+
+        Covers scanned archives and romroot containers (contents from
+        their sidecars). Only archives whose content rows are all fully
+        hashed (not provisional, at least the digests in mask) qualify:
+        a byte-identical copy can take their rows instead of extracting.
+        """
+        cur = self._conn.execute(
+            """SELECT sf.path, hex(c.blake3) AS blake3
+               FROM scanned_files_base sf JOIN contents c ON c.id = sf.content_id
+               WHERE sf.size = ? AND sf.path != ? AND c.blake3 IS NOT NULL
+                 AND EXISTS (SELECT 1 FROM archive_contents ac
+                             WHERE ac.archive_path = sf.path)
+                 AND NOT EXISTS (SELECT 1 FROM archive_contents ac
+                                 WHERE ac.archive_path = sf.path
+                                   AND (ac.provisional = 1
+                                        OR ac.hashed & ? != ?))""",
+            (size, exclude_path, mask, mask),
+        )
+        return {row["blake3"]: row["path"] for row in cur}
+
+    def find_untrusted_archive_by_hash(
+        self, hash_type: str, hash_value: str,
+    ) -> str | None:
+        """Path of a non-romroot archive with a fully hashed entry of this hash."""
+        assert hash_type in HASH_TYPES
+        row = self._conn.execute(
+            f"""SELECT a.archive_path FROM contents c
+                JOIN archive_contents_base a ON a.content_id = c.id
+                JOIN scanned_files_base sf ON sf.path = a.archive_path
+                WHERE c.{hash_type} = ? AND sf.source_type != 'romroot'
+                  AND a.provisional = 0""",
+            (_digest(hash_type, hash_value),),
+        ).fetchone()
+        return row[0] if row else None
+
     def find_archive_content_by_hash(
         self, hash_type: str, hash_value: str
     ) -> list[sqlite3.Row]:
         """Find archive content entries matching a hash value."""
         assert hash_type in HASH_TYPES
         cur = self._conn.execute(
-            f"SELECT * FROM archive_contents WHERE {hash_type} = ?",
-            (hash_value,),
+            f"{_ARCHIVE_SELECT} WHERE c.{hash_type} = ? AND a.provisional = 0",
+            (_digest(hash_type, hash_value),),
         )
         return cur.fetchall()
 
@@ -301,24 +1343,48 @@ class CacheDB:
         entries: list of dicts with keys: game_name, rom_name, rom_size,
         crc32, md5, sha1, sha256, blake3
         """
-        # Clear existing entries for this DAT
-        self._conn.execute(
-            "DELETE FROM dat_entries WHERE dat_path = ?", (dat_path,)
-        )
+        self.load_dat_bulk(dat_path, system, entries)
 
-        for entry in entries:
+    def load_dat_bulk(
+        self,
+        dat_path: str,
+        system: str,
+        entries: Iterable[Mapping],
+    ) -> None:
+        """Replace a DAT's entries, streamed through one executemany().
+
+        entries may be a generator (e.g. straight from the DAT parser);
+        it is consumed before the DB is touched. The delete and the
+        inserts are one transaction, rolled back as a whole on a
+        duplicate ROM.
+        """
+        entries = list(entries)
+        contents = [_content(e) for e in entries]
+        with self.batch():
+            # Clear existing entries for this DAT
             self._conn.execute(
-                """INSERT INTO dat_entries
+                "DELETE FROM dat_entries_base WHERE dat_path = ?", (dat_path,)
+            )
+            ids = self._intern(contents)
+            self._conn.executemany(
+                """INSERT INTO dat_entries_base
                    (dat_path, system, game_name, rom_name, rom_size,
-                    crc32, md5, sha1, sha256, blake3)
-                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                (dat_path, system, entry["game_name"], entry["rom_name"],
-                 entry.get("rom_size"), entry.get("crc32", ""),
-                 entry.get("md5", ""), entry.get("sha1", ""),
-                 entry.get("sha256", ""), entry.get("blake3", "")),
+                    content_id)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                [
+                    (dat_path, system, e["game_name"], e["rom_name"],
+                     e.get("rom_size"), ids[content[0]])
+                    for e, content in zip(entries, contents)
+                ],
             )
 
-        self._conn.commit()
+    def dat_size_crc_pairs(self) -> set[tuple[int, str]]:
+        """All (rom_size, CRC32) pairs wanted by any loaded DAT."""
+        cur = self._conn.execute(
+            "SELECT DISTINCT d.rom_size, hex(c.crc32) FROM dat_entries_base d "
+            "JOIN contents c ON c.id = d.content_id WHERE c.crc32 IS NOT NULL"
+        )
+        return {(row[0], row[1]) for row in cur.fetchall()}
 
     def get_dat_entries(self, dat_path: str) -> list[sqlite3.Row]:
         """Get all DAT entries for a given DAT path."""
@@ -333,8 +1399,8 @@ class CacheDB:
         """Find scanned files matching a hash value."""
         assert hash_type in HASH_TYPES
         cur = self._conn.execute(
-            f"SELECT * FROM scanned_files WHERE {hash_type} = ?",
-            (hash_value,),
+            f"{_SCANNED_SELECT} WHERE c.{hash_type} = ?",
+            (_digest(hash_type, hash_value),),
         )
         return cur.fetchall()
 
@@ -351,13 +1417,28 @@ class CacheDB:
         status: str,
     ) -> None:
         """Record a match result."""
-        self._conn.execute(
+        self.record_matches([dict(
+            dat_path=dat_path, game_name=game_name, rom_name=rom_name,
+            source_path=source_path, source_type=source_type,
+            archive_entry=archive_entry, status=status,
+        )])
+
+    def record_matches(self, rows: Iterable[Mapping]) -> None:
+        """record_match() for many results in one executemany().
+
+        Each row maps record_match()'s keyword arguments.
+        """
+        self._conn.executemany(
             """INSERT OR REPLACE INTO matches
                (dat_path, game_name, rom_name, source_path, source_type,
                 archive_entry, status)
                VALUES (?, ?, ?, ?, ?, ?, ?)""",
-            (dat_path, game_name, rom_name, source_path, source_type,
-             archive_entry, status),
+            (
+                (r["dat_path"], r["game_name"], r["rom_name"],
+                 r["source_path"], r["source_type"], r["archive_entry"],
+                 r["status"])
+                for r in rows
+            ),
         )
         self._auto_commit()
 
@@ -371,6 +1452,16 @@ class CacheDB:
             cur = self._conn.execute("SELECT * FROM matches")
         return cur.fetchall()
 
+    def get_missing_dat_entries(self) -> list[sqlite3.Row]:
+        """DAT entries whose last match found no source."""
+        cur = self._conn.execute(
+            """SELECT d.* FROM dat_entries d
+               JOIN matches m ON d.dat_path = m.dat_path
+                 AND d.game_name = m.game_name AND d.rom_name = m.rom_name
+               WHERE m.status = 'missing'""",
+        )
+        return cur.fetchall()
+
     def get_unmatched_dat_entries(
         self, dat_path: str | None = None
     ) -> list[sqlite3.Row]:
@@ -408,13 +1499,30 @@ class CacheDB:
         rscf_path: str = "",
     ) -> None:
         """Record a file in the romroot inventory."""
-        self._conn.execute(
-            """INSERT OR REPLACE INTO romroot_files
-               (path, system, game_name, rom_name, crc32, md5, sha1,
-                sha256, blake3, rscf_path)
-               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-            (path, system, game_name, rom_name, crc32, md5, sha1,
-             sha256, blake3, rscf_path),
+        self.upsert_many_romroot([dict(
+            path=path, system=system, game_name=game_name,
+            rom_name=rom_name, crc32=crc32, md5=md5, sha1=sha1,
+            sha256=sha256, blake3=blake3, rscf_path=rscf_path,
+        )])
+
+    def upsert_many_romroot(self, rows: Iterable[Mapping]) -> None:
+        """upsert_romroot() for many files in one executemany().
+
+        Each row maps upsert_romroot()'s keyword arguments, written in
+        one transaction like upsert_many_scanned().
+        """
+        rows = list(rows)
+        contents = [_content(r) for r in rows]
+        ids = self._intern(contents)
+        self._conn.executemany(
+            """INSERT OR REPLACE INTO romroot_files_base
+               (path, system, game_name, rom_name, content_id, rscf_path)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            [
+                (r["path"], r["system"], r["game_name"], r["rom_name"],
+                 ids[content[0]], r.get("rscf_path", ""))
+                for r, content in zip(rows, contents)
+            ],
         )
         self._auto_commit()
 
@@ -429,18 +1537,19 @@ class CacheDB:
         (e.g. identical silence/pregap tracks on CD games).
         """
         assert hash_type in HASH_TYPES
+        digest = _digest(hash_type, hash_value)
         if game_name:
             cur = self._conn.execute(
-                f"SELECT * FROM romroot_files WHERE {hash_type} = ? "
-                f"AND game_name = ?",
-                (hash_value, game_name),
+                f"{_ROMROOT_SELECT} WHERE c.{hash_type} = ? "
+                f"AND r.game_name = ?",
+                (digest, game_name),
             )
             row = cur.fetchone()
             if row:
                 return row
         cur = self._conn.execute(
-            f"SELECT * FROM romroot_files WHERE {hash_type} = ?",
-            (hash_value,),
+            f"{_ROMROOT_SELECT} WHERE c.{hash_type} = ?",
+            (digest,),
         )
         return cur.fetchone()
 
@@ -460,7 +1569,7 @@ class CacheDB:
         Used when rebuilding an archive (replace all entries).
         """
         self._conn.execute(
-            "DELETE FROM romroot_files WHERE path = ?", (path,)
+            "DELETE FROM romroot_files_base WHERE path = ?", (path,)
         )
         self._auto_commit()
 
@@ -487,11 +1596,101 @@ class CacheDB:
             "SELECT COUNT(*) FROM matches WHERE status = 'missing'"
         ).fetchone()[0]
 
+        provisional = self._conn.execute(
+            "SELECT COUNT(*) FROM archive_contents WHERE provisional = 1"
+        ).fetchone()[0]
+        partial = self._conn.execute(
+            "SELECT (SELECT COUNT(*) FROM scanned_files WHERE hashed != ?"
+            "        AND is_archive = 0 AND source_type != 'romroot')"
+            " + (SELECT COUNT(*) FROM archive_contents WHERE hashed != ?"
+            "        AND provisional = 0)",
+            (ALL_HASHES, ALL_HASHES),
+        ).fetchone()[0]
+
         return {
             "scanned_files": count("scanned_files"),
+            "scanned_dirs": count("scanned_dirs"),
             "archive_contents": count("archive_contents"),
+            "archive_provisional": provisional,
+            "partially_hashed": partial,
             "dat_entries": count("dat_entries"),
             "matched": matched,
             "missing": missing,
             "romroot_files": count("romroot_files"),
+            "contents": count("contents"),
         }
+
+
+class ReaderPool:
+    """Read-only CacheDB connections for readers running beside the writer.
+
+    The writer (scan, match, execute) keeps its single CacheDB. Status
+    queries and API handlers read through a pool instead: one read-only
+    CacheDB per thread, opened on first use and kept until close().
+
+    Query inside snapshot(): every read there sees the DB as of the
+    snapshot's start, however many batches the writer commits meanwhile.
+    Outside a snapshot a reader holds no read transaction, so idle
+    readers never hold back the writer's WAL checkpoints.
+    """
+
+    def __init__(
+        self, db_path: Path | str, *, profile: DBProfile | None = None,
+    ) -> None:
+        self.db_path = Path(db_path)
+        self._profile = profile
+        self._local = threading.local()
+        self._readers: list[CacheDB] = []
+        self._lock = threading.Lock()
+
+    def reader(self) -> CacheDB:
+        """This thread's read-only CacheDB."""
+        db = getattr(self._local, "db", None)
+        if db is None:
+            db = CacheDB(self.db_path, readonly=True, profile=self._profile)
+            self._local.db = db
+            with self._lock:
+                self._readers.append(db)
+        return db
+
+    @contextlib.contextmanager
+    def snapshot(self) -> Iterator[CacheDB]:
+        """This thread's reader inside one read transaction.
+
+        Nested snapshots share the outermost one.
+        """
+        db = self.reader()
+        if db._conn.in_transaction:
+            yield db
+            return
+        db._conn.execute("BEGIN")
+        try:
+            # The first read pins the snapshot, not BEGIN itself
+            db._conn.execute("SELECT 1 FROM sqlite_master LIMIT 1").fetchall()
+            yield db
+        finally:
+            db._conn.rollback()
+
+    def close(self) -> None:
+        """Close every thread's reader."""
+        with self._lock:
+            readers, self._readers = self._readers, []
+        for db in readers:
+            db.close()
+        self._local = threading.local()
+
+    def __enter__(self) -> ReaderPool:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+def _subtree_bounds(root: str) -> tuple[str, str]:
+    """Exclusive (low, high) TEXT bounds matching every path below root.
+
+    '0' sorts directly after '/', so the range is an index scan on the
+    path primary key.
+    """
+    root = root.rstrip("/")
+    return root + "/", root + "0"
@@ -28,7 +28,6 @@ from rscf import (
     Sidecar,
     SidecarResolver,
     StorageMode,
-    hash_file,
     read_sidecar,
     write_sidecar,
 )
@@ -48,6 +47,13 @@ from romtholos.collect.compress import (
 from romtholos.collect.config import ORPHANED_DIR_NAME
 from romtholos.collect.db import CacheDB
 from romtholos.collect.extract import ExtractionLimits, ExtractedFile, extract_recursive
+from romtholos.collect.hashing import hash_path
+from romtholos.collect.iosched import NO_LIMITS, IOScheduler
+from romtholos.collect.manifest import (
+    MANIFEST_FILENAME,
+    is_game_file,
+    refresh_manifest,
+)
 from romtholos.collect.match import GamePlan, MatchOp
 
 
@@ -60,8 +66,11 @@ class ExtractionCache:
     exactly once regardless of how many tracks reference it.
     """
 
-    def __init__(self, cache_dir: Path, max_mb: int = 2048):
+    def __init__(
+        self, cache_dir: Path, max_mb: int = 2048, io: IOScheduler = NO_LIMITS,
+    ):
         self._cache_dir = cache_dir
+        self._io = io
         self._max_bytes = max_mb * 1024 * 1024
         self._entries: dict[str, list[ExtractedFile]] = {}
         self._sizes: dict[str, int] = {}
@@ -84,7 +93,7 @@ class ExtractionCache:
         subdir = self._cache_dir / f"_cache_{hash(key) & 0xFFFFFFFF:08x}"
         subdir.mkdir(parents=True, exist_ok=True)
 
-        extracted = extract_recursive(source, subdir, limits)
+        extracted = _extract_source(source, subdir, limits, self._io)
         total_size = sum(e.size for e in extracted)
 
         # Evict oldest entries to make room (soft quota)
@@ -120,11 +129,11 @@ class ExtractionCache:
         for ef in self._entries.get(key, []):
             if not ef.path.exists():
                 continue
-            hashes = hash_file(ef.path)
+            hashes = hash_path(ef.path)
             for ht in ("crc32", "md5", "sha1", "sha256", "blake3"):
                 v = getattr(hashes, ht, "")
                 if v:
-                    index[(ht, v.upper())] = ef.path
+                    index[(ht, v)] = ef.path
 
         self._hash_indexes[key] = index
         return index
@@ -141,7 +150,7 @@ class ExtractionCache:
         self.get_or_extract(source, limits)
         key = str(source)
         index = self._ensure_index(key)
-        return index.get((hash_type, hash_value.upper()))
+        return index.get((hash_type, hash_value))
 
     def find_file(
         self, source: str, hash_type: str, hash_value: str,
@@ -152,7 +161,7 @@ class ExtractionCache:
         Requires the source to have been extracted via get_or_extract first.
         """
         index = self._ensure_index(source)
-        return index.get((hash_type, hash_value.upper()))
+        return index.get((hash_type, hash_value))
 
     def cleanup(self) -> None:
         """Remove all cached extractions."""
@@ -173,13 +182,30 @@ def _find_by_hash(
     for path in candidates:
         if not path.exists():
             continue
-        hashes = hash_file(path)
+        hashes = hash_path(path)
         actual = getattr(hashes, hash_type, "")
-        if actual and actual.upper() == hash_value.upper():
+        if actual and actual == hash_value:
             return path
     return None
 
 
+def _record_romroot(
+    db: CacheDB, path: str, game: GamePlan, entries: list[FileEntry],
+    rscf_path: str,
+) -> None:
+    """Record a container's sidecar entries in romroot_files (one statement)."""
+    db.upsert_many_romroot(
+        {
+            "path": path, "system": game.system,
+            "game_name": game.game_name, "rom_name": entry.path,
+            "crc32": entry.crc32, "md5": entry.md5, "sha1": entry.sha1,
+            "sha256": entry.sha256, "blake3": entry.blake3,
+            "rscf_path": rscf_path,
+        }
+        for entry in entries
+    )
+
+
 def _ensure_dir(path: Path) -> Path:
     """Create directory if it doesn't exist."""
     path.mkdir(parents=True, exist_ok=True)
@@ -197,7 +223,7 @@ def _verify_on_target(target_path: Path, expected_blake3: str) -> bool:
     """Re-read a file from the target filesystem and verify BLAKE3."""
     if not target_path.exists():
         return False
-    hashes = hash_file(target_path)
+    hashes = hash_path(target_path, ("blake3",))
     return hashes.blake3.upper() == expected_blake3.upper()
 
 
@@ -238,11 +264,12 @@ def _verify_roundtrip(
 
         expected_blake3 = {b.upper() for _, b in expected_entries}
 
-        # Hash all extracted files
-        extracted_blake3: set[str] = set()
-        for ef in extracted:
-            h = hash_file(ef.path)
-            extracted_blake3.add(h.blake3.upper())
+        # Hash all extracted files (once — both checks below use it)
+        blake3_by_path = {
+            ef.path: hash_path(ef.path, ("blake3",)).blake3.upper()
+            for ef in extracted
+        }
+        extracted_blake3 = set(blake3_by_path.values())
 
         # Every expected ROM must be present in extracted output
         for rom_name, blake3 in expected_entries:
@@ -251,16 +278,26 @@ def _verify_roundtrip(
 
         # Every extracted file must match a known-good BLAKE3
         for ef in extracted:
-            h = hash_file(ef.path)
-            if h.blake3.upper() not in expected_blake3:
+            if blake3_by_path[ef.path] not in expected_blake3:
                 errors.append(ef.path.name)
 
     return len(errors) == 0, errors
 
 
+def _extract_source(
+    source: Path, dest_dir: Path, limits: ExtractionLimits, io: IOScheduler,
+) -> list[ExtractedFile]:
+    """extract_recursive under a read slot of the source's device."""
+    with io.read(source) as throttle:
+        extracted = extract_recursive(source, dest_dir, limits)
+        throttle(source.stat().st_size)
+    return extracted
+
+
 def _get_rom_to_work_dir(
     op: MatchOp, work_dir: Path, limits: ExtractionLimits,
     cache: ExtractionCache | None = None,
+    io: IOScheduler = NO_LIMITS,
 ) -> Path | None:
     """Get a ROM file into work_dir. Returns path or None on failure.
 
@@ -268,19 +305,20 @@ def _get_rom_to_work_dir(
     can differ from DAT names and are not authoritative.
 
     When cache is provided, archive extractions are cached and the needed
-    file is *copied* from cache to work_dir.
+    file is *copied* from cache to work_dir. Source copies and
+    extractions hold an io read slot on the source's device.
     """
     assert op.source_path is not None
     source = Path(op.source_path)
 
     if op.source_type == "plain":
         dest = work_dir / source.name
-        shutil.copy2(source, dest)
+        io.copy(source, dest)
         return dest
 
     if op.source_type == "archive":
         dest = work_dir / source.name
-        shutil.copy2(source, dest)
+        io.copy(source, dest)
         return dest
 
     if op.source_type in ("archive_content", "romroot"):
@@ -298,7 +336,7 @@ def _get_rom_to_work_dir(
                 return dest
             return None
 
-        extracted = extract_recursive(source, work_dir, limits)
+        extracted = _extract_source(source, work_dir, limits, io)
         return _find_by_hash(
             [e.path for e in extracted], op.hash_type, op.hash_value,
         )
@@ -998,19 +1036,7 @@ def _relocate_archive(
 
     # Update DB: delete old entries, insert new
     db.delete_romroot_entries(old_path_str)
-    for entry in old.sidecar.files:
-        db.upsert_romroot(
-            path=str(new_archive),
-            system=game.system,
-            game_name=game.game_name,
-            rom_name=entry.path,
-            crc32=entry.crc32,
-            md5=entry.md5,
-            sha1=entry.sha1,
-            sha256=entry.sha256,
-            blake3=entry.blake3,
-            rscf_path=str(new_rscf),
-        )
+    _record_romroot(db, str(new_archive), game, old.sidecar.files, str(new_rscf))
 
     _cleanup_empty_parents(old_parent)
 
@@ -1084,19 +1110,7 @@ def _relocate_directory(
                 )
                 write_sidecar(updated, rscf_path)
 
-                for entry in sc.files:
-                    db.upsert_romroot(
-                        path=str(rom_file),
-                        system=game.system,
-                        game_name=game.game_name,
-                        rom_name=entry.path,
-                        crc32=entry.crc32,
-                        md5=entry.md5,
-                        sha1=entry.sha1,
-                        sha256=entry.sha256,
-                        blake3=entry.blake3,
-                        rscf_path=str(rscf_path),
-                    )
+                _record_romroot(db, str(rom_file), game, sc.files, str(rscf_path))
             except RscfError:
                 pass
 
@@ -1106,11 +1120,14 @@ def _relocate_directory(
 def _cleanup_empty_parents(start_dir: Path) -> None:
     """Remove empty parent directories walking upward.
 
-    Stops at the first non-empty directory.
+    Stops at the first non-empty directory. A manifest left alone in a
+    directory does not count.
     """
     current = start_dir
-    while current.exists() and not any(current.iterdir()):
+    while current.exists() and all(
+            p.name == MANIFEST_FILENAME for p in current.iterdir()):
         parent = current.parent
+        (current / MANIFEST_FILENAME).unlink(missing_ok=True)
         current.rmdir()
         current = parent
 
@@ -1125,7 +1142,7 @@ def _get_container_blake3(path: Path, resolver: SidecarResolver) -> str:
                 return sc.container_blake3.upper()
         except RscfError:
             pass
-    return hash_file(path).blake3.upper()
+    return hash_path(path, ("blake3",)).blake3.upper()
 
 
 def _get_directory_blake3(path: Path, resolver: SidecarResolver) -> str:
@@ -1235,7 +1252,7 @@ def quarantine_orphans(
                 # Check if ALL files in this directory are orphaned
                 all_orphaned = True
                 for sibling in parent.iterdir():
-                    if sibling.suffix == ".rscf" or not sibling.is_file():
+                    if not is_game_file(sibling) or not sibling.is_file():
                         continue
                     if str(sibling) not in orphaned_paths:
                         all_orphaned = False
@@ -1330,7 +1347,13 @@ def _archive_fully_accounted(source_path: str, db: CacheDB) -> bool:
     Plain files (non-archives) are always considered fully accounted —
     they contain exactly one ROM whose collection status is already
     verified by the game_keys check.
+
+    Archives known only from their listing (provisional CRC32 rows) are
+    never accounted — CRC32 alone cannot prove a file is in romroot.
     """
+    if db.get_provisional_contents(source_path):
+        return False
+
     contents = db.get_archive_contents(source_path)
     if not contents:
         return True  # plain file or archive with no extracted entries
@@ -1438,6 +1461,8 @@ def execute_plan(
     extraction_cache_mb: int = 2048,
     compression_map: dict[str, str] | None = None,
     global_fallback: str = "",
+    io: IOScheduler = NO_LIMITS,
+    romroot_manifest: bool = False,
 ) -> dict[str, int]:
     """Execute the match plan — build per-game archives in romroot.
 
@@ -1467,6 +1492,10 @@ def execute_plan(
             fallback. When a profile is incompatible with the detected media
             type, the cascade falls through to this. Defaults to
             compression_profile if empty.
+        io: Per-device read limits for copies and extractions from sources.
+        romroot_manifest: Keep romroot's manifest (all sidecars of the
+            system directory, see manifest.py) up to date. Refreshed
+            once, after the last game, if anything was written.
 
     Returns:
         Dict with counts: processed, skipped, failed, missing.
@@ -1487,7 +1516,7 @@ def execute_plan(
     _ensure_dir(work_dir)
 
     cache_dir = work_dir / "_extraction_cache"
-    cache = ExtractionCache(cache_dir, max_mb=extraction_cache_mb)
+    cache = ExtractionCache(cache_dir, max_mb=extraction_cache_mb, io=io)
     _ensure_dir(cache_dir)
 
     # Disposal tracking: which source files feed which games, and which
@@ -1651,12 +1680,12 @@ def execute_plan(
                     if existing and not existing.is_directory:
                         _handle_archive_to_directory(
                             game, new_ops, existing, target_dir, work_dir,
-                            resolver, limits, db, stats,
+                            resolver, limits, db, stats, io=io,
                         )
                     else:
                         _execute_directory(
                             game, new_ops, target_dir, work_dir,
-                            resolver, limits, db, stats, cache=cache,
+                            resolver, limits, db, stats, cache=cache, io=io,
                         )
                 elif action == GameAction.RECOMPRESS and effective_strategy == "directory":
                     assert existing is not None
@@ -1667,7 +1696,7 @@ def execute_plan(
                 elif existing and existing.is_directory and effective_strategy != "directory":
                     _handle_directory_to_archive(
                         game, new_ops, existing, target_dir, work_dir,
-                        effective_profile, resolver, limits, db, stats,
+                        effective_profile, resolver, limits, db, stats, io=io,
                     )
                 else:
                     _execute_archive(
@@ -1677,6 +1706,7 @@ def execute_plan(
                         sbi_dir=sbi_dir,
                         verify_roundtrip=verify_roundtrip,
                         cache=cache,
+                        io=io,
                     )
             except Exception as e:
                 print(
@@ -1703,6 +1733,11 @@ def execute_plan(
     finally:
         cache.cleanup()
 
+    if romroot_manifest and (
+            stats["processed"] or stats["relocated"]
+            or not (target_dir / MANIFEST_FILENAME).exists()):
+        refresh_manifest(target_dir)
+
     return stats
 
 
@@ -1720,6 +1755,7 @@ def _execute_directory(
     db: CacheDB,
     stats: dict[str, int],
     cache: ExtractionCache | None = None,
+    io: IOScheduler = NO_LIMITS,
 ) -> None:
     """Execute 'none' profile: copy individual files to game directory."""
     game_dir = _ensure_dir(target_dir / game.game_name)
@@ -1727,18 +1763,20 @@ def _execute_directory(
     for op in new_ops:
         assert op.source_path is not None
 
-        rom_in_work = _get_rom_to_work_dir(op, work_dir, limits, cache=cache)
+        rom_in_work = _get_rom_to_work_dir(
+            op, work_dir, limits, cache=cache, io=io,
+        )
         if rom_in_work is None or not rom_in_work.exists():
             print(f"    Failed: could not get {op.rom_name}", file=sys.stderr)
             stats["failed"] += 1
             continue
 
-        rom_hashes = hash_file(rom_in_work)
+        rom_hashes = hash_path(rom_in_work)
         rom_size = rom_in_work.stat().st_size
 
         if op.hash_value:
             actual = getattr(rom_hashes, op.hash_type, "")
-            if actual.upper() != op.hash_value.upper():
+            if actual != op.hash_value:
                 print(
                     f"    Failed: hash mismatch for {op.rom_name}",
                     file=sys.stderr,
@@ -1809,6 +1847,7 @@ def _handle_archive_to_directory(
     limits: ExtractionLimits,
     db: CacheDB,
     stats: dict[str, int],
+    io: IOScheduler = NO_LIMITS,
 ) -> None:
     """Transition from archive → directory (none) profile."""
     assert not existing.is_directory
@@ -1829,7 +1868,7 @@ def _handle_archive_to_directory(
         target_file = game_dir / ef.original_name
         shutil.copy2(ef.path, target_file)
 
-        rom_hashes = hash_file(target_file)
+        rom_hashes = hash_path(target_file)
         target_stat = target_file.stat()
 
         rom_name = entry.path if entry else ef.original_name
@@ -1868,7 +1907,7 @@ def _handle_archive_to_directory(
     if new_ops:
         _execute_directory(
             game, new_ops, target_dir, work_dir,
-            resolver, limits, db, stats,
+            resolver, limits, db, stats, io=io,
         )
 
     # Cleanup old archive + sidecar
@@ -1888,6 +1927,7 @@ def _handle_directory_to_archive(
     limits: ExtractionLimits,
     db: CacheDB,
     stats: dict[str, int],
+    io: IOScheduler = NO_LIMITS,
 ) -> None:
     """Transition from directory (none) → archive profile."""
     assert existing.is_directory
@@ -1916,18 +1956,19 @@ def _handle_directory_to_archive(
     verified_roms: list[tuple[MatchOp, Path, FileHashes, int]] = []
     for op in new_ops:
         assert op.source_path is not None
-        rom_in_work = _get_rom_to_work_dir(op, rom_work, limits)  # no cache for transitions
+        # No cache for transitions
+        rom_in_work = _get_rom_to_work_dir(op, rom_work, limits, io=io)
         if rom_in_work is None or not rom_in_work.exists():
             print(f"    Failed: could not get {op.rom_name}", file=sys.stderr)
             stats["failed"] += 1
             return
 
-        rom_hashes = hash_file(rom_in_work)
+        rom_hashes = hash_path(rom_in_work)
         rom_size = rom_in_work.stat().st_size
 
         if op.hash_value:
             actual = getattr(rom_hashes, op.hash_type, "")
-            if actual.upper() != op.hash_value.upper():
+            if actual != op.hash_value:
                 print(f"    Failed: hash mismatch for {op.rom_name}", file=sys.stderr)
                 stats["failed"] += 1
                 return
@@ -1947,7 +1988,7 @@ def _handle_directory_to_archive(
     result = compress(compression_profile, all_roms, compress_base)
     archive_in_work = result.output
 
-    compressed_hashes = hash_file(archive_in_work)
+    compressed_hashes = hash_path(archive_in_work)
 
     # Determine target path
     ext = profile_extension(compression_profile, len(all_roms))
@@ -1988,19 +2029,7 @@ def _handle_directory_to_archive(
         if rom_file.is_file() and rom_file.suffix != ".rscf":
             db.delete_romroot_entries(str(rom_file))
 
-    for entry in merged:
-        db.upsert_romroot(
-            path=str(target_archive),
-            system=game.system,
-            game_name=game.game_name,
-            rom_name=entry.path,
-            crc32=entry.crc32,
-            md5=entry.md5,
-            sha1=entry.sha1,
-            sha256=entry.sha256,
-            blake3=entry.blake3,
-            rscf_path=str(rscf_path),
-        )
+    _record_romroot(db, str(target_archive), game, merged, str(rscf_path))
 
     # Remove old game directory
     shutil.rmtree(game_dir)
@@ -2038,6 +2067,7 @@ def _execute_dolphin_copy(
     resolver: SidecarResolver,
     db: CacheDB,
     stats: dict[str, int],
+    io: IOScheduler = NO_LIMITS,
 ) -> bool:
     """Try to copy a source RVZ/GCZ/WIA as-is if it matches the target profile.
 
@@ -2070,10 +2100,10 @@ def _execute_dolphin_copy(
     target_archive = target_dir / archive_name
 
     # Copy source directly to target
-    shutil.copy2(source, target_archive)
+    io.copy(source, target_archive)
 
     # Hash the copy for container verification
-    compressed_hashes = hash_file(target_archive)
+    compressed_hashes = hash_path(target_archive)
 
     if not _verify_on_target(target_archive, compressed_hashes.blake3):
         target_archive.unlink(missing_ok=True)
@@ -2130,6 +2160,7 @@ def _execute_dimg_copy(
     resolver: SidecarResolver,
     db: CacheDB,
     stats: dict[str, int],
+    io: IOScheduler = NO_LIMITS,
 ) -> bool:
     """Try to copy a source .aaru as-is if it matches the target profile.
 
@@ -2163,10 +2194,10 @@ def _execute_dimg_copy(
     target_archive = target_dir / archive_name
 
     # Copy source directly to target
-    shutil.copy2(source, target_archive)
+    io.copy(source, target_archive)
 
     # Hash the copy for container verification
-    compressed_hashes = hash_file(target_archive)
+    compressed_hashes = hash_path(target_archive)
 
     if not _verify_on_target(target_archive, compressed_hashes.blake3):
         target_archive.unlink(missing_ok=True)
@@ -2201,19 +2232,7 @@ def _execute_dimg_copy(
     rscf_path = resolver.sidecar_path(target_archive)
     write_sidecar(sidecar, rscf_path)
 
-    for entry in file_entries:
-        db.upsert_romroot(
-            path=str(target_archive),
-            system=game.system,
-            game_name=game.game_name,
-            rom_name=entry.path,
-            crc32=entry.crc32,
-            md5=entry.md5,
-            sha1=entry.sha1,
-            sha256=entry.sha256,
-            blake3=entry.blake3,
-            rscf_path=str(rscf_path),
-        )
+    _record_romroot(db, str(target_archive), game, file_entries, str(rscf_path))
     stats["processed"] += 1
     return True
 
@@ -2238,6 +2257,7 @@ def _execute_archive(
     sbi_dir: Path | None = None,
     verify_roundtrip: bool = False,
     cache: ExtractionCache | None = None,
+    io: IOScheduler = NO_LIMITS,
 ) -> None:
     """Execute archive profiles: build/update per-game archive."""
     profile = PROFILES[compression_profile]
@@ -2262,18 +2282,20 @@ def _execute_archive(
     for op in ops_to_fetch:
         assert op.source_path is not None
 
-        rom_in_work = _get_rom_to_work_dir(op, rom_work, limits, cache=cache)
+        rom_in_work = _get_rom_to_work_dir(
+            op, rom_work, limits, cache=cache, io=io,
+        )
         if rom_in_work is None or not rom_in_work.exists():
             print(f"    Failed: could not get {op.rom_name}", file=sys.stderr)
             stats["failed"] += 1
             return  # fail entire game — archive must be consistent
 
-        rom_hashes = hash_file(rom_in_work)
+        rom_hashes = hash_path(rom_in_work)
         rom_size = rom_in_work.stat().st_size
 
         if op.hash_value:
             actual = getattr(rom_hashes, op.hash_type, "")
-            if actual.upper() != op.hash_value.upper():
+            if actual != op.hash_value:
                 print(
                     f"    Failed: hash mismatch for {op.rom_name}",
                     file=sys.stderr,
@@ -2324,14 +2346,14 @@ def _execute_archive(
                     and len(new_ops) == 1
                     and _execute_dolphin_copy(
                         game, first_op, target_dir, compression_profile,
-                        resolver, db, stats,
+                        resolver, db, stats, io=io,
                     )):
                 return
             # Aaru (.aaru) — multi-track games are normal
             if (compression_profile.startswith("aaru-")
                     and _execute_dimg_copy(
                         game, first_op, target_dir, compression_profile,
-                        resolver, db, stats,
+                        resolver, db, stats, io=io,
                     )):
                 return
 
@@ -2375,7 +2397,7 @@ def _execute_archive(
             for op in game.ops:
                 if op.hash_value:
                     rom_key = Path(op.rom_name).name
-                    dat_hashes[rom_key] = (op.hash_type, op.hash_value.upper())
+                    dat_hashes[rom_key] = (op.hash_type, op.hash_value)
 
             for ef in extracted:
                 # Try direct name match first
@@ -2389,7 +2411,7 @@ def _execute_archive(
                 expected = dat_hashes.get(dest_name)
                 if expected:
                     ht, hv = expected
-                    actual = getattr(hash_file(ef.path), ht, "").upper()
+                    actual = getattr(hash_path(ef.path, (ht,)), ht, "")
                     if actual != hv:
                         print(
                             f"    Warning: corrupt ROM in existing archive: "
@@ -2415,7 +2437,7 @@ def _execute_archive(
         assert False, f"Unexpected action {action} in _execute_archive"
 
     # Step 5: Hash compressed output
-    compressed_hashes = hash_file(archive_in_work)
+    compressed_hashes = hash_path(archive_in_work)
 
     # Step 5b: Roundtrip verify — extract the archive and verify per-ROM BLAKE3
     # Aaru profiles use dimg-tool's built-in --verify (passed via compress()),
@@ -2489,18 +2511,6 @@ def _execute_archive(
 
     # Step 9: Update DB — replace all entries for this archive
     db.delete_romroot_entries(str(target_archive))
-    for entry in merged_entries:
-        db.upsert_romroot(
-            path=str(target_archive),
-            system=game.system,
-            game_name=game.game_name,
-            rom_name=entry.path,
-            crc32=entry.crc32,
-            md5=entry.md5,
-            sha1=entry.sha1,
-            sha256=entry.sha256,
-            blake3=entry.blake3,
-            rscf_path=str(rscf_path),
-        )
+    _record_romroot(db, str(target_archive), game, merged_entries, str(rscf_path))
 
     stats["processed"] += len(verified_roms) or len(existing_entries)
@@ -5,6 +5,13 @@ Supports: zip, 7z, rar (via 7z), gz, bz2, xz, zstd, lz4,
           dolphin disc images (rvz, gcz, wia → iso via dolphin-tool),
           aaru disc images (.aaru → CUE/BIN or ISO via dimg-tool).
 Nested archives are extracted recursively up to a configurable depth.
+zip/7z/rar can also be listed (size + CRC32 per entry) without extracting.
+
+Streaming: zip, tar (incl. tar.gz/bz2/xz/zst/lz4) and single-file
+gz/bz2/xz/zst/lz4 entries can be hashed straight out of the decompressor
+(stream_hash_entries) — nothing is written to work_dir. Dolphin images and
+DVD .aaru images are rendered into a named pipe (FIFO) and hashed as the
+tool writes, falling back to on-disk extraction if the tool refuses it.
 
 Safety:
 - Maximum total extracted size limit (post-extraction check)
@@ -15,12 +22,25 @@ Safety:
 
 from __future__ import annotations
 
+import lzma
 import os
+import select
 import shutil
 import subprocess
+import tarfile
 import tempfile
+import time
+import zipfile
+import zlib
+from collections.abc import Callable, Collection, Iterator
 from dataclasses import dataclass
 from pathlib import Path
+from typing import IO
+
+from rscf import FileHashes
+
+from romtholos.collect.db import HASH_TYPES
+from romtholos.collect.hashing import CHUNK_SIZE, StreamHasher
 
 
 class ExtractionError(Exception):
@@ -39,6 +59,14 @@ class PathTraversalError(ExtractionError):
     """Extracted file escapes the target directory."""
 
 
+class StreamingUnsupported(ExtractionError):
+    """Archive cannot be hashed by streaming — use extract_recursive().
+
+    Raised for formats without a streaming reader, nested archives,
+    encrypted or exotic-method entries, and tar links.
+    """
+
+
 @dataclass
 class ExtractionLimits:
     """Safety limits for archive extraction."""
@@ -64,6 +92,36 @@ class ExtractedFile:
     """File size in bytes."""
 
 
+@dataclass
+class ListedEntry:
+    """A file entry read from an archive listing (nothing extracted)."""
+
+    name: str
+    """Entry filename (basename, same as ExtractedFile.original_name)."""
+
+    size: int
+    """Uncompressed size in bytes."""
+
+    crc32: str
+    """Uppercase hex CRC32 from the archive header; empty if not stored."""
+
+
+@dataclass
+class HashedEntry:
+    """An archive entry hashed while streaming (never written to disk)."""
+
+    original_name: str
+    """Entry filename (basename, same as ExtractedFile.original_name)."""
+
+    size: int
+    """Uncompressed size in bytes."""
+
+    hashes: FileHashes
+
+
+# Formats whose listings carry per-entry CRC32 (via 7z l -slt)
+_LISTABLE_EXTENSIONS: set[str] = {".zip", ".7z", ".rar"}
+
 # Dolphin disc image formats (extracted via dolphin-tool → ISO)
 _DOLPHIN_EXTENSIONS: set[str] = {".rvz", ".gcz", ".wia"}
 
@@ -128,6 +186,62 @@ def _extract_7z(archive: Path, target: Path) -> None:
         raise ExtractionError(f"7z extract failed for {archive}: {result.stderr}")
 
 
+def is_listable(path: Path) -> bool:
+    """Check if an archive's listing exposes per-entry size and CRC32."""
+    return path.suffix.lower() in _LISTABLE_EXTENSIONS
+
+
+def list_archive(archive: Path) -> list[ListedEntry]:
+    """List zip/7z/rar entries with size and CRC32, without extracting.
+
+    Directory entries are omitted. Entries the format stores without a
+    CRC (e.g. empty files in 7z) have crc32 == "".
+
+    Raises:
+        ExtractionError: If the format is not listable or 7z fails.
+    """
+    if not is_listable(archive):
+        raise ExtractionError(f"Cannot list archive format: {archive.name}")
+
+    result = subprocess.run(
+        ["7z", "l", "-slt", str(archive)],
+        capture_output=True, text=True, timeout=600,
+    )
+    if result.returncode != 0:
+        raise ExtractionError(f"7z list failed for {archive}: {result.stderr}")
+    return _parse_7z_listing(result.stdout)
+
+
+def _parse_7z_listing(output: str) -> list[ListedEntry]:
+    """Parse ``7z l -slt`` output into file entries."""
+    # Per-entry blocks follow the "----------" separator, one blank-line
+    # separated block of "Key = Value" lines per entry
+    _, sep, body = output.partition("\n----------\n")
+    if not sep:
+        return []
+
+    entries: list[ListedEntry] = []
+    for block in body.split("\n\n"):
+        fields: dict[str, str] = {}
+        for line in block.splitlines():
+            key, eq, value = line.partition(" = ")
+            if eq:
+                fields[key] = value
+            elif line.endswith(" ="):
+                fields[line[:-2]] = ""
+        if "Path" not in fields:
+            continue
+        if (fields.get("Folder") == "+"
+                or fields.get("Attributes", "").startswith("D")):
+            continue
+        entries.append(ListedEntry(
+            name=Path(fields["Path"].replace("\\", "/")).name,
+            size=int(fields.get("Size") or 0),
+            crc32=fields.get("CRC", "").upper(),
+        ))
+    return entries
+
+
 def _extract_tar(archive: Path, target: Path) -> None:
     """Extract tar archives (including compressed variants) via GNU tar.
 
@@ -146,6 +260,21 @@ def _extract_tar(archive: Path, target: Path) -> None:
         raise ExtractionError(f"tar extract failed for {archive}: {result.stderr}")
 
 
+# Decompress-to-stdout commands for single-file compressed formats
+_DECOMPRESS_CMDS: dict[str, list[str]] = {
+    ".gz": ["gzip", "-d", "-k", "-c"],
+    ".bz2": ["bzip2", "-d", "-k", "-c"],
+    ".xz": ["xz", "-d", "-k", "-c"],
+    ".zst": ["zstd", "-d", "-c"],
+    ".lz4": ["lz4", "-d", "-c"],
+}
+
+_TAR_SUFFIXES: tuple[str, ...] = (
+    ".tar.gz", ".tgz", ".tar.bz2", ".tbz2",
+    ".tar.xz", ".txz", ".tar.zst", ".tar.lz4", ".tar",
+)
+
+
 def _extract_single_compressed(archive: Path, target: Path, limits: ExtractionLimits) -> None:
     """Extract single-file compressed formats (gz, bz2, xz, zst, lz4).
 
@@ -156,15 +285,7 @@ def _extract_single_compressed(archive: Path, target: Path, limits: ExtractionLi
     suffix = archive.suffix.lower()
     stem = archive.stem
 
-    decompress_cmds: dict[str, list[str]] = {
-        ".gz": ["gzip", "-d", "-k", "-c"],
-        ".bz2": ["bzip2", "-d", "-k", "-c"],
-        ".xz": ["xz", "-d", "-k", "-c"],
-        ".zst": ["zstd", "-d", "-c"],
-        ".lz4": ["lz4", "-d", "-c"],
-    }
-
-    cmd_base = decompress_cmds.get(suffix)
+    cmd_base = _DECOMPRESS_CMDS.get(suffix)
     if cmd_base is None:
         raise ExtractionError(f"Unsupported single-file compression: {suffix}")
 
@@ -259,22 +380,7 @@ def _extract_dimg(archive: Path, target: Path) -> None:
         raise ExtractionError(str(e)) from e
 
     # Use dimg-tool info --json to determine if it's CD (→ CUE) or DVD (→ ISO)
-    info_cmd = cmd_base + ["info", "--json", str(archive)]
-    info_result = subprocess.run(
-        info_cmd, capture_output=True, text=True, timeout=30,
-    )
-    if info_result.returncode != 0:
-        raise ExtractionError(
-            f"dimg-tool info failed for {archive}: {info_result.stderr}"
-        )
-
-    import json
-    info = json.loads(info_result.stdout)
-    system = info.get("system", "")
-
-    # DVD systems render to ISO, CD systems render to CUE/BIN
-    dvd_systems = {"dvd", "ps2dvd", "psp"}
-    is_cd = system not in dvd_systems
+    is_cd = _dimg_is_cd(cmd_base, archive)
 
     out_ext = ".cue" if is_cd else ".iso"
     out_path = target / (archive.stem + out_ext)
@@ -300,14 +406,33 @@ def _extract_dimg(archive: Path, target: Path) -> None:
         raise ExtractionError(f"dimg-tool produced no output for {archive}")
 
 
+def _dimg_is_cd(cmd_base: list[str], archive: Path) -> bool:
+    """Ask dimg-tool whether an .aaru image renders to CUE/BIN (CD) or ISO."""
+    info_cmd = cmd_base + ["info", "--json", str(archive)]
+    info_result = subprocess.run(
+        info_cmd, capture_output=True, text=True, timeout=30,
+    )
+    if info_result.returncode != 0:
+        raise ExtractionError(
+            f"dimg-tool info failed for {archive}: {info_result.stderr}"
+        )
+
+    import json
+    info = json.loads(info_result.stdout)
+    system = info.get("system", "")
+
+    # DVD systems render to ISO, CD systems render to CUE/BIN
+    dvd_systems = {"dvd", "ps2dvd", "psp"}
+    return system not in dvd_systems
+
+
 def _extract_archive(archive: Path, target: Path, limits: ExtractionLimits) -> None:
     """Extract an archive using the appropriate method."""
     suffix = archive.suffix.lower()
     name_lower = archive.name.lower()
 
     # Tar variants (must check before single-file compressed)
-    if name_lower.endswith((".tar.gz", ".tgz", ".tar.bz2", ".tbz2",
-                            ".tar.xz", ".txz", ".tar.zst", ".tar.lz4", ".tar")):
+    if name_lower.endswith(_TAR_SUFFIXES):
         _extract_tar(archive, target)
     elif suffix in (".zip", ".7z", ".rar"):
         _extract_7z(archive, target)
@@ -397,3 +522,382 @@ def extract_recursive(
         raise
 
     return results
+
+
+# --- Streaming (extract-free) hashing ---
+
+
+def can_stream(archive: Path) -> bool:
+    """Check if an archive's format has a streaming reader."""
+    name_lower = archive.name.lower()
+    if name_lower.endswith(_TAR_SUFFIXES):
+        return True
+    return archive.suffix.lower() in (
+        {".zip"} | _DECOMPRESS_CMDS.keys() | _DOLPHIN_EXTENSIONS | _AARU_EXTENSIONS
+    )
+
+
+def stream_hash_entries(
+    archive: Path,
+    limits: ExtractionLimits | None = None,
+    work_dir: Path | None = None,
+    hash_types: Collection[str] = HASH_TYPES,
+) -> Iterator[HashedEntry]:
+    """Hash every file in an archive without writing it to disk.
+
+    Streaming counterpart of extract_recursive() + hash_file(): yields one
+    HashedEntry per non-archive file, in archive order, with the same
+    original_name and hashes extraction would produce. Decompressed bytes
+    go straight into the hashers; limits.max_total_bytes is enforced as
+    they arrive. Only hash_types are computed (the rest are empty).
+
+    Not recursive: a nested archive raises StreamingUnsupported (the
+    caller falls back to extract_recursive(), discarding partial results).
+
+    Disc images (dolphin, DVD .aaru) are rendered into a FIFO created in
+    work_dir (a temp dir if None) — the tool must see the same filesystem
+    as for on-disk extraction (flatpak dolphin-tool). CD .aaru images
+    render per-track BINs whose names are only known afterwards, so they
+    raise StreamingUnsupported.
+
+    Raises:
+        StreamingUnsupported: Format or content needs real extraction.
+        SizeLimitError: Total uncompressed size exceeds the limit.
+        ExtractionError: Corrupt archive or decompressor failure.
+    """
+    if limits is None:
+        limits = ExtractionLimits()
+
+    name_lower = archive.name.lower()
+    budget = _ByteBudget(limits.max_total_bytes)
+
+    if name_lower.endswith(_TAR_SUFFIXES):
+        yield from _stream_tar(archive, budget, hash_types)
+    elif archive.suffix.lower() == ".zip":
+        yield from _stream_zip(archive, budget, hash_types)
+    elif archive.suffix.lower() in _DECOMPRESS_CMDS:
+        yield from _stream_single_compressed(archive, budget, hash_types)
+    elif archive.suffix.lower() in _DOLPHIN_EXTENSIONS:
+        yield _stream_dolphin(archive, budget, work_dir, hash_types)
+    elif archive.suffix.lower() in _AARU_EXTENSIONS:
+        yield _stream_dimg(archive, budget, work_dir, hash_types)
+    else:
+        raise StreamingUnsupported(f"No streaming reader for {archive.name}")
+
+
+class _ByteBudget:
+    """Running total of decompressed bytes against max_total_bytes."""
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self.used = 0
+
+    def consume(self, n: int) -> None:
+        self.used += n
+        if self.used > self.max_bytes:
+            raise SizeLimitError(
+                f"Extracted size {self.used} exceeds limit {self.max_bytes}"
+            )
+
+
+def _hash_stream(
+    name: str, stream: IO[bytes], budget: _ByteBudget,
+    hash_types: Collection[str],
+) -> HashedEntry:
+    """Hash one entry's decompressed byte stream."""
+    if _is_archive(Path(name)):
+        raise StreamingUnsupported(f"Nested archive {name} needs extraction")
+
+    hasher = StreamHasher(hash_types)
+    while chunk := stream.read(CHUNK_SIZE):
+        budget.consume(len(chunk))
+        hasher.update(chunk)
+    return HashedEntry(
+        original_name=Path(name).name, size=hasher.size, hashes=hasher.result(),
+    )
+
+
+def _stream_zip(
+    archive: Path, budget: _ByteBudget, hash_types: Collection[str],
+) -> Iterator[HashedEntry]:
+    """Hash zip entries via zipfile (CRC is checked by zipfile at EOF)."""
+    try:
+        zf = zipfile.ZipFile(archive)
+    except (zipfile.BadZipFile, OSError) as e:
+        raise ExtractionError(f"zip open failed for {archive}: {e}") from e
+
+    with zf:
+        infos = [i for i in zf.infolist() if not i.is_dir()]
+        # Check up front so nothing is hashed for an archive that must be
+        # extracted anyway
+        for info in infos:
+            if _is_archive(Path(info.filename)):
+                raise StreamingUnsupported(
+                    f"Nested archive {info.filename} needs extraction"
+                )
+        for info in infos:
+            try:
+                with zf.open(info) as stream:
+                    yield _hash_stream(
+                        info.filename, stream, budget, hash_types,
+                    )
+            except (NotImplementedError, RuntimeError) as e:
+                # Unsupported compression method or encrypted entry
+                raise StreamingUnsupported(
+                    f"zip entry {info.filename} in {archive.name}: {e}"
+                ) from e
+            except (zipfile.BadZipFile, zlib.error, EOFError, OSError) as e:
+                raise ExtractionError(f"zip read failed for {archive}: {e}") from e
+
+
+def _stream_tar(
+    archive: Path, budget: _ByteBudget, hash_types: Collection[str],
+) -> Iterator[HashedEntry]:
+    """Hash tar members in one sequential pass.
+
+    gz/bz2/xz are decompressed by tarfile itself; zst/lz4 are piped
+    through the external decompressor (same tools GNU tar would use).
+    """
+    name_lower = archive.name.lower()
+    if name_lower.endswith(".tar.zst"):
+        cmd = _DECOMPRESS_CMDS[".zst"]
+    elif name_lower.endswith(".tar.lz4"):
+        cmd = _DECOMPRESS_CMDS[".lz4"]
+    else:
+        cmd = None
+
+    if cmd is None:
+        with archive.open("rb") as raw:
+            yield from _stream_tar_members(archive, raw, budget, hash_types)
+        return
+
+    with _DecompressorPipe(cmd + [str(archive)], archive) as stdout:
+        yield from _stream_tar_members(archive, stdout, budget, hash_types)
+
+
+def _stream_tar_members(
+    archive: Path, fileobj: IO[bytes], budget: _ByteBudget,
+    hash_types: Collection[str],
+) -> Iterator[HashedEntry]:
+    try:
+        with tarfile.open(fileobj=fileobj, mode="r|*") as tf:
+            for member in tf:
+                if member.isdir():
+                    continue
+                if not member.isreg():
+                    # Links and special files: extraction semantics differ
+                    raise StreamingUnsupported(
+                        f"tar member {member.name} is not a regular file"
+                    )
+                stream = tf.extractfile(member)
+                assert stream is not None
+                yield _hash_stream(member.name, stream, budget, hash_types)
+    except (tarfile.TarError, zlib.error, lzma.LZMAError, EOFError, OSError) as e:
+        raise ExtractionError(f"tar read failed for {archive}: {e}") from e
+
+
+def _stream_single_compressed(
+    archive: Path, budget: _ByteBudget, hash_types: Collection[str],
+) -> Iterator[HashedEntry]:
+    """Hash the single file inside gz/bz2/xz/zst/lz4 (name = archive stem)."""
+    if _is_archive(Path(archive.stem)):
+        raise StreamingUnsupported(f"Nested archive {archive.stem} needs extraction")
+
+    cmd = _DECOMPRESS_CMDS[archive.suffix.lower()] + [str(archive)]
+    with _DecompressorPipe(cmd, archive) as stdout:
+        entry = _hash_stream(archive.stem, stdout, budget, hash_types)
+    yield entry
+
+
+class _DecompressorPipe:
+    """Run a decompress-to-stdout command; yields its stdout.
+
+    On normal exit the command must succeed (ExtractionError otherwise);
+    on any error the process is killed.
+    """
+
+    def __init__(self, cmd: list[str], archive: Path) -> None:
+        self._cmd = cmd
+        self._archive = archive
+        self._proc: subprocess.Popen | None = None
+
+    def __enter__(self) -> IO[bytes]:
+        try:
+            self._proc = subprocess.Popen(
+                self._cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+        except OSError as e:
+            raise StreamingUnsupported(f"{self._cmd[0]} unavailable: {e}") from e
+        assert self._proc.stdout is not None
+        return self._proc.stdout
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        proc = self._proc
+        assert proc is not None and proc.stdout is not None
+        try:
+            if exc_type is not None:
+                proc.kill()
+                proc.wait()
+                return
+            # Drain trailing bytes (tar end-of-archive padding) so the
+            # decompressor is not killed by SIGPIPE before it exits
+            while proc.stdout.read(CHUNK_SIZE):
+                pass
+            proc.wait(timeout=3600)
+            if proc.returncode != 0:
+                assert proc.stderr is not None
+                stderr = proc.stderr.read().decode(errors="replace")
+                raise ExtractionError(
+                    f"Decompression failed for {self._archive}: {stderr}"
+                )
+        finally:
+            proc.stdout.close()
+            if proc.stderr:
+                proc.stderr.close()
+
+
+def _stream_dolphin(
+    archive: Path, budget: _ByteBudget, work_dir: Path | None,
+    hash_types: Collection[str],
+) -> HashedEntry:
+    """Hash the ISO inside an RVZ/GCZ/WIA as dolphin-tool writes it."""
+    from romtholos.collect.compress import CompressionError, dolphin_tool_cmd
+
+    try:
+        cmd_base = dolphin_tool_cmd()
+    except CompressionError as e:
+        raise ExtractionError(str(e)) from e
+
+    name = archive.stem + ".iso"
+    return _hash_tool_fifo(
+        lambda out: cmd_base + [
+            "convert", f"--input={archive}", f"--output={out}", "-f", "iso",
+        ],
+        name, archive, budget, work_dir, hash_types,
+    )
+
+
+def _stream_dimg(
+    archive: Path, budget: _ByteBudget, work_dir: Path | None,
+    hash_types: Collection[str],
+) -> HashedEntry:
+    """Hash the ISO rendered from a DVD .aaru image as dimg-tool writes it."""
+    from romtholos.collect.compress import CompressionError, dimg_tool_cmd
+
+    try:
+        cmd_base = dimg_tool_cmd()
+    except CompressionError as e:
+        raise ExtractionError(str(e)) from e
+
+    if _dimg_is_cd(cmd_base, archive):
+        raise StreamingUnsupported(
+            f"CD image {archive.name} renders multiple BINs — needs extraction"
+        )
+
+    name = archive.stem + ".iso"
+    return _hash_tool_fifo(
+        lambda out: cmd_base + ["convert", "-i", str(archive), "-o", str(out)],
+        name, archive, budget, work_dir, hash_types,
+    )
+
+
+def _hash_tool_fifo(
+    build_cmd: Callable[[Path], list[str]],
+    name: str,
+    archive: Path,
+    budget: _ByteBudget,
+    work_dir: Path | None,
+    hash_types: Collection[str] = HASH_TYPES,
+) -> HashedEntry:
+    """Run a converter whose output file is a FIFO and hash what it writes.
+
+    The FIFO is opened non-blocking and polled, so a tool that exits
+    without ever opening it cannot hang the scan. Any sign that the tool
+    did not stream into the pipe — non-zero exit (e.g. it tried to seek),
+    no writer ever connected, or the FIFO replaced by a regular file —
+    raises StreamingUnsupported so the caller re-runs it on disk.
+    """
+    if work_dir is not None:
+        work_dir.mkdir(parents=True, exist_ok=True)
+    fifo_dir = Path(tempfile.mkdtemp(prefix="_fifo_", dir=work_dir))
+    fifo = fifo_dir / name
+    os.mkfifo(fifo)
+
+    fd = os.open(fifo, os.O_RDONLY | os.O_NONBLOCK)
+    stderr = tempfile.TemporaryFile()
+    proc: subprocess.Popen | None = None
+    try:
+        proc = subprocess.Popen(
+            build_cmd(fifo), stdout=subprocess.DEVNULL, stderr=stderr,
+        )
+        poller = select.poll()
+        poller.register(fd, select.POLLIN)
+        hasher = StreamHasher(hash_types)
+        deadline = time.monotonic() + 7200
+        connected = False  # a writer opened the FIFO
+        hung_up = False    # ... and closed it again
+        rewritten = False  # data after a hang-up: output was not sequential
+
+        def consume(data: bytes) -> None:
+            nonlocal connected, rewritten
+            connected = True
+            rewritten = rewritten or hung_up
+            budget.consume(len(data))
+            hasher.update(data)
+
+        while True:
+            events = poller.poll(200)
+            revents = events[0][1] if events else 0
+            if revents & select.POLLIN:
+                try:
+                    data = os.read(fd, CHUNK_SIZE)
+                except BlockingIOError:
+                    data = b""
+                if data:
+                    consume(data)
+                    continue
+            if revents & select.POLLHUP:
+                connected = hung_up = True
+            if proc.poll() is not None:
+                break
+            if time.monotonic() > deadline:
+                raise ExtractionError(f"converter timed out for {archive}")
+            if hung_up:
+                # Writer closed — wait for the tool to exit (POLLHUP
+                # would otherwise return immediately)
+                try:
+                    proc.wait(timeout=0.05)
+                except subprocess.TimeoutExpired:
+                    pass
+
+        # The tool has exited: drain whatever it wrote after the last poll
+        while True:
+            try:
+                data = os.read(fd, CHUNK_SIZE)
+            except BlockingIOError:
+                break
+            if not data:
+                break
+            consume(data)
+
+        returncode = proc.returncode
+        proc = None
+        if (returncode != 0 or not connected or rewritten
+                or not fifo.is_fifo()):
+            stderr.seek(0)
+            detail = stderr.read().decode(errors="replace").strip()
+            raise StreamingUnsupported(
+                f"{archive.name}: converter did not stream to FIFO "
+                f"(exit {returncode}){': ' + detail if detail else ''}"
+            )
+
+        return HashedEntry(
+            original_name=name, size=hasher.size, hashes=hasher.result(),
+        )
+    finally:
+        if proc is not None:
+            proc.kill()
+            proc.wait()
+        os.close(fd)
+        stderr.close()
+        shutil.rmtree(fifo_dir, ignore_errors=True)
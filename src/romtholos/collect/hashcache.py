@@ -0,0 +1,314 @@
+"""Portable hash cache — move scan results between collector hosts.
+
+Two hosts that see the same NAS would otherwise each hash it in full.
+``collect cache export`` writes the scanned_files and archive_contents
+rows of untrusted sources to a file; ``collect cache import`` loads them
+into another host's DB, so its next scan only stats.
+
+File format: gzip-compressed JSON lines.
+
+- Header: ``{"format": "romtholos-hash-cache", "version": 1, ...}``
+- One record per content, keyed by (size, BLAKE3): the digests, the
+  fingerprint, archive entries (archives), and the files holding that
+  content as [path, mtime_ns] — the stat-identity hint.
+- Trailer: record count and the BLAKE3 of every line before it.
+
+Import is streamed in one transaction and rolled back unless the trailer
+checksum matches. Each file is stat'ed under its remapped path and only
+taken when size and mtime_ns still match the record; its row gets the
+local ctime/inode/device, so the next scan is a stat-cache hit. Romroot
+rows are not exported — romroot recovers from its own sidecars.
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+import zlib
+from collections.abc import Iterator
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from itertools import groupby
+from pathlib import Path
+
+import blake3
+
+from romtholos.collect.config import SourceDir
+from romtholos.collect.db import HASH_TYPES, CacheDB
+
+FORMAT = "romtholos-hash-cache"
+VERSION = 1
+
+
+class CacheFileError(Exception):
+    """Cache file is unreadable, truncated, corrupt or of another format."""
+
+
+@dataclass
+class ExportStats:
+    contents: int = 0
+    files: int = 0
+    archive_entries: int = 0
+
+
+@dataclass
+class ImportStats:
+    contents: int = 0
+    files_imported: int = 0
+    files_current: int = 0  # DB row already matches the file
+    files_stale: int = 0  # missing, or size/mtime changed since export
+    files_outside: int = 0  # not within a configured untrusted source
+    archive_entries: int = 0
+
+
+def _line(obj: dict) -> bytes:
+    return json.dumps(obj, separators=(",", ":")).encode() + b"\n"
+
+
+def _content_record(db: CacheDB, rows: list) -> dict | None:
+    """One record for rows sharing (size, BLAKE3, is_archive), or None.
+
+    Digests are merged across the rows (lazy hashing may have filled in
+    different ones). Archives take the entries of the first path with
+    fully hashed ones, else the first with provisional ones.
+    """
+    first = rows[0]
+    record: dict = {"size": first["size"]}
+    for ht in HASH_TYPES:
+        record[ht] = next((r[ht] for r in rows if r[ht]), "")
+    record["fingerprint"] = next(
+        (r["fingerprint"] for r in rows if r["fingerprint"]), "",
+    )
+    if first["is_archive"]:
+        entries = provisional = None
+        for row in rows:
+            entries = db.get_archive_contents(row["path"])
+            if entries:
+                break
+            provisional = provisional or db.get_provisional_contents(row["path"])
+        if entries:
+            record["entries"] = [
+                [e["entry_name"], e["entry_size"],
+                 *(e[ht] or "" for ht in HASH_TYPES)]
+                for e in entries
+            ]
+        elif provisional:
+            record["provisional"] = [
+                [e["entry_name"], e["entry_size"], e["crc32"] or ""]
+                for e in provisional
+            ]
+        else:
+            return None  # no contents (failed extraction): nothing to carry
+    record["files"] = [[r["path"], r["mtime_ns"]] for r in rows]
+    return record
+
+
+def export_cache(db: CacheDB, dest: Path) -> ExportStats:
+    """Write the untrusted-source hash cache of db to dest (atomically)."""
+    stats = ExportStats()
+    checksum = blake3.blake3()
+    tmp = dest.with_name(dest.name + ".tmp")
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    with gzip.open(tmp, "wb") as f:
+        def emit(obj: dict) -> None:
+            line = _line(obj)
+            checksum.update(line)
+            f.write(line)
+
+        emit({
+            "format": FORMAT, "version": VERSION,
+            "created": datetime.now(timezone.utc).isoformat(),
+            "host": os.uname().nodename,
+        })
+        rows = db.iter_scanned_by_content()
+        for _, group in groupby(
+            rows, key=lambda r: (r["size"], r["blake3"], r["is_archive"]),
+        ):
+            record = _content_record(db, list(group))
+            if record is None:
+                continue
+            emit(record)
+            stats.contents += 1
+            stats.files += len(record["files"])
+            stats.archive_entries += len(
+                record.get("entries") or record.get("provisional") or (),
+            )
+        f.write(_line({
+            "end": True, "records": stats.contents,
+            "blake3": checksum.hexdigest(),
+        }))
+    os.replace(tmp, dest)
+    return stats
+
+
+def _records(src: Path) -> Iterator[dict]:
+    """Content records of a cache file.
+
+    The trailer is checked after the last record: a truncated or corrupt
+    file raises CacheFileError only then, so consume the records inside
+    a transaction.
+    """
+    checksum = blake3.blake3()
+    count = 0
+    try:
+        with gzip.open(src, "rb") as f:
+            header = f.readline()
+            try:
+                head = json.loads(header)
+            except ValueError:
+                head = None
+            if not isinstance(head, dict) or head.get("format") != FORMAT:
+                raise CacheFileError(f"{src}: not a {FORMAT} file")
+            if head.get("version") != VERSION:
+                raise CacheFileError(
+                    f"{src}: unsupported version {head.get('version')!r}",
+                )
+            checksum.update(header)
+            for line in f:
+                obj = json.loads(line)
+                if not isinstance(obj, dict):
+                    raise CacheFileError(f"{src}: malformed record")
+                if obj.get("end"):
+                    if (obj.get("records") != count
+                            or obj.get("blake3") != checksum.hexdigest()):
+                        raise CacheFileError(f"{src}: checksum mismatch")
+                    if f.readline():
+                        raise CacheFileError(f"{src}: data after trailer")
+                    return
+                checksum.update(line)
+                count += 1
+                yield obj
+    except (OSError, EOFError, zlib.error, ValueError) as exc:
+        raise CacheFileError(f"{src}: {exc}") from exc
+    raise CacheFileError(f"{src}: truncated (no trailer)")
+
+
+def remap_path(path: str, remap: list[tuple[str, str]]) -> str:
+    """Apply the longest matching (old, new) path prefix."""
+    best: tuple[str, str] | None = None
+    for old, new in remap:
+        old = old.rstrip("/")
+        if (path == old or path.startswith(old + "/")) and (
+                best is None or len(old) > len(best[0])):
+            best = (old, new.rstrip("/"))
+    if best is None:
+        return path
+    return best[1] + path[len(best[0]):]
+
+
+def _source_type(sources: list[SourceDir], path: Path) -> str | None:
+    """Type of the innermost untrusted source containing path."""
+    owners = [
+        s for s in sources
+        if s.source_type != "romroot" and path.is_relative_to(s.path)
+    ]
+    if not owners:
+        return None
+    return max(owners, key=lambda s: len(s.path.parts)).source_type
+
+
+def import_cache(
+    db: CacheDB,
+    src: Path,
+    sources: list[SourceDir],
+    remap: list[tuple[str, str]] | None = None,
+) -> ImportStats:
+    """Load a cache file into db; all or nothing.
+
+    Args:
+        sources: Configured sources. A file is only imported inside an
+            untrusted (ingest/disposal/readonly) source; its row gets
+            that source's type.
+        remap: (old, new) path prefixes — where the exporting host's
+            mount points are on this one.
+
+    Raises:
+        CacheFileError: unreadable, truncated or corrupt file. Nothing
+            is imported.
+    """
+    stats = ImportStats()
+    now = datetime.now(timezone.utc).isoformat()
+    remap = remap or []
+    with db.batch():
+        for record in _records(src):
+            stats.contents += 1
+            try:
+                _import_record(db, record, sources, remap, now, stats)
+            except (KeyError, TypeError, ValueError) as exc:
+                raise CacheFileError(f"{src}: malformed record: {exc}") from exc
+    return stats
+
+
+def _import_record(
+    db: CacheDB,
+    record: dict,
+    sources: list[SourceDir],
+    remap: list[tuple[str, str]],
+    now: str,
+    stats: ImportStats,
+) -> None:
+    """Import the files of one content record that still match."""
+    for exported, mtime_ns in record["files"]:
+        path = Path(remap_path(exported, remap))
+        source_type = _source_type(sources, path)
+        if source_type is None:
+            stats.files_outside += 1
+            continue
+        try:
+            st = path.stat()
+        except OSError:
+            stats.files_stale += 1
+            continue
+        if st.st_size != record["size"] or st.st_mtime_ns != mtime_ns:
+            stats.files_stale += 1
+            continue
+        path_str = str(path)
+        if db.is_unchanged(
+                path_str, st.st_size, st.st_mtime_ns, st.st_ctime_ns,
+                st.st_ino):
+            stats.files_current += 1
+            continue
+        _import_file(db, path_str, st, source_type, record, now)
+        stats.files_imported += 1
+        stats.archive_entries += len(
+            record.get("entries") or record.get("provisional") or (),
+        )
+
+
+def _import_file(
+    db: CacheDB,
+    path_str: str,
+    st: os.stat_result,
+    source_type: str,
+    record: dict,
+    now: str,
+) -> None:
+    """Write one file's scanned_files row (and archive_contents)."""
+    is_archive = "entries" in record or "provisional" in record
+    db.upsert_scanned(
+        path=path_str,
+        size=st.st_size,
+        mtime_ns=st.st_mtime_ns,
+        ctime_ns=st.st_ctime_ns,
+        inode=st.st_ino,
+        device=st.st_dev,
+        source_type=source_type,
+        **{ht: record[ht] for ht in HASH_TYPES},
+        fingerprint=record["fingerprint"],
+        is_archive=is_archive,
+        scanned_at=now,
+    )
+    if not is_archive:
+        return
+    db.delete_archive_contents(path_str)
+    db.upsert_many_archive_contents(
+        {"archive_path": path_str, "entry_name": name, "entry_size": size,
+         **dict(zip(HASH_TYPES, digests))}
+        for name, size, *digests in record.get("entries", ())
+    )
+    db.upsert_many_archive_contents(
+        {"archive_path": path_str, "entry_name": name, "entry_size": size,
+         "crc32": crc32, "provisional": True}
+        for name, size, crc32 in record.get("provisional", ())
+    )
@@ -0,0 +1,289 @@
+"""Incremental hashing of byte streams into the rscf FileHashes shape.
+
+All file hashing in collect goes through hash_path(): one read of the
+file into reusable buffers, with large files fanned out across threads
+(one per digest, BLAKE3 multi-threaded). Data that only exists as a
+stream (archive entries piped out of a decompressor) is fed to a
+StreamHasher directly. Both produce the same five digests in the same
+format as ``rscf.hash_file`` (uppercase hex, CRC32 zero-padded to 8
+digits) so DB rows and sidecars are indistinguishable.
+
+Also home of the sampled content fingerprint that lets scan recognise a
+file whose stat identity changed (backup restore, rsync, snapshot copy)
+without re-reading all of it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import zlib
+from collections.abc import Callable, Collection
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import BinaryIO
+
+import blake3
+from rscf import FileHashes
+
+from romtholos.collect.db import HASH_TYPES
+
+# Read size for streamed data — large enough that per-call overhead of the
+# five hashers is negligible.
+CHUNK_SIZE = 1024 * 1024
+
+# Files at least this large are hashed by the parallel engine: one thread
+# per digest and BLAKE3 in multi-threaded mode. Below it, thread hand-off
+# costs more than it saves.
+PARALLEL_MIN_SIZE = 64 * 1024 * 1024
+
+# Read size for the parallel engine. Two buffers of this size are reused
+# for the whole file: one being hashed while the next is read.
+PARALLEL_CHUNK_SIZE = 8 * 1024 * 1024
+
+# sequential: read-ahead requested beyond the current position
+_READ_AHEAD = 32 * 1024 * 1024
+
+
+class _Crc32:
+    """zlib.crc32 behind the hashlib update/hexdigest interface."""
+
+    def __init__(self) -> None:
+        self._value = 0
+
+    def update(self, data: bytes | memoryview) -> None:
+        self._value = zlib.crc32(data, self._value)
+
+    def hexdigest(self) -> str:
+        return f"{self._value:08x}"
+
+
+_DIGESTS = {
+    "crc32": _Crc32,
+    "md5": hashlib.md5,
+    "sha1": hashlib.sha1,
+    "sha256": hashlib.sha256,
+    "blake3": blake3.blake3,
+}
+
+
+class StreamHasher:
+    """CRC32 + MD5 + SHA1 + SHA256 + BLAKE3 over one stream, single pass.
+
+    hash_types restricts the work to a subset (lazy hash policies); the
+    digests left out come back as empty strings. With threaded=True the
+    BLAKE3 hasher uses all cores for each update (large inputs only).
+    """
+
+    def __init__(
+        self, hash_types: Collection[str] = HASH_TYPES, *, threaded: bool = False,
+    ) -> None:
+        unknown = set(hash_types) - set(HASH_TYPES)
+        assert not unknown, f"unknown hash types: {sorted(unknown)}"
+        self._digests = {
+            ht: _DIGESTS[ht]() for ht in HASH_TYPES if ht in hash_types
+        }
+        if threaded and "blake3" in self._digests:
+            self._digests["blake3"] = blake3.blake3(
+                max_threads=blake3.blake3.AUTO,
+            )
+        self.size = 0
+
+    def update(self, data: bytes | memoryview) -> None:
+        for digest in self._digests.values():
+            digest.update(data)
+        self.size += len(data)
+
+    def submit(
+        self, data: memoryview, pool: ThreadPoolExecutor,
+    ) -> list[Future]:
+        """Start update(data) with each digest on its own pool thread.
+
+        hashlib, zlib and blake3 all release the GIL on large buffers, so
+        the digests really run side by side. data's buffer must not be
+        touched until every returned future is done.
+        """
+        self.size += len(data)
+        return [
+            pool.submit(digest.update, data)
+            for digest in self._digests.values()
+        ]
+
+    @property
+    def digest_count(self) -> int:
+        return len(self._digests)
+
+    def result(self) -> FileHashes:
+        hexes = {
+            ht: digest.hexdigest().upper()
+            for ht, digest in self._digests.items()
+        }
+        return FileHashes(
+            crc32=hexes.get("crc32", ""),
+            md5=hexes.get("md5", ""),
+            sha1=hexes.get("sha1", ""),
+            sha256=hexes.get("sha256", ""),
+            blake3=hexes.get("blake3", ""),
+        )
+
+
+def _advise(fd: int, offset: int, length: int, advice: str) -> None:
+    """posix_fadvise, where available; the hints are advisory only."""
+    if hasattr(os, "posix_fadvise"):
+        try:
+            os.posix_fadvise(fd, offset, length, getattr(os, advice))
+        except OSError:
+            pass
+
+
+class _ReadHints:
+    """Read-ahead hints for one sequential pass over a file.
+
+    SEQUENTIAL widens kernel read-ahead; WILLNEED keeps _READ_AHEAD bytes
+    queued ahead of the reader, so the disk streams while we hash.
+    """
+
+    def __init__(self, fd: int) -> None:
+        self._fd = fd
+        self._offset = 0
+        _advise(fd, 0, 0, "POSIX_FADV_SEQUENTIAL")
+        _advise(fd, 0, _READ_AHEAD, "POSIX_FADV_WILLNEED")
+
+    def progress(self, nbytes: int) -> None:
+        self._offset += nbytes
+        _advise(self._fd, self._offset, _READ_AHEAD, "POSIX_FADV_WILLNEED")
+
+
+def evict(path: Path) -> None:
+    """Drop path from the page cache (DONTNEED) once it was read.
+
+    A scan reads most files exactly once; without this, terabytes of
+    ROMs streamed through would push everything else out of the cache.
+    """
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        _advise(fd, 0, 0, "POSIX_FADV_DONTNEED")
+    finally:
+        os.close(fd)
+
+
+def hash_path(
+    path: Path, hash_types: Collection[str] = HASH_TYPES,
+    *, sequential: bool = False,
+    throttle: Callable[[int], None] | None = None,
+) -> FileHashes:
+    """Hash a file on disk — all five digests, or just hash_types.
+
+    The file is read exactly once into reusable buffers (``readinto``).
+    Files of PARALLEL_MIN_SIZE or more go through the parallel engine:
+    each chunk is fanned out to one thread per digest while the next
+    chunk is read, and BLAKE3 itself runs multi-threaded (single-core
+    hosts always take the sequential path). The result is
+    identical to ``rscf.hash_file`` (uppercase hex, CRC32 zero-padded).
+
+    sequential: issue read-ahead hints while reading (see _ReadHints);
+    pair with evict() once the file is no longer needed.
+    throttle: called with the size of every chunk read (IOScheduler
+    bandwidth pacing).
+    """
+    with open(path, "rb", buffering=0) as f:
+        hints = _ReadHints(f.fileno()) if sequential else None
+
+        def on_read(nbytes: int) -> None:
+            if hints is not None:
+                hints.progress(nbytes)
+            if throttle is not None:
+                throttle(nbytes)
+        size = os.fstat(f.fileno()).st_size
+        if size < PARALLEL_MIN_SIZE or (os.cpu_count() or 1) < 2:
+            hasher = StreamHasher(hash_types)
+            _read_inline(f, hasher, CHUNK_SIZE, on_read)
+        else:
+            hasher = _hash_parallel(f, hash_types, on_read)
+        return hasher.result()
+
+
+def _read_inline(
+    f: BinaryIO, hasher: StreamHasher, chunk_size: int,
+    on_read: Callable[[int], None],
+) -> None:
+    buf = memoryview(bytearray(chunk_size))
+    while n := f.readinto(buf):
+        hasher.update(buf[:n])
+        on_read(n)
+
+
+def _hash_parallel(
+    f: BinaryIO, hash_types: Collection[str],
+    on_read: Callable[[int], None],
+) -> StreamHasher:
+    """Double-buffered read of f with the digests on a thread pool."""
+    hasher = StreamHasher(hash_types, threaded=True)
+    if hasher.digest_count < 2:
+        # A lone digest gains nothing from the pool (BLAKE3 still uses
+        # its own threads); hash inline.
+        _read_inline(f, hasher, PARALLEL_CHUNK_SIZE, on_read)
+        return hasher
+
+    buffers = [
+        memoryview(bytearray(PARALLEL_CHUNK_SIZE)) for _ in range(2)
+    ]
+    with ThreadPoolExecutor(
+        max_workers=hasher.digest_count, thread_name_prefix="hash",
+    ) as pool:
+        pending = None
+        current = 0
+        while True:
+            n = f.readinto(buffers[current])
+            if pending is not None:
+                for future in wait(pending).done:
+                    future.result()
+                pending = None
+            if not n:
+                break
+            pending = hasher.submit(buffers[current][:n], pool)
+            on_read(n)
+            current ^= 1
+    return hasher
+
+
+# Content fingerprint: BLAKE3 over the size, the first and last
+# _FP_EDGE bytes and _FP_SAMPLES blocks spread evenly in between.
+_FP_EDGE = 1024 * 1024
+_FP_SAMPLES = 4
+_FP_SAMPLE_SIZE = 64 * 1024
+
+
+def content_fingerprint(path: Path, size: int, blake3_hex: str = "") -> str:
+    """Cheap content fingerprint — reads at most ~2.25 MiB of the file.
+
+    Files no larger than two edges are read whole and the fingerprint is
+    their BLAKE3, so it equals ``FileHashes.blake3``; pass that as
+    blake3_hex right after hashing to skip the re-read. Larger files mix
+    in the size so truncation or growth always changes it.
+
+    A match is strong evidence, not proof: an in-place edit that keeps
+    the size and misses every sampled range goes unnoticed. Scan only
+    trusts it for sources configured with ``trust_fingerprint``.
+    """
+    if blake3_hex and size <= 2 * _FP_EDGE:
+        return blake3_hex
+    hasher = blake3.blake3()
+    with open(path, "rb") as f:
+        if size <= 2 * _FP_EDGE:
+            while chunk := f.read(CHUNK_SIZE):
+                hasher.update(chunk)
+            return hasher.hexdigest().upper()
+
+        hasher.update(size.to_bytes(8, "little"))
+        hasher.update(f.read(_FP_EDGE))
+        span = size - 2 * _FP_EDGE - _FP_SAMPLE_SIZE
+        for i in range(1, _FP_SAMPLES + 1):
+            f.seek(_FP_EDGE + span * i // (_FP_SAMPLES + 1))
+            hasher.update(f.read(_FP_SAMPLE_SIZE))
+        f.seek(size - _FP_EDGE)
+        hasher.update(f.read(_FP_EDGE))
+    return hasher.hexdigest().upper()
@@ -0,0 +1,160 @@
+"""Per-device I/O scheduling — read slots and bandwidth caps.
+
+Scan workers, execute and verify all read from the same disks. Two
+workers seeking on one HDD are slower than one, and a background scan
+of a NAS share should not saturate its link. Each source in the config
+may cap reads on the device it lives on:
+
+- ``max_reads``: reads in flight on that device at once (0 = unlimited).
+  Hashing, extraction and copies take a slot before touching the device.
+- ``read_mb_per_s``: average read bandwidth in MB/s (0 = unlimited),
+  paced per chunk for hashing and copies, charged as the archive size
+  for extraction.
+
+Limits are keyed on ``st_dev``: every path on the device shares them,
+including romroot and sources without limits of their own. Several
+limited sources on one device get the strictest of each cap.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from romtholos.collect.config import SourceDir
+
+# Copy chunk for bandwidth-limited copies
+_COPY_CHUNK = 1024 * 1024
+
+
+def _no_throttle(nbytes: int) -> None:
+    pass
+
+
+@dataclass(frozen=True)
+class DeviceLimit:
+    """Read caps for one device (0 = unlimited)."""
+
+    max_reads: int = 0
+    read_mb_per_s: float = 0.0
+
+    def merge(self, other: DeviceLimit) -> DeviceLimit:
+        """Strictest of both caps."""
+        return DeviceLimit(
+            max_reads=_strictest(self.max_reads, other.max_reads),
+            read_mb_per_s=_strictest(self.read_mb_per_s, other.read_mb_per_s),
+        )
+
+
+def _strictest(a: float, b: float) -> float:
+    return min(a, b) if a and b else a or b
+
+
+class _Device:
+    """Slots and bandwidth pacing for one device."""
+
+    def __init__(self, limit: DeviceLimit) -> None:
+        self._slots = (
+            threading.BoundedSemaphore(limit.max_reads)
+            if limit.max_reads else None
+        )
+        self._bytes_per_s = limit.read_mb_per_s * 1e6
+        self._lock = threading.Lock()
+        self._free_at = 0.0  # monotonic time the bandwidth budget catches up
+
+    def throttle(self, nbytes: int) -> None:
+        """Account nbytes just read; sleep to keep the average under the cap."""
+        if nbytes <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            self._free_at = max(self._free_at, now) + nbytes / self._bytes_per_s
+            delay = self._free_at - now
+        time.sleep(delay)
+
+    @contextmanager
+    def slot(self) -> Iterator[Callable[[int], None]]:
+        throttle = self.throttle if self._bytes_per_s else _no_throttle
+        if self._slots is None:
+            yield throttle
+            return
+        with self._slots:
+            yield throttle
+
+
+class IOScheduler:
+    """Per-device read limits, shared by every thread of one collector run.
+
+    An IOScheduler without limits costs nothing: read() yields a no-op
+    throttle without a stat call.
+    """
+
+    def __init__(self, limits: dict[int, DeviceLimit] | None = None) -> None:
+        self._devices = {
+            dev: _Device(limit) for dev, limit in (limits or {}).items()
+        }
+
+    @classmethod
+    def from_sources(cls, sources: Iterable[SourceDir]) -> IOScheduler:
+        """Build from the max_reads / read_mb_per_s of configured sources.
+
+        Sources that do not exist (yet) are skipped — nothing to read there.
+        """
+        limits: dict[int, DeviceLimit] = {}
+        for source in sources:
+            limit = DeviceLimit(source.max_reads, source.read_mb_per_s)
+            if limit == DeviceLimit():
+                continue
+            try:
+                dev = os.stat(source.path).st_dev
+            except OSError:
+                continue
+            limits[dev] = limits[dev].merge(limit) if dev in limits else limit
+        return cls(limits)
+
+    @contextmanager
+    def read(
+        self, path: Path, device: int = 0,
+    ) -> Iterator[Callable[[int], None]]:
+        """Hold a read slot on path's device; yields throttle(nbytes).
+
+        device: st_dev if the caller already has it (walk entries), else
+        path is stat'ed. Do not nest reads on one device — with
+        max_reads=1 that would wait on itself.
+        """
+        if not self._devices:
+            yield _no_throttle
+            return
+        if not device:
+            try:
+                device = os.stat(path).st_dev
+            except OSError:
+                device = 0  # the read itself reports it
+        state = self._devices.get(device)
+        if state is None:
+            yield _no_throttle
+            return
+        with state.slot() as throttle:
+            yield throttle
+
+    def copy(self, source: Path, dest: Path) -> None:
+        """shutil.copy2 under a read slot of source's device, paced if capped."""
+        with self.read(source) as throttle:
+            if throttle is _no_throttle:
+                shutil.copy2(source, dest)
+                return
+            with open(source, "rb") as fsrc, open(dest, "wb") as fdst:
+                while chunk := fsrc.read(_COPY_CHUNK):
+                    fdst.write(chunk)
+                    throttle(len(chunk))
+            shutil.copystat(source, dest)
+
+
+NO_LIMITS = IOScheduler()
+"""Default scheduler: no device is limited."""
@@ -0,0 +1,146 @@
+"""Per-system romroot manifest — all sidecars of a directory in one file.
+
+On a cold DB, the romroot scan opens one ``.rscf`` per archive: on a NAS
+that is one small random read per game. With ``defaults.romroot_manifest``
+execute also keeps ``.rscf-manifest.json`` in every system directory it
+writes to, holding each sidecar below that directory (game directories
+included), keyed by path relative to the manifest.
+
+Scan reads the manifest once when it lists the directory. An entry is
+used instead of the sidecar only while its container_size and
+container_mtime_ns still match the walk's stat of the file — the same
+identity the sidecar itself records. Anything else (new or rewritten
+archive, entry missing, unreadable manifest) falls back to the sidecar.
+
+The manifest is rewritten by rename, never in place. It is a cache of the
+sidecars, not a replacement: ``--force-rescan`` deletes it, and execute
+rebuilds it from the sidecars.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+
+from rscf import FileEntry, Sidecar, SidecarResolver, StorageMode, read_sidecar
+from rscf.sidecar import RscfError
+
+from romtholos.collect.lock import LOCK_FILENAME
+from romtholos.collect.walk import walk_files
+
+MANIFEST_FILENAME = ".rscf-manifest.json"
+_VERSION = 1
+
+# Files in a system directory that are neither games nor sidecars
+_NOT_GAMES = frozenset((MANIFEST_FILENAME, MANIFEST_FILENAME + ".tmp", LOCK_FILENAME))
+
+_ENTRY_FIELDS = ("path", "size", "crc32", "md5", "sha1", "sha256", "blake3")
+
+
+def _encode(sidecar: Sidecar) -> dict:
+    return {
+        "container_blake3": sidecar.container_blake3,
+        "container_size": sidecar.container_size,
+        "container_mtime_ns": sidecar.container_mtime_ns,
+        "container_ctime_ns": sidecar.container_ctime_ns,
+        "container_inode": sidecar.container_inode,
+        "renderer": sidecar.renderer,
+        "files": [[getattr(e, f) for f in _ENTRY_FIELDS] for e in sidecar.files],
+    }
+
+
+def _decode(data: dict) -> Sidecar:
+    return Sidecar(
+        container_blake3=data["container_blake3"],
+        container_size=data["container_size"],
+        container_mtime_ns=data["container_mtime_ns"],
+        container_ctime_ns=data["container_ctime_ns"],
+        container_inode=data["container_inode"],
+        renderer=data["renderer"],
+        files=[FileEntry(**dict(zip(_ENTRY_FIELDS, e))) for e in data["files"]],
+    )
+
+
+def read_manifest(directory: Path) -> dict[Path, Sidecar]:
+    """Container path → sidecar, from directory's manifest.
+
+    Empty if there is no manifest or it cannot be used (corrupt, other
+    version) — callers then read the sidecars themselves.
+    """
+    try:
+        data = json.loads((directory / MANIFEST_FILENAME).read_bytes())
+        if data.get("version") != _VERSION:
+            return {}
+        return {
+            directory / rel: _decode(entry)
+            for rel, entry in data["entries"].items()
+        }
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        return {}
+
+
+def write_manifest(directory: Path, sidecars: dict[Path, Sidecar]) -> None:
+    """Replace directory's manifest atomically (write + rename)."""
+    data = {
+        "version": _VERSION,
+        "entries": {
+            str(path.relative_to(directory)): _encode(sc)
+            for path, sc in sorted(sidecars.items())
+        },
+    }
+    target = directory / MANIFEST_FILENAME
+    tmp = directory / (MANIFEST_FILENAME + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, separators=(",", ":"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, target)
+
+
+def is_game_file(path: Path) -> bool:
+    """False for sidecars and collector bookkeeping files (lock, manifest)."""
+    return path.suffix != ".rscf" and path.name not in _NOT_GAMES
+
+
+def entry_matches(sidecar: Sidecar, size: int, mtime_ns: int) -> bool:
+    """Whether a manifest entry still describes a file of this stat."""
+    return sidecar.container_size == size and sidecar.container_mtime_ns == mtime_ns
+
+
+def refresh_manifest(directory: Path) -> int:
+    """Bring directory's manifest up to date with the sidecars below it.
+
+    Entries whose container stat still matches are kept; other sidecars
+    are read. Entries of vanished files or sidecars are dropped.
+
+    Returns the number of sidecars read.
+    """
+    resolver = SidecarResolver(StorageMode.IN_TREE)
+    old = read_manifest(directory)
+    dir_names: dict[Path, frozenset[str]] = {}
+
+    def on_dir(d: Path, names: list[str]) -> None:
+        dir_names[d] = frozenset(names)
+
+    sidecars: dict[Path, Sidecar] = {}
+    read = 0
+    for entry in walk_files(
+        directory,
+        include=is_game_file,
+        on_dir=on_dir,
+    ):
+        sidecar_path = resolver.sidecar_path(entry.path)
+        if sidecar_path.name not in dir_names.get(sidecar_path.parent, ()):
+            continue
+        known = old.get(entry.path)
+        if known is not None and entry_matches(known, entry.size, entry.mtime_ns):
+            sidecars[entry.path] = known
+            continue
+        try:
+            sidecars[entry.path] = read_sidecar(sidecar_path)
+        except RscfError:
+            continue  # corrupt: scan reads (and reports) it itself
+        read += 1
+    write_manifest(directory, sidecars)
+    return read
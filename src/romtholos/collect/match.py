@@ -6,6 +6,7 @@ Read-only (except DB cache writes). Produces a match plan.
 from __future__ import annotations
 
 import sys
+from collections.abc import Iterator
 from dataclasses import dataclass
 from pathlib import Path
 
@@ -18,6 +19,11 @@ from romtholos.collect.db import CacheDB
 
 _AARU_EXTENSIONS: frozenset[str] = frozenset({".aaru", ".aaruf", ".dicf"})
 
+# Hash types match consults, in order. CRC32 is excluded — it's a 32-bit
+# checksum, not a cryptographic hash. Collisions are expected (confirmed:
+# truncated files can share CRC32 with the correct full-size file).
+_MATCH_HASH_TYPES: tuple[str, ...] = ("sha1", "md5", "sha256", "blake3")
+
 
 def _source_affinity(path: str, game_name: str) -> tuple[int, int]:
     """Score a source path for game-name affinity (higher is better).
@@ -174,7 +180,7 @@ def _consolidate_sources(
         for ht in ("crc32", "md5", "sha1", "sha256", "blake3"):
             v = entry[ht]
             if v:
-                primary_hashes[(ht, v.upper())] = entry["entry_name"]
+                primary_hashes[(ht, v)] = entry["entry_name"]
 
     result: list[MatchOp] = []
     reassigned = 0
@@ -196,7 +202,7 @@ def _consolidate_sources(
             continue
 
         # Check if primary source also has this track
-        key = (op.hash_type, op.hash_value.upper()) if op.hash_value else None
+        key = (op.hash_type, op.hash_value) if op.hash_value else None
         if key and key in primary_hashes:
             result.append(MatchOp(
                 dat_path=op.dat_path,
@@ -234,6 +240,27 @@ def _consolidate_game_sources(ops: list[MatchOp], db: CacheDB) -> list[MatchOp]:
     return result
 
 
+def _dat_entries(root) -> Iterator[dict]:
+    """dat_entries rows of a parsed DAT, one per <rom>."""
+    for game in root.findall("game"):
+        game_name = game.get("name", "")
+        if not game_name:
+            continue
+
+        for rom in game.findall("rom"):
+            rom_name = rom.get("name", "")
+            yield {
+                "game_name": game_name,
+                "rom_name": rom_name,
+                "rom_size": int(rom.get("size") or "0"),
+                "crc32": rom.get("crc", ""),
+                "md5": rom.get("md5", ""),
+                "sha1": rom.get("sha1", ""),
+                "sha256": rom.get("sha256", ""),
+                "blake3": rom.get("blake3", ""),
+            }
+
+
 def load_dat_to_db(dat_path: Path, db: CacheDB) -> str:
     """Parse a selection DAT and load entries into the DB cache.
 
@@ -249,29 +276,32 @@ def load_dat_to_db(dat_path: Path, db: CacheDB) -> str:
         if name_el is not None and name_el.text:
             system = name_el.text
 
-    entries = []
-    for game in root.findall("game"):
-        game_name = game.get("name", "")
-        if not game_name:
-            continue
-
-        for rom in game.findall("rom"):
-            rom_name = rom.get("name", "")
-            entries.append({
-                "game_name": game_name,
-                "rom_name": rom_name,
-                "rom_size": int(rom.get("size") or "0"),
-                "crc32": (rom.get("crc", "") or "").upper(),
-                "md5": (rom.get("md5", "") or "").upper(),
-                "sha1": (rom.get("sha1", "") or "").upper(),
-                "sha256": (rom.get("sha256", "") or "").upper(),
-                "blake3": (rom.get("blake3", "") or "").upper(),
-            })
-
-    db.load_dat(str(dat_path), system, entries)
+    db.load_dat_bulk(str(dat_path), system, _dat_entries(root))
     return system
 
 
+def load_selection_dats(selection_dir: Path, db: CacheDB) -> int:
+    """Load every selection DAT into dat_entries without matching.
+
+    Used before scan when the archive prefilter needs to know which
+    (size, CRC32) pairs are wanted. Unparseable DATs are skipped here
+    and reported by match_all_dats(). Returns the number of DATs loaded.
+    """
+    if not selection_dir.is_dir():
+        return 0
+
+    loaded = 0
+    for dat_file in sorted(selection_dir.glob("**/*.dat")):
+        if not dat_file.is_file():
+            continue
+        try:
+            load_dat_to_db(dat_file, db)
+        except Exception:
+            continue
+        loaded += 1
+    return loaded
+
+
 def _try_match_hash(
     db: CacheDB, hash_type: str, hash_value: str,
     game_name: str = "",
@@ -330,11 +360,8 @@ def match_dat(dat_path: Path, db: CacheDB) -> list[MatchOp]:
         rom_name = entry["rom_name"]
         rom_size = entry["rom_size"]
 
-        # Check if already in romroot.
-        # CRC32 is excluded — it's a 32-bit checksum, not a cryptographic
-        # hash. Collisions are expected (confirmed: truncated files can
-        # share CRC32 with the correct full-size file).
-        for ht in ("sha1", "md5", "sha256", "blake3"):
+        # Check if already in romroot (cryptographic hashes only)
+        for ht in _MATCH_HASH_TYPES:
             hv = entry[ht]
             if hv:
                 existing = db.find_in_romroot(ht, hv, game_name=game_name)
@@ -356,7 +383,7 @@ def match_dat(dat_path: Path, db: CacheDB) -> list[MatchOp]:
         else:
             # Try matching by hash — cryptographic hashes only
             matched = False
-            for ht in ("sha1", "md5", "sha256", "blake3"):
+            for ht in _MATCH_HASH_TYPES:
                 hv = entry[ht]
                 if not hv:
                     continue
@@ -394,17 +421,16 @@ def match_dat(dat_path: Path, db: CacheDB) -> list[MatchOp]:
                     status="missing",
                 ))
 
-        # Record in DB
-        op = ops[-1]
-        db.record_match(
-            dat_path=str(dat_path),
-            game_name=game_name,
-            rom_name=rom_name,
-            source_path=op.source_path,
-            source_type=op.source_type,
-            archive_entry=op.archive_entry,
-            status=op.status,
-        )
+    # Record in DB — one op per DAT entry, in one transaction
+    db.record_matches(
+        {
+            "dat_path": op.dat_path, "game_name": op.game_name,
+            "rom_name": op.rom_name, "source_path": op.source_path,
+            "source_type": op.source_type,
+            "archive_entry": op.archive_entry, "status": op.status,
+        }
+        for op in ops
+    )
 
     # Source consolidation: prefer fewest source archives per game
     ops = _consolidate_game_sources(ops, db)
@@ -412,6 +438,30 @@ def match_dat(dat_path: Path, db: CacheDB) -> list[MatchOp]:
     return ops
 
 
+def lazy_hash_demand(db: CacheDB) -> tuple[set[str], set[int] | None]:
+    """Hash types and ROM sizes that could still resolve missing entries.
+
+    For sources with a reduced ``hashes:`` policy: the DAT entries the last
+    match left missing may carry only digests that were never computed.
+    Returns the match hash types those entries carry and their sizes —
+    candidates for scan.complete_hashes(). Sizes is None when some entry
+    has no size (no narrowing possible).
+    """
+    types: set[str] = set()
+    sizes: set[int] = set()
+    unsized = False
+    for entry in db.get_missing_dat_entries():
+        carried = [ht for ht in _MATCH_HASH_TYPES if entry[ht]]
+        if not carried:
+            continue
+        types.update(carried)
+        if entry["rom_size"] is None:
+            unsized = True
+        else:
+            sizes.add(entry["rom_size"])
+    return types, None if unsized else sizes
+
+
 def match_all_dats(
     selection_dir: Path, db: CacheDB,
 ) -> list[tuple[str, str, list[MatchOp]]]:
@@ -13,6 +13,7 @@ from rscf import SidecarResolver, StorageMode
 
 from romtholos.collect.compress import _KNOWN_ARCHIVE_EXTENSIONS
 from romtholos.collect.config import ORPHANED_DIR_NAME
+from romtholos.collect.walk import walk_files
 
 # Extensions that indicate a file is an archive (not a bare ROM).
 _ARCHIVE_SUFFIXES = set(_KNOWN_ARCHIVE_EXTENSIONS) | {".tar.zst"}
@@ -44,19 +45,7 @@ def _is_archive_file(path: Path) -> bool:
     return path.suffix in _ARCHIVE_SUFFIXES
 
 
-def _item_size(path: Path, resolver: SidecarResolver) -> int:
-    """Total size of an orphan item including sidecars."""
-    if path.is_dir():
-        return sum(f.stat().st_size for f in path.rglob("*") if f.is_file())
-
-    size = path.stat().st_size
-    sidecar = resolver.sidecar_path(path)
-    if sidecar.exists():
-        size += sidecar.stat().st_size
-    return size
-
-
-def list_orphans(romroot: Path) -> list[OrphanEntry]:
+def list_orphans(romroot: Path, stat_workers: int = 1) -> list[OrphanEntry]:
     """List all orphaned items in romroot/_orphaned/.
 
     Returns a sorted list of OrphanEntry objects. Each entry is either:
@@ -67,6 +56,9 @@ def list_orphans(romroot: Path) -> list[OrphanEntry]:
     non-archive files (bare ROMs). Directories that only contain
     archives are path-structure directories — the archives inside
     are listed individually.
+
+    One walk of _orphaned/ (see walk.py) provides every file size, so no
+    file is stat'ed twice.
     """
     orphan_dir = romroot / ORPHANED_DIR_NAME
     if not orphan_dir.is_dir():
@@ -74,34 +66,36 @@ def list_orphans(romroot: Path) -> list[OrphanEntry]:
 
     resolver = SidecarResolver(StorageMode.IN_TREE)
     entries: list[OrphanEntry] = []
+    sizes: dict[Path, int] = {}
     game_dirs: set[Path] = set()
 
-    # First pass: identify game directories (contain bare ROM files)
-    for d in sorted(orphan_dir.rglob("*")):
-        if not d.is_dir():
-            continue
-        has_bare_roms = any(
-            f.is_file() and f.suffix != ".rscf" and not _is_archive_file(f)
-            for f in d.iterdir()
-        )
-        if has_bare_roms:
-            game_dirs.add(d)
-            entries.append(OrphanEntry(
-                path=d,
-                size=_item_size(d, resolver),
-                is_directory=True,
-            ))
-
-    # Second pass: collect archive files not inside game directories
-    for f in sorted(orphan_dir.rglob("*")):
-        if not f.is_file() or f.suffix == ".rscf":
+    # Game directories: any directory below _orphaned/ that directly
+    # contains a bare ROM file
+    for entry in walk_files(orphan_dir, stat_workers=stat_workers):
+        sizes[entry.path] = entry.size
+        f = entry.path
+        if (f.parent != orphan_dir and f.suffix != ".rscf"
+                and not _is_archive_file(f)):
+            game_dirs.add(f.parent)
+
+    for d in sorted(game_dirs):
+        entries.append(OrphanEntry(
+            path=d,
+            size=sum(size for f, size in sizes.items() if f.is_relative_to(d)),
+            is_directory=True,
+        ))
+
+    # Archive files not inside game directories
+    for f, size in sizes.items():
+        if f.suffix == ".rscf":
             continue
         # Skip files inside game directories
         if any(f.is_relative_to(gd) for gd in game_dirs):
             continue
+        sidecar = resolver.sidecar_path(f)
         entries.append(OrphanEntry(
             path=f,
-            size=_item_size(f, resolver),
+            size=size + sizes.get(sidecar, 0),
             is_directory=False,
         ))
 
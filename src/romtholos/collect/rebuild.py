@@ -0,0 +1,345 @@
+"""Rebuild collector.db from RSCF sidecars and selection DATs.
+
+The DB is disposable, and losing it used to mean a cold scan: one
+sidecar read per file, interleaved with the walk and committed every
+_COMMIT_CHUNK files. ``collect rebuild-cache`` only does the rebuild:
+
+- Every source is walked. Romroot containers take their sidecar from the
+  directory manifest when it still matches (see manifest.py), else from
+  the sidecar next to them. Files of untrusted sources use their in-tree
+  sidecar (ingest/disposal) or shadow store entry (readonly) — only
+  while it matches the file's size and mtime_ns, as scan checks them.
+- Sidecars are parsed into rows on a process pool, a chunk per task; the
+  calling process only writes the rows, with one executemany() per table
+  and chunk, all in one transaction.
+- The rows go into a new DB file next to the current one, which is
+  analyzed (fresh planner statistics) and renamed over it once complete. An interrupted rebuild leaves the
+  current DB as it was.
+
+Nothing is hashed here: files without a usable sidecar get no row, and
+the next scan hashes them as on any cold start. Directory state, scan
+cursors and matches start empty; the next scan and match fill them in.
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import NamedTuple
+
+from rscf import Sidecar, SidecarResolver, StorageMode, read_sidecar
+from rscf.sidecar import RscfError
+
+from romtholos.collect.config import ORPHANED_DIR_NAME, SourceDir
+from romtholos.collect.db import HASH_TYPES, CacheDB, DBProfile
+from romtholos.collect.manifest import (
+    MANIFEST_FILENAME,
+    entry_matches,
+    is_game_file,
+    read_manifest,
+)
+from romtholos.collect.match import load_selection_dats
+from romtholos.collect.scan import (
+    is_archive_file,
+    is_scannable,
+    plain_sidecar_entry,
+    romroot_game,
+)
+from romtholos.collect.shadow import ShadowStore
+from romtholos.collect.walk import WalkEntry, walk_files
+
+# Files per parse task — large enough to amortise pickling, small enough
+# to keep every worker busy on a few thousand files.
+_PARSE_CHUNK = 256
+
+# Suffixes of the SQLite files that belong to a WAL-mode database
+_DB_SIDE_FILES = ("-wal", "-shm")
+
+
+@dataclass
+class RebuildStats:
+    """Results of a cache rebuild."""
+
+    files: int = 0  # scanned_files rows written
+    sidecars_read: int = 0
+    from_manifest: int = 0
+    archive_entries: int = 0
+    romroot_entries: int = 0
+    without_sidecar: int = 0  # left for the next scan to hash
+    dats_loaded: int = 0
+    warnings: list[str] = field(default_factory=list)
+
+
+class _Job(NamedTuple):
+    """A file whose sidecar is to be parsed into rows."""
+
+    source: Path
+    source_type: str
+    entry: WalkEntry
+    sidecar_paths: tuple[Path, ...]  # candidates, first usable one wins
+
+
+@dataclass
+class _Rows:
+    """DB rows of parsed sidecars, as upsert_many_* arguments."""
+
+    scanned: list[dict] = field(default_factory=list)
+    contents: list[dict] = field(default_factory=list)
+    romroot: list[dict] = field(default_factory=list)
+    sidecars_read: int = 0
+    without_sidecar: int = 0
+    warnings: list[str] = field(default_factory=list)
+
+
+def _add_rows(rows: _Rows, job: _Job, sidecar: Sidecar, rscf_path: Path,
+              now: str) -> None:
+    """Append the rows a scan would record for job's file from sidecar."""
+    path, size, mtime_ns, ctime_ns, inode, device = job.entry
+    path_str = str(path)
+    scanned = {
+        "path": path_str, "size": size, "mtime_ns": mtime_ns,
+        "ctime_ns": ctime_ns, "inode": inode, "device": device,
+        "source_type": job.source_type, "scanned_at": now,
+    }
+
+    if job.source_type != "romroot" and not is_archive_file(path):
+        entry = plain_sidecar_entry(sidecar, path.name, size)
+        scanned.update({ht: getattr(entry, ht) for ht in HASH_TYPES})
+        scanned["blake3"] = sidecar.container_blake3
+        rows.scanned.append(scanned)
+        return
+
+    # Romroot containers and source archives: container BLAKE3 only,
+    # the digests are on the entries
+    scanned["blake3"] = sidecar.container_blake3
+    scanned["is_archive"] = job.source_type != "romroot"
+    rows.scanned.append(scanned)
+    if job.source_type == "romroot":
+        system, game_name = romroot_game(job.source, path)
+    for entry in sidecar.files:
+        digests = {ht: getattr(entry, ht) for ht in HASH_TYPES}
+        rows.contents.append({
+            "archive_path": path_str, "entry_name": entry.path,
+            "entry_size": entry.size, **digests,
+        })
+        if job.source_type == "romroot":
+            rows.romroot.append({
+                "path": path_str, "system": system, "game_name": game_name,
+                "rom_name": entry.path, **digests,
+                "rscf_path": str(rscf_path),
+            })
+
+
+def _parse_chunk(jobs: list[_Job], now: str) -> _Rows:
+    """Worker: read the sidecars of jobs and turn them into rows.
+
+    Romroot sidecars are taken as they are (romroot is ours, scan does
+    the same). Untrusted ones must match the file's size and mtime_ns.
+    """
+    rows = _Rows()
+    for job in jobs:
+        for rscf_path in job.sidecar_paths:
+            if job.source_type == "readonly" and not rscf_path.exists():
+                continue  # shadow store entries are not listed beforehand
+            try:
+                sidecar = read_sidecar(rscf_path)
+            except (RscfError, OSError) as e:
+                rows.warnings.append(f"corrupt sidecar {rscf_path}: {e}")
+                continue
+            rows.sidecars_read += 1
+            if job.source_type != "romroot" and not (
+                    sidecar.container_size == job.entry.size
+                    and sidecar.container_mtime_ns == job.entry.mtime_ns):
+                continue
+            _add_rows(rows, job, sidecar, rscf_path, now)
+            break
+        else:
+            rows.without_sidecar += 1
+    return rows
+
+
+def _romroot_jobs(
+    source: SourceDir, manifest_rows: _Rows, now: str,
+) -> Iterator[_Job]:
+    """Jobs for a romroot source's containers.
+
+    Containers whose manifest entry matches go straight into
+    manifest_rows; the rest are yielded for parsing.
+    """
+    resolver = SidecarResolver(StorageMode.IN_TREE)
+    dir_names: dict[Path, frozenset[str]] = {}
+    manifests: dict[Path, Sidecar] = {}
+
+    def on_dir(directory: Path, names: list[str]) -> None:
+        dir_names[directory] = frozenset(names)
+        if MANIFEST_FILENAME in names:
+            manifests.update(read_manifest(directory))
+
+    for entry in walk_files(
+        source.path, include=is_game_file,
+        exclude_dirs=(source.path / ORPHANED_DIR_NAME,),
+        on_dir=on_dir, stat_workers=source.stat_workers,
+    ):
+        job = _Job(source.path, "romroot", entry, ())
+        rscf_path = resolver.sidecar_path(entry.path)
+        if rscf_path.name not in dir_names.get(rscf_path.parent, ()):
+            manifest_rows.without_sidecar += 1
+            continue
+        known = manifests.pop(entry.path, None)
+        if known is not None and entry_matches(known, entry.size, entry.mtime_ns):
+            _add_rows(manifest_rows, job, known, rscf_path, now)
+            continue
+        yield job._replace(sidecar_paths=(rscf_path,))
+
+
+def _untrusted_jobs(
+    source: SourceDir, shadow: ShadowStore | None,
+) -> Iterator[_Job]:
+    """Jobs for the files of an ingest, disposal or readonly source."""
+    resolver = SidecarResolver(StorageMode.IN_TREE)
+    dir_names: dict[Path, frozenset[str]] = {}
+
+    def on_dir(directory: Path, names: list[str]) -> None:
+        dir_names[directory] = frozenset(names)
+
+    for entry in walk_files(
+        source.path, include=is_scannable, on_dir=on_dir,
+        stat_workers=source.stat_workers,
+    ):
+        candidates: list[Path] = []
+        rscf_path = resolver.sidecar_path(entry.path)
+        if rscf_path.name in dir_names.get(rscf_path.parent, ()):
+            candidates.append(rscf_path)
+        # As in scan: only read-only sources use the shadow store
+        if shadow is not None and source.source_type == "readonly":
+            candidates.append(shadow.sidecar_path(entry.path))
+        yield _Job(source.path, source.source_type, entry, tuple(candidates))
+
+
+def _chunks(jobs: Iterator[_Job], size: int) -> Iterator[list[_Job]]:
+    chunk: list[_Job] = []
+    for job in jobs:
+        chunk.append(job)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _write_rows(db: CacheDB, rows: _Rows, stats: RebuildStats) -> None:
+    db.upsert_many_scanned(rows.scanned)
+    db.upsert_many_archive_contents(rows.contents)
+    db.upsert_many_romroot(rows.romroot)
+    stats.files += len(rows.scanned)
+    stats.archive_entries += len(rows.contents)
+    stats.romroot_entries += len(rows.romroot)
+    stats.sidecars_read += rows.sidecars_read
+    stats.without_sidecar += rows.without_sidecar
+    stats.warnings.extend(rows.warnings)
+    for msg in rows.warnings:
+        print(f"  WARNING: {msg}", file=sys.stderr)
+
+
+def _remove_db_files(path: Path) -> None:
+    for p in (path, *(path.with_name(path.name + s) for s in _DB_SIDE_FILES)):
+        p.unlink(missing_ok=True)
+
+
+def _swap_in(new: Path, target: Path) -> None:
+    """Rename the closed DB new over target.
+
+    target's -wal/-shm go first: SQLite would otherwise replay the old
+    database's log into the new file on the next open.
+    """
+    for suffix in _DB_SIDE_FILES:
+        target.with_name(target.name + suffix).unlink(missing_ok=True)
+    os.replace(new, target)
+
+
+def _parse_source(
+    db: CacheDB,
+    jobs: Iterator[_Job],
+    now: str,
+    pool: ProcessPoolExecutor | None,
+    workers: int,
+    stats: RebuildStats,
+) -> None:
+    """Parse jobs chunk by chunk and write their rows in walk order.
+
+    With a pool, up to two chunks per worker are parsed ahead while
+    the walk continues and earlier chunks are written.
+    """
+    if pool is None:
+        for chunk in _chunks(jobs, _PARSE_CHUNK):
+            _write_rows(db, _parse_chunk(chunk, now), stats)
+        return
+
+    pending: deque[Future[_Rows]] = deque()
+    for chunk in _chunks(jobs, _PARSE_CHUNK):
+        pending.append(pool.submit(_parse_chunk, chunk, now))
+        if len(pending) >= 2 * workers:
+            _write_rows(db, pending.popleft().result(), stats)
+    while pending:
+        _write_rows(db, pending.popleft().result(), stats)
+
+
+def rebuild_cache(
+    sources: list[SourceDir],
+    db_path: Path,
+    *,
+    selection_dir: Path | None = None,
+    shadow: ShadowStore | None = None,
+    workers: int = 1,
+    profile: DBProfile | None = None,
+) -> RebuildStats:
+    """Rebuild the DB at db_path from sidecars (and selection DATs).
+
+    Args:
+        sources: Configured sources, romroot ones included.
+        db_path: The collector DB; replaced once the rebuild completes.
+            No other process may have it open (take the collector lock).
+        selection_dir: Load every selection DAT below it into dat_entries.
+        shadow: Shadow sidecar store for read-only sources.
+        workers: Processes parsing sidecars. 1 parses in this process.
+        profile: SQLite tuning of the new DB's connection.
+    """
+    stats = RebuildStats()
+    now = datetime.now(timezone.utc).isoformat()
+    new_path = db_path.with_name(db_path.name + ".rebuild")
+    _remove_db_files(new_path)  # leftover of an interrupted rebuild
+
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        with CacheDB(new_path, profile=profile) as db:
+            with db.batch():
+                for source in sources:
+                    print(f"  Rebuilding from {source.path} ({source.source_type})",
+                          file=sys.stderr)
+                    manifest_rows = _Rows()
+                    if source.source_type == "romroot":
+                        jobs = _romroot_jobs(source, manifest_rows, now)
+                    else:
+                        jobs = _untrusted_jobs(source, shadow)
+                    _parse_source(db, jobs, now, pool, workers, stats)
+                    stats.from_manifest += len(manifest_rows.scanned)
+                    _write_rows(db, manifest_rows, stats)
+
+            if selection_dir is not None:
+                stats.dats_loaded = load_selection_dats(selection_dir, db)
+            db.optimize(analyze=True)
+    except BaseException:
+        _remove_db_files(new_path)
+        raise
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    _swap_in(new_path, db_path)
+    return stats
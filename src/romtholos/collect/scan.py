@@ -2,7 +2,11 @@
 
 After scan completes, the DB contains 5 hashes (CRC32, MD5, SHA1, SHA256,
 BLAKE3) for every file across all sources — plain files and archive contents
-alike. The match phase can then work as pure DB hash lookups.
+alike. The match phase can then work as pure DB hash lookups. With the
+archive prefilter on, archives no DAT wants keep listing-derived size +
+CRC32 rows only (provisional — never used for matching). Sources with a
+reduced ``hashes:`` policy store only those digests; complete_hashes()
+fills in the rest on demand.
 
 Source types:
 - romroot: Load hashes from RSCF sidecars (fast). Full rescan rebuilds them.
@@ -13,18 +17,25 @@ Source types:
 
 from __future__ import annotations
 
+import os
 import shutil
+import stat
 import sys
+import tempfile
+import time
+from collections import Counter, deque
+from collections.abc import Callable, Collection, Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
 from dataclasses import dataclass, field
 from datetime import datetime, timezone
 from pathlib import Path
 
 from rscf import (
     FileEntry,
+    FileHashes,
     Sidecar,
     SidecarResolver,
     StorageMode,
-    hash_file,
     read_sidecar,
     write_sidecar,
 )
@@ -32,9 +43,28 @@ from rscf.sidecar import RscfError
 
 from romtholos.collect.compress import strip_archive_extension
 from romtholos.collect.config import ORPHANED_DIR_NAME, SourceDir
-from romtholos.collect.lock import LOCK_FILENAME
-from romtholos.collect.db import CacheDB
-from romtholos.collect.extract import ExtractionLimits, extract_recursive
+from romtholos.collect.hashing import content_fingerprint, evict, hash_path
+from romtholos.collect.iosched import NO_LIMITS, IOScheduler
+from romtholos.collect.layout import PhysicalOrder
+from romtholos.collect.manifest import (
+    MANIFEST_FILENAME,
+    entry_matches,
+    is_game_file,
+    read_manifest,
+)
+from romtholos.collect.shadow import ShadowStore
+from romtholos.collect.db import HASH_TYPES, CacheDB, hash_mask, mask_hash_types
+from romtholos.collect.extract import (
+    ExtractionLimits,
+    ListedEntry,
+    StreamingUnsupported,
+    can_stream,
+    extract_recursive,
+    is_listable,
+    list_archive,
+    stream_hash_entries,
+)
+from romtholos.collect.walk import WalkEntry, walk_files
 
 # File extensions we recognize as ROM-related or archives
 _ROM_EXTENSIONS: set[str] = {
@@ -69,12 +99,16 @@ _ARCHIVE_EXTENSIONS: set[str] = {
 
 
 # Files per transaction — limits progress loss on interrupt.
-# Future: parallel scanning (--workers N) could further improve throughput on
-# network mounts where CIFS can pipeline multiple requests.
+# With --workers N, hashing runs on a thread pool while the calling thread
+# remains the single DB writer and still commits every _COMMIT_CHUNK files.
 _COMMIT_CHUNK = 50
 
+# Directories changed this close to scan start are not trusted for pruning:
+# a file added in the same timestamp tick would leave mtime unchanged.
+_RACY_DIR_NS = 2_000_000_000
+
 
-def _is_scannable(path: Path) -> bool:
+def is_scannable(path: Path) -> bool:
     """Check if a file should be scanned."""
     name = path.name.lower()
     if ".tar." in name:
@@ -82,7 +116,7 @@ def _is_scannable(path: Path) -> bool:
     return path.suffix.lower() in _ROM_EXTENSIONS
 
 
-def _is_archive(path: Path) -> bool:
+def is_archive_file(path: Path) -> bool:
     """Check if a file is an archive whose contents should be extracted."""
     name = path.name.lower()
     if ".tar." in name:
@@ -99,8 +133,14 @@ class SourceScanStats:
     files_hashed: int = 0
     files_skipped: int = 0
     files_from_sidecar: int = 0
+    files_from_manifest: int = 0  # of files_from_sidecar (romroot)
     archives_extracted: int = 0
     archive_entries_hashed: int = 0
+    archives_listed: int = 0
+    dirs_pruned: int = 0
+    files_relinked: int = 0
+    files_fingerprinted: int = 0
+    archives_cloned: int = 0
     warnings: list[str] = field(default_factory=list)
 
     def warn(self, msg: str) -> None:
@@ -108,6 +148,148 @@ class SourceScanStats:
         print(f"  Warning: {msg}", file=sys.stderr)
 
 
+@dataclass
+class _ScanJob:
+    """A file that missed every cache and must be hashed by a worker."""
+
+    path: Path
+    size: int
+    mtime_ns: int
+    ctime_ns: int
+    inode: int
+    is_archive: bool = False
+    device: int = 0
+    links: list[_ScanJob] = field(default_factory=list)
+    """Hardlinks to this file found while it was in flight (same scan)."""
+    fingerprint: str = ""
+    """Stored fingerprint to try before hashing (trust_fingerprint sources)."""
+    known_contents: dict[str, list[tuple[str, int, FileHashes]]] = field(
+        default_factory=dict,
+    )
+    """Entries of known same-size archives, by container BLAKE3 (archives)."""
+
+
+@dataclass
+class _HashResult:
+    """Outcome of hashing one file — produced off the DB thread.
+
+    Workers never touch the DB: everything the writer needs to record
+    the file (hashes, post-hash stat, archive entries, warnings) travels
+    back in this object.
+    """
+
+    hashes: FileHashes | None = None
+    post_st: os.stat_result | None = None
+    entries: list[tuple[str, int, object]] | None = None
+    """Archive entries as (name, size, hashes) — from extraction or sidecar."""
+    listing: list[ListedEntry] | None = None
+    """Prefilter: listing of an archive no DAT wants (stored provisional)."""
+    fingerprint: str = ""
+    """Content fingerprint of a fully hashed file."""
+    fingerprint_hit: bool = False
+    """Fingerprint matched the stored one — DB hashes are kept as-is."""
+    from_sidecar: bool = False
+    extracted: bool = False
+    cloned: bool = False
+    """Entries taken from a byte-identical known archive (job.known_contents)."""
+    warning: str = ""
+
+
+class _InlineExecutor:
+    """Executor stand-in for --workers 1: runs each job immediately.
+
+    Keeps the single-worker scan strictly sequential (hash, record, next
+    file) — identical ordering to the pre-pool implementation.
+    """
+
+    def submit(self, fn, *args) -> Future:
+        fut: Future = Future()
+        try:
+            fut.set_result(fn(*args))
+        except BaseException as e:
+            fut.set_exception(e)
+        return fut
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        pass
+
+
+def _run_pipelined(
+    db: CacheDB,
+    items: Iterable,
+    prepare: Callable[[object], _ScanJob | None],
+    work: Callable[[_ScanJob], _HashResult],
+    record: Callable[[_ScanJob, _HashResult], None],
+    workers: int,
+    checkpoint: Callable[[object, list[_ScanJob]], None] | None = None,
+) -> None:
+    """Drive prepare → work → record over items with a bounded worker pool.
+
+    prepare and record run on the calling thread, which is the only DB
+    writer. prepare handles cache hits and sidecar fast paths itself and
+    returns a job only when the file must be hashed. work runs on up to
+    ``workers`` threads (hashlib/BLAKE3 release the GIL, extraction runs in
+    subprocesses). Results are recorded in walk order, and a transaction is
+    committed every _COMMIT_CHUNK finished files — or right after an
+    archive, whose extraction is the costliest work to lose.
+
+    checkpoint, if given, is called inside each transaction with the last
+    item whose results are all in it (every earlier item is done too) and
+    the jobs still in flight, so a resume point commits atomically with
+    the work it covers.
+    """
+    executor = (
+        ThreadPoolExecutor(max_workers=workers, thread_name_prefix="scan")
+        if workers > 1 else _InlineExecutor()
+    )
+    # In-flight limit: enough queued work to keep every worker busy while
+    # the writer records, without materialising the whole walk.
+    window = workers * 2 if workers > 1 else 1
+    it = iter(items)
+    # Each pending job carries the item pulled just before it: once the
+    # job at the front is unfinished, that item is the committed frontier.
+    pending: deque[tuple[object, _ScanJob, Future]] = deque()
+    last_item: object = None
+    exhausted = False
+
+    try:
+        while not exhausted or pending:
+            with db.batch():
+                finished = 0
+                while finished < _COMMIT_CHUNK:
+                    while (not exhausted and len(pending) < window
+                           and finished < _COMMIT_CHUNK):
+                        try:
+                            item = next(it)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                        job = prepare(item)
+                        if job is None:
+                            finished += 1
+                            last_item = item
+                            continue
+                        pending.append(
+                            (last_item, job, executor.submit(work, job)),
+                        )
+                        last_item = item
+
+                    if not pending:
+                        break
+                    _, job, fut = pending.popleft()
+                    record(job, fut.result())
+                    finished += 1
+                    if job.is_archive:
+                        break
+
+                if checkpoint is not None:
+                    through = pending[0][0] if pending else last_item
+                    if through is not None:
+                        checkpoint(through, [job for _, job, _ in pending])
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
 def scan_all(
     sources: list[SourceDir],
     db: CacheDB,
@@ -115,9 +297,23 @@ def scan_all(
     *,
     force_rescan: bool = False,
     path_filter: Path | None = None,
+    workers: int = 1,
+    deep: bool = False,
+    prefilter: bool = False,
+    restart: bool = False,
+    io: IOScheduler | None = None,
+    shadow: ShadowStore | None = None,
 ) -> dict[str, SourceScanStats]:
     """Scan all sources according to their type.
 
+    Resumable: every commit also records a cursor (last committed walk
+    path, archives in flight) per walked root in scan_cursors. After an
+    interrupt, the next scan_all skips sources the interrupted run
+    finished and resumes the others after their cursor — finished
+    subtrees are not even listed. The cursors of the scanned roots are
+    cleared once a scan completes; changes in the skipped part are picked up by the next
+    scan after that.
+
     Args:
         sources: List of SourceDir with source_type.
         db: Cache database.
@@ -125,11 +321,31 @@ def scan_all(
         force_rescan: If True, rebuild RSCF sidecars for romroot.
         path_filter: If set, restrict scanning to this subfolder.
             Must be within at least one configured source.
+        workers: Number of files hashed/extracted in parallel.
+            1 = sequential (default).
+        deep: If True, list every romroot directory even when its
+            mtime/ctime/inode match the directory table. Implied by
+            force_rescan.
+        prefilter: If True, zip/7z/rar archives in untrusted sources are
+            first listed; only those with an entry whose (size, CRC32) is
+            in dat_entries are extracted and hashed. The rest get
+            provisional archive_contents rows. Load DATs before scanning.
+        restart: Discard all cursors and scan everything from the top.
+        io: Per-device read limits for hashing and extraction. None
+            builds them from the sources' max_reads / read_mb_per_s.
+        shadow: Shadow sidecar store for read-only sources (paths.shadow_store).
 
     Returns:
         Dict of source_path (str) -> SourceScanStats.
     """
+    assert workers >= 1, f"workers must be >= 1, got {workers}"
+    if io is None:
+        io = IOScheduler.from_sources(sources)
     results: dict[str, SourceScanStats] = {}
+    wanted = db.dat_size_crc_pairs() if prefilter else None
+    if restart:
+        db.clear_scan_cursors()
+    walked: list[str] = []
 
     for source in sources:
         # When path_filter is set, skip sources that don't contain the path
@@ -145,208 +361,487 @@ def scan_all(
         label = f"{walk_root} (subset of {source.path})" if walk_root else str(source.path)
         print(f"Scanning: {label} ({source.source_type})", file=sys.stderr)
 
+        key = str(walk_root if walk_root is not None else source.path)
+        walked.append(key)
+        cursor = db.get_scan_cursor(key)
+        if cursor is not None and bool(cursor["force_rescan"]) != force_rescan:
+            cursor = None  # interrupted run had other semantics — start over
+        if cursor is not None and cursor["complete"]:
+            print(
+                "  Skipping: finished by the interrupted scan "
+                "(--restart to rescan)",
+                file=sys.stderr,
+            )
+            continue
+        resume_after = None
+        if cursor is not None and cursor["position"]:
+            resume_after = Path(cursor["position"])
+            print(
+                f"  Resuming after {resume_after} (--restart to rescan)",
+                file=sys.stderr,
+            )
+            for archive in filter(None, cursor["in_flight"].split("\n")):
+                _clear_stale_extraction(work_dir, Path(archive))
+
+        def checkpoint(path: Path, in_flight: list[Path], key: str = key) -> None:
+            db.set_scan_cursor(
+                key, str(path), in_flight=[str(p) for p in in_flight],
+                force_rescan=force_rescan,
+            )
+
         if source.source_type == "romroot":
             stats = _scan_romroot(
                 source.path, db, force_rescan=force_rescan, walk_root=walk_root,
+                workers=workers, stat_workers=source.stat_workers, deep=deep,
+                resume_after=resume_after, checkpoint=checkpoint, io=io,
             )
         else:
             stats = _scan_untrusted(
                 source.path, source.source_type, db, work_dir,
-                walk_root=walk_root,
+                walk_root=walk_root, workers=workers,
+                stat_workers=source.stat_workers, wanted=wanted,
+                trust_fingerprint=source.trust_fingerprint,
+                hash_types=source.hash_types, read_order=source.read_order,
+                resume_after=resume_after, checkpoint=checkpoint, io=io,
+                shadow=shadow,
             )
+        db.set_scan_cursor(key, "", force_rescan=force_rescan, complete=True)
 
         results[str(source.path)] = stats
+        extra = ""
+        if stats.archives_listed:
+            extra += f", {stats.archives_listed} archives listed only"
+        if stats.dirs_pruned:
+            extra += f", {stats.dirs_pruned} unchanged dirs"
+        if stats.files_relinked:
+            extra += f", {stats.files_relinked} renamed/linked"
+        if stats.files_fingerprinted:
+            extra += f", {stats.files_fingerprinted} by fingerprint"
+        if stats.archives_cloned:
+            extra += f", {stats.archives_cloned} archives identical to known ones"
+        if stats.files_from_manifest:
+            extra += f", {stats.files_from_manifest} sidecars via manifest"
         print(
             f"  Done: {stats.files_hashed} hashed, "
             f"{stats.files_from_sidecar} from sidecar, "
             f"{stats.files_skipped} skipped, "
             f"{stats.archives_extracted} archives "
-            f"({stats.archive_entries_hashed} entries)",
+            f"({stats.archive_entries_hashed} entries){extra}",
             file=sys.stderr,
         )
         if stats.warnings:
             print(f"  {len(stats.warnings)} warning(s)", file=sys.stderr)
 
+    # Every walked root is done — a full scan also retires cursors left by
+    # interrupted --path scans within its sources. Cursors of sources not
+    # given here (the watcher rescans only its own) are kept.
+    db.clear_scan_cursors(walked, subtrees=path_filter is None)
+    # Digest combinations replaced or deleted during the scan
+    db.prune_contents()
     return results
 
 
+def scan_files(
+    source: SourceDir,
+    paths: Iterable[Path],
+    db: CacheDB,
+    work_dir: Path,
+    *,
+    workers: int = 1,
+    prefilter: bool = False,
+    io: IOScheduler | None = None,
+    shadow: ShadowStore | None = None,
+) -> SourceScanStats:
+    """Scan just the given files of an ingest, disposal or readonly source.
+
+    Same per-file handling as scan_all (stat-cache, rename detection,
+    sidecars, mid-download detection), without walking the source — the
+    watcher uses it for files inotify reported. Paths that are missing,
+    not regular files or not scannable are ignored. io, shadow: as
+    for scan_all.
+    """
+    assert source.source_type != "romroot", "romroot is scanned via sidecars"
+    entries: list[WalkEntry] = []
+    for path in sorted(set(paths)):
+        if not is_scannable(path):
+            continue
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        if stat.S_ISREG(st.st_mode):
+            entries.append(WalkEntry(
+                path, st.st_size, st.st_mtime_ns, st.st_ctime_ns,
+                st.st_ino, st.st_dev,
+            ))
+
+    wanted = db.dat_size_crc_pairs() if prefilter else None
+    return _scan_untrusted(
+        source.path, source.source_type, db, work_dir,
+        workers=workers, wanted=wanted,
+        trust_fingerprint=source.trust_fingerprint,
+        hash_types=source.hash_types, entries=entries,
+        io=io if io is not None else IOScheduler.from_sources([source]),
+        shadow=shadow,
+    )
+
+
+def _walk_checkpoint(
+    checkpoint: Callable[[Path, list[Path]], None] | None,
+    order: PhysicalOrder | None = None,
+) -> Callable[[object, list[_ScanJob]], None] | None:
+    """Adapt a (walk path, archives in flight) cursor callback to
+    _run_pipelined, whose items are (position, WalkEntry) pairs.
+
+    With a physical order, items are not in walk order: the cursor only
+    moves when a whole window has been recorded.
+    """
+    if checkpoint is None:
+        return None
+
+    def on_commit(item: tuple[int, WalkEntry], jobs: list[_ScanJob]) -> None:
+        entry: WalkEntry | None = item[1]
+        if order is not None:
+            entry = order.committed_through(item[0])
+            if entry is None:
+                return
+        checkpoint(entry.path, [job.path for job in jobs if job.is_archive])
+
+    return on_commit
+
+
+def _clear_stale_extraction(work_dir: Path, archive: Path) -> None:
+    """Remove extraction dirs an interrupted scan left for archive.
+
+    A hard stop (power loss, SIGKILL) skips the cleanup in
+    _extract_and_hash_archive. Only dirs named exactly like its
+    mkdtemp() output for this archive are touched.
+    """
+    prefix = f"_scan_{archive.stem}_"
+    try:
+        candidates = list(work_dir.iterdir())
+    except OSError:
+        return
+    for path in candidates:
+        name = path.name
+        if (name.startswith(prefix) and len(name) == len(prefix) + 8
+                and path.is_dir()):
+            shutil.rmtree(path, ignore_errors=True)
+
+
 def _scan_romroot(
     source: Path, db: CacheDB, *, force_rescan: bool,
     walk_root: Path | None = None,
+    workers: int = 1,
+    stat_workers: int = 1,
+    deep: bool = False,
+    resume_after: Path | None = None,
+    checkpoint: Callable[[Path, list[Path]], None] | None = None,
+    io: IOScheduler = NO_LIMITS,
 ) -> SourceScanStats:
     """Scan romroot by loading RSCF sidecars.
 
+    Directory pruning: if a directory's (mtime_ns, ctime_ns, inode) matches
+    scanned_dirs and its files are still in scanned_files, it is not listed
+    and none of its files are stat'ed — only its known subdirectories are
+    visited. Romroot files are only ever replaced via rename, which changes
+    the directory mtime; in-place edits need deep (or verify).
     Stat-cache: if a file's (path, size, mtime_ns, ctime_ns, inode) matches
     the DB, skip it entirely — no sidecar read needed.
     Cold start: read sidecar → load hashes into DB without re-hashing.
-    force_rescan: re-hash every file, rewrite sidecars, delete orphans.
+    A directory's manifest (see manifest.py) stands in for the sidecars
+    below it whose container size + mtime still match.
+    force_rescan: re-hash every file, rewrite sidecars, delete orphans
+    and manifests.
 
     Args:
         walk_root: If set, restrict the walk to this subdirectory of source.
+        workers: Number of files hashed in parallel on the slow path.
+        stat_workers: Concurrent stat calls for the walk (network mounts).
+        deep: List every directory, ignoring scanned_dirs.
+        resume_after: Continue an interrupted scan after this path. The
+            directory table is then only updated for fully listed dirs.
+        checkpoint: Called with the committed walk position (scan_all's
+            cursor).
+        io: Per-device read limits for hashing.
     """
     stats = SourceScanStats(source_type="romroot")
     resolver = SidecarResolver(StorageMode.IN_TREE)
     now = datetime.now(timezone.utc).isoformat()
-
-    # Single-pass walk: collect (path, size, mtime_ns, ctime_ns, inode) tuples
-    # Exclude _orphaned/ subtree — it is scanned separately as an ingest source
-    file_stats: list[tuple[Path, int, int, int, int]] = []
-    sidecar_files: set[Path] = set()
+    started_ns = time.time_ns()
+
+    # Streaming walk of (path, size, mtime_ns, ctime_ns, inode, device) tuples.
+    # Exclude _orphaned/ subtree — it is scanned separately as an ingest source.
+    # Sidecars are never stat'ed: their presence comes from the directory
+    # listing, which the walker reports before yielding that directory's files.
+    dir_sidecars: dict[Path, set[str]] = {}
+    orphan_sidecars: list[Path] = []
     orphaned_dir = source / ORPHANED_DIR_NAME
     effective_root = walk_root if walk_root is not None else source
+    # Sidecars from manifests of listed directories, until their file
+    # comes up — one read per system directory instead of one per game
+    manifest_sidecars: dict[Path, Sidecar] = {}
 
-    for p in sorted(effective_root.glob("**/*")):
-        if not p.is_file():
-            continue
-        if p == orphaned_dir or p.is_relative_to(orphaned_dir):
-            continue
-        if p.name == LOCK_FILENAME:
-            continue
-        if p.suffix == ".rscf":
-            sidecar_files.add(p)
-        else:
-            st = p.stat()
-            file_stats.append((p, st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino))
-
-    total = len(file_stats)
-    for chunk_start in range(0, total, _COMMIT_CHUNK):
-        chunk_end = min(chunk_start + _COMMIT_CHUNK, total)
-        with db.batch():
-            for pos in range(chunk_start, chunk_end):
-                filepath, size, mtime_ns, ctime_ns, inode = file_stats[pos]
-                file_num = pos + 1
-                stats.files_total += 1
-                path_str = str(filepath)
-
-                # Stat-cache: skip if DB already has this file unchanged
-                if not force_rescan and db.is_unchanged(path_str, size, mtime_ns, ctime_ns, inode):
-                    stats.files_skipped += 1
-                    continue
-
-                sidecar_path = resolver.sidecar_path(filepath)
-
-                if not force_rescan and sidecar_path in sidecar_files:
-                    # Fast path: load from sidecar
-                    try:
-                        sidecar = read_sidecar(sidecar_path)
-
-                        # Store container in scanned_files
-                        db.upsert_scanned(
-                            path=path_str,
-                            size=size,
-                            mtime_ns=mtime_ns,
-                            ctime_ns=ctime_ns,
-                            inode=inode,
-                            source_type="romroot",
-                            crc32="",
-                            md5="",
-                            sha1="",
-                            sha256="",
-                            blake3=sidecar.container_blake3,
-                            is_archive=False,
-                            scanned_at=now,
-                        )
-
-                        # Store file entries in archive_contents
-                        # and populate romroot_files for match phase
-                        rel = filepath.relative_to(source)
-                        # Parent directory name — works for both flat and
-                        # provider-based hierarchy (archive-mode games)
-                        system = rel.parts[-2] if len(rel.parts) > 1 else ""
-
-                        for entry in sidecar.files:
-                            db.upsert_archive_content(
-                                archive_path=path_str,
-                                entry_name=entry.path,
-                                entry_size=entry.size,
-                                crc32=entry.crc32,
-                                md5=entry.md5,
-                                sha1=entry.sha1,
-                                sha256=entry.sha256,
-                                blake3=entry.blake3,
-                            )
-
-                            game_name = strip_archive_extension(filepath.name)
-                            db.upsert_romroot(
-                                path=path_str,
-                                system=system,
-                                game_name=game_name,
-                                rom_name=entry.path,
-                                crc32=entry.crc32,
-                                md5=entry.md5,
-                                sha1=entry.sha1,
-                                sha256=entry.sha256,
-                                blake3=entry.blake3,
-                                rscf_path=str(sidecar_path),
-                            )
-
-                        stats.files_from_sidecar += 1
-                        sidecar_files.discard(sidecar_path)
-                        continue
-
-                    except RscfError as e:
-                        stats.warn(
-                            f"corrupt sidecar {sidecar_path.name}: {e}"
-                        )
-                        # Fall through to hash
+    def on_dir(directory: Path, names: list[str]) -> None:
+        if MANIFEST_FILENAME in names:
+            if force_rescan:
+                (directory / MANIFEST_FILENAME).unlink(missing_ok=True)
+            else:
+                manifest_sidecars.update(read_manifest(directory))
+        rscf = {n for n in names if n.endswith(".rscf")}
+        if not rscf:
+            return
+        dir_sidecars[directory] = rscf
+        # Orphaned sidecars: .rscf files with no corresponding source file
+        present = set(names)
+        for n in sorted(rscf):
+            if resolver.source_path(directory / n).name not in present:
+                orphan_sidecars.append(directory / n)
+
+    # Directory table snapshot — prune() runs on the walker thread, so it
+    # must not touch the DB connection.
+    root_str = str(effective_root)
+    known_dirs = db.get_scanned_dirs(root_str)
+    file_counts = db.count_scanned_by_dir(root_str)
+    known_children: dict[str, list[str]] = {}
+    for row in known_dirs.values():
+        known_children.setdefault(row["parent"], []).append(
+            Path(row["path"]).name,
+        )
+    listed_dirs: dict[str, os.stat_result] = {}
+    pruned_dirs: list[str] = []
+    dir_files: Counter[Path] = Counter()
+
+    def prune(directory: Path) -> list[str] | None:
+        try:
+            st = directory.stat()
+        except OSError:
+            return None
+        key = str(directory)
+        row = known_dirs.get(key)
+        if (
+            not deep and not force_rescan and row is not None
+            and row["mtime_ns"] == st.st_mtime_ns
+            and row["ctime_ns"] == st.st_ctime_ns
+            and row["inode"] == st.st_ino
+            and file_counts.get(key, 0) >= row["entry_count"]
+        ):
+            pruned_dirs.append(key)
+            return known_children.get(key, [])
+        listed_dirs[key] = st
+        return None
+
+    walk = walk_files(
+        effective_root, include=is_game_file, exclude_dirs=(orphaned_dir,),
+        on_dir=on_dir, prune=prune, stat_workers=stat_workers,
+        start_after=resume_after,
+    )
 
-                # Slow path: hash the file
-                print(
-                    f"  [{file_num}/{total}] Hashing: {filepath.name} ({size:,} bytes)",
-                    file=sys.stderr,
-                )
-                hashes = hash_file(filepath)
-
-                db.upsert_scanned(
-                    path=path_str,
-                    size=size,
-                    mtime_ns=mtime_ns,
-                    ctime_ns=ctime_ns,
-                    inode=inode,
-                    source_type="romroot",
-                    crc32=hashes.crc32,
-                    md5=hashes.md5,
-                    sha1=hashes.sha1,
-                    sha256=hashes.sha256,
-                    blake3=hashes.blake3,
-                    is_archive=False,
-                    scanned_at=now,
-                )
-                stats.files_hashed += 1
-
-                if force_rescan:
-                    # Rebuild sidecar (use already-collected stat)
-                    new_sidecar = Sidecar(
-                        container_blake3=hashes.blake3,
-                        container_size=size,
-                        container_mtime_ns=mtime_ns,
-                        container_ctime_ns=ctime_ns,
-                        container_inode=inode,
-                        renderer="",
-                        files=[
-                            FileEntry.from_hashes(
-                                path=filepath.name,
-                                size=size,
-                                hashes=hashes,
-                            ),
-                        ],
+    def prepare(item: tuple[int, WalkEntry]) -> _ScanJob | None:
+        pos, (filepath, size, mtime_ns, ctime_ns, inode, device) = item
+        file_num = pos + 1
+        stats.files_total += 1
+        dir_files[filepath.parent] += 1
+        path_str = str(filepath)
+        known = manifest_sidecars.pop(filepath, None)
+
+        # Stat-cache: skip if DB already has this file unchanged
+        if not force_rescan and db.is_unchanged(path_str, size, mtime_ns, ctime_ns, inode):
+            stats.files_skipped += 1
+            return None
+
+        sidecar_path = resolver.sidecar_path(filepath)
+        has_sidecar = sidecar_path.name in dir_sidecars.get(sidecar_path.parent, ())
+
+        if not force_rescan and has_sidecar:
+            # Fast path: load from the manifest, else the sidecar itself
+            sidecar: Sidecar | None = None
+            if known is not None and entry_matches(known, size, mtime_ns):
+                sidecar = known
+                stats.files_from_manifest += 1
+            else:
+                try:
+                    sidecar = read_sidecar(sidecar_path)
+                except RscfError as e:
+                    stats.warn(
+                        f"corrupt sidecar {sidecar_path.name}: {e}"
                     )
-                    write_sidecar(new_sidecar, sidecar_path)
-                    sidecar_files.discard(sidecar_path)
+                    # Fall through to hash
+            if sidecar is not None:
+                _load_romroot_sidecar(
+                    source, filepath, sidecar, sidecar_path, db, now,
+                    size, mtime_ns, ctime_ns, inode, device,
+                )
+                stats.files_from_sidecar += 1
+                return None
 
-    # Orphaned sidecars: .rscf files with no corresponding source file
-    for orphan in sidecar_files:
-        expected_source = resolver.source_path(orphan)
-        if not expected_source.exists():
-            if force_rescan:
-                orphan.unlink()
-                stats.warn(f"deleted orphan sidecar: {orphan.name}")
-            else:
-                stats.warn(f"orphan sidecar (no source): {orphan.name}")
+        # Slow path: hash the file
+        print(
+            f"  [{file_num}] Hashing: {filepath.name} ({size:,} bytes)",
+            file=sys.stderr,
+        )
+        return _ScanJob(filepath, size, mtime_ns, ctime_ns, inode, device=device)
+
+    def record(job: _ScanJob, result: _HashResult) -> None:
+        hashes = result.hashes
+        assert hashes is not None
+        db.upsert_scanned(
+            path=str(job.path),
+            size=job.size,
+            mtime_ns=job.mtime_ns,
+            ctime_ns=job.ctime_ns,
+            inode=job.inode,
+            device=job.device,
+            source_type="romroot",
+            crc32=hashes.crc32,
+            md5=hashes.md5,
+            sha1=hashes.sha1,
+            sha256=hashes.sha256,
+            blake3=hashes.blake3,
+            is_archive=False,
+            scanned_at=now,
+        )
+        stats.files_hashed += 1
+
+        if force_rescan:
+            # Rebuild sidecar (use already-collected stat)
+            new_sidecar = Sidecar(
+                container_blake3=hashes.blake3,
+                container_size=job.size,
+                container_mtime_ns=job.mtime_ns,
+                container_ctime_ns=job.ctime_ns,
+                container_inode=job.inode,
+                renderer="",
+                files=[
+                    FileEntry.from_hashes(
+                        path=job.path.name,
+                        size=job.size,
+                        hashes=hashes,
+                    ),
+                ],
+            )
+            write_sidecar(new_sidecar, resolver.sidecar_path(job.path))
+
+    _run_pipelined(
+        db, enumerate(walk), prepare, lambda job: _hash_plain(job, io), record,
+        workers,
+        checkpoint=_walk_checkpoint(checkpoint),
+    )
+
+    # Every file is now in the DB — record the directories. Only a
+    # completed walk gets here, so an interrupted scan never prunes.
+    # A resumed walk skipped the start of the resume point's ancestors
+    # and never saw the dirs before it: leave those rows alone.
+    if resume_after is not None:
+        partial = {str(p) for p in resume_after.parents}
+        listed_dirs = {
+            k: st for k, st in listed_dirs.items() if k not in partial
+        }
+    with db.batch():
+        for key in pruned_dirs:
+            count = known_dirs[key]["entry_count"]
+            stats.files_total += count
+            stats.files_skipped += count
+        stats.dirs_pruned = len(pruned_dirs)
+
+        for key, st in listed_dirs.items():
+            directory = Path(key)
+            # Racy (changed during this scan): keep the row so the parent
+            # still knows this child, but with an mtime that never matches.
+            racy = st.st_ctime_ns >= started_ns - _RACY_DIR_NS
+            db.upsert_scanned_dir(
+                path=key,
+                parent=str(directory.parent),
+                mtime_ns=-1 if racy else st.st_mtime_ns,
+                ctime_ns=st.st_ctime_ns,
+                inode=st.st_ino,
+                entry_count=dir_files[directory],
+            )
+
+        if resume_after is None:
+            visited = listed_dirs.keys() | set(pruned_dirs)
+            for key in known_dirs.keys() - visited:
+                db.delete_scanned_dir(key)
+
+    for orphan in orphan_sidecars:
+        if force_rescan:
+            orphan.unlink()
+            stats.warn(f"deleted orphan sidecar: {orphan.name}")
+        else:
+            stats.warn(f"orphan sidecar (no source): {orphan.name}")
 
     return stats
 
 
+def _load_romroot_sidecar(
+    source: Path,
+    filepath: Path,
+    sidecar: Sidecar,
+    sidecar_path: Path,
+    db: CacheDB,
+    now: str,
+    size: int,
+    mtime_ns: int,
+    ctime_ns: int,
+    inode: int,
+    device: int = 0,
+) -> None:
+    """Record a romroot container and its sidecar entries in the DB.
+
+    Populates scanned_files (container), archive_contents and romroot_files
+    (enables match to find "in_romroot").
+    """
+    path_str = str(filepath)
+
+    # Store container in scanned_files
+    db.upsert_scanned(
+        path=path_str,
+        size=size,
+        mtime_ns=mtime_ns,
+        ctime_ns=ctime_ns,
+        inode=inode,
+        device=device,
+        source_type="romroot",
+        crc32="",
+        md5="",
+        sha1="",
+        sha256="",
+        blake3=sidecar.container_blake3,
+        is_archive=False,
+        scanned_at=now,
+    )
+
+    # Store file entries in archive_contents
+    # and populate romroot_files for match phase
+    system, game_name = romroot_game(source, filepath)
+
+    _store_sidecar_entries(db, path_str, sidecar.files)
+    db.upsert_many_romroot(
+        {
+            "path": path_str, "system": system, "game_name": game_name,
+            "rom_name": entry.path,
+            **{ht: getattr(entry, ht) for ht in HASH_TYPES},
+            "rscf_path": str(sidecar_path),
+        }
+        for entry in sidecar.files
+    )
+
+
+def romroot_game(source: Path, filepath: Path) -> tuple[str, str]:
+    """(system, game_name) of a romroot container below source."""
+    rel = filepath.relative_to(source)
+    # Parent directory name — works for both flat and
+    # provider-based hierarchy (archive-mode games)
+    system = rel.parts[-2] if len(rel.parts) > 1 else ""
+    return system, strip_archive_extension(filepath.name)
+
+
+def _hash_plain(job: _ScanJob, io: IOScheduler) -> _HashResult:
+    """Worker: hash a romroot file (no mid-download check — romroot is ours)."""
+    with io.read(job.path, job.device) as throttle:
+        return _HashResult(hashes=hash_path(job.path, throttle=throttle))
+
+
 def _writes_sidecars(source_type: str) -> bool:
     """Whether this source type writes RSCF sidecars alongside source files."""
     return source_type in ("ingest", "disposal")
@@ -354,8 +849,12 @@ def _writes_sidecars(source_type: str) -> bool:
 
 def _write_plain_sidecar(
     filepath: Path, hashes, size: int, mtime_ns: int, ctime_ns: int, inode: int,
+    shadow: ShadowStore | None = None,
 ) -> None:
-    """Write an RSCF sidecar for a plain (non-archive) source file."""
+    """Write an RSCF sidecar for a plain (non-archive) source file.
+
+    In-tree next to the file, or into shadow if given (read-only sources).
+    """
     resolver = SidecarResolver(StorageMode.IN_TREE)
     sc = Sidecar(
         container_blake3=hashes.blake3,
@@ -372,18 +871,23 @@ def _write_plain_sidecar(
             ),
         ],
     )
-    write_sidecar(sc, resolver.sidecar_path(filepath))
+    if shadow is not None:
+        shadow.write(filepath, sc)
+    else:
+        write_sidecar(sc, resolver.sidecar_path(filepath))
 
 
 def _write_archive_sidecar(
     archive: Path, container_hashes, container_size: int,
     mtime_ns: int, ctime_ns: int, inode: int,
     entries: list[tuple[str, int, object]],
+    shadow: ShadowStore | None = None,
 ) -> None:
     """Write an RSCF sidecar for a source archive after extraction.
 
     Args:
         entries: List of (name, size, FileHashes) from extraction.
+        shadow: Write into this shadow store instead of next to archive.
     """
     resolver = SidecarResolver(StorageMode.IN_TREE)
     sc = Sidecar(
@@ -398,7 +902,49 @@ def _write_archive_sidecar(
             for name, size, entry_hashes in entries
         ],
     )
-    write_sidecar(sc, resolver.sidecar_path(archive))
+    if shadow is not None:
+        shadow.write(archive, sc)
+    else:
+        write_sidecar(sc, resolver.sidecar_path(archive))
+
+
+def _current_sidecar(
+    filepath: Path, st: os.stat_result, shadow: ShadowStore | None,
+) -> Sidecar | None:
+    """filepath's sidecar if it matches the file's size + mtime (not inode).
+
+    The in-tree sidecar wins; the shadow store is the fallback for
+    read-only sources.
+    """
+    resolver = SidecarResolver(StorageMode.IN_TREE)
+    sidecar_path = resolver.sidecar_path(filepath)
+    candidates: list[Sidecar | None] = []
+    if sidecar_path.exists():
+        try:
+            candidates.append(read_sidecar(sidecar_path))
+        except RscfError:
+            pass
+    if shadow is not None:
+        candidates.append(shadow.read(filepath))
+    for sc in candidates:
+        if (sc is not None and sc.container_size == st.st_size
+                and sc.container_mtime_ns == st.st_mtime_ns):
+            return sc
+    return None
+
+
+def plain_sidecar_entry(sc: Sidecar, name: str, size: int) -> FileEntry:
+    """The file entry of a plain file's sidecar.
+
+    A plain file's sidecar has one entry: the file itself. Anything else
+    (or an entry that does not describe the container) yields an entry
+    with just the container BLAKE3.
+    """
+    entry = sc.files[0] if len(sc.files) == 1 else None
+    if (entry is None or entry.size != size
+            or entry.blake3 != sc.container_blake3):
+        entry = FileEntry(path=name, size=size, blake3=sc.container_blake3)
+    return entry
 
 
 def _load_plain_from_sidecar(
@@ -408,38 +954,34 @@ def _load_plain_from_sidecar(
     db: CacheDB,
     now: str,
     stats: SourceScanStats,
+    shadow: ShadowStore | None = None,
 ) -> bool:
     """Try to load a plain file's hashes from its RSCF sidecar.
 
+    Falls back to the shadow store, if given. All digests of the
+    sidecar's file entry are restored, so complete_hashes() has nothing
+    left to re-read.
+
     Returns True if sidecar was used, False if hashing is needed.
     """
-    resolver = SidecarResolver(StorageMode.IN_TREE)
-    sidecar_path = resolver.sidecar_path(filepath)
-    if not sidecar_path.exists():
-        return False
-
-    try:
-        sc = read_sidecar(sidecar_path)
-    except RscfError:
-        return False
-
-    # Verify sidecar matches current file stat
     st = filepath.stat()
-    if (sc.container_size != st.st_size
-            or sc.container_mtime_ns != st.st_mtime_ns):
+    sc = _current_sidecar(filepath, st, shadow)
+    if sc is None:
         return False
 
+    entry = plain_sidecar_entry(sc, filepath.name, st.st_size)
     db.upsert_scanned(
         path=path_str,
         size=st.st_size,
         mtime_ns=st.st_mtime_ns,
         ctime_ns=st.st_ctime_ns,
         inode=st.st_ino,
+        device=st.st_dev,
         source_type=source_type,
-        crc32="",
-        md5="",
-        sha1="",
-        sha256="",
+        crc32=entry.crc32,
+        md5=entry.md5,
+        sha1=entry.sha1,
+        sha256=entry.sha256,
         blake3=sc.container_blake3,
         is_archive=False,
         scanned_at=now,
@@ -455,29 +997,20 @@ def _load_archive_from_sidecar(
     db: CacheDB,
     now: str,
     stats: SourceScanStats,
+    shadow: ShadowStore | None = None,
 ) -> bool:
     """Try to load an archive's hashes from its RSCF sidecar.
 
     Recovers scanned_files + archive_contents from sidecar data
     without re-extracting the archive. Used when the stat-cache
-    misses (e.g. after CIFS inode change) but the sidecar is intact.
+    misses (e.g. after CIFS inode change or a fresh DB) but the
+    sidecar — in-tree or in the shadow store — is intact.
 
     Returns True if sidecar was used, False if extraction is needed.
     """
-    resolver = SidecarResolver(StorageMode.IN_TREE)
-    sidecar_path = resolver.sidecar_path(filepath)
-    if not sidecar_path.exists():
-        return False
-
-    try:
-        sc = read_sidecar(sidecar_path)
-    except RscfError:
-        return False
-
-    # Verify sidecar matches current file stat (size + mtime, not inode)
     st = filepath.stat()
-    if (sc.container_size != st.st_size
-            or sc.container_mtime_ns != st.st_mtime_ns):
+    sc = _current_sidecar(filepath, st, shadow)
+    if sc is None:
         return False
 
     # Restore scanned_files entry with current inode
@@ -487,6 +1020,7 @@ def _load_archive_from_sidecar(
         mtime_ns=st.st_mtime_ns,
         ctime_ns=st.st_ctime_ns,
         inode=st.st_ino,
+        device=st.st_dev,
         source_type=source_type,
         crc32="",
         md5="",
@@ -498,17 +1032,7 @@ def _load_archive_from_sidecar(
     )
 
     # Restore archive_contents from sidecar file entries
-    for entry in sc.files:
-        db.upsert_archive_content(
-            archive_path=path_str,
-            entry_name=entry.path,
-            entry_size=entry.size,
-            crc32=entry.crc32,
-            md5=entry.md5,
-            sha1=entry.sha1,
-            sha256=entry.sha256,
-            blake3=entry.blake3,
-        )
+    _store_sidecar_entries(db, path_str, sc.files)
 
     stats.files_from_sidecar += 1
     stats.archive_entries_hashed += len(sc.files)
@@ -522,6 +1046,17 @@ def _scan_untrusted(
     work_dir: Path,
     *,
     walk_root: Path | None = None,
+    workers: int = 1,
+    stat_workers: int = 1,
+    wanted: set[tuple[int, str]] | None = None,
+    trust_fingerprint: bool = False,
+    hash_types: Collection[str] = HASH_TYPES,
+    read_order: str = "path",
+    resume_after: Path | None = None,
+    checkpoint: Callable[[Path, list[Path]], None] | None = None,
+    entries: Iterable[WalkEntry] | None = None,
+    io: IOScheduler = NO_LIMITS,
+    shadow: ShadowStore | None = None,
 ) -> SourceScanStats:
     """Scan an ingest, disposal, or readonly source — hash everything.
 
@@ -529,223 +1064,725 @@ def _scan_untrusted(
     during hashing, warn and skip (expected for actively downloading files).
 
     Archive cache: if an archive's path+size+mtime_ns+ctime_ns+inode match the
-    DB and archive_contents already exist, skip re-extraction.
+    DB and archive_contents already exist, skip re-extraction. Provisional
+    (listing-only) contents count only while no DAT wants any of them.
+
+    Rename/move detection: a path the DB does not know, whose (device,
+    inode, size, mtime_ns) matches a scanned row elsewhere, takes over that
+    row's hashes and archive_contents — re-pointed if the old path is gone
+    (rename/move), copied if it still exists (hardlink). Hardlinks met
+    twice within one scan are hashed once.
+
+    Content fingerprint: with trust_fingerprint, every hashed file also
+    gets a sampled fingerprint (size + BLAKE3 of head, tail and a few
+    blocks), and a file whose stat no longer matches its own row
+    (restore, rsync, NAS snapshot copy — new inode/ctime) keeps the
+    stored hashes when its size and fingerprint still match; only the
+    stat columns are refreshed. Other sources skip the extra reads.
 
     Ingest/disposal sources write RSCF sidecars alongside files for faster
-    re-scans.  Read-only sources never write sidecars.
+    re-scans.  Read-only sources never write sidecars next to their files;
+    with a shadow store they are kept there instead.
 
     Args:
         walk_root: If set, restrict the walk to this subdirectory of source.
+        workers: Number of files hashed/extracted in parallel. Cache checks,
+            sidecar reads/writes and DB writes stay on the calling thread.
+        stat_workers: Concurrent stat calls for the walk (network mounts).
+        wanted: Prefilter — (size, CRC32) pairs from dat_entries. None
+            disables the prefilter (every archive is extracted).
+        trust_fingerprint: Accept a fingerprint match in place of a
+            stat-cache hit.
+        hash_types: Digests computed for files and archive entries (must
+            include blake3); the rest are left for complete_hashes().
+        read_order: "path" hashes in walk order; "inode" / "extent"
+            re-sequence the walk in on-disk order (see layout.py) and
+            read each file once with read-ahead hints, dropping it from
+            the page cache afterwards. Ignored for explicit entries.
+        resume_after: Continue an interrupted scan after this path.
+        checkpoint: Called with the committed walk position and the
+            archives still in flight (scan_all's cursor).
+        entries: Pre-stat'ed files to scan instead of walking the source
+            (scan_files / watch mode).
+        io: Per-device read limits; each hash or extraction holds a read
+            slot on its file's device.
+        shadow: Shadow sidecar store (see shadow.py); used by read-only
+            sources only.
     """
     stats = SourceScanStats(source_type=source_type)
     limits = ExtractionLimits()
     now = datetime.now(timezone.utc).isoformat()
     writable = _writes_sidecars(source_type)
+    if writable:
+        shadow = None
 
-    # Single-pass walk: collect (path, size, mtime_ns, ctime_ns, inode) tuples
-    file_stats: list[tuple[Path, int, int, int, int]] = []
+    # Streaming walk of (path, size, mtime_ns, ctime_ns, inode, device)
+    # tuples — hashing starts on the first files while the walk continues
     effective_root = walk_root if walk_root is not None else source
-    for p in sorted(effective_root.glob("**/*")):
-        if p.is_file() and _is_scannable(p):
-            st = p.stat()
-            file_stats.append((p, st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino))
-
-    total = len(file_stats)
-    for chunk_start in range(0, total, _COMMIT_CHUNK):
-        chunk_end = min(chunk_start + _COMMIT_CHUNK, total)
-        with db.batch():
-            for pos in range(chunk_start, chunk_end):
-                filepath, size, mtime_ns, ctime_ns, inode = file_stats[pos]
-                file_num = pos + 1
-                stats.files_total += 1
-
-                path_str = str(filepath)
-                is_archive = _is_archive(filepath)
-
-                # Archive cache check
-                if is_archive:
-                    if (db.is_unchanged(path_str, size, mtime_ns, ctime_ns, inode)
-                            and db.has_archive_contents(path_str)):
-                        stats.files_skipped += 1
-                        continue
-
-                    # Sidecar fast path for archives
-                    if _load_archive_from_sidecar(filepath, path_str, source_type, db, now, stats):
-                        continue
-                else:
-                    # Plain file cache check
-                    if db.is_unchanged(path_str, size, mtime_ns, ctime_ns, inode):
-                        stats.files_skipped += 1
-                        continue
-
-                    # Sidecar fast path for plain files (cold start recovery)
-                    if _load_plain_from_sidecar(filepath, path_str, source_type, db, now, stats):
-                        continue
-
-                print(
-                    f"  [{file_num}/{total}] Hashing: {filepath.name} ({size:,} bytes)",
-                    file=sys.stderr,
-                )
-                hashes = hash_file(filepath)
+    walk = entries if entries is not None else walk_files(
+        effective_root, include=is_scannable, stat_workers=stat_workers,
+        start_after=resume_after,
+    )
+    order: PhysicalOrder | None = None
+    if entries is None and read_order != "path":
+        walk = order = PhysicalOrder(walk, read_order)
+
+    # Jobs being hashed, by identity — a hardlink to one of them joins it
+    in_flight: dict[tuple[int, int, int, int], _ScanJob] = {}
+
+    def prepare(item: tuple[int, WalkEntry]) -> _ScanJob | None:
+        pos, (filepath, size, mtime_ns, ctime_ns, inode, device) = item
+        file_num = pos + 1
+        stats.files_total += 1
+
+        path_str = str(filepath)
+        is_archive = is_archive_file(filepath)
+        identity = (device, inode, size, mtime_ns)
+
+        # Archive cache check
+        if is_archive:
+            if (db.is_unchanged(path_str, size, mtime_ns, ctime_ns, inode)
+                    and db.has_archive_contents(path_str)
+                    and not _provisional_now_wanted(db, path_str, wanted)):
+                stats.files_skipped += 1
+                return None
+        # Plain file cache check
+        elif db.is_unchanged(path_str, size, mtime_ns, ctime_ns, inode):
+            stats.files_skipped += 1
+            return None
+
+        job = _ScanJob(
+            filepath, size, mtime_ns, ctime_ns, inode, is_archive, device,
+        )
+        # Hardlink to a file still being hashed: record it alongside
+        linked = in_flight.get(identity)
+        if linked is not None and linked.is_archive == is_archive:
+            linked.links.append(job)
+            return None
+        if _reuse_by_identity(job, source_type, db, now, wanted, hash_types):
+            stats.files_relinked += 1
+            return None
+
+        # Sidecar fast path (cold start recovery)
+        if is_archive:
+            if _load_archive_from_sidecar(
+                    filepath, path_str, source_type, db, now, stats, shadow):
+                return None
+        elif _load_plain_from_sidecar(
+                filepath, path_str, source_type, db, now, stats, shadow):
+            return None
+
+        if trust_fingerprint:
+            job.fingerprint = _trusted_fingerprint(job, db, wanted, hash_types)
+        if is_archive:
+            job.known_contents = _known_archive_contents(db, job, hash_types)
+
+        if not job.fingerprint:
+            print(
+                f"  [{file_num}] Hashing: {filepath.name} ({size:,} bytes)",
+                file=sys.stderr,
+            )
+        if inode:
+            in_flight[identity] = job
+        return job
+
+    def work(job: _ScanJob) -> _HashResult:
+        with io.read(job.path, job.device) as throttle:
+            return _hash_untrusted(
+                job, work_dir, limits, wanted, hash_types, order is not None,
+                throttle, trust_fingerprint,
+            )
 
-                # Mid-download detection: stat after hashing, compare against
-                # walk-collected values
-                try:
-                    post_st = filepath.stat()
-                except OSError:
-                    stats.warn(f"file vanished during scan: {filepath.name}")
-                    continue
+    def record(job: _ScanJob, result: _HashResult) -> None:
+        in_flight.pop((job.device, job.inode, job.size, job.mtime_ns), None)
+        _record_untrusted(
+            job, result, source_type, db, now, stats, writable, shadow,
+        )
+        for link in job.links:
+            if result.hashes is None and not result.fingerprint_hit:
+                stats.warn(f"skipped hardlink {link.path.name}: {result.warning}")
+                continue
+            db.copy_scanned(
+                str(job.path), str(link.path), ctime_ns=link.ctime_ns,
+                source_type=source_type, scanned_at=now,
+            )
+            stats.files_relinked += 1
 
-                if post_st.st_size != size or post_st.st_mtime_ns != mtime_ns:
-                    stats.warn(
-                        f"file changed during scan (mid-download?): "
-                        f"{filepath.name}"
-                    )
-                    continue
-
-                # Use post-hash stat for ctime/inode (most current)
-                db.upsert_scanned(
-                    path=path_str,
-                    size=post_st.st_size,
-                    mtime_ns=post_st.st_mtime_ns,
-                    ctime_ns=post_st.st_ctime_ns,
-                    inode=post_st.st_ino,
-                    source_type=source_type,
-                    crc32=hashes.crc32,
-                    md5=hashes.md5,
-                    sha1=hashes.sha1,
-                    sha256=hashes.sha256,
-                    blake3=hashes.blake3,
-                    is_archive=is_archive,
-                    scanned_at=now,
-                )
-                stats.files_hashed += 1
-
-                if not is_archive:
-                    # Write sidecar for plain files (ingest/disposal only)
-                    if writable:
-                        _write_plain_sidecar(
-                            filepath, hashes,
-                            post_st.st_size, post_st.st_mtime_ns,
-                            post_st.st_ctime_ns, post_st.st_ino,
-                        )
-                    continue
-
-                # Load archive contents: try sidecar fast path, fall back to extraction
-                if _load_archive_contents_from_sidecar(filepath, path_str, db, stats):
-                    pass  # loaded from sidecar
-                else:
-                    _extract_and_hash_archive(
-                        filepath, path_str, db, work_dir, limits, stats,
-                        write_sidecar_=writable,
-                        container_hashes=hashes,
-                        container_size=post_st.st_size,
-                        container_mtime_ns=post_st.st_mtime_ns,
-                        container_ctime_ns=post_st.st_ctime_ns,
-                        container_inode=post_st.st_ino,
-                    )
+    _run_pipelined(
+        db, enumerate(walk), prepare, work, record, workers,
+        checkpoint=_walk_checkpoint(checkpoint, order),
+    )
 
     return stats
 
 
-def _load_archive_contents_from_sidecar(
-    archive: Path,
-    archive_path_str: str,
+def _has_hashes(row, hash_types: Collection[str]) -> bool:
+    """True if a scanned_files row holds every digest of hash_types."""
+    mask = hash_mask(hash_types)
+    return row["hashed"] & mask == mask
+
+
+def _trusted_fingerprint(
+    job: _ScanJob,
     db: CacheDB,
-    stats: SourceScanStats,
+    wanted: set[tuple[int, str]] | None,
+    hash_types: Collection[str],
+) -> str:
+    """Return the stored fingerprint a worker may check instead of hashing.
+
+    Only rows that would otherwise count as complete qualify: same size
+    and archive-ness, every digest of hash_types (plain) or
+    archive_contents that need no re-extraction (archive). Empty string
+    means hash normally.
+    """
+    row = db.get_scanned(str(job.path))
+    if (row is None or not row["fingerprint"] or row["size"] != job.size
+            or bool(row["is_archive"]) != job.is_archive):
+        return ""
+    if job.is_archive:
+        path_str = str(job.path)
+        if (not db.has_archive_contents(path_str)
+                or _provisional_now_wanted(db, path_str, wanted)):
+            return ""
+    elif not _has_hashes(row, hash_types):
+        return ""
+    return row["fingerprint"]
+
+
+def _reuse_by_identity(
+    job: _ScanJob,
+    source_type: str,
+    db: CacheDB,
+    now: str,
+    wanted: set[tuple[int, str]] | None,
+    hash_types: Collection[str],
+) -> bool:
+    """Take over the hashes of a known file with the same identity.
+
+    Looks up (device, inode, size, mtime_ns) in scanned_files. A usable
+    row — same archive-ness, every digest of hash_types (plain) or
+    archive_contents that need no re-extraction (archive) — is moved to job.path if its old
+    path no longer holds this inode, or copied if it does (hardlink).
+    Romroot rows are only ever copied: romroot_files still points at them.
+
+    Returns True if the file was recorded without hashing.
+    """
+    for row in db.find_by_identity(job.device, job.inode, job.size, job.mtime_ns):
+        old = row["path"]
+        if old == str(job.path) or bool(row["is_archive"]) != job.is_archive:
+            continue  # same path: only ctime changed — rehash as before
+        if job.is_archive:
+            if (not db.has_archive_contents(old)
+                    or _provisional_now_wanted(db, old, wanted)):
+                continue
+        elif not _has_hashes(row, hash_types):
+            continue  # partial hashes (BLAKE3-only sidecar) — hash it properly
+
+        try:
+            st = os.stat(old)
+            still_linked = (st.st_ino, st.st_dev) == (job.inode, job.device)
+        except OSError:
+            still_linked = False
+
+        db.copy_scanned(
+            old, str(job.path), ctime_ns=job.ctime_ns,
+            source_type=source_type, scanned_at=now,
+            move=not still_linked and row["source_type"] != "romroot",
+        )
+        return True
+    return False
+
+
+def _known_archive_contents(
+    db: CacheDB, job: _ScanJob, hash_types: Collection[str],
+) -> dict[str, list[tuple[str, int, FileHashes]]]:
+    """Entries of known archives the size of job, by container BLAKE3.
+
+    A re-downloaded .7z or an .aaru copied back out of romroot is
+    byte-identical to an archive already scanned: once the worker has the
+    container hash, these entries stand in for the extraction.
+    """
+    known: dict[str, list[tuple[str, int, FileHashes]]] = {}
+    candidates = db.find_archives_by_size(
+        job.size, str(job.path), hash_mask(hash_types),
+    )
+    for blake3, archive_path in candidates.items():
+        known[blake3] = [
+            (row["entry_name"], row["entry_size"], FileHashes(
+                crc32=row["crc32"] or "", md5=row["md5"] or "",
+                sha1=row["sha1"] or "", sha256=row["sha256"] or "",
+                blake3=row["blake3"] or "",
+            ))
+            for row in db.get_archive_contents(archive_path)
+        ]
+    return known
+
+
+def _provisional_now_wanted(
+    db: CacheDB, path_str: str, wanted: set[tuple[int, str]] | None,
 ) -> bool:
-    """Try to load archive contents from an RSCF sidecar.
+    """Check if a listing-only archive must now be fully hashed.
+
+    True when the archive has provisional rows and either the prefilter
+    is off or a DAT now wants one of its (size, CRC32) pairs.
+    """
+    provisional = db.get_provisional_contents(path_str)
+    if not provisional:
+        return False
+    if wanted is None:
+        return True
+    return any((row["entry_size"], row["crc32"]) in wanted for row in provisional)
+
+
+def _prefilter_listing(
+    archive: Path, wanted: set[tuple[int, str]],
+) -> list[ListedEntry] | None:
+    """List an archive and decide whether it can skip extraction.
+
+    Returns the listing when no entry's (size, CRC32) is wanted by a DAT.
+    Returns None — extract and hash as usual — when an entry is wanted,
+    the listing is unusable (failed, empty, entry without CRC), or it
+    contains a nested archive whose contents the listing cannot show.
+    """
+    try:
+        listing = list_archive(archive)
+    except Exception:
+        return None
+
+    if not listing:
+        return None
+    for entry in listing:
+        if not entry.crc32 or is_archive_file(Path(entry.name)):
+            return None
+        if (entry.size, entry.crc32) in wanted:
+            return None
+    return listing
+
+
+def _hash_untrusted(
+    job: _ScanJob, work_dir: Path, limits: ExtractionLimits,
+    wanted: set[tuple[int, str]] | None = None,
+    hash_types: Collection[str] = HASH_TYPES,
+    read_once: bool = False,
+    throttle: Callable[[int], None] | None = None,
+    fingerprint: bool = False,
+) -> _HashResult:
+    """Worker: hash one untrusted file and, for archives, its contents.
+
+    Mid-download detection: stat after hashing, compare against the
+    walk-collected values. A changed or vanished file yields a warning
+    and no hashes.
+
+    Prefilter (wanted is not None): a listable archive none of whose
+    entries any DAT wants comes back as a listing, not extracted.
+
+    Fingerprint (job.fingerprint set): if the file still has that
+    fingerprint, nothing else is read — the stored hashes stand.
+    fingerprint: also take the content fingerprint of a fully hashed
+    file (trust_fingerprint sources only; it costs extra reads).
+
+    read_once: stream the file with read-ahead hints and evict it from
+    the page cache once done with it (after extraction, for archives).
+
+    throttle: IOScheduler bandwidth pacing — fed every chunk hashed, and
+    the archive size once an archive has been extracted.
+    """
+    result = _hash_untrusted_file(
+        job, work_dir, limits, wanted, hash_types, read_once, throttle,
+        fingerprint,
+    )
+    if read_once:
+        evict(job.path)
+    return result
+
+
+def _hash_untrusted_file(
+    job: _ScanJob, work_dir: Path, limits: ExtractionLimits,
+    wanted: set[tuple[int, str]] | None,
+    hash_types: Collection[str],
+    read_once: bool,
+    throttle: Callable[[int], None] | None,
+    fingerprint: bool,
+) -> _HashResult:
+    if job.fingerprint:
+        try:
+            if content_fingerprint(job.path, job.size) == job.fingerprint:
+                post_st = job.path.stat()
+                if post_st.st_size == job.size:
+                    return _HashResult(fingerprint_hit=True, post_st=post_st)
+        except OSError:
+            pass  # vanished — the full hash below reports it
+        print(
+            f"  Hashing: {job.path.name} ({job.size:,} bytes, "
+            f"fingerprint changed)",
+            file=sys.stderr,
+        )
+
+    hashes = hash_path(
+        job.path, hash_types, sequential=read_once, throttle=throttle,
+    )
+
+    try:
+        post_st = job.path.stat()
+    except OSError:
+        return _HashResult(warning=f"file vanished during scan: {job.path.name}")
+
+    if post_st.st_size != job.size or post_st.st_mtime_ns != job.mtime_ns:
+        return _HashResult(
+            warning=f"file changed during scan (mid-download?): {job.path.name}",
+        )
+
+    result = _HashResult(hashes=hashes, post_st=post_st)
+    if fingerprint:
+        result.fingerprint = content_fingerprint(job.path, job.size, hashes.blake3)
+    if not job.is_archive:
+        return result
+
+    # Byte-identical to a known archive: reuse its entries
+    known = job.known_contents.get(hashes.blake3)
+    if known is not None:
+        result.entries = known
+        result.cloned = True
+        return result
+
+    # Load archive contents: try sidecar fast path, fall back to extraction
+    sidecar_entries = _read_archive_contents_sidecar(job.path)
+    if sidecar_entries is not None:
+        result.entries = [(e.path, e.size, e) for e in sidecar_entries]
+        result.from_sidecar = True
+        return result
+
+    if wanted is not None and is_listable(job.path):
+        result.listing = _prefilter_listing(job.path, wanted)
+        if result.listing is not None:
+            return result
+
+    try:
+        result.entries = _extract_and_hash_archive(
+            job.path, work_dir, limits, hash_types,
+        )
+        result.extracted = True
+    except Exception as e:
+        result.warning = f"extraction failed for {job.path.name}: {e}"
+    if throttle is not None:
+        throttle(job.size)
+    return result
+
+
+def _record_untrusted(
+    job: _ScanJob,
+    result: _HashResult,
+    source_type: str,
+    db: CacheDB,
+    now: str,
+    stats: SourceScanStats,
+    writable: bool,
+    shadow: ShadowStore | None = None,
+) -> None:
+    """Writer: record a worker's _HashResult in the DB (and sidecars).
+
+    Sidecars go next to the file if writable, else into shadow if given.
+    """
+    if result.fingerprint_hit:
+        st = result.post_st
+        assert st is not None
+        db.refresh_scanned_stat(
+            str(job.path), st.st_mtime_ns, st.st_ctime_ns, st.st_ino,
+            st.st_dev, now,
+        )
+        stats.files_fingerprinted += 1
+        return
+
+    if result.hashes is None:
+        stats.warn(result.warning)
+        return
 
-    If a sidecar exists alongside the archive and is valid, load the
-    per-ROM hashes into archive_contents (same as _scan_romroot does).
+    hashes = result.hashes
+    post_st = result.post_st
+    assert post_st is not None
+    path_str = str(job.path)
+
+    # Use post-hash stat for ctime/inode (most current)
+    db.upsert_scanned(
+        path=path_str,
+        size=post_st.st_size,
+        mtime_ns=post_st.st_mtime_ns,
+        ctime_ns=post_st.st_ctime_ns,
+        inode=post_st.st_ino,
+        device=post_st.st_dev,
+        source_type=source_type,
+        crc32=hashes.crc32,
+        md5=hashes.md5,
+        sha1=hashes.sha1,
+        sha256=hashes.sha256,
+        blake3=hashes.blake3,
+        fingerprint=result.fingerprint,
+        is_archive=job.is_archive,
+        scanned_at=now,
+    )
+    stats.files_hashed += 1
+
+    if not job.is_archive:
+        # Write sidecar for plain files (ingest/disposal, or shadow)
+        if writable or shadow is not None:
+            _write_plain_sidecar(
+                job.path, hashes,
+                post_st.st_size, post_st.st_mtime_ns,
+                post_st.st_ctime_ns, post_st.st_ino, shadow,
+            )
+        return
+
+    # Clear stale entries
+    db.delete_archive_contents(path_str)
+
+    if result.from_sidecar:
+        assert result.entries is not None
+        _store_archive_entries(db, path_str, result.entries)
+        stats.files_from_sidecar += 1
+        return
+
+    if result.listing is not None:
+        # Provisional: size + CRC32 from the listing, nothing hashed.
+        # Match ignores these rows; no sidecar is written.
+        db.upsert_many_archive_contents(
+            {
+                "archive_path": path_str, "entry_name": entry.name,
+                "entry_size": entry.size, "crc32": entry.crc32,
+                "provisional": True,
+            }
+            for entry in result.listing
+        )
+        stats.archives_listed += 1
+        return
+
+    if result.warning:
+        stats.warn(result.warning)
+        return
+
+    if result.extracted:
+        stats.archives_extracted += 1
+    elif result.cloned:
+        stats.archives_cloned += 1
+    entries = result.entries or []
+    _store_archive_entries(db, path_str, entries)
+    stats.archive_entries_hashed += len(entries)
+
+    # Write RSCF sidecar with all extracted entry hashes (ingest/disposal,
+    # or shadow)
+    if (writable or shadow is not None) and entries:
+        _write_archive_sidecar(
+            job.path, hashes, post_st.st_size,
+            post_st.st_mtime_ns, post_st.st_ctime_ns, post_st.st_ino,
+            entries, shadow,
+        )
+
+
+def _store_archive_entries(
+    db: CacheDB,
+    archive_path_str: str,
+    entries: list[tuple[str, int, object]],
+) -> None:
+    """Insert (name, size, hashes) archive entries into archive_contents."""
+    db.upsert_many_archive_contents(
+        {
+            "archive_path": archive_path_str, "entry_name": name,
+            "entry_size": size,
+            **{ht: getattr(entry_hashes, ht) for ht in HASH_TYPES},
+        }
+        for name, size, entry_hashes in entries
+    )
+
+
+def _store_sidecar_entries(
+    db: CacheDB, archive_path_str: str, entries: list[FileEntry],
+) -> None:
+    """Insert a sidecar's file entries into archive_contents."""
+    db.upsert_many_archive_contents(
+        {
+            "archive_path": archive_path_str, "entry_name": entry.path,
+            "entry_size": entry.size,
+            **{ht: getattr(entry, ht) for ht in HASH_TYPES},
+        }
+        for entry in entries
+    )
+
+
+def _read_archive_contents_sidecar(archive: Path) -> list[FileEntry] | None:
+    """Read archive contents from an RSCF sidecar, if one exists.
+
+    If a sidecar exists alongside the archive and is valid, its per-ROM
+    hashes can be loaded into archive_contents (same as _scan_romroot does).
     This avoids expensive extraction for archives in _orphaned/ or
     any ingest source where sidecars were previously written.
 
-    Returns True if sidecar was used, False if extraction is needed.
+    Returns the sidecar file entries, or None if extraction is needed.
     """
     sidecar_path = archive.parent / (archive.name + ".rscf")
     if not sidecar_path.exists():
-        return False
+        return None
 
     try:
         sc = read_sidecar(sidecar_path)
     except RscfError:
-        return False
+        return None
 
-    # Clear stale entries and load from sidecar
-    db.delete_archive_contents(archive_path_str)
-    for entry in sc.files:
-        db.upsert_archive_content(
-            archive_path=archive_path_str,
-            entry_name=entry.path,
-            entry_size=entry.size,
-            crc32=entry.crc32,
-            md5=entry.md5,
-            sha1=entry.sha1,
-            sha256=entry.sha256,
-            blake3=entry.blake3,
-        )
-    stats.files_from_sidecar += 1
-    return True
+    return list(sc.files)
 
 
 def _extract_and_hash_archive(
     archive: Path,
-    archive_path_str: str,
-    db: CacheDB,
     work_dir: Path,
     limits: ExtractionLimits,
-    stats: SourceScanStats,
-    *,
-    write_sidecar_: bool = False,
-    container_hashes=None,
-    container_size: int = 0,
-    container_mtime_ns: int = 0,
-    container_ctime_ns: int = 0,
-    container_inode: int = 0,
-) -> None:
-    """Extract an archive to work_dir, hash all contents, store in DB.
+    hash_types: Collection[str] = HASH_TYPES,
+) -> list[tuple[str, int, FileHashes]]:
+    """Extract an archive to work_dir and hash all contents (hash_types only).
+
+    zip/tar/single-file compressed archives are hashed by streaming
+    (nothing written to work_dir); dolphin images and DVD .aaru images are
+    streamed through a FIFO in work_dir. Anything the streaming reader
+    cannot handle (nested archives, 7z/rar, CD images, converters that
+    refuse the FIFO) is extracted.
 
-    When write_sidecar_ is True (ingest/disposal sources), writes an RSCF
-    sidecar alongside the archive containing all extracted entry hashes.
+    Safe to call from worker threads: each call extracts into its own
+    unique subdirectory of work_dir and never touches the DB.
+
+    Returns:
+        List of (original_name, size, FileHashes) per extracted entry.
+
+    Raises:
+        ExtractionError (or any extraction failure) — caller warns.
     """
-    # Clear stale entries
-    db.delete_archive_contents(archive_path_str)
+    if can_stream(archive):
+        try:
+            return [
+                (entry.original_name, entry.size, entry.hashes)
+                for entry in stream_hash_entries(
+                    archive, limits, work_dir, hash_types,
+                )
+            ]
+        except StreamingUnsupported:
+            pass  # fall back to extraction
 
-    # Create per-archive subdirectory in work_dir
-    archive_work = work_dir / f"_scan_{archive.stem}"
-    archive_work.mkdir(parents=True, exist_ok=True)
+    # Create per-archive subdirectory in work_dir (unique per call, so
+    # two archives with the same stem can be extracted concurrently)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    archive_work = Path(tempfile.mkdtemp(prefix=f"_scan_{archive.stem}_", dir=work_dir))
 
     try:
         extracted = extract_recursive(archive, archive_work, limits)
-        stats.archives_extracted += 1
-
-        sidecar_entries: list[tuple[str, int, object]] = []
-
-        for entry in extracted:
-            entry_hashes = hash_file(entry.path)
-            db.upsert_archive_content(
-                archive_path=archive_path_str,
-                entry_name=entry.original_name,
-                entry_size=entry.size,
-                crc32=entry_hashes.crc32,
-                md5=entry_hashes.md5,
-                sha1=entry_hashes.sha1,
-                sha256=entry_hashes.sha256,
-                blake3=entry_hashes.blake3,
-            )
-            stats.archive_entries_hashed += 1
-            sidecar_entries.append((entry.original_name, entry.size, entry_hashes))
-
-        if write_sidecar_ and container_hashes is not None and sidecar_entries:
-            _write_archive_sidecar(
-                archive, container_hashes, container_size,
-                container_mtime_ns, container_ctime_ns, container_inode,
-                sidecar_entries,
-            )
-
-    except Exception as e:
-        stats.warn(f"extraction failed for {archive.name}: {e}")
+        return [
+            (entry.original_name, entry.size, hash_path(entry.path, hash_types))
+            for entry in extracted
+        ]
     finally:
         if archive_work.exists():
             shutil.rmtree(archive_work, ignore_errors=True)
+
+
+def complete_hashes(
+    db: CacheDB,
+    work_dir: Path,
+    *,
+    hash_types: Collection[str] = HASH_TYPES,
+    sizes: Collection[int] | None = None,
+    paths: Collection[str] | None = None,
+    workers: int = 1,
+    io: IOScheduler = NO_LIMITS,
+) -> int:
+    """Compute the digests a reduced ``hashes:`` policy left out.
+
+    Candidates are plain files and archive entries in ingest, disposal and
+    readonly sources whose ``hashed`` mask lacks any of hash_types (romroot
+    rows come from complete sidecars). They can be narrowed to entry sizes
+    (what a DAT is still missing) and/or to source paths (what execute is
+    about to copy). Plain files are re-read; archives are re-streamed or
+    re-extracted once for all their incomplete entries.
+
+    A file whose size or mtime changed since it was scanned is skipped —
+    the next scan hashes it again. Reads hold an io slot on their device.
+
+    Returns:
+        Number of files and archives completed.
+    """
+    mask = hash_mask(hash_types)
+    types = mask_hash_types(mask)
+    limits = ExtractionLimits()
+    jobs: list[_ScanJob] = []
+
+    for row in db.scanned_missing_hashes(mask):
+        if sizes is not None and row["size"] not in sizes:
+            continue
+        if paths is not None and row["path"] not in paths:
+            continue
+        jobs.append(_ScanJob(
+            Path(row["path"]), row["size"], row["mtime_ns"],
+            row["ctime_ns"], row["inode"],
+        ))
+
+    archive_entries: dict[str, set[str]] = {}
+    for row in db.archive_contents_missing_hashes(mask):
+        if sizes is not None and row["entry_size"] not in sizes:
+            continue
+        archive_path = row["archive_path"]
+        if paths is not None and archive_path not in paths:
+            continue
+        if archive_path not in archive_entries:
+            archive_entries[archive_path] = set()
+            jobs.append(_ScanJob(
+                Path(archive_path), row["archive_size"],
+                row["archive_mtime_ns"], 0, 0, is_archive=True,
+            ))
+        archive_entries[archive_path].add(row["entry_name"])
+
+    if not jobs:
+        return 0
+    print(
+        f"  Completing {', '.join(types)} for {len(jobs)} file(s)/archive(s)",
+        file=sys.stderr,
+    )
+    completed = 0
+
+    def work(job: _ScanJob) -> _HashResult:
+        try:
+            st = job.path.stat()
+        except OSError:
+            return _HashResult(warning=f"file vanished: {job.path.name}")
+        if st.st_size != job.size or st.st_mtime_ns != job.mtime_ns:
+            return _HashResult(
+                warning=f"changed since scan, skipped: {job.path.name}",
+            )
+        with io.read(job.path, st.st_dev) as throttle:
+            if not job.is_archive:
+                return _HashResult(
+                    hashes=hash_path(job.path, types, throttle=throttle),
+                )
+            try:
+                entries = _extract_and_hash_archive(
+                    job.path, work_dir, limits, types,
+                )
+            except Exception as e:
+                return _HashResult(
+                    warning=f"extraction failed for {job.path.name}: {e}",
+                )
+            throttle(job.size)
+        return _HashResult(entries=entries)
+
+    def record(job: _ScanJob, result: _HashResult) -> None:
+        nonlocal completed
+        if result.warning:
+            print(f"  Warning: {result.warning}", file=sys.stderr)
+            return
+        path_str = str(job.path)
+        if not job.is_archive:
+            db.update_scanned_hashes(path_str, result.hashes)
+        else:
+            wanted_names = archive_entries[path_str]
+            for name, _size, entry_hashes in result.entries or []:
+                if name in wanted_names:
+                    db.update_archive_content_hashes(
+                        path_str, name, entry_hashes,
+                    )
+        completed += 1
+
+    _run_pipelined(db, jobs, lambda job: job, work, record, workers)
+    return completed
@@ -0,0 +1,53 @@
+"""Shadow sidecar store for read-only sources.
+
+Read-only sources never get RSCF sidecars next to their files, so the
+only record of their hashes is collector.db — which is disposable (a
+schema bump or a lost file means rehashing every share). A shadow store
+keeps the same sidecars in a directory of its own instead, mirroring
+each source file's absolute path under the store root:
+
+    /mnt/nas/roms/snes/game.zip -> <root>/mnt/nas/roms/snes/game.zip.rscf
+
+Entries are validated like in-tree sidecars — container size and
+mtime_ns must match the file — so a stale entry is simply rehashed and
+overwritten. Entries of deleted files are not pruned. The store does
+not depend on CacheDB and survives it being deleted.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from rscf import Sidecar, read_sidecar, write_sidecar
+from rscf.sidecar import RscfError
+
+
+class ShadowStore:
+    """Sidecars for files whose own directory must not be written to."""
+
+    def __init__(self, root: Path) -> None:
+        self.root = root
+
+    def sidecar_path(self, path: Path) -> Path:
+        """Shadow sidecar location for a source file."""
+        mirrored = self.root.joinpath(*path.absolute().parts[1:])
+        return mirrored.with_name(mirrored.name + ".rscf")
+
+    def read(self, path: Path) -> Sidecar | None:
+        """Shadow sidecar of path, or None if missing or unreadable."""
+        sidecar_path = self.sidecar_path(path)
+        if not sidecar_path.exists():
+            return None
+        try:
+            return read_sidecar(sidecar_path)
+        except RscfError:
+            return None
+
+    def write(self, path: Path, sidecar: Sidecar) -> None:
+        """Store path's sidecar (write + rename, never half-written)."""
+        sidecar_path = self.sidecar_path(path)
+        sidecar_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = sidecar_path.with_name(sidecar_path.name + ".tmp")
+        write_sidecar(sidecar, tmp)
+        os.replace(tmp, sidecar_path)
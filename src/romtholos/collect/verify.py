@@ -17,13 +17,16 @@ from rscf import (
     FileEntry,
     SidecarResolver,
     StorageMode,
-    hash_file,
     read_sidecar,
 )
 from rscf.sidecar import RscfError
 
 from romtholos.collect.config import ORPHANED_DIR_NAME
 from romtholos.collect.db import CacheDB, HASH_TYPES
+from romtholos.collect.hashing import hash_path
+from romtholos.collect.iosched import NO_LIMITS, IOScheduler
+from romtholos.collect.manifest import is_game_file
+from romtholos.collect.walk import walk_files
 
 
 @dataclass
@@ -93,15 +96,9 @@ def _check_source_available(
                 return True, row["path"]
 
         # Check archive_contents
-        cur = db._conn.execute(
-            f"SELECT ac.archive_path FROM archive_contents ac "
-            f"JOIN scanned_files sf ON ac.archive_path = sf.path "
-            f"WHERE ac.{hash_type} = ? AND sf.source_type != 'romroot'",
-            (hash_value,),
-        )
-        row = cur.fetchone()
-        if row:
-            return True, row[0]
+        archive_path = db.find_untrusted_archive_by_hash(hash_type, hash_value)
+        if archive_path:
+            return True, archive_path
 
     return False, ""
 
@@ -110,6 +107,8 @@ def verify_romroot(
     romroot: Path,
     db: CacheDB | None = None,
     romroot_overrides: dict[str, Path] | None = None,
+    stat_workers: int = 1,
+    io: IOScheduler = NO_LIMITS,
 ) -> VerifyResult:
     """Verify integrity of all romroot archives.
 
@@ -121,6 +120,8 @@ def verify_romroot(
         db: Optional DB for source availability checks. If None,
             source availability is not checked.
         romroot_overrides: Per-system romroot path overrides.
+        stat_workers: Concurrent stat calls for the walk (network mounts).
+        io: Per-device read limits for the re-hash.
 
     Returns:
         VerifyResult with per-file details for any corrupt archives.
@@ -140,16 +141,22 @@ def verify_romroot(
     for root in roots:
         if not root.exists():
             continue
-        orphaned_dir = root / ORPHANED_DIR_NAME
-        for p in sorted(root.glob("**/*")):
-            if not p.is_file():
-                continue
-            if p == orphaned_dir or p.is_relative_to(orphaned_dir):
-                continue
-            if p.suffix == ".rscf":
-                continue
+        # Sidecar presence comes from the directory listing — no extra stat
+        dir_names: dict[Path, frozenset[str]] = {}
+
+        def on_dir(directory: Path, names: list[str]) -> None:
+            dir_names[directory] = frozenset(names)
+
+        for entry in walk_files(
+            root,
+            include=is_game_file,
+            exclude_dirs=(root / ORPHANED_DIR_NAME,),
+            on_dir=on_dir,
+            stat_workers=stat_workers,
+        ):
+            p = entry.path
             sidecar_path = resolver.sidecar_path(p)
-            if sidecar_path.is_file():
+            if sidecar_path.name in dir_names.get(sidecar_path.parent, ()):
                 archives.append((p, sidecar_path))
             else:
                 result.missing_sidecar += 1
@@ -187,8 +194,9 @@ def verify_romroot(
             )
             continue
 
-        # Re-hash the archive
-        hashes = hash_file(archive_path)
+        # Re-hash the archive (BLAKE3 is all the sidecar check needs)
+        with io.read(archive_path) as throttle:
+            hashes = hash_path(archive_path, ("blake3",), throttle=throttle)
         actual_blake3 = hashes.blake3.upper()
 
         if actual_blake3 == expected_blake3:
@@ -0,0 +1,259 @@
+"""Streaming source walker — os.scandir with optional concurrent stat.
+
+Replaces ``sorted(root.glob("**/*"))`` + one ``p.stat()`` per file. The
+walk yields ``WalkEntry`` tuples as directories are listed, so the hashing
+stage can start on the first files while the rest of the tree is still
+being enumerated, and the full tree is never held in memory.
+
+Ordering: entries are yielded in exactly the order ``sorted(glob("**/*"))``
+produced — a depth-first walk with each directory's entries sorted by name
+(files and subdirectories interleaved). Scan results and DB insertion order
+are therefore unchanged.
+
+Pruning: a ``prune`` callback may declare a directory unchanged before it
+is listed. Its files are then neither listed nor stat'ed, and only the
+subdirectories the callback names are descended into (scan.py uses this
+with the CacheDB directory table).
+
+Resuming: ``start_after`` skips everything up to and including a path in
+walk order. Directories that sort entirely before it are never listed, so
+an interrupted scan restarts without re-enumerating finished subtrees.
+
+High-latency mounts (CIFS/NFS): with ``stat_workers > 1`` each directory's
+stat calls are issued concurrently, and the walk runs on a background
+thread feeding a bounded queue so enumeration overlaps with hashing.
+"""
+
+from __future__ import annotations
+
+import os
+import queue
+import sys
+import threading
+from collections.abc import Callable, Collection, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+
+
+# Entries buffered between the background walker and the consumer.
+_PREFETCH_ENTRIES = 4096
+
+
+class WalkEntry(NamedTuple):
+    """A regular file found by the walker, with its stat identity."""
+
+    path: Path
+    size: int
+    mtime_ns: int
+    ctime_ns: int
+    inode: int
+    device: int
+
+
+def walk_files(
+    root: Path,
+    *,
+    include: Callable[[Path], bool] | None = None,
+    exclude_dirs: Collection[Path] = (),
+    on_dir: Callable[[Path, list[str]], None] | None = None,
+    prune: Callable[[Path], Collection[str] | None] | None = None,
+    stat_workers: int = 1,
+    start_after: Path | None = None,
+) -> Iterator[WalkEntry]:
+    """Stream (path, size, mtime_ns, ctime_ns, inode, dev) for files under root.
+
+    Args:
+        root: Directory to walk. A missing root yields nothing.
+        include: Predicate on the file path. Files it rejects are never
+            stat'ed or yielded (their names still reach on_dir).
+        exclude_dirs: Subtrees to skip entirely (e.g. romroot/_orphaned).
+        on_dir: Called with (directory, sorted entry names) when a directory
+            is listed — before any of its files are yielded. With
+            stat_workers > 1 it runs on the walker thread.
+        prune: Called with each directory before it is listed. Returning
+            None lists it normally; returning a collection of subdirectory
+            names skips the listing and all of its files, and descends into
+            just those subdirectories. Runs on the walker thread, like on_dir.
+        stat_workers: Concurrent stat calls per directory. Values > 1 also
+            move the walk to a background thread.
+        start_after: Resume point — only entries after this path (in walk
+            order) are yielded. Directories before it are neither listed
+            nor passed to prune/on_dir. Ignored unless it lies under root.
+
+    Symlinked directories are not followed (same as glob("**/*")); symlinked
+    files are followed. Files that vanish between listing and stat are
+    skipped.
+    """
+    assert stat_workers >= 1, f"stat_workers must be >= 1, got {stat_workers}"
+    excluded = frozenset(exclude_dirs)
+    after: tuple[str, ...] | None = None
+    if start_after is not None and start_after.is_relative_to(root):
+        after = start_after.relative_to(root).parts or None
+
+    if stat_workers == 1:
+        yield from _walk(root, include, excluded, on_dir, prune, None, after)
+        return
+
+    with ThreadPoolExecutor(
+        max_workers=stat_workers, thread_name_prefix="walk-stat",
+    ) as pool:
+        yield from _prefetch(
+            _walk(root, include, excluded, on_dir, prune, pool, after),
+        )
+
+
+def _walk(
+    directory: Path,
+    include: Callable[[Path], bool] | None,
+    excluded: frozenset[Path],
+    on_dir: Callable[[Path, list[str]], None] | None,
+    prune: Callable[[Path], Collection[str] | None] | None,
+    pool: ThreadPoolExecutor | None,
+    after: tuple[str, ...] | None = None,
+) -> Iterator[WalkEntry]:
+    """Depth-first walk of one directory, entries sorted by name.
+
+    after holds the remaining path components of the resume point below
+    this directory: names before after[0] are skipped, after[0] itself is
+    descended into with the rest (or skipped, if it is the resume file).
+    """
+    if prune is not None:
+        subdirs = prune(directory)
+        if subdirs is not None:
+            for name in sorted(subdirs):
+                sub_after = _resume_below(name, after)
+                path = directory / name
+                if sub_after is not _SKIP and path not in excluded:
+                    yield from _walk(
+                        path, include, excluded, on_dir, prune, pool, sub_after,
+                    )
+            return
+
+    try:
+        with os.scandir(directory) as it:
+            dir_entries = sorted(it, key=lambda e: e.name)
+    except (FileNotFoundError, NotADirectoryError):
+        return
+    except OSError as e:
+        # Unreadable (permissions, I/O error): skip it, keep walking
+        print(f"  WARNING: cannot list {directory}: {e}", file=sys.stderr)
+        return
+
+    if on_dir is not None:
+        on_dir(directory, [e.name for e in dir_entries])
+
+    # Classify via d_type (no syscall unless the entry is a symlink).
+    # Runs of consecutive files are stat'ed as one batch so concurrent
+    # stat can overlap their round trips without reordering the output.
+    batch: list[tuple[Path, os.DirEntry]] = []
+    for entry in dir_entries:
+        sub_after = _resume_below(entry.name, after)
+        if sub_after is _SKIP:
+            continue
+        path = directory / entry.name
+        try:
+            is_dir = entry.is_dir(follow_symlinks=False)
+            is_file = not is_dir and entry.is_file()
+        except OSError:
+            continue
+
+        if is_file:
+            if include is None or include(path):
+                batch.append((path, entry))
+            continue
+
+        if batch:
+            yield from _stat_batch(batch, pool)
+            batch = []
+        if is_dir and path not in excluded:
+            yield from _walk(
+                path, include, excluded, on_dir, prune, pool, sub_after,
+            )
+
+    if batch:
+        yield from _stat_batch(batch, pool)
+
+
+_SKIP = object()
+
+
+def _resume_below(
+    name: str, after: tuple[str, ...] | None,
+) -> tuple[str, ...] | None | object:
+    """Resume point for entry name: None (walk it all), the remaining
+    components (walk past them), or _SKIP (already done)."""
+    if after is None or name > after[0]:
+        return None
+    if name < after[0] or len(after) == 1:
+        return _SKIP
+    return after[1:]
+
+
+def _stat_one(item: tuple[Path, os.DirEntry]) -> WalkEntry | None:
+    path, entry = item
+    try:
+        st = entry.stat()
+    except OSError:
+        return None  # vanished between listing and stat
+    return WalkEntry(
+        path, st.st_size, st.st_mtime_ns, st.st_ctime_ns, st.st_ino, st.st_dev,
+    )
+
+
+def _stat_batch(
+    batch: list[tuple[Path, os.DirEntry]],
+    pool: ThreadPoolExecutor | None,
+) -> Iterator[WalkEntry]:
+    """Stat a run of files, concurrently when a pool is given (order kept)."""
+    results = pool.map(_stat_one, batch) if pool is not None and len(batch) > 1 \
+        else map(_stat_one, batch)
+    for walk_entry in results:
+        if walk_entry is not None:
+            yield walk_entry
+
+
+_DONE = object()
+
+
+def _prefetch(source: Iterator[WalkEntry]) -> Iterator[WalkEntry]:
+    """Run source on a background thread, buffering into a bounded queue.
+
+    Exceptions from the walker are re-raised in the consumer. If the
+    consumer stops early, the walker thread is told to stop.
+    """
+    buf: queue.Queue = queue.Queue(maxsize=_PREFETCH_ENTRIES)
+    stop = threading.Event()
+
+    def put(item: object) -> bool:
+        while not stop.is_set():
+            try:
+                buf.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce() -> None:
+        try:
+            for item in source:
+                if not put(item):
+                    return
+        except BaseException as e:
+            put(e)
+            return
+        put(_DONE)
+
+    thread = threading.Thread(target=produce, name="walk", daemon=True)
+    thread.start()
+    try:
+        while True:
+            item = buf.get()
+            if item is _DONE:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+        thread.join()
@@ -0,0 +1,332 @@
+"""Watch mode — inotify-driven incremental scan of untrusted sources.
+
+``collect run`` walks every source to find the handful of files that
+arrived since the last run. The watcher keeps an inotify watch on every
+directory of the ingest, disposal and readonly sources instead, and
+hashes just the files that were written, moved in or created.
+
+Debounce: a file is scanned once it has had no events for ``settle``
+seconds and its size and mtime did not move between two checks — a
+download still being written keeps postponing it. If it changes while
+being hashed anyway, scan's mid-download detection skips it and the next
+write event queues it again.
+
+Linux only (inotify via libc, no extra dependency). A kernel queue
+overflow loses events, so the watched sources are then rescanned in
+full — cheap, thanks to the stat-cache.
+"""
+
+from __future__ import annotations
+
+import ctypes
+import ctypes.util
+import errno
+import os
+import select
+import struct
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable
+from pathlib import Path
+
+from romtholos.collect.config import SourceDir
+from romtholos.collect.db import CacheDB
+from romtholos.collect.iosched import IOScheduler
+from romtholos.collect.scan import (
+    SourceScanStats,
+    is_scannable,
+    scan_all,
+    scan_files,
+)
+from romtholos.collect.shadow import ShadowStore
+from romtholos.collect.walk import walk_files
+
+# Source types the watcher follows. Romroot only changes through execute.
+WATCHED_SOURCE_TYPES = ("ingest", "disposal", "readonly")
+
+# inotify(7) event bits
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_ISDIR = 0x40000000
+
+_WATCH_MASK = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_ONLYDIR
+_EVENT = struct.Struct("iIII")  # wd, mask, cookie, len — then the name
+_READ_SIZE = 64 * 1024
+
+
+class WatchUnsupported(RuntimeError):
+    """Raised when inotify is not available on this platform."""
+
+
+class _Inotify:
+    """Minimal inotify wrapper: recursive directory watches over libc."""
+
+    def __init__(self) -> None:
+        if not sys.platform.startswith("linux"):
+            raise WatchUnsupported("collect watch needs Linux inotify")
+        self._libc = ctypes.CDLL(
+            ctypes.util.find_library("c") or "libc.so.6", use_errno=True,
+        )
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            err = ctypes.get_errno()
+            raise WatchUnsupported(f"inotify_init1 failed: {os.strerror(err)}")
+        self._dirs: dict[int, Path] = {}
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def add_tree(self, root: Path) -> None:
+        """Watch root and every directory below it."""
+        self._add(root)
+        for dirpath, dirnames, _ in os.walk(root):
+            for name in dirnames:
+                self._add(Path(dirpath) / name)
+
+    def _add(self, directory: Path) -> None:
+        wd = self._libc.inotify_add_watch(
+            self._fd, os.fsencode(directory), _WATCH_MASK,
+        )
+        if wd < 0:
+            err = ctypes.get_errno()
+            if err == errno.ENOSPC:
+                print(
+                    f"  Warning: inotify watch limit reached, not watching "
+                    f"{directory} (raise fs.inotify.max_user_watches)",
+                    file=sys.stderr,
+                )
+            return  # ENOENT/ENOTDIR: vanished before we got to it
+        self._dirs[wd] = directory
+
+    def read(self, timeout: float) -> list[tuple[Path, int]] | None:
+        """Wait up to timeout seconds; return (path, mask) events.
+
+        Returns None when the kernel queue overflowed (events were lost).
+        """
+        poller = select.poll()
+        poller.register(self._fd, select.POLLIN)
+        if not poller.poll(max(timeout, 0.0) * 1000):
+            return []
+
+        events: list[tuple[Path, int]] = []
+        overflow = False
+        while True:
+            try:
+                data = os.read(self._fd, _READ_SIZE)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _cookie, length = _EVENT.unpack_from(data, offset)
+                offset += _EVENT.size
+                name = data[offset:offset + length].rstrip(b"\0")
+                offset += length
+                if mask & _IN_Q_OVERFLOW:
+                    overflow = True
+                elif mask & _IN_IGNORED:
+                    self._dirs.pop(wd, None)
+                elif wd in self._dirs and name:
+                    events.append((self._dirs[wd] / os.fsdecode(name), mask))
+        return None if overflow else events
+
+
+class _Pending:
+    """Files waiting to settle: path → (last event, last seen size/mtime)."""
+
+    def __init__(self, settle: float) -> None:
+        self.settle = settle
+        self._files: dict[Path, tuple[float, tuple[int, int] | None]] = {}
+
+    def touch(self, path: Path, now: float) -> None:
+        self._files[path] = (now, _size_mtime(path))
+
+    def next_deadline(self, now: float) -> float:
+        """Seconds until the earliest file may have settled."""
+        if not self._files:
+            return self.settle
+        first = min(t for t, _ in self._files.values())
+        return max(first + self.settle - now, 0.0)
+
+    def settled(self, now: float) -> list[Path]:
+        """Pop files quiet for settle seconds with a stable size/mtime."""
+        ready: list[Path] = []
+        for path, (last, seen) in list(self._files.items()):
+            if now - last < self.settle:
+                continue
+            current = _size_mtime(path)
+            if current is None:
+                del self._files[path]  # gone — nothing to scan
+            elif current == seen:
+                ready.append(path)
+                del self._files[path]
+            else:
+                # Still being written: look again after settle
+                self._files[path] = (now, current)
+        return sorted(ready)
+
+
+def _size_mtime(path: Path) -> tuple[int, int] | None:
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    return st.st_size, st.st_mtime_ns
+
+
+def watch_sources(
+    sources: list[SourceDir],
+    db: CacheDB,
+    work_dir: Path,
+    *,
+    settle: float = 5.0,
+    workers: int = 1,
+    prefilter: bool = False,
+    initial_scan: bool = True,
+    on_batch: Callable[[list[Path] | None], None] | None = None,
+    stop: threading.Event | None = None,
+    io: IOScheduler | None = None,
+    shadow: ShadowStore | None = None,
+) -> None:
+    """Follow untrusted sources with inotify and scan what changes.
+
+    Args:
+        sources: Configured sources; only ingest, disposal and readonly
+            ones are watched.
+        db: Cache database (used from the calling thread only).
+        work_dir: Working directory for archive extraction.
+        settle: Quiet time (seconds) before a written file is scanned.
+        workers: Files hashed/extracted in parallel per batch.
+        prefilter: Archive prefilter, as for scan_all (DATs must be loaded).
+        initial_scan: Scan the watched sources once before waiting, to
+            catch what arrived while nobody was watching.
+        on_batch: Called after each batch with the scanned paths, or None
+            after a full rescan (queue overflow, initial scan).
+        stop: Event that ends the loop (default: run until interrupted).
+        io: Per-device read limits (default: built from all sources, so
+            romroot's device limits apply too).
+        shadow: Shadow sidecar store for read-only sources.
+    """
+    watched = [s for s in sources if s.source_type in WATCHED_SOURCE_TYPES]
+    if not watched:
+        print("  No ingest, disposal or readonly sources to watch", file=sys.stderr)
+        return
+
+    if io is None:
+        io = IOScheduler.from_sources(sources)
+    inotify = _Inotify()
+    try:
+        for source in watched:
+            if source.path.is_dir():
+                inotify.add_tree(source.path)
+                print(f"  Watching: {source.path} ({source.source_type})", file=sys.stderr)
+            else:
+                print(f"  Skipping {source.path}: does not exist", file=sys.stderr)
+
+        if initial_scan:
+            _rescan(
+                watched, db, work_dir, workers, prefilter, on_batch, io, shadow,
+            )
+
+        pending = _Pending(settle)
+        while stop is None or not stop.is_set():
+            events = inotify.read(min(pending.next_deadline(time.monotonic()), 1.0))
+            now = time.monotonic()
+            if events is None:
+                print("  inotify queue overflow — rescanning", file=sys.stderr)
+                _rescan(
+                    watched, db, work_dir, workers, prefilter, on_batch, io,
+                    shadow,
+                )
+                continue
+
+            for path, mask in events:
+                if mask & _IN_ISDIR:
+                    # New or moved-in directory: watch it, and queue what
+                    # was written before the watch existed
+                    inotify.add_tree(path)
+                    for entry in walk_files(path, include=is_scannable):
+                        pending.touch(entry.path, now)
+                elif is_scannable(path):
+                    pending.touch(path, now)
+
+            ready = pending.settled(now)
+            if ready:
+                _scan_batch(
+                    watched, ready, db, work_dir, workers, prefilter, on_batch, io,
+                    shadow,
+                )
+    finally:
+        inotify.close()
+
+
+def _rescan(
+    watched: list[SourceDir],
+    db: CacheDB,
+    work_dir: Path,
+    workers: int,
+    prefilter: bool,
+    on_batch: Callable[[list[Path] | None], None] | None,
+    io: IOScheduler,
+    shadow: ShadowStore | None,
+) -> None:
+    """Full (stat-cached) scan of the watched sources."""
+    results = scan_all(
+        watched, db, work_dir, workers=workers, prefilter=prefilter, io=io,
+        shadow=shadow,
+    )
+    if on_batch is not None and _changed(results.values()):
+        on_batch(None)
+
+
+def _scan_batch(
+    watched: list[SourceDir],
+    paths: list[Path],
+    db: CacheDB,
+    work_dir: Path,
+    workers: int,
+    prefilter: bool,
+    on_batch: Callable[[list[Path] | None], None] | None,
+    io: IOScheduler,
+    shadow: ShadowStore | None,
+) -> None:
+    """Scan settled files, grouped by the source that contains them."""
+    by_source: dict[Path, list[Path]] = {}
+    for path in paths:
+        source = _owning_source(watched, path)
+        if source is not None:
+            by_source.setdefault(source.path, []).append(path)
+
+    stats: list[SourceScanStats] = []
+    for source in watched:
+        files = by_source.get(source.path)
+        if files:
+            print(
+                f"Scanning {len(files)} new file(s) in {source.path}",
+                file=sys.stderr,
+            )
+            stats.append(scan_files(
+                source, files, db, work_dir, workers=workers, prefilter=prefilter,
+                io=io, shadow=shadow,
+            ))
+    if on_batch is not None and _changed(stats):
+        on_batch(paths)
+
+
+def _owning_source(watched: list[SourceDir], path: Path) -> SourceDir | None:
+    """Innermost watched source containing path."""
+    owners = [s for s in watched if path.is_relative_to(s.path)]
+    return max(owners, key=lambda s: len(s.path.parts), default=None)
+
+
+def _changed(stats: Iterable[SourceScanStats]) -> bool:
+    """True if a scan recorded anything new."""
+    return any(
+        s.files_hashed or s.files_from_sidecar or s.files_relinked
+        or s.files_fingerprinted
+        for s in stats
+    )
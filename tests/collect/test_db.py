@@ -0,0 +1,439 @@
+"""Tests for CacheDB's content-addressed storage."""
+
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import zlib
+from pathlib import Path
+
+import pytest
+from rscf import FileHashes
+
+from romtholos.collect import db as db_mod
+from romtholos.collect.config import SourceDir
+from romtholos.collect.db import (
+    CacheDB,
+    DBProfile,
+    ReaderPool,
+    SchemaMismatchError,
+    wal_size,
+)
+from romtholos.collect.execute import execute_plan
+from romtholos.collect.match import group_by_game, match_all_dats, match_dat
+from romtholos.collect.scan import scan_all
+
+_DIGESTS = {
+    "crc32": "AABBCCDD",
+    "md5": "0" * 32,
+    "sha1": "1" * 40,
+    "sha256": "2" * 64,
+    "blake3": "3" * 64,
+}
+
+
+def _count(db: CacheDB, table: str) -> int:
+    return db._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+# The schema of the oldest migratable DB (v4)
+_V4_SCHEMA = """
+CREATE TABLE scanned_files (
+    path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+    ctime_ns INTEGER NOT NULL DEFAULT 0, inode INTEGER NOT NULL DEFAULT 0,
+    source_type TEXT NOT NULL DEFAULT 'readonly',
+    crc32 TEXT, md5 TEXT, sha1 TEXT, sha256 TEXT, blake3 TEXT,
+    is_archive INTEGER DEFAULT 0, scanned_at TEXT NOT NULL);
+CREATE TABLE archive_contents (
+    archive_path TEXT NOT NULL, entry_name TEXT NOT NULL, entry_size INTEGER,
+    crc32 TEXT, md5 TEXT, sha1 TEXT, sha256 TEXT, blake3 TEXT,
+    PRIMARY KEY (archive_path, entry_name));
+CREATE TABLE dat_entries (
+    dat_path TEXT NOT NULL, system TEXT NOT NULL, game_name TEXT NOT NULL,
+    rom_name TEXT NOT NULL, rom_size INTEGER,
+    crc32 TEXT, md5 TEXT, sha1 TEXT, sha256 TEXT, blake3 TEXT,
+    PRIMARY KEY (dat_path, game_name, rom_name));
+CREATE TABLE matches (
+    dat_path TEXT NOT NULL, game_name TEXT NOT NULL, rom_name TEXT NOT NULL,
+    source_path TEXT, source_type TEXT, archive_entry TEXT,
+    status TEXT NOT NULL, PRIMARY KEY (dat_path, game_name, rom_name));
+CREATE TABLE romroot_files (
+    path TEXT NOT NULL, system TEXT NOT NULL, game_name TEXT NOT NULL,
+    rom_name TEXT NOT NULL,
+    crc32 TEXT, md5 TEXT, sha1 TEXT, sha256 TEXT, blake3 TEXT,
+    rscf_path TEXT, PRIMARY KEY (path, rom_name));
+CREATE INDEX idx_scanned_sha1 ON scanned_files(sha1);
+PRAGMA user_version = 4;
+"""
+
+
+def _v4_db(db_path: Path) -> None:
+    """A v4 DB: a plain file, an archive with one entry, a DAT and romroot."""
+    d = _DIGESTS
+    conn = sqlite3.connect(db_path)
+    conn.executescript(_V4_SCHEMA)
+    conn.execute(
+        "INSERT INTO scanned_files VALUES ('/in/a.gba', 100, 1, 2, 3, 'ingest',"
+        " ?, ?, ?, ?, ?, 0, 'now')",
+        (d["crc32"], d["md5"], d["sha1"], d["sha256"], d["blake3"]),
+    )
+    conn.execute(
+        "INSERT INTO scanned_files VALUES ('/in/b.zip', 50, 1, 2, 4, 'ingest',"
+        " NULL, NULL, NULL, NULL, ?, 1, 'now')", ("4" * 64,),
+    )
+    conn.execute(
+        "INSERT INTO archive_contents VALUES ('/in/b.zip', 'b.gba', 100,"
+        " ?, ?, ?, ?, ?)",
+        (d["crc32"], d["md5"], d["sha1"], d["sha256"], d["blake3"]),
+    )
+    conn.execute(
+        "INSERT INTO dat_entries VALUES ('/sel/gba.dat', 'GBA', 'G', 'G.gba',"
+        " 100, ?, ?, ?, '', '')", (d["crc32"], d["md5"], d["sha1"]),
+    )
+    conn.execute(
+        "INSERT INTO matches VALUES ('/sel/gba.dat', 'G', 'G.gba', '/in/a.gba',"
+        " 'plain', NULL, 'matched')",
+    )
+    conn.execute(
+        "INSERT INTO romroot_files VALUES ('/rr/G.zst', 'GBA', 'G', 'G.gba',"
+        " ?, ?, ?, ?, ?, '/rr/G.zst.rscf')",
+        (d["crc32"], d["md5"], d["sha1"], d["sha256"], d["blake3"]),
+    )
+    conn.commit()
+    conn.close()
+
+
+def _downgrade_to_hex_digests(db_path: Path) -> None:
+    """Turn a DB into the v12 layout: hex TEXT digests, '' if unknown."""
+    conn = sqlite3.connect(db_path)
+    for view in ("scanned_files", "archive_contents", "dat_entries", "romroot_files"):
+        conn.execute(f"DROP VIEW {view}")
+    conn.executescript("""
+        CREATE TABLE contents_v12 (
+            id INTEGER PRIMARY KEY, key BLOB NOT NULL UNIQUE,
+            crc32 TEXT NOT NULL DEFAULT '', md5 TEXT NOT NULL DEFAULT '',
+            sha1 TEXT NOT NULL DEFAULT '', sha256 TEXT NOT NULL DEFAULT '',
+            blake3 TEXT NOT NULL DEFAULT '');
+        INSERT INTO contents_v12 SELECT id, key, hex(crc32), hex(md5),
+            hex(sha1), hex(sha256), hex(blake3) FROM contents;
+        DROP TABLE contents;
+        ALTER TABLE contents_v12 RENAME TO contents;
+        PRAGMA user_version = 12;
+    """)
+    conn.close()
+
+
+class TestContents:
+
+    def test_romroot_entry_shares_contents_row(self, tmp_path: Path):
+        with CacheDB(tmp_path / "test.db") as db:
+            db.upsert_archive_content("/rr/G.zst", "G.gba", 100, **_DIGESTS)
+            db.upsert_romroot("/rr/G.zst", "GBA", "G", "G.gba", **_DIGESTS)
+
+            assert _count(db, "contents") == 1
+            assert db.find_in_romroot("sha1", _DIGESTS["sha1"])["path"] == "/rr/G.zst"
+            assert db.get_archive_contents("/rr/G.zst")[0]["md5"] == _DIGESTS["md5"]
+
+    def test_hashes_filled_in_later(self, tmp_path: Path):
+        with CacheDB(tmp_path / "test.db") as db:
+            db.upsert_scanned("/in/a.gba", size=100, mtime_ns=1,
+                              blake3=_DIGESTS["blake3"])
+
+            db.update_scanned_hashes("/in/a.gba", FileHashes(**_DIGESTS))
+
+            [row] = db.find_by_hash("sha1", _DIGESTS["sha1"])
+            assert row["blake3"] == _DIGESTS["blake3"]
+            assert row["hashed"] == 31
+            assert db.prune_contents() == 1  # the BLAKE3-only row
+            assert _count(db, "contents") == 1
+
+    def test_deleting_through_view(self, tmp_path: Path):
+        with CacheDB(tmp_path / "test.db") as db:
+            db.upsert_scanned("/in/a.gba", size=100, mtime_ns=1, **_DIGESTS)
+
+            db._conn.execute("DELETE FROM scanned_files WHERE path = '/in/a.gba'")
+
+            assert db.get_scanned("/in/a.gba") is None
+            assert db.prune_contents() == 1
+
+    def test_digests_normalised(self, tmp_path: Path):
+        with CacheDB(tmp_path / "test.db") as db:
+            db.upsert_scanned("/in/a.gba", size=100, mtime_ns=1,
+                              sha1=_DIGESTS["sha1"], crc32="aabbccdd")
+
+            [row] = db.find_by_hash("crc32", "AABBCCDD")
+            assert row["crc32"] == "AABBCCDD"
+            assert row["md5"] == ""
+            assert db.find_by_hash("md5", "") == []
+            assert tuple(db._conn.execute(
+                "SELECT md5 IS NULL, length(sha1) FROM contents"
+            ).fetchone()) == (1, 20)
+
+    def test_hex_digest_db_migrated_in_place(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        with CacheDB(db_path) as db:
+            db.upsert_scanned("/in/a.gba", size=100, mtime_ns=1, **_DIGESTS)
+            db.upsert_romroot("/rr/G.zst", "GBA", "G", "G.gba", sha1=_DIGESTS["sha1"])
+            before = db.get_scanned("/in/a.gba")
+        _downgrade_to_hex_digests(db_path)
+
+        with CacheDB(db_path) as db:
+            assert db._conn.execute("PRAGMA user_version").fetchone()[0] == 13
+            assert tuple(db.get_scanned("/in/a.gba")) == tuple(before)
+            assert db.find_in_romroot("sha1", _DIGESTS["sha1"])["md5"] == ""
+            assert db.find_by_hash("blake3", _DIGESTS["blake3"])
+
+    def test_pre_contents_db_recreated(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        conn = sqlite3.connect(db_path)
+        conn.execute("CREATE TABLE scanned_files (path TEXT PRIMARY KEY, sha1 TEXT)")
+        conn.execute("INSERT INTO scanned_files VALUES ('/in/a.gba', 'X')")
+        conn.execute("PRAGMA user_version = 11")
+        conn.commit()
+        conn.close()
+
+        with CacheDB(db_path) as db:
+            assert db.get_scanned("/in/a.gba") is None
+            db.upsert_scanned("/in/a.gba", size=100, mtime_ns=1, **_DIGESTS)
+            assert db.get_scanned("/in/a.gba")["sha1"] == _DIGESTS["sha1"]
+
+
+    def test_malformed_dat_digest_ignored(self, tmp_path: Path, capsys):
+        ingest = tmp_path / "ingest"
+        ingest.mkdir()
+        roms = {"A.gba": b"A" * 300, "B.gba": b"B" * 300}
+        for name, data in roms.items():
+            (ingest / name).write_bytes(data)
+        selection = tmp_path / "selection"
+        selection.mkdir()
+        lines = ['<?xml version="1.0"?>', "<datafile>",
+                 "<header><name>GBA</name></header>"]
+        for name, data in roms.items():
+            lines.append(f'<game name="{name[0]}"><rom name="{name}" '
+                         f'size="300" sha1="{hashlib.sha1(data).hexdigest()}"/></game>')
+        lines.append('<game name="C"><rom name="C.gba" size="300" '
+                     'crc="ABC" sha1="not-hex"/></game>')
+        lines.append("</datafile>")
+        (selection / "GBA.dat").write_text("\n".join(lines), encoding="utf-8")
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all([SourceDir(path=ingest, source_type="ingest")], db,
+                     tmp_path / "work")
+            results = match_all_dats(selection, db)
+
+        status = {op.rom_name: op.status for _, _, ops in results for op in ops}
+        assert status == {"A.gba": "matched", "B.gba": "matched", "C.gba": "missing"}
+        err = capsys.readouterr().err
+        assert "ignoring malformed crc32 'ABC' of C.gba" in err
+        assert "ignoring malformed sha1 'not-hex' of C.gba" in err
+
+
+    def test_digest_width_checked(self):
+        assert db_mod._digest("crc32", "deadBEEF") == bytes.fromhex("DEADBEEF")
+        assert db_mod._digest("crc32", "1" * 40) is None  # a SHA1 in crc32
+        assert db_mod._digest("crc32", "de ad be") is None
+        assert db_mod._digest("crc32", " deadbee") is None
+        for ht, size in (("md5", 16), ("sha1", 20), ("sha256", 32), ("blake3", 32)):
+            assert len(db_mod._digest(ht, "ab" * size)) == size
+            assert db_mod._digest(ht, "ab" * (size - 1)) is None
+
+    def test_lowercase_dat_matches_and_executes(self, tmp_path: Path):
+        ingest = tmp_path / "ingest"
+        ingest.mkdir()
+        data = b"lowercase" * 100
+        (ingest / "Game.gba").write_bytes(data)
+        dat = tmp_path / "selection" / "GBA.dat"
+        dat.parent.mkdir()
+        dat.write_text(
+            '<?xml version="1.0"?><datafile><header><name>GBA</name></header>'
+            f'<game name="Game"><rom name="Game.gba" size="{len(data)}" '
+            f'crc="{zlib.crc32(data):08x}" md5="{hashlib.md5(data).hexdigest()}" '
+            f'sha1="{hashlib.sha1(data).hexdigest()}"/></game></datafile>',
+            encoding="utf-8",
+        )
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all([SourceDir(path=ingest, source_type="ingest")], db,
+                     tmp_path / "work")
+            ops = match_dat(dat, db)
+            assert [op.status for op in ops] == ["matched"]
+
+            stats = execute_plan(
+                group_by_game(ops), tmp_path / "romroot" / "GBA",
+                tmp_path / "work", "none", db,
+            )
+
+        assert (stats["processed"], stats["failed"]) == (1, 0)
+        assert (tmp_path / "romroot" / "GBA" / "Game" / "Game.gba").read_bytes() == data
+
+
+class TestMigrations:
+
+    def test_v4_db_migrated_in_place(self, tmp_path: Path, capsys):
+        db_path = tmp_path / "test.db"
+        _v4_db(db_path)
+
+        with CacheDB(db_path) as db:
+            assert db._conn.execute("PRAGMA user_version").fetchone()[0] == 13
+            plain = db.get_scanned("/in/a.gba")
+            assert (plain["device"], plain["fingerprint"], plain["hashed"]) == (0, "", 31)
+            assert db.get_scanned("/in/b.zip")["hashed"] == 16  # BLAKE3 only
+            [entry] = db.find_archive_content_by_hash("sha1", _DIGESTS["sha1"])
+            assert (entry["entry_name"], entry["provisional"]) == ("b.gba", 0)
+            assert db.find_in_romroot("md5", _DIGESTS["md5"])["path"] == "/rr/G.zst"
+            [dat] = db.get_dat_entries("/sel/gba.dat")
+            assert (dat["sha1"], dat["sha256"]) == (_DIGESTS["sha1"], "")
+            assert db.stats()["matched"] == 1
+            # Every row table but dat_entries shares the one full digest set
+            assert _count(db, "contents") == 3
+
+        err = capsys.readouterr().err
+        assert "[1/9] v4 -> v5" in err
+        assert "[9/9] v12 -> v13" in err
+
+    def test_destructive_step_recreates(self, tmp_path: Path, monkeypatch):
+        db_path = tmp_path / "test.db"
+        _v4_db(db_path)
+        monkeypatch.setitem(
+            db_mod._MIGRATIONS, 8,
+            db_mod._MIGRATIONS[8]._replace(destructive=True),
+        )
+
+        with CacheDB(db_path) as db:
+            assert db._conn.execute("PRAGMA user_version").fetchone()[0] == 13
+            assert db.get_scanned("/in/a.gba") is None
+
+    def test_failed_step_rolls_back_and_recreates(self, tmp_path: Path, monkeypatch):
+        db_path = tmp_path / "test.db"
+        _v4_db(db_path)
+        monkeypatch.setitem(
+            db_mod._MIGRATIONS, 12,
+            db_mod._MIGRATIONS[12]._replace(script="SELECT no_such_column FROM contents;"),
+        )
+
+        with CacheDB(db_path) as db:
+            assert db.get_scanned("/in/a.gba") is None
+            assert db.stats()["scanned_files"] == 0
+
+
+class TestReaderPool:
+
+    def test_reads_and_rejects_writes(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        with CacheDB(db_path) as writer:
+            writer.upsert_scanned("/in/a.gba", size=100, mtime_ns=1, **_DIGESTS)
+
+            with ReaderPool(db_path) as pool:
+                db = pool.reader()
+                assert db.find_by_hash("sha1", _DIGESTS["sha1"])[0]["path"] == "/in/a.gba"
+                with pytest.raises(sqlite3.OperationalError):
+                    db.upsert_scanned("/in/b.gba", size=1, mtime_ns=1)
+
+    def test_snapshot_ignores_later_commits(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        with CacheDB(db_path) as writer, ReaderPool(db_path) as pool:
+            writer.upsert_scanned("/in/a.gba", size=100, mtime_ns=1)
+
+            with pool.snapshot() as db:
+                writer.upsert_scanned("/in/b.gba", size=100, mtime_ns=1)
+                assert db.stats()["scanned_files"] == 1
+                assert db.get_scanned("/in/b.gba") is None
+
+            with pool.snapshot() as db:
+                assert db.stats()["scanned_files"] == 2
+
+    def test_not_blocked_by_open_batch(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        with CacheDB(db_path) as writer, ReaderPool(db_path) as pool:
+            writer.upsert_scanned("/in/a.gba", size=100, mtime_ns=1)
+            with writer.batch():
+                writer.upsert_scanned("/in/b.gba", size=100, mtime_ns=1)
+                with pool.snapshot() as db:
+                    assert db.stats()["scanned_files"] == 1
+
+    def test_idle_readers_leave_checkpoint_alone(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        with CacheDB(db_path) as writer, ReaderPool(db_path) as pool:
+            with pool.snapshot() as db:
+                db.stats()
+            writer.upsert_scanned("/in/a.gba", size=100, mtime_ns=1)
+
+            busy, _, _ = writer._conn.execute(
+                "PRAGMA wal_checkpoint(TRUNCATE)"
+            ).fetchone()
+            assert busy == 0
+
+    def test_one_reader_per_thread(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        CacheDB(db_path).close()
+        with ReaderPool(db_path) as pool:
+            mine = pool.reader()
+            other: list[CacheDB] = []
+            t = threading.Thread(target=lambda: other.append(pool.reader()))
+            t.start()
+            t.join()
+
+            assert pool.reader() is mine
+            assert other[0] is not mine
+
+    def test_old_schema_not_read(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        _v4_db(db_path)
+
+        with pytest.raises(SchemaMismatchError):
+            ReaderPool(db_path).reader()
+        with pytest.raises(FileNotFoundError):
+            ReaderPool(tmp_path / "missing.db").reader()
+
+
+class TestProfile:
+
+    def test_pragmas_applied(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        profile = DBProfile(cache_mb=8, mmap_mb=0, temp_store="file")
+        with (CacheDB(db_path, profile=profile) as writer,
+              ReaderPool(db_path, profile=profile) as pool):
+            for db in (writer, pool.reader()):
+                pragmas = [
+                    db._conn.execute(f"PRAGMA {name}").fetchone()[0]
+                    for name in ("cache_size", "mmap_size", "temp_store")
+                ]
+                assert pragmas == [-8 * 1024, 0, 1]  # KiB, off, FILE
+
+    def test_periodic_checkpoint_truncates_wal(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        with CacheDB(db_path, profile=DBProfile(checkpoint_every=0)) as db:
+            for i in range(5):
+                db.upsert_scanned(f"/in/{i}.gba", size=1, mtime_ns=1)
+            assert wal_size(db_path) > 0
+        with CacheDB(db_path, profile=DBProfile(checkpoint_every=5)) as db:
+            for i in range(5):
+                db.upsert_scanned(f"/in/{i}.gba", size=2, mtime_ns=1)
+            assert wal_size(db_path) == 0
+        assert wal_size(tmp_path / "missing.db") == 0
+
+    def test_checkpoint_held_back_by_snapshot(self, tmp_path: Path):
+        db_path = tmp_path / "test.db"
+        with CacheDB(db_path) as writer, ReaderPool(db_path) as pool:
+            writer.upsert_scanned("/in/a.gba", size=100, mtime_ns=1)
+            with pool.snapshot():
+                writer.upsert_scanned("/in/b.gba", size=100, mtime_ns=1)
+                busy, _, _ = writer.checkpoint(wait=False)
+                assert busy == 1
+                assert wal_size(db_path) > 0
+
+            assert writer.checkpoint() == (0, 0, 0)
+            assert wal_size(db_path) == 0
+
+    def test_analyze_after_bulk_load(self, tmp_path: Path):
+        with CacheDB(tmp_path / "test.db") as db:
+            db.upsert_many_scanned(
+                {"path": f"/in/{i}.gba", "size": i, "mtime_ns": 1, **_DIGESTS}
+                for i in range(100)
+            )
+            db.optimize(analyze=True)
+            tables = {
+                r[0] for r in db._conn.execute("SELECT tbl FROM sqlite_stat1")
+            }
+        assert "scanned_files_base" in tables
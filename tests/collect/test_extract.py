@@ -4,17 +4,26 @@ from __future__ import annotations
 
 import subprocess
 import zipfile
+import zlib
 from pathlib import Path
 
 import pytest
 
+from rscf import hash_file
+
 from romtholos.collect.extract import (
     ExtractionLimits,
     ExtractedFile,
     NestingDepthError,
     PathTraversalError,
     SizeLimitError,
+    StreamingUnsupported,
+    _ByteBudget,
+    _hash_tool_fifo,
+    _parse_7z_listing,
     extract_recursive,
+    list_archive,
+    stream_hash_entries,
 )
 
 
@@ -169,6 +178,109 @@ class Test7zExtraction:
         assert results[0].size == 4096
 
 
+class TestArchiveListing:
+    """Listing-only reads (size + CRC32) used by the scan prefilter."""
+
+    def test_zip_listing(self, tmp_path: Path):
+        content = b"\x01\x02" * 512
+        archive = tmp_path / "pack.zip"
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("sub/", b"")
+            zf.writestr("sub/game.gba", content)
+
+        entries = list_archive(archive)
+
+        assert len(entries) == 1
+        assert entries[0].name == "game.gba"
+        assert entries[0].size == len(content)
+        assert entries[0].crc32 == f"{zlib.crc32(content):08X}"
+
+    def test_parse_7z_format_listing(self):
+        output = (
+            "7-Zip [64] 16.02\n\n"
+            "--\nPath = pack.7z\nType = 7z\n\n"
+            "----------\n"
+            "Path = Disc\nSize = 0\nAttributes = D....\nCRC =\n\n"
+            "Path = Disc/track01.bin\nSize = 2352\n"
+            "Attributes = A....\nCRC = 1a2b3c4d\n\n"
+            "Path = Disc/empty.txt\nSize = 0\nAttributes = A....\nCRC =\n"
+        )
+
+        entries = _parse_7z_listing(output)
+
+        assert [(e.name, e.size, e.crc32) for e in entries] == [
+            ("track01.bin", 2352, "1A2B3C4D"),
+            ("empty.txt", 0, ""),
+        ]
+
+
+class TestStreamHashing:
+    """stream_hash_entries() must agree with extract + hash_file()."""
+
+    def _rom(self, tmp_path: Path, name: str = "game.bin") -> Path:
+        path = tmp_path / "input" / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(bytes(range(256)) * 64)
+        return path
+
+    def _assert_same(self, archive: Path, rom: Path, tmp_path: Path) -> None:
+        streamed = list(stream_hash_entries(archive))
+        assert len(streamed) == 1
+        assert streamed[0].original_name == rom.name
+        assert streamed[0].size == rom.stat().st_size
+        assert streamed[0].hashes == hash_file(rom)
+
+        extracted = extract_recursive(archive, tmp_path / "work")
+        assert streamed[0].hashes == hash_file(extracted[0].path)
+
+    def test_zip(self, tmp_path: Path):
+        rom = self._rom(tmp_path)
+        archive = tmp_path / "game.zip"
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.write(rom, "sub/game.bin")
+
+        self._assert_same(archive, rom, tmp_path)
+
+    def test_tar_zst(self, tmp_path: Path):
+        rom = self._rom(tmp_path)
+        archive = tmp_path / "game.tar.zst"
+        subprocess.run(
+            ["tar", "--zstd", "-cf", str(archive), "-C", str(rom.parent), rom.name],
+            check=True,
+        )
+
+        self._assert_same(archive, rom, tmp_path)
+
+    def test_single_gz(self, tmp_path: Path):
+        rom = self._rom(tmp_path)
+        archive = tmp_path / "game.bin.gz"
+        with archive.open("wb") as f:
+            subprocess.run(["gzip", "-c", str(rom)], stdout=f, check=True)
+
+        self._assert_same(archive, rom, tmp_path)
+
+    def test_nested_archive_unsupported(self, tmp_path: Path):
+        inner = tmp_path / "inner.zip"
+        with zipfile.ZipFile(inner, "w") as zf:
+            zf.writestr("game.gba", b"\x00" * 64)
+        outer = tmp_path / "outer.zip"
+        with zipfile.ZipFile(outer, "w") as zf:
+            zf.write(inner, "inner.zip")
+
+        with pytest.raises(StreamingUnsupported):
+            list(stream_hash_entries(outer))
+
+    def test_size_limit_enforced_inline(self, tmp_path: Path):
+        archive = tmp_path / "big.zip"
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr("big.bin", b"\x00" * (2 * 1024 * 1024))
+
+        limits = ExtractionLimits(max_total_bytes=1024 * 1024)
+        with pytest.raises(SizeLimitError):
+            list(stream_hash_entries(archive, limits))
+        assert not (tmp_path / "work").exists()
+
+
 class TestTarExtraction:
     def test_tar_gz(self, tmp_path: Path):
         src = tmp_path / "input"
@@ -265,3 +377,40 @@ class TestPostExtractionValidation:
         limits = ExtractionLimits(max_total_bytes=1 * 1024 * 1024)
         with pytest.raises(SizeLimitError):
             extract_recursive(zst, tmp_path / "work", limits=limits)
+
+
+class TestFifoStreaming:
+    """Converters writing into a FIFO are hashed without a temp file."""
+
+    def test_sequential_writer_is_hashed(self, tmp_path: Path):
+        rom = _make_rom(tmp_path / "game.iso", size=3 * 1024 * 1024 + 17)
+
+        entry = _hash_tool_fifo(
+            lambda out: ["sh", "-c", 'cat "$0" > "$1"', str(rom), str(out)],
+            "game.iso", rom, _ByteBudget(1 << 30), tmp_path / "work",
+        )
+
+        assert entry.original_name == "game.iso"
+        assert entry.size == rom.stat().st_size
+        assert entry.hashes == hash_file(rom)
+        assert list((tmp_path / "work").iterdir()) == []
+
+    def test_tool_failure_falls_back(self, tmp_path: Path):
+        rom = _make_rom(tmp_path / "game.iso")
+
+        with pytest.raises(StreamingUnsupported):
+            _hash_tool_fifo(
+                lambda out: ["sh", "-c", "exit 3"],
+                "game.iso", rom, _ByteBudget(1 << 30), tmp_path / "work",
+            )
+
+    def test_replaced_fifo_falls_back(self, tmp_path: Path):
+        rom = _make_rom(tmp_path / "game.iso")
+
+        with pytest.raises(StreamingUnsupported):
+            _hash_tool_fifo(
+                lambda out: [
+                    "sh", "-c", 'rm "$1" && cat "$0" > "$1"', str(rom), str(out),
+                ],
+                "game.iso", rom, _ByteBudget(1 << 30), tmp_path / "work",
+            )
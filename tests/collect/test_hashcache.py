@@ -0,0 +1,108 @@
+"""Tests for hash cache export/import between hosts."""
+
+from __future__ import annotations
+
+import gzip
+import shutil
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from romtholos.collect.config import SourceDir
+from romtholos.collect.db import CacheDB
+from romtholos.collect.hashcache import (
+    CacheFileError,
+    export_cache,
+    import_cache,
+    remap_path,
+)
+from romtholos.collect.scan import scan_all
+
+
+def _library(root: Path) -> Path:
+    (root / "gba").mkdir(parents=True)
+    (root / "gba" / "game.gba").write_bytes(b"EXPORTED" * 200)
+    shutil.copy2(root / "gba" / "game.gba", root / "gba" / "dupe.gba")
+    with zipfile.ZipFile(root / "set.zip", "w") as zf:
+        zf.writestr("inner.gba", b"INNER" * 300)
+    return root
+
+
+def _export(tmp_path: Path) -> tuple[Path, Path]:
+    """Scan a library on "host A" and export its cache."""
+    library = _library(tmp_path / "host_a" / "roms")
+    with CacheDB(tmp_path / "a.db") as db:
+        scan_all([SourceDir(path=library, source_type="readonly")], db, tmp_path / "work")
+        stats = export_cache(db, tmp_path / "cache.jsonl.gz")
+    assert (stats.contents, stats.files) == (2, 3)
+    return library, tmp_path / "cache.jsonl.gz"
+
+
+class TestRoundTrip:
+
+    def test_imported_host_scans_without_hashing(self, tmp_path: Path):
+        library, cache = _export(tmp_path)
+        # Host B mounts the same share elsewhere (copytree keeps mtimes)
+        mounted = tmp_path / "host_b" / "nas"
+        shutil.copytree(library, mounted)
+        source = SourceDir(path=mounted, source_type="readonly")
+
+        with CacheDB(tmp_path / "b.db") as db:
+            stats = import_cache(db, cache, [source], [(str(library), str(mounted))])
+            scanned = scan_all([source], db, tmp_path / "work")[str(mounted)]
+
+            assert stats.files_imported == 3
+            assert scanned.files_hashed == 0
+            assert scanned.files_skipped == 3
+            rows = db.get_archive_contents(str(mounted / "set.zip"))
+            assert [r["entry_name"] for r in rows] == ["inner.gba"]
+
+    def test_changed_and_unconfigured_files_skipped(self, tmp_path: Path):
+        library, cache = _export(tmp_path)
+        (library / "gba" / "game.gba").write_bytes(b"REWRITTEN" * 300)
+
+        with CacheDB(tmp_path / "b.db") as db:
+            stats = import_cache(
+                db, cache, [SourceDir(path=library / "gba", source_type="ingest")],
+            )
+
+            assert stats.files_imported == 1  # dupe.gba
+            assert stats.files_stale == 1
+            assert stats.files_outside == 1  # set.zip: outside the source
+            assert db.get_scanned(str(library / "gba" / "dupe.gba"))["source_type"] == "ingest"
+
+    def test_remap_longest_prefix(self):
+        remap = [("/mnt/nas", "/srv/a"), ("/mnt/nas/roms/", "/srv/b")]
+
+        assert remap_path("/mnt/nas/roms/x.zip", remap) == "/srv/b/x.zip"
+        assert remap_path("/mnt/nas/other", remap) == "/srv/a/other"
+        assert remap_path("/mnt/nasty/x", remap) == "/mnt/nasty/x"
+
+
+class TestCorruptFile:
+
+    def test_truncated_file_imports_nothing(self, tmp_path: Path):
+        library, cache = _export(tmp_path)
+        lines = gzip.decompress(cache.read_bytes()).splitlines(keepends=True)
+        truncated = tmp_path / "truncated.gz"
+        truncated.write_bytes(gzip.compress(b"".join(lines[:-1])))
+        source = SourceDir(path=library, source_type="readonly")
+
+        with CacheDB(tmp_path / "b.db") as db:
+            with pytest.raises(CacheFileError, match="truncated"):
+                import_cache(db, truncated, [source])
+
+            assert db.stats()["scanned_files"] == 0
+
+    def test_tampered_record_fails_checksum(self, tmp_path: Path):
+        library, cache = _export(tmp_path)
+        data = gzip.decompress(cache.read_bytes()).replace(b'"size":1600', b'"size":1601')
+        tampered = tmp_path / "tampered.gz"
+        tampered.write_bytes(gzip.compress(data))
+
+        with CacheDB(tmp_path / "b.db") as db:
+            with pytest.raises(CacheFileError, match="checksum"):
+                import_cache(db, tampered, [SourceDir(path=library, source_type="readonly")])
+
+            assert db.stats()["scanned_files"] == 0
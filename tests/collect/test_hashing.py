@@ -0,0 +1,67 @@
+"""Tests for the single-read hashing engine."""
+
+from __future__ import annotations
+
+import hashlib
+import zlib
+from pathlib import Path
+
+import blake3
+import pytest
+
+from romtholos.collect import hashing
+from romtholos.collect.hashing import hash_path
+
+
+def _expected(data: bytes) -> dict[str, str]:
+    return {
+        "crc32": f"{zlib.crc32(data):08X}",
+        "md5": hashlib.md5(data).hexdigest().upper(),
+        "sha1": hashlib.sha1(data).hexdigest().upper(),
+        "sha256": hashlib.sha256(data).hexdigest().upper(),
+        "blake3": blake3.blake3(data).hexdigest().upper(),
+    }
+
+
+def _write(tmp_path: Path, size: int) -> tuple[Path, bytes]:
+    data = bytes((i * 7 + i // 251) & 0xFF for i in range(size))
+    path = tmp_path / f"rom_{size}.bin"
+    path.write_bytes(data)
+    return path, data
+
+
+@pytest.fixture
+def small_parallel(monkeypatch):
+    """Route tiny files through the parallel engine with odd-sized chunks."""
+    monkeypatch.setattr(hashing, "PARALLEL_MIN_SIZE", 1)
+    monkeypatch.setattr(hashing, "PARALLEL_CHUNK_SIZE", 4093)
+    monkeypatch.setattr(hashing.os, "cpu_count", lambda: 4)
+
+
+class TestHashPath:
+
+    @pytest.mark.parametrize("size", [0, 1, 4093, 100_000])
+    def test_sequential_matches_reference(self, tmp_path, size):
+        path, data = _write(tmp_path, size)
+
+        hashes = hash_path(path)
+
+        assert {ht: getattr(hashes, ht) for ht in _expected(data)} == _expected(data)
+
+    @pytest.mark.parametrize("size", [1, 4093, 4094, 100_000])
+    def test_parallel_matches_reference(self, tmp_path, size, small_parallel):
+        path, data = _write(tmp_path, size)
+
+        hashes = hash_path(path)
+
+        assert {ht: getattr(hashes, ht) for ht in _expected(data)} == _expected(data)
+
+    @pytest.mark.parametrize("types", [("blake3",), ("sha1", "blake3")])
+    def test_parallel_subset(self, tmp_path, types, small_parallel):
+        path, data = _write(tmp_path, 50_000)
+        expected = _expected(data)
+
+        hashes = hash_path(path, types)
+
+        for ht in expected:
+            assert getattr(hashes, ht) == (expected[ht] if ht in types else "")
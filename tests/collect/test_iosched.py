@@ -0,0 +1,98 @@
+"""Tests for the per-device I/O scheduler."""
+
+from __future__ import annotations
+
+import threading
+import time
+from pathlib import Path
+
+from romtholos.collect.config import SourceDir
+from romtholos.collect.db import CacheDB
+from romtholos.collect.iosched import DeviceLimit, IOScheduler
+from romtholos.collect.scan import scan_all
+
+
+def _scheduler(tmp_path: Path, **limits) -> IOScheduler:
+    return IOScheduler.from_sources([SourceDir(path=tmp_path, **limits)])
+
+
+class TestDeviceLimit:
+
+    def test_merge_keeps_strictest_cap(self):
+        merged = DeviceLimit(max_reads=4).merge(
+            DeviceLimit(max_reads=2, read_mb_per_s=50.0),
+        )
+
+        assert merged == DeviceLimit(max_reads=2, read_mb_per_s=50.0)
+
+    def test_unlimited_sources_add_no_device(self, tmp_path: Path):
+        io = _scheduler(tmp_path)
+
+        with io.read(tmp_path) as throttle:
+            throttle(10**12)  # no-op: would sleep for ages if paced
+
+
+class TestIOScheduler:
+
+    def test_max_reads_caps_concurrency(self, tmp_path: Path):
+        io = _scheduler(tmp_path, max_reads=2)
+        lock = threading.Lock()
+        active = peak = 0
+
+        def reader() -> None:
+            nonlocal active, peak
+            with io.read(tmp_path):
+                with lock:
+                    active += 1
+                    peak = max(peak, active)
+                time.sleep(0.05)
+                with lock:
+                    active -= 1
+
+        threads = [threading.Thread(target=reader) for _ in range(6)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert peak == 2
+
+    def test_bandwidth_paced(self, tmp_path: Path):
+        io = _scheduler(tmp_path, read_mb_per_s=10.0)
+
+        t0 = time.monotonic()
+        with io.read(tmp_path) as throttle:
+            for _ in range(4):
+                throttle(500_000)  # 2 MB at 10 MB/s
+
+        assert time.monotonic() - t0 >= 0.19
+
+    def test_paced_copy_preserves_content(self, tmp_path: Path):
+        src = tmp_path / "game.bin"
+        src.write_bytes(bytes(range(256)) * 8192)
+        io = _scheduler(tmp_path, read_mb_per_s=1000.0)
+
+        io.copy(src, tmp_path / "copy.bin")
+
+        assert (tmp_path / "copy.bin").read_bytes() == src.read_bytes()
+        assert (tmp_path / "copy.bin").stat().st_mtime_ns == src.stat().st_mtime_ns
+
+
+class TestScanWithLimits:
+
+    def test_single_slot_scan_matches_unlimited(self, tmp_path: Path):
+        src = tmp_path / "src"
+        src.mkdir()
+        for i in range(8):
+            (src / f"game{i}.gba").write_bytes(f"SLOT{i}".encode() * 500)
+
+        def rows(db_name: str, **limits) -> dict:
+            source = SourceDir(path=src, source_type="readonly", **limits)
+            with CacheDB(tmp_path / db_name) as db:
+                scan_all([source], db, tmp_path / "work", workers=4)
+                return {
+                    r["path"]: r["blake3"] for r in db._conn.execute(
+                        "SELECT path, blake3 FROM scanned_files")
+                }
+
+        assert rows("limited.db", max_reads=1) == rows("free.db")
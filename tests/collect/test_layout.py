@@ -0,0 +1,64 @@
+"""Tests for physical read ordering."""
+
+from __future__ import annotations
+
+from pathlib import Path
+
+import pytest
+
+from romtholos.collect.layout import PhysicalOrder, first_extent
+from romtholos.collect.walk import WalkEntry
+
+
+def _entry(name: str, inode: int, device: int = 1) -> WalkEntry:
+    return WalkEntry(Path(name), 10, 0, 0, inode, device)
+
+
+class TestPhysicalOrder:
+
+    def test_inode_order_within_windows(self):
+        walk = [_entry("a", 30), _entry("b", 10), _entry("c", 20),
+                _entry("d", 5), _entry("e", 1)]
+
+        got = [e.path.name for e in PhysicalOrder(walk, "inode", window=3)]
+
+        # Sorted per window of three; windows keep walk order
+        assert got == ["b", "c", "a", "e", "d"]
+
+    def test_devices_not_interleaved(self):
+        walk = [_entry("a", 1, device=2), _entry("b", 2, device=1),
+                _entry("c", 3, device=2)]
+
+        got = [e.path.name for e in PhysicalOrder(walk, "inode")]
+
+        assert got == ["b", "a", "c"]
+
+    def test_committed_through_whole_windows_only(self):
+        walk = [_entry(name, 5 - i) for i, name in enumerate("abcde")]
+        order = PhysicalOrder(walk, "inode", window=2)
+        list(order)
+
+        assert order.committed_through(0) is None
+        # Item 1 completes the first window (a, b): resume after "b"
+        assert order.committed_through(1).path.name == "b"
+        assert order.committed_through(2) is None
+        assert order.committed_through(4).path.name == "e"
+
+    def test_path_is_not_a_physical_order(self):
+        with pytest.raises(AssertionError):
+            PhysicalOrder([], "path")
+
+
+class TestFirstExtent:
+
+    def test_regular_file(self, tmp_path: Path):
+        rom = tmp_path / "game.bin"
+        rom.write_bytes(b"\xAA" * 65536)
+
+        physical = first_extent(rom)
+
+        # None where the filesystem has no FIEMAP (tmpfs, overlay, NFS)
+        assert physical is None or physical >= 0
+
+    def test_missing_file(self, tmp_path: Path):
+        assert first_extent(tmp_path / "missing.bin") is None
@@ -0,0 +1,136 @@
+"""Tests for the per-system romroot sidecar manifest."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from rscf import FileEntry, Sidecar, hash_file, read_sidecar, write_sidecar
+
+from romtholos.collect import manifest as manifest_mod
+from romtholos.collect import scan as scan_mod
+from romtholos.collect.config import SourceDir
+from romtholos.collect.db import CacheDB
+from romtholos.collect.manifest import (
+    MANIFEST_FILENAME,
+    read_manifest,
+    refresh_manifest,
+)
+from romtholos.collect.scan import scan_all
+
+
+def _collected(path: Path, content: bytes, mtime_ns: int = 0) -> Path:
+    """A romroot file with its sidecar, as execute leaves it."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(content)
+    if mtime_ns:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    hashes = hash_file(path)
+    st = path.stat()
+    write_sidecar(Sidecar(
+        container_blake3=hashes.blake3,
+        container_size=st.st_size,
+        container_mtime_ns=st.st_mtime_ns,
+        container_ctime_ns=st.st_ctime_ns,
+        container_inode=st.st_ino,
+        renderer="zstd-19",
+        files=[FileEntry.from_hashes(path=path.stem + ".gba", size=st.st_size,
+                                     hashes=hashes)],
+    ), path.parent / (path.name + ".rscf"))
+    return path
+
+
+def _no_sidecar_reads(monkeypatch, module) -> None:
+    def fail(path):
+        raise AssertionError(f"sidecar read: {path}")
+
+    monkeypatch.setattr(module, "read_sidecar", fail)
+
+
+class TestRefreshManifest:
+
+    def test_collects_sidecars_of_games_and_game_dirs(self, tmp_path: Path):
+        system = tmp_path / "No-Intro" / "Nintendo - Game Boy Advance"
+        archive = _collected(system / "Game A.zst", b"A" * 500)
+        rom = _collected(system / "Game B" / "Game B.gba", b"B" * 300)
+
+        assert refresh_manifest(system) == 2
+
+        entries = read_manifest(system)
+        assert set(entries) == {archive, rom}
+        assert entries[archive].renderer == "zstd-19"
+        assert entries[rom].files[0].sha1 == hash_file(rom).sha1
+
+    def test_unchanged_entries_not_reread(self, tmp_path: Path, monkeypatch):
+        system = tmp_path / "System"
+        _collected(system / "Game A.zst", b"A" * 500)
+        refresh_manifest(system)
+        rewritten = _collected(system / "Game B.zst", b"B" * 300)
+
+        with monkeypatch.context() as m:
+            reads: list[Path] = []
+            m.setattr(manifest_mod, "read_sidecar",
+                      lambda p: reads.append(p) or read_sidecar(p))
+            assert refresh_manifest(system) == 1
+
+        assert [p.name for p in reads] == ["Game B.zst.rscf"]
+        assert rewritten in read_manifest(system)
+
+    def test_corrupt_manifest_ignored(self, tmp_path: Path):
+        (tmp_path / MANIFEST_FILENAME).write_text("{not json")
+
+        assert read_manifest(tmp_path) == {}
+
+
+class TestScanWithManifest:
+
+    def test_cold_scan_reads_no_sidecars(self, tmp_path: Path, monkeypatch):
+        romroot = tmp_path / "romroot"
+        system = romroot / "System"
+        roms = [_collected(system / f"Game {i}.zst", bytes([i]) * 400) for i in range(3)]
+        refresh_manifest(system)
+        _no_sidecar_reads(monkeypatch, scan_mod)
+
+        with CacheDB(tmp_path / "test.db") as db:
+            stats = scan_all(
+                [SourceDir(path=romroot, source_type="romroot")], db, tmp_path / "work",
+            )[str(romroot)]
+
+            assert stats.files_from_sidecar == 3
+            assert stats.files_from_manifest == 3
+            assert stats.files_hashed == 0
+            assert db.get_scanned(str(roms[0]))["blake3"] == hash_file(roms[0]).blake3
+            assert db.get_scanned(str(system / MANIFEST_FILENAME)) is None
+
+    def test_changed_file_falls_back_to_sidecar(self, tmp_path: Path):
+        romroot = tmp_path / "romroot"
+        system = romroot / "System"
+        old = _collected(system / "Game.zst", b"OLD" * 100)
+        refresh_manifest(system)
+        # Rewritten after the manifest (e.g. an interrupted execute)
+        rom = _collected(
+            system / "Game.zst", b"NEWER" * 100,
+            mtime_ns=old.stat().st_mtime_ns + 1_000_000_000,
+        )
+
+        with CacheDB(tmp_path / "test.db") as db:
+            stats = scan_all(
+                [SourceDir(path=romroot, source_type="romroot")], db, tmp_path / "work",
+            )[str(romroot)]
+
+            assert stats.files_from_sidecar == 1
+            assert stats.files_from_manifest == 0
+            assert db.get_scanned(str(rom))["blake3"] == hash_file(rom).blake3
+
+    def test_force_rescan_drops_manifest(self, tmp_path: Path):
+        romroot = tmp_path / "romroot"
+        _collected(romroot / "System" / "Game.zst", b"G" * 100)
+        refresh_manifest(romroot / "System")
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(
+                [SourceDir(path=romroot, source_type="romroot")], db,
+                tmp_path / "work", force_rescan=True,
+            )
+
+        assert not (romroot / "System" / MANIFEST_FILENAME).exists()
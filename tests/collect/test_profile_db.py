@@ -0,0 +1,94 @@
+"""Profiling tests for CacheDB bulk writes (executemany) vs one row per call.
+
+Loads a synthetic Redump-sized DAT, its match results and one archive
+entry per ROM, once through the single-row API (one statement and one
+commit per row, as match and scan used to write) and once through the
+bulk API, and reports the rows per second of each.
+
+Run with:
+    ROMTHOLOS_PROFILE_ENTRIES=60000 \\
+        uv run pytest tests/collect/test_profile_db.py -v -s
+"""
+
+from __future__ import annotations
+
+import os
+import time
+from pathlib import Path
+
+from romtholos.collect.db import CacheDB
+
+ENTRY_COUNT = int(os.environ.get("ROMTHOLOS_PROFILE_ENTRIES", "20000"))
+DAT_PATH = "/selection/Redump/Sony - PlayStation.dat"
+
+
+def _dat_entries(count: int = ENTRY_COUNT):
+    for i in range(count):
+        yield {
+            "game_name": f"Game {i // 4:05d}",
+            "rom_name": f"Game {i // 4:05d} (Track {i % 4 + 1}).bin",
+            "rom_size": 1024 * (i + 1),
+            "crc32": f"{i:08X}",
+            "md5": f"{i:032X}",
+            "sha1": f"{i:040X}",
+        }
+
+
+def _matches(count: int = ENTRY_COUNT):
+    for e in _dat_entries(count):
+        yield {
+            "dat_path": DAT_PATH, "game_name": e["game_name"],
+            "rom_name": e["rom_name"], "source_path": f"/ingest/{e['game_name']}.7z",
+            "source_type": "archive_content", "archive_entry": e["rom_name"],
+            "status": "matched",
+        }
+
+
+def _archive_entries(count: int = ENTRY_COUNT):
+    for e in _dat_entries(count):
+        yield {
+            "archive_path": f"/ingest/{e['game_name']}.7z",
+            "entry_name": e["rom_name"], "entry_size": e["rom_size"],
+            "crc32": e["crc32"], "md5": e["md5"], "sha1": e["sha1"],
+        }
+
+
+def _load_row_by_row(db: CacheDB) -> None:
+    db.load_dat(DAT_PATH, "Sony - PlayStation", list(_dat_entries()))
+    for row in _matches():
+        db.record_match(**row)
+    for row in _archive_entries():
+        db.upsert_archive_content(**row)
+
+
+def _load_bulk(db: CacheDB) -> None:
+    db.load_dat_bulk(DAT_PATH, "Sony - PlayStation", _dat_entries())
+    db.record_matches(_matches())
+    db.upsert_many_archive_contents(_archive_entries())
+
+
+def _timed(db_path: Path, load) -> tuple[float, dict]:
+    with CacheDB(db_path) as db:
+        t0 = time.monotonic()
+        load(db)
+        elapsed = time.monotonic() - t0
+        return elapsed, db.stats()
+
+
+class TestBulkWrites:
+    """Row-by-row vs executemany throughput."""
+
+    def test_bulk_faster_than_row_by_row(self, tmp_path: Path):
+        rows = 3 * ENTRY_COUNT
+        single, single_stats = _timed(tmp_path / "single.db", _load_row_by_row)
+        bulk, bulk_stats = _timed(tmp_path / "bulk.db", _load_bulk)
+
+        print(f"\n  {rows} rows ({ENTRY_COUNT} DAT entries + matches + archive entries)")
+        print(f"  row by row: {single:.2f}s, {rows / single:,.0f} rows/s")
+        print(f"        bulk: {bulk:.2f}s, {rows / bulk:,.0f} rows/s "
+              f"({single / bulk:.1f}x)")
+
+        assert bulk_stats == single_stats
+        assert bulk_stats["dat_entries"] == ENTRY_COUNT
+        assert bulk_stats["matched"] == ENTRY_COUNT
+        assert bulk < single
@@ -0,0 +1,121 @@
+"""Profiling tests for scan read order (path vs inode vs extent).
+
+Writes a library whose files are allocated in an order unrelated to their
+names, then scans it cold (page cache dropped per file) once per
+read_order and reports the throughput. The difference only shows on a
+spinning disk: point ROMTHOLOS_PROFILE_DIR at a directory on one.
+
+Run with:
+    ROMTHOLOS_PROFILE_DIR=/mnt/hdd/tmp \\
+        uv run pytest tests/collect/test_profile_read_order.py -v -s
+"""
+
+from __future__ import annotations
+
+import os
+import random
+import shutil
+import tempfile
+import time
+from pathlib import Path
+
+import pytest
+
+from romtholos.collect.config import SourceDir
+from romtholos.collect.db import CacheDB
+from romtholos.collect.hashing import evict
+from romtholos.collect.scan import scan_all
+
+FILE_COUNT = 400
+FILE_SIZE = 256 * 1024
+
+
+def _rotational(path: Path) -> str:
+    """'yes' / 'no' / 'unknown' for the block device holding path."""
+    dev = path.stat().st_dev
+    sys_dev = Path(f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}")
+    for queue in (sys_dev / "queue", sys_dev / ".." / "queue"):
+        try:
+            return "yes" if (queue / "rotational").read_text().strip() == "1" else "no"
+        except OSError:
+            continue
+    return "unknown"
+
+
+def build_scattered_library(base: Path, file_count: int = FILE_COUNT) -> Path:
+    """Write file_count ROMs in shuffled order across a few directories.
+
+    Allocation (inode and extent) order follows the write order, so path
+    order jumps around the disk — like a library filled over years.
+    """
+    source = base / "source"
+    rng = random.Random(1234)
+    names = [
+        source / f"dir{i % 8:02d}" / f"game_{i:05d}.bin"
+        for i in range(file_count)
+    ]
+    rng.shuffle(names)
+    for i, path in enumerate(names):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(i.to_bytes(8, "big") * (FILE_SIZE // 8))
+    os.sync()
+    return source
+
+
+# ---------------------------------------------------------------------------
+# Fixtures
+# ---------------------------------------------------------------------------
+
+
+@pytest.fixture(scope="module")
+def library(tmp_path_factory):
+    """Module-scoped scattered library (built once, reused across tests)."""
+    root = os.environ.get("ROMTHOLOS_PROFILE_DIR")
+    if root:
+        base = Path(tempfile.mkdtemp(prefix="romtholos-profile-", dir=root))
+    else:
+        base = tmp_path_factory.mktemp("profile")
+    source = build_scattered_library(base)
+    print(
+        f"\n  Fixture: {FILE_COUNT} files x {FILE_SIZE // 1024} KiB "
+        f"in {base} (rotational: {_rotational(base)})",
+    )
+    yield base, source
+    if root:
+        shutil.rmtree(base, ignore_errors=True)
+
+
+# ---------------------------------------------------------------------------
+# Profiling tests
+# ---------------------------------------------------------------------------
+
+
+class TestReadOrder:
+    """Cold scan throughput per read_order."""
+
+    def test_scan_throughput_by_order(self, library):
+        base, source = library
+        files = sorted(p for p in source.rglob("*.bin"))
+        total_mb = sum(p.stat().st_size for p in files) / 1e6
+
+        results: dict[str, tuple[float, int]] = {}
+        for order in ("path", "inode", "extent"):
+            for p in files:
+                evict(p)
+            db_path = base / f"{order}.db"
+            with CacheDB(db_path) as db:
+                t0 = time.monotonic()
+                stats = scan_all(
+                    [SourceDir(path=source, source_type="readonly", read_order=order)],
+                    db, base / "work",
+                )
+                elapsed = time.monotonic() - t0
+            results[order] = (elapsed, stats[str(source)].files_hashed)
+
+        for order, (elapsed, hashed) in results.items():
+            print(
+                f"  {order:>6}: {elapsed:.2f}s, "
+                f"{total_mb / max(elapsed, 1e-9):.1f} MB/s ({hashed} files)",
+            )
+
+        assert {hashed for _, hashed in results.values()} == {FILE_COUNT}
@@ -0,0 +1,148 @@
+"""Tests for rebuilding the DB cache from sidecars."""
+
+from __future__ import annotations
+
+import zipfile
+from pathlib import Path
+
+import pytest
+
+from romtholos.collect import rebuild as rebuild_mod
+from romtholos.collect.config import SourceDir
+from romtholos.collect.db import CacheDB
+from romtholos.collect.manifest import refresh_manifest
+from romtholos.collect.rebuild import rebuild_cache
+from romtholos.collect.scan import scan_all
+from romtholos.collect.shadow import ShadowStore
+
+
+def _tree(tmp_path: Path) -> list[SourceDir]:
+    """Romroot with two systems, an ingest source and a read-only one."""
+    romroot = tmp_path / "romroot"
+    for system, games in (("GBA", 3), ("SNES", 2)):
+        for i in range(games):
+            rom = romroot / system / f"{system} Game {i}.gba"
+            rom.parent.mkdir(parents=True, exist_ok=True)
+            rom.write_bytes(f"{system}{i}".encode() * 200)
+    ingest = tmp_path / "ingest"
+    ingest.mkdir()
+    (ingest / "loose.gba").write_bytes(b"LOOSE" * 300)
+    with zipfile.ZipFile(ingest / "set.zip", "w") as zf:
+        zf.writestr("inner.nes", b"INNER" * 300)
+    readonly = tmp_path / "nas"
+    readonly.mkdir()
+    (readonly / "shared.sfc").write_bytes(b"SHARED" * 300)
+    return [
+        SourceDir(path=romroot, source_type="romroot"),
+        SourceDir(path=ingest, source_type="ingest"),
+        SourceDir(path=readonly, source_type="readonly"),
+    ]
+
+
+def _scanned(tmp_path: Path, sources: list[SourceDir], shadow) -> Path:
+    """Scan once (romroot sidecars via --force-rescan), return the DB."""
+    db_path = tmp_path / "collector.db"
+    with CacheDB(db_path) as db:
+        scan_all(sources, db, tmp_path / "work", force_rescan=True, shadow=shadow)
+    return db_path
+
+
+def _cold_scan(tmp_path: Path, sources: list[SourceDir], shadow) -> Path:
+    """A scan into a fresh DB: everything loaded from sidecars."""
+    db_path = tmp_path / "cold.db"
+    with CacheDB(db_path) as db:
+        scan_all(sources, db, tmp_path / "work", shadow=shadow)
+    return db_path
+
+
+def _snapshot(db_path: Path) -> dict[str, list[tuple]]:
+    """Hash-relevant rows of every rebuilt table."""
+    with CacheDB(db_path) as db:
+        conn = db._conn
+        return {
+            "scanned_files": sorted(
+                tuple(r) for r in conn.execute(
+                    "SELECT path, size, mtime_ns, ctime_ns, inode, device,"
+                    " source_type, crc32, md5, sha1, sha256, blake3, hashed,"
+                    " is_archive FROM scanned_files",
+                )
+            ),
+            "archive_contents": sorted(
+                tuple(r) for r in conn.execute("SELECT * FROM archive_contents")
+            ),
+            "romroot_files": sorted(
+                tuple(r) for r in conn.execute("SELECT * FROM romroot_files")
+            ),
+        }
+
+
+class TestRebuildCache:
+
+    @pytest.mark.parametrize("workers", [1, 2])
+    def test_matches_a_cold_scan(self, tmp_path: Path, workers: int):
+        sources = _tree(tmp_path)
+        shadow = ShadowStore(tmp_path / "shadow")
+        db_path = _scanned(tmp_path, sources, shadow)
+        expected = _snapshot(_cold_scan(tmp_path, sources, shadow))
+        refresh_manifest(tmp_path / "romroot" / "GBA")
+
+        stats = rebuild_cache(sources, db_path, shadow=shadow, workers=workers)
+
+        assert _snapshot(db_path) == expected
+        assert stats.files == 8
+        assert stats.from_manifest == 3
+        assert stats.sidecars_read == 5
+        assert stats.romroot_entries == 5
+        assert stats.without_sidecar == 0
+
+    def test_next_scan_is_all_stat_hits(self, tmp_path: Path):
+        sources = _tree(tmp_path)
+        shadow = ShadowStore(tmp_path / "shadow")
+        db_path = _scanned(tmp_path, sources, shadow)
+
+        rebuild_cache(sources, db_path, shadow=shadow)
+
+        with CacheDB(db_path) as db:
+            results = scan_all(sources, db, tmp_path / "work", shadow=shadow)
+        assert sum(s.files_hashed for s in results.values()) == 0
+        assert sum(s.files_skipped for s in results.values()) == 8
+
+    def test_files_without_sidecar_left_for_scan(self, tmp_path: Path):
+        sources = _tree(tmp_path)
+        db_path = _scanned(tmp_path, sources, shadow=None)
+        # Read-only files have no sidecar without a shadow store, and a
+        # file rewritten since its sidecar no longer matches it
+        (tmp_path / "ingest" / "loose.gba").write_bytes(b"REWRITTEN" * 400)
+
+        stats = rebuild_cache(sources, db_path)
+
+        assert stats.without_sidecar == 2
+        with CacheDB(db_path) as db:
+            assert db.get_scanned(str(tmp_path / "nas" / "shared.sfc")) is None
+            assert db.get_scanned(str(tmp_path / "ingest" / "loose.gba")) is None
+
+    def test_interrupted_rebuild_keeps_current_db(self, tmp_path: Path, monkeypatch):
+        sources = _tree(tmp_path)
+        db_path = _scanned(tmp_path, sources, shadow=None)
+        before = _snapshot(db_path)
+
+        def fail(db, rows, stats):
+            raise KeyboardInterrupt
+
+        monkeypatch.setattr(rebuild_mod, "_write_rows", fail)
+        with pytest.raises(KeyboardInterrupt):
+            rebuild_cache(sources, db_path)
+
+        assert _snapshot(db_path) == before
+        assert list(tmp_path.glob("collector.db.rebuild*")) == []
+
+    def test_stale_rows_dropped(self, tmp_path: Path):
+        sources = _tree(tmp_path)
+        db_path = _scanned(tmp_path, sources, shadow=None)
+        with CacheDB(db_path) as db:
+            db.upsert_scanned(path="/gone/old.gba", size=1, mtime_ns=1)
+
+        rebuild_cache(sources, db_path)
+
+        with CacheDB(db_path) as db:
+            assert db.get_scanned("/gone/old.gba") is None
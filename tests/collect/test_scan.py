@@ -3,7 +3,10 @@
 from __future__ import annotations
 
 import os
+import hashlib
+import shutil
 import zipfile
+import zlib
 from pathlib import Path
 
 import pytest
@@ -11,8 +14,10 @@ import pytest
 from rscf import FileEntry, Sidecar, hash_file, read_sidecar, write_sidecar
 
 from romtholos.collect.config import SourceDir
-from romtholos.collect.db import CacheDB
-from romtholos.collect.scan import SourceScanStats, scan_all
+from romtholos.collect.db import ALL_HASHES, CacheDB, hash_mask
+from romtholos.collect.match import lazy_hash_demand
+from romtholos.collect.scan import SourceScanStats, complete_hashes, scan_all
+from romtholos.collect.shadow import ShadowStore
 
 
 def _make_rom(path: Path, content: bytes = b"\x00" * 1024) -> Path:
@@ -22,6 +27,11 @@ def _make_rom(path: Path, content: bytes = b"\x00" * 1024) -> Path:
     return path
 
 
+def _sha1_upper(content: bytes) -> str:
+    """Uppercase SHA1 of in-memory content (as stored by scan)."""
+    return hashlib.sha1(content).hexdigest().upper()
+
+
 def _make_sidecar(rom_path: Path) -> Path:
     """Hash a ROM and write an RSCF sidecar next to it."""
     hashes = hash_file(rom_path)
@@ -329,6 +339,71 @@ class TestReadonlyScan:
             assert row["source_type"] == "readonly"
 
 
+class TestShadowStore:
+    """Read-only sources keep their sidecars in a shadow store."""
+
+    def test_fresh_db_loads_from_shadow(self, tmp_path: Path, monkeypatch):
+        source = tmp_path / "roms"
+        rom = _make_rom(source / "game.gba", b"SHADOW_ROM" * 100)
+        with zipfile.ZipFile(source / "set.zip", "w") as zf:
+            zf.writestr("inner.gba", b"INNER" * 300)
+        shadow = ShadowStore(tmp_path / "shadow")
+        sources = [SourceDir(path=source, source_type="readonly")]
+
+        with CacheDB(tmp_path / "first.db") as db:
+            first = scan_all(sources, db, tmp_path / "work", shadow=shadow)
+            hashed = db.get_scanned(str(rom))
+
+        assert first[str(source)].files_hashed == 2
+        assert not list(source.glob("*.rscf"))
+        assert shadow.sidecar_path(rom).is_file()
+
+        from romtholos.collect import scan as scan_mod
+
+        def fail(*args, **kwargs):
+            raise AssertionError("file was hashed")
+
+        monkeypatch.setattr(scan_mod, "_hash_untrusted", fail)
+        with CacheDB(tmp_path / "second.db") as db:
+            second = scan_all(sources, db, tmp_path / "work", shadow=shadow)
+
+            assert second[str(source)].files_from_sidecar == 2
+            row = db.get_scanned(str(rom))
+            for column in ("crc32", "md5", "sha1", "sha256", "blake3"):
+                assert row[column] == hashed[column]
+            entries = db.get_archive_contents(str(source / "set.zip"))
+            assert [r["sha1"] for r in entries] == [_sha1_upper(b"INNER" * 300)]
+
+    def test_stale_shadow_entry_rehashed(self, tmp_path: Path):
+        source = tmp_path / "roms"
+        rom = _make_rom(source / "game.gba", b"BEFORE" * 100)
+        shadow = ShadowStore(tmp_path / "shadow")
+        sources = [SourceDir(path=source, source_type="readonly")]
+        with CacheDB(tmp_path / "first.db") as db:
+            scan_all(sources, db, tmp_path / "work", shadow=shadow)
+
+        rom.write_bytes(b"AFTER!" * 200)
+        with CacheDB(tmp_path / "second.db") as db:
+            stats = scan_all(sources, db, tmp_path / "work", shadow=shadow)[str(source)]
+
+            assert stats.files_hashed == 1
+            assert stats.files_from_sidecar == 0
+            assert read_sidecar(shadow.sidecar_path(rom)).container_size == 1200
+
+    def test_ingest_ignores_shadow(self, tmp_path: Path):
+        source = tmp_path / "ingest"
+        rom = _make_rom(source / "game.gba", b"INGEST" * 100)
+        shadow = ShadowStore(tmp_path / "shadow")
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(
+                [SourceDir(path=source, source_type="ingest")],
+                db, tmp_path / "work", shadow=shadow,
+            )
+
+        assert (source / "game.gba.rscf").is_file()
+        assert not shadow.sidecar_path(rom).exists()
+
+
 class TestScanAll:
     def test_all_source_types(self, tmp_path: Path):
         """Scan with all three source types in one call."""
@@ -377,6 +452,760 @@ class TestScanAll:
             assert len(results) == 0
 
 
+class TestParallelScan:
+    def test_workers_match_sequential_results(self, tmp_path: Path):
+        """--workers N records the same rows as a sequential scan."""
+        ingest = tmp_path / "ingest"
+        work = tmp_path / "work"
+
+        for i in range(12):
+            _make_rom(ingest / f"game{i:02d}.gba", f"PARALLEL{i}".encode() * 200)
+        for i in range(3):
+            # Same stem in different folders — extraction dirs must not clash
+            archive = ingest / f"set{i}" / "pack.zip"
+            archive.parent.mkdir(parents=True)
+            with zipfile.ZipFile(archive, "w") as zf:
+                zf.writestr(f"inner{i}.gba", f"ZIPPED{i}".encode() * 200)
+
+        sources = [SourceDir(path=ingest, source_type="readonly")]
+
+        with CacheDB(tmp_path / "seq.db") as db:
+            scan_all(sources, db, work)
+            seq = {r["path"]: r["blake3"] for r in db._conn.execute(
+                "SELECT path, blake3 FROM scanned_files")}
+            seq_ac = db.stats()["archive_contents"]
+
+        with CacheDB(tmp_path / "par.db") as db:
+            results = scan_all(sources, db, work, workers=4)
+            stats = results[str(ingest)]
+            par = {r["path"]: r["blake3"] for r in db._conn.execute(
+                "SELECT path, blake3 FROM scanned_files")}
+
+            assert stats.files_hashed == 15
+            assert stats.archives_extracted == 3
+            assert par == seq
+            assert db.stats()["archive_contents"] == seq_ac == 3
+
+    def test_workers_write_sidecars(self, tmp_path: Path):
+        """Sidecars are still written for ingest sources with workers > 1."""
+        ingest = tmp_path / "ingest"
+        work = tmp_path / "work"
+
+        roms = [
+            _make_rom(ingest / f"game{i}.gba", f"SIDECAR{i}".encode() * 100)
+            for i in range(5)
+        ]
+
+        sources = [SourceDir(path=ingest, source_type="ingest")]
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, work, workers=3)
+
+        for rom in roms:
+            sc = read_sidecar(rom.parent / (rom.name + ".rscf"))
+            assert sc.container_blake3 == hash_file(rom).blake3
+
+
+class TestReadOrder:
+    @pytest.mark.parametrize("order", ["inode", "extent"])
+    def test_physical_order_matches_path_order(self, tmp_path: Path, order):
+        """read_order changes the hashing order, not the recorded rows."""
+        src = tmp_path / "src"
+        for i in range(10):
+            _make_rom(src / f"d{i % 3}" / f"game{i:02d}.gba", f"ORDER{i}".encode() * 200)
+        with zipfile.ZipFile(src / "pack.zip", "w") as zf:
+            zf.writestr("inner.gba", b"ZIPPED" * 200)
+
+        def rows(read_order: str, db_name: str) -> dict:
+            source = SourceDir(path=src, source_type="readonly", read_order=read_order)
+            with CacheDB(tmp_path / db_name) as db:
+                scan_all([source], db, tmp_path / "work", workers=2)
+                return {
+                    r["path"]: r["blake3"] for r in db._conn.execute(
+                        "SELECT path, blake3 FROM scanned_files")
+                } | {
+                    r["entry_name"]: r["blake3"] for r in db._conn.execute(
+                        "SELECT entry_name, blake3 FROM archive_contents")
+                }
+
+        assert rows(order, "physical.db") == rows("path", "path.db")
+
+
+class TestIdenticalArchives:
+    """A byte-identical copy of a known archive is not extracted again."""
+
+    def _zip(self, path: Path, payload: bytes) -> Path:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with zipfile.ZipFile(path, "w") as zf:
+            zf.writestr("inner.gba", payload)
+        return path
+
+    def _no_extraction(self, monkeypatch) -> None:
+        from romtholos.collect import scan as scan_mod
+
+        def fail(*args, **kwargs):
+            raise AssertionError("archive was extracted")
+
+        monkeypatch.setattr(scan_mod, "_extract_and_hash_archive", fail)
+
+    def test_copy_of_scanned_archive_reuses_entries(
+        self, tmp_path: Path, monkeypatch,
+    ):
+        first = tmp_path / "first"
+        original = self._zip(first / "set.zip", b"INNER" * 300)
+        second = tmp_path / "second"
+        second.mkdir()
+        shutil.copy(original, second / "redownload.zip")
+        # Same size, different bytes: must still be extracted
+        other = self._zip(tmp_path / "third" / "other.zip", b"OTHER" * 300)
+        assert other.stat().st_size == original.stat().st_size
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all([SourceDir(path=first, source_type="readonly")], db, tmp_path / "work")
+            third = scan_all(
+                [SourceDir(path=other.parent, source_type="readonly")],
+                db, tmp_path / "work",
+            )[str(other.parent)]
+            with monkeypatch.context() as m:
+                self._no_extraction(m)
+                stats = scan_all(
+                    [SourceDir(path=second, source_type="readonly")],
+                    db, tmp_path / "work",
+                )[str(second)]
+
+            assert third.archives_extracted == 1
+            assert stats.archives_cloned == 1
+            assert stats.archives_extracted == 0
+            copied = db.get_archive_contents(str(second / "redownload.zip"))
+            known = db.get_archive_contents(str(original))
+            assert [tuple(r)[1:] for r in copied] == [tuple(r)[1:] for r in known]
+
+    def test_copy_out_of_romroot_reuses_sidecar_entries(
+        self, tmp_path: Path, monkeypatch,
+    ):
+        payload = b"COLLECTED" * 200
+        inner = _make_rom(tmp_path / "staging" / "inner.gba", payload)
+        romroot = tmp_path / "romroot"
+        archive = self._zip(romroot / "Test System" / "Game.zip", payload)
+        stat = archive.stat()
+        write_sidecar(Sidecar(
+            container_blake3=hash_file(archive).blake3,
+            container_size=stat.st_size,
+            container_mtime_ns=stat.st_mtime_ns,
+            container_ctime_ns=stat.st_ctime_ns,
+            container_inode=stat.st_ino,
+            renderer="",
+            files=[FileEntry.from_hashes(
+                path="inner.gba", size=len(payload), hashes=hash_file(inner),
+            )],
+        ), archive.parent / "Game.zip.rscf")
+        ingest = tmp_path / "ingest"
+        ingest.mkdir()
+        shutil.copy(archive, ingest / "Game.zip")
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all([SourceDir(path=romroot, source_type="romroot")], db, tmp_path / "work")
+            with monkeypatch.context() as m:
+                self._no_extraction(m)
+                stats = scan_all(
+                    [SourceDir(path=ingest, source_type="readonly")],
+                    db, tmp_path / "work",
+                )[str(ingest)]
+
+            assert stats.archives_cloned == 1
+            rows = db.get_archive_contents(str(ingest / "Game.zip"))
+            assert [r["sha1"] for r in rows] == [_sha1_upper(payload)]
+
+
+class TestDirPruning:
+    """Unchanged romroot directories are not listed on rescan."""
+
+    @pytest.fixture()
+    def settled(self, monkeypatch):
+        """Treat every directory as settled (no racy-mtime window)."""
+        monkeypatch.setattr("romtholos.collect.scan._RACY_DIR_NS", -(10**18))
+
+    def _romroot(self, tmp_path: Path) -> Path:
+        romroot = tmp_path / "romroot"
+        for name in ("a.gba", "b.gba"):
+            _make_sidecar(_make_rom(romroot / "Sys" / name, name.encode() * 64))
+        _make_sidecar(_make_rom(romroot / "Sys" / "Disc" / "c.bin", b"C" * 64))
+        # Backdate directory mtimes so a later change is always visible,
+        # even within one filesystem timestamp tick
+        for d in (romroot, romroot / "Sys", romroot / "Sys" / "Disc"):
+            os.utime(d, ns=(10**18, 10**18))
+        return romroot
+
+    def test_unchanged_dirs_pruned(self, tmp_path: Path, settled):
+        romroot = self._romroot(tmp_path)
+        sources = [SourceDir(path=romroot, source_type="romroot")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, tmp_path / "work")
+            assert db.stats()["scanned_dirs"] == 3
+
+            stats = scan_all(sources, db, tmp_path / "work")[str(romroot)]
+
+        assert stats.dirs_pruned == 3
+        assert stats.files_total == 3
+        assert stats.files_skipped == 3
+
+    def test_new_file_relists_only_its_dir(self, tmp_path: Path, settled):
+        romroot = self._romroot(tmp_path)
+        sources = [SourceDir(path=romroot, source_type="romroot")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, tmp_path / "work")
+            _make_sidecar(_make_rom(romroot / "Sys" / "Disc" / "d.bin", b"D" * 64))
+
+            stats = scan_all(sources, db, tmp_path / "work")[str(romroot)]
+
+            assert stats.dirs_pruned == 2
+            assert stats.files_from_sidecar == 1
+            assert db.get_scanned(str(romroot / "Sys" / "Disc" / "d.bin"))
+
+    def test_missing_file_rows_force_listing(self, tmp_path: Path, settled):
+        romroot = self._romroot(tmp_path)
+        sources = [SourceDir(path=romroot, source_type="romroot")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, tmp_path / "work")
+            db._conn.execute("DELETE FROM scanned_files")
+            db._conn.commit()
+
+            stats = scan_all(sources, db, tmp_path / "work")[str(romroot)]
+
+            assert stats.files_from_sidecar == 3
+            assert db.stats()["scanned_files"] == 3
+
+    def test_deep_lists_everything(self, tmp_path: Path, settled):
+        romroot = self._romroot(tmp_path)
+        sources = [SourceDir(path=romroot, source_type="romroot")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, tmp_path / "work")
+            stats = scan_all(sources, db, tmp_path / "work", deep=True)[str(romroot)]
+
+        assert stats.dirs_pruned == 0
+        assert stats.files_skipped == 3
+
+    def test_removed_dir_forgotten(self, tmp_path: Path, settled):
+        romroot = self._romroot(tmp_path)
+        sources = [SourceDir(path=romroot, source_type="romroot")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, tmp_path / "work")
+            shutil.rmtree(romroot / "Sys" / "Disc")
+            scan_all(sources, db, tmp_path / "work")
+
+            assert db.stats()["scanned_dirs"] == 2
+
+    def test_recent_dirs_not_pruned(self, tmp_path: Path):
+        """Directories changed moments ago are never trusted."""
+        romroot = self._romroot(tmp_path)
+        sources = [SourceDir(path=romroot, source_type="romroot")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, tmp_path / "work")
+            stats = scan_all(sources, db, tmp_path / "work")[str(romroot)]
+
+        assert stats.dirs_pruned == 0
+        assert stats.files_skipped == 3
+
+
+class TestArchivePrefilter:
+    """Listing-based prefilter: only DAT-wanted archives are extracted."""
+
+    def _setup(self, tmp_path: Path) -> tuple[Path, bytes, bytes]:
+        src = tmp_path / "src"
+        src.mkdir()
+        wanted, other = b"WANTED" * 100, b"OTHER!" * 100
+        with zipfile.ZipFile(src / "wanted.zip", "w") as zf:
+            zf.writestr("a.gba", wanted)
+        with zipfile.ZipFile(src / "other.zip", "w") as zf:
+            zf.writestr("b.gba", other)
+        return src, wanted, other
+
+    def _load_dat(self, db: CacheDB, name: str, content: bytes) -> None:
+        db.load_dat(f"{name}.dat", "Sys", [{
+            "game_name": name,
+            "rom_name": f"{name}.gba",
+            "rom_size": len(content),
+            "crc32": f"{zlib.crc32(content):08X}",
+        }])
+
+    def test_only_wanted_archives_extracted(self, tmp_path: Path):
+        src, wanted, other = self._setup(tmp_path)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            self._load_dat(db, "a", wanted)
+            stats = scan_all(sources, db, tmp_path / "work", prefilter=True)[str(src)]
+
+            assert stats.archives_extracted == 1
+            assert stats.archives_listed == 1
+            assert len(db.get_archive_contents(str(src / "wanted.zip"))) == 1
+
+            other_path = str(src / "other.zip")
+            assert db.get_archive_contents(other_path) == []
+            rows = db.get_provisional_contents(other_path)
+            assert [(r["entry_name"], r["entry_size"]) for r in rows] == [
+                ("b.gba", len(other)),
+            ]
+
+    def test_provisional_rows_never_matched(self, tmp_path: Path):
+        src, wanted, other = self._setup(tmp_path)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            self._load_dat(db, "a", wanted)
+            scan_all(sources, db, tmp_path / "work", prefilter=True)
+
+            crc = f"{zlib.crc32(other):08X}"
+            assert db.find_archive_content_by_hash("crc32", crc) == []
+            assert db.stats()["archive_provisional"] == 1
+
+    def test_newly_wanted_archive_upgraded(self, tmp_path: Path):
+        src, wanted, other = self._setup(tmp_path)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            self._load_dat(db, "a", wanted)
+            scan_all(sources, db, tmp_path / "work", prefilter=True)
+
+            # A DAT now wants the listed CRC — the stat-cache hit is ignored
+            self._load_dat(db, "b", other)
+            stats = scan_all(sources, db, tmp_path / "work", prefilter=True)[str(src)]
+
+            assert stats.archives_extracted == 1
+            assert stats.files_skipped == 1
+            other_path = str(src / "other.zip")
+            assert db.get_provisional_contents(other_path) == []
+            rows = db.get_archive_contents(other_path)
+            assert rows[0]["sha1"] == _sha1_upper(other)
+
+    def test_prefilter_off_extracts_provisional(self, tmp_path: Path):
+        src, wanted, _other = self._setup(tmp_path)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            self._load_dat(db, "a", wanted)
+            scan_all(sources, db, tmp_path / "work", prefilter=True)
+            stats = scan_all(sources, db, tmp_path / "work")[str(src)]
+
+            assert stats.archives_extracted == 1
+            assert db.stats()["archive_provisional"] == 0
+
+
+class TestRenameDetection:
+    """Known (device, inode, size, mtime_ns) at a new path reuses hashes."""
+
+    def test_moved_file_not_rehashed(self, tmp_path: Path):
+        src = tmp_path / "src"
+        rom = _make_rom(src / "game.gba", b"MOVEME" * 200)
+        expected = hash_file(rom)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, tmp_path / "work")
+            moved = src / "sorted" / "game.gba"
+            moved.parent.mkdir()
+            rom.rename(moved)
+
+            stats = scan_all(sources, db, tmp_path / "work")[str(src)]
+
+            assert stats.files_hashed == 0
+            assert stats.files_relinked == 1
+            assert db.get_scanned(str(rom)) is None
+            row = db.get_scanned(str(moved))
+            assert row["sha1"] == expected.sha1
+            assert row["ctime_ns"] == moved.stat().st_ctime_ns
+
+            # Next scan is a plain stat-cache hit
+            stats = scan_all(sources, db, tmp_path / "work")[str(src)]
+            assert stats.files_skipped == 1
+
+    def test_moved_file_reused_under_reduced_policy(self, tmp_path: Path):
+        src = tmp_path / "src"
+        rom = _make_rom(src / "game.gba", b"LAZYMOVE" * 200)
+        sources = [SourceDir(
+            path=src, source_type="readonly", hash_types=("blake3",),
+        )]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, tmp_path / "work")
+            moved = src / "sorted" / "game.gba"
+            moved.parent.mkdir()
+            rom.rename(moved)
+
+            stats = scan_all(sources, db, tmp_path / "work")[str(src)]
+
+            assert stats.files_hashed == 0
+            assert stats.files_relinked == 1
+            assert db.get_scanned(str(moved))["blake3"] == hash_file(moved).blake3
+
+    def test_moved_archive_keeps_contents(self, tmp_path: Path):
+        src = tmp_path / "src"
+        src.mkdir()
+        archive = src / "pack.zip"
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("inner.gba", b"ZIPPED" * 200)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            scan_all(sources, db, tmp_path / "work")
+            renamed = src / "renamed.zip"
+            archive.rename(renamed)
+
+            stats = scan_all(sources, db, tmp_path / "work")[str(src)]
+
+            assert stats.archives_extracted == 0
+            assert stats.files_relinked == 1
+            assert db.get_archive_contents(str(archive)) == []
+            rows = db.get_archive_contents(str(renamed))
+            assert [r["entry_name"] for r in rows] == ["inner.gba"]
+
+    @pytest.mark.parametrize("workers", [1, 4])
+    def test_hardlinks_hashed_once(self, tmp_path: Path, workers: int):
+        src = tmp_path / "src"
+        rom = _make_rom(src / "a" / "game.gba", b"LINKED" * 200)
+        link = src / "b" / "game.gba"
+        link.parent.mkdir()
+        os.link(rom, link)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            stats = scan_all(
+                sources, db, tmp_path / "work", workers=workers,
+            )[str(src)]
+
+            assert stats.files_hashed == 1
+            assert stats.files_relinked == 1
+            assert db.get_scanned(str(link))["sha1"] == \
+                db.get_scanned(str(rom))["sha1"]
+
+    def test_hardlink_across_sources_copied(self, tmp_path: Path):
+        ingest = tmp_path / "ingest"
+        readonly = tmp_path / "readonly"
+        rom = _make_rom(ingest / "game.gba", b"SHARED" * 200)
+        readonly.mkdir()
+        os.link(rom, readonly / "game.gba")
+        sources = [
+            SourceDir(path=ingest, source_type="ingest"),
+            SourceDir(path=readonly, source_type="readonly"),
+        ]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            results = scan_all(sources, db, tmp_path / "work")
+
+            assert results[str(readonly)].files_hashed == 0
+            assert results[str(readonly)].files_relinked == 1
+            assert db.get_scanned(str(rom))["source_type"] == "ingest"
+            row = db.get_scanned(str(readonly / "game.gba"))
+            assert row["source_type"] == "readonly"
+            assert row["sha1"] == hash_file(rom).sha1
+
+
+class TestFingerprintTrust:
+    """A restored file (new inode/ctime) is recognised by its fingerprint."""
+
+    def _restore(self, path: Path) -> None:
+        """Replace a file by a copy of itself — new inode, same mtime."""
+        tmp = path.with_name(path.name + ".bak")
+        shutil.copy2(path, tmp)
+        path.unlink()
+        tmp.rename(path)
+
+    def _scan(self, tmp_path: Path, src: Path, trust: bool) -> SourceScanStats:
+        sources = [SourceDir(
+            path=src, source_type="readonly", trust_fingerprint=trust,
+        )]
+        with CacheDB(tmp_path / "test.db") as db:
+            return scan_all(sources, db, tmp_path / "work")[str(src)]
+
+    def test_restored_file_trusted(self, tmp_path: Path):
+        src = tmp_path / "src"
+        rom = _make_rom(src / "game.gba", os.urandom(3 * 1024 * 1024))
+        self._scan(tmp_path, src, trust=True)
+        self._restore(rom)
+
+        stats = self._scan(tmp_path, src, trust=True)
+
+        assert stats.files_hashed == 0
+        assert stats.files_fingerprinted == 1
+        with CacheDB(tmp_path / "test.db") as db:
+            row = db.get_scanned(str(rom))
+            assert row["sha1"] == hash_file(rom).sha1
+            assert row["inode"] == rom.stat().st_ino
+        assert self._scan(tmp_path, src, trust=True).files_skipped == 1
+
+    def test_restored_file_rehashed_without_trust(self, tmp_path: Path):
+        src = tmp_path / "src"
+        rom = _make_rom(src / "game.gba", b"UNTRUSTED" * 100)
+        self._scan(tmp_path, src, trust=False)
+        self._restore(rom)
+
+        stats = self._scan(tmp_path, src, trust=False)
+
+        assert stats.files_hashed == 1
+        assert stats.files_fingerprinted == 0
+
+    def test_no_fingerprint_without_trust(self, tmp_path: Path, monkeypatch):
+        from romtholos.collect import scan as scan_mod
+
+        def fail(*args):
+            raise AssertionError("fingerprint taken for an untrusting source")
+
+        monkeypatch.setattr(scan_mod, "content_fingerprint", fail)
+        src = tmp_path / "src"
+        rom = _make_rom(src / "game.gba", os.urandom(3 * 1024 * 1024))
+
+        assert self._scan(tmp_path, src, trust=False).files_hashed == 1
+        with CacheDB(tmp_path / "test.db") as db:
+            assert db.get_scanned(str(rom))["fingerprint"] == ""
+
+    def test_changed_content_rehashed(self, tmp_path: Path):
+        src = tmp_path / "src"
+        rom = _make_rom(src / "game.gba", b"A" * 4096)
+        self._scan(tmp_path, src, trust=True)
+        st = rom.stat()
+        rom.write_bytes(b"B" * 4096)
+        os.utime(rom, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+        stats = self._scan(tmp_path, src, trust=True)
+
+        assert stats.files_hashed == 1
+        with CacheDB(tmp_path / "test.db") as db:
+            assert db.get_scanned(str(rom))["sha1"] == _sha1_upper(b"B" * 4096)
+
+    def test_fingerprint_samples_large_files(self, tmp_path: Path):
+        from romtholos.collect.hashing import content_fingerprint
+
+        data = bytearray(os.urandom(8 * 1024 * 1024))
+        path = tmp_path / "big.iso"
+        path.write_bytes(data)
+        base = content_fingerprint(path, len(data))
+
+        data[100] ^= 0xFF  # inside the head
+        path.write_bytes(data)
+        assert content_fingerprint(path, len(data)) != base
+
+        small = _make_rom(tmp_path / "small.gba", b"SMALL" * 100)
+        assert content_fingerprint(small, 500) == hash_file(small).blake3
+
+
+class TestLazyHashes:
+    """Reduced hashes: policy — deferred digests filled in on demand."""
+
+    def _scan(self, tmp_path: Path, src: Path, db: CacheDB) -> None:
+        sources = [SourceDir(
+            path=src, source_type="readonly", hash_types=("sha1", "blake3"),
+        )]
+        scan_all(sources, db, tmp_path / "work")
+
+    def test_only_policy_hashes_computed(self, tmp_path: Path):
+        src = tmp_path / "src"
+        rom = _make_rom(src / "game.gba", b"LAZY" * 300)
+        expected = hash_file(rom)
+
+        with CacheDB(tmp_path / "test.db") as db:
+            self._scan(tmp_path, src, db)
+            row = db.get_scanned(str(rom))
+
+            assert row["sha1"] == expected.sha1
+            assert row["blake3"] == expected.blake3
+            assert row["md5"] == row["crc32"] == row["sha256"] == ""
+            assert row["hashed"] == hash_mask(("sha1", "blake3"))
+            assert db.stats()["partially_hashed"] == 1
+
+    def test_complete_fills_plain_and_archive(self, tmp_path: Path):
+        src = tmp_path / "src"
+        rom = _make_rom(src / "game.gba", b"PLAIN" * 300)
+        inner = b"INNER" * 300
+        archive = src / "pack.zip"
+        with zipfile.ZipFile(archive, "w") as zf:
+            zf.writestr("inner.gba", inner)
+
+        with CacheDB(tmp_path / "test.db") as db:
+            self._scan(tmp_path, src, db)
+            done = complete_hashes(db, tmp_path / "work")
+
+            assert done == 2
+            row = db.get_scanned(str(rom))
+            assert row["md5"] == hash_file(rom).md5
+            assert row["hashed"] == ALL_HASHES
+            entry = db.get_archive_contents(str(archive))[0]
+            assert entry["md5"] == hashlib.md5(inner).hexdigest().upper()
+            assert entry["hashed"] == ALL_HASHES
+            assert db.stats()["partially_hashed"] == 0
+
+    def test_demand_limited_to_missing_entry_sizes(self, tmp_path: Path):
+        src = tmp_path / "src"
+        wanted = _make_rom(src / "wanted.gba", b"W" * 1000)
+        other = _make_rom(src / "other.gba", b"O" * 2000)
+
+        with CacheDB(tmp_path / "test.db") as db:
+            self._scan(tmp_path, src, db)
+            md5 = hashlib.md5(b"W" * 1000).hexdigest().upper()
+            db.load_dat("md5only.dat", "Sys", [{
+                "game_name": "g", "rom_name": "g.gba", "rom_size": 1000,
+                "md5": md5,
+            }])
+            db.record_match("md5only.dat", "g", "g.gba", None, None, None,
+                            "missing")
+
+            types, sizes = lazy_hash_demand(db)
+            assert types == {"md5"}
+            assert sizes == {1000}
+
+            complete_hashes(db, tmp_path / "work", hash_types=types, sizes=sizes)
+
+            assert db.get_scanned(str(wanted))["md5"] == md5
+            assert db.get_scanned(str(other))["md5"] == ""
+            assert [r["path"] for r in db.find_by_hash("md5", md5)] == [str(wanted)]
+
+    def test_changed_file_not_completed(self, tmp_path: Path):
+        src = tmp_path / "src"
+        rom = _make_rom(src / "game.gba", b"BEFORE" * 100)
+
+        with CacheDB(tmp_path / "test.db") as db:
+            self._scan(tmp_path, src, db)
+            rom.write_bytes(b"AFTER!!" * 100)
+
+            assert complete_hashes(db, tmp_path / "work") == 0
+            assert db.get_scanned(str(rom))["md5"] == ""
+
+
+class TestResumableScan:
+    """Interrupted scans continue from the last committed chunk."""
+
+    def _source(self, tmp_path: Path, count: int = 120) -> Path:
+        src = tmp_path / "src"
+        for i in range(count):
+            _make_rom(src / f"d{i // 40}" / f"rom{i:03d}.gba", b"R%03d" % i * 64)
+        return src
+
+    def _interrupt_after(self, monkeypatch, n: int) -> None:
+        from romtholos.collect import scan as scan_mod
+
+        real = scan_mod._hash_untrusted
+        calls = 0
+
+        def flaky(job, *args):
+            nonlocal calls
+            calls += 1
+            if calls > n:
+                raise KeyboardInterrupt
+            return real(job, *args)
+
+        monkeypatch.setattr(scan_mod, "_hash_untrusted", flaky)
+
+    def test_resume_skips_committed_chunk(self, tmp_path: Path, monkeypatch):
+        src = self._source(tmp_path)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            with monkeypatch.context() as m:
+                self._interrupt_after(m, 60)
+                with pytest.raises(KeyboardInterrupt):
+                    scan_all(sources, db, tmp_path / "work")
+
+            cursor = db.get_scan_cursor(str(src))
+            assert cursor["position"] == str(src / "d1" / "rom049.gba")
+            assert db.stats()["scanned_files"] == 50
+
+            stats = scan_all(sources, db, tmp_path / "work")[str(src)]
+
+            assert stats.files_total == 70
+            assert stats.files_hashed == 70
+            assert db.stats()["scanned_files"] == 120
+            assert db.get_scan_cursor(str(src)) is None
+
+    def test_finished_source_not_rescanned(self, tmp_path: Path, monkeypatch):
+        first = self._source(tmp_path, 3)
+        second = tmp_path / "second"
+        _make_rom(second / "late.gba", b"LATE" * 100)
+        sources = [
+            SourceDir(path=first, source_type="readonly"),
+            SourceDir(path=second, source_type="readonly"),
+        ]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            with monkeypatch.context() as m:
+                self._interrupt_after(m, 3)
+                with pytest.raises(KeyboardInterrupt):
+                    scan_all(sources, db, tmp_path / "work")
+
+            results = scan_all(sources, db, tmp_path / "work")
+
+            assert str(first) not in results
+            assert results[str(second)].files_hashed == 1
+
+    def test_restart_discards_cursor(self, tmp_path: Path, monkeypatch):
+        src = self._source(tmp_path)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            with monkeypatch.context() as m:
+                self._interrupt_after(m, 60)
+                with pytest.raises(KeyboardInterrupt):
+                    scan_all(sources, db, tmp_path / "work")
+
+            stats = scan_all(sources, db, tmp_path / "work", restart=True)[str(src)]
+
+            assert stats.files_total == 120
+            assert stats.files_skipped == 50
+
+    def test_physical_order_cursor_waits_for_window(
+        self, tmp_path: Path, monkeypatch,
+    ):
+        """Out of walk order, no cursor is stored before a window completes."""
+        src = self._source(tmp_path)
+        sources = [SourceDir(path=src, source_type="readonly", read_order="inode")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            with monkeypatch.context() as m:
+                self._interrupt_after(m, 60)
+                with pytest.raises(KeyboardInterrupt):
+                    scan_all(sources, db, tmp_path / "work")
+
+            assert db.get_scan_cursor(str(src)) is None
+            assert db.stats()["scanned_files"] == 50
+
+            stats = scan_all(sources, db, tmp_path / "work")[str(src)]
+
+            assert stats.files_skipped == 50
+            assert stats.files_hashed == 70
+
+    def test_full_scan_retires_path_cursors_below_it(self, tmp_path: Path):
+        src = self._source(tmp_path, 3)
+        other = tmp_path / "other"
+        with CacheDB(tmp_path / "test.db") as db:
+            db.set_scan_cursor(str(src / "d0"), str(src / "d0" / "rom000.gba"))
+            db.set_scan_cursor(str(other), str(other / "x.gba"))
+
+            scan_all([SourceDir(path=src, source_type="readonly")], db,
+                     tmp_path / "work")
+
+            assert db.get_scan_cursor(str(src / "d0")) is None
+            assert db.get_scan_cursor(str(other)) is not None
+
+    def test_archive_committed_immediately(self, tmp_path: Path, monkeypatch):
+        src = tmp_path / "src"
+        _make_rom(src / "b.gba", b"PLAIN" * 100)
+        with zipfile.ZipFile(src / "a.zip", "w") as zf:
+            zf.writestr("inner.gba", b"INNER" * 100)
+        sources = [SourceDir(path=src, source_type="readonly")]
+
+        with CacheDB(tmp_path / "test.db") as db:
+            with monkeypatch.context() as m:
+                self._interrupt_after(m, 1)
+                with pytest.raises(KeyboardInterrupt):
+                    scan_all(sources, db, tmp_path / "work")
+
+            assert db.has_archive_contents(str(src / "a.zip"))
+            assert db.get_scan_cursor(str(src))["position"] == str(src / "a.zip")
+
+
 class TestDBBatch:
     def test_is_unchanged_checks_all_fields(self, tmp_path: Path):
         """is_unchanged verifies path, size, mtime_ns, ctime_ns, inode."""
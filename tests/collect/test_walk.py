@@ -0,0 +1,172 @@
+"""Tests for the streaming source walker."""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+from romtholos.collect import walk as walk_mod
+from romtholos.collect.walk import walk_files
+
+
+def _tree(root: Path) -> None:
+    """Build a small tree with interleaved files and directories."""
+    for rel in (
+        "a.bin",
+        "b/inner.bin",
+        "b/z.rscf",
+        "b-c.bin",
+        "c/d/deep.bin",
+        "c/e.bin",
+        "skip/hidden.bin",
+        "zz.bin",
+    ):
+        p = root / rel
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_bytes(rel.encode())
+
+
+class TestWalkFiles:
+
+    @pytest.mark.parametrize("stat_workers", [1, 4])
+    def test_order_matches_sorted_glob(self, tmp_path, stat_workers):
+        _tree(tmp_path)
+        expected = [p for p in sorted(tmp_path.glob("**/*")) if p.is_file()]
+
+        got = [e.path for e in walk_files(tmp_path, stat_workers=stat_workers)]
+
+        assert got == expected
+
+    @pytest.mark.parametrize("stat_workers", [1, 4])
+    def test_stat_fields(self, tmp_path, stat_workers):
+        _tree(tmp_path)
+
+        for entry in walk_files(tmp_path, stat_workers=stat_workers):
+            st = entry.path.stat()
+            assert entry.size == st.st_size
+            assert entry.mtime_ns == st.st_mtime_ns
+            assert entry.ctime_ns == st.st_ctime_ns
+            assert entry.inode == st.st_ino
+            assert entry.device == st.st_dev
+
+    def test_include_and_exclude_dirs(self, tmp_path):
+        _tree(tmp_path)
+
+        got = [
+            e.path.relative_to(tmp_path).as_posix()
+            for e in walk_files(
+                tmp_path,
+                include=lambda p: p.suffix != ".rscf",
+                exclude_dirs=(tmp_path / "skip",),
+            )
+        ]
+
+        assert "b/z.rscf" not in got
+        assert "skip/hidden.bin" not in got
+        assert "b/inner.bin" in got
+
+    def test_on_dir_sees_filtered_names_before_files(self, tmp_path):
+        _tree(tmp_path)
+        listed: dict[Path, list[str]] = {}
+        seen_before: list[bool] = []
+
+        for entry in walk_files(
+            tmp_path,
+            include=lambda p: p.suffix != ".rscf",
+            on_dir=lambda d, names: listed.__setitem__(d, names),
+        ):
+            seen_before.append(entry.path.parent in listed)
+
+        assert all(seen_before)
+        assert listed[tmp_path / "b"] == ["inner.bin", "z.rscf"]
+        assert listed[tmp_path] == ["a.bin", "b", "b-c.bin", "c", "skip", "zz.bin"]
+
+    def test_missing_root_yields_nothing(self, tmp_path):
+        assert list(walk_files(tmp_path / "nope")) == []
+        assert list(walk_files(tmp_path / "nope", stat_workers=4)) == []
+
+    @pytest.mark.parametrize("stat_workers", [1, 4])
+    def test_unreadable_dir_skipped(self, tmp_path, monkeypatch, capsys, stat_workers):
+        _tree(tmp_path)
+        real_scandir = os.scandir
+
+        def scandir(path):
+            if Path(path).name == "c":
+                raise PermissionError(13, "Permission denied", str(path))
+            return real_scandir(path)
+
+        monkeypatch.setattr(walk_mod.os, "scandir", scandir)
+        got = [e.path.relative_to(tmp_path).as_posix()
+               for e in walk_files(tmp_path, stat_workers=stat_workers)]
+
+        assert got == [
+            "a.bin", "b/inner.bin", "b/z.rscf", "b-c.bin", "skip/hidden.bin", "zz.bin",
+        ]
+        assert f"cannot list {tmp_path / 'c'}" in capsys.readouterr().err
+
+    def test_early_close_stops_background_walk(self, tmp_path):
+        _tree(tmp_path)
+
+        gen = walk_files(tmp_path, stat_workers=4)
+        first = next(gen)
+        gen.close()
+
+        assert first.path == tmp_path / "a.bin"
+
+    def test_walker_error_propagates(self, tmp_path):
+        _tree(tmp_path)
+
+        def on_dir(d: Path, names: list[str]) -> None:
+            if d.name == "c":
+                raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError, match="boom"):
+            list(walk_files(tmp_path, on_dir=on_dir, stat_workers=4))
+
+    @pytest.mark.parametrize("stat_workers", [1, 4])
+    def test_prune_skips_listing_but_visits_named_subdirs(self, tmp_path, stat_workers):
+        _tree(tmp_path)
+        listed: list[Path] = []
+
+        got = [
+            e.path.relative_to(tmp_path).as_posix()
+            for e in walk_files(
+                tmp_path,
+                on_dir=lambda d, names: listed.append(d),
+                prune=lambda d: ["d"] if d.name == "c" else None,
+                stat_workers=stat_workers,
+            )
+        ]
+
+        assert "c/e.bin" not in got
+        assert "c/d/deep.bin" in got
+        assert tmp_path / "c" not in listed
+
+    @pytest.mark.parametrize("stat_workers", [1, 4])
+    def test_start_after_resumes_without_listing_done_dirs(
+        self, tmp_path, stat_workers,
+    ):
+        _tree(tmp_path)
+        everything = [e.path for e in walk_files(tmp_path)]
+        resume = tmp_path / "c" / "d" / "deep.bin"
+        listed: list[Path] = []
+
+        got = [
+            e.path for e in walk_files(
+                tmp_path, start_after=resume, stat_workers=stat_workers,
+                on_dir=lambda d, names: listed.append(d),
+            )
+        ]
+
+        assert got == everything[everything.index(resume) + 1:]
+        assert tmp_path / "b" not in listed
+        assert tmp_path / "c" / "d" in listed
+
+    def test_start_after_outside_root_is_ignored(self, tmp_path):
+        _tree(tmp_path)
+
+        got = list(walk_files(tmp_path / "c", start_after=tmp_path / "b" / "x"))
+
+        assert len(got) == 2
@@ -0,0 +1,171 @@
+"""Tests for inotify watch mode."""
+
+from __future__ import annotations
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from romtholos.collect.config import SourceDir
+from romtholos.collect.db import CacheDB
+from romtholos.collect.scan import scan_files
+from romtholos.collect.watch import _Pending, watch_sources
+
+pytestmark = pytest.mark.skipif(
+    not sys.platform.startswith("linux"), reason="inotify is Linux-only",
+)
+
+
+def _wait_for(predicate, timeout: float = 10.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestPending:
+
+    def test_settles_after_quiet_period(self, tmp_path: Path):
+        rom = tmp_path / "game.gba"
+        rom.write_bytes(b"DATA" * 10)
+        pending = _Pending(settle=5.0)
+
+        pending.touch(rom, now=100.0)
+
+        assert pending.settled(now=102.0) == []
+        assert pending.settled(now=105.0) == [rom]
+        assert pending.settled(now=110.0) == []
+
+    def test_growing_file_is_postponed(self, tmp_path: Path):
+        rom = tmp_path / "game.gba"
+        rom.write_bytes(b"PART")
+        pending = _Pending(settle=5.0)
+        pending.touch(rom, now=100.0)
+
+        with rom.open("ab") as f:
+            f.write(b"MORE")
+
+        assert pending.settled(now=105.0) == []
+        assert pending.settled(now=110.0) == [rom]
+
+    def test_vanished_file_dropped(self, tmp_path: Path):
+        rom = tmp_path / "game.gba"
+        rom.write_bytes(b"GONE")
+        pending = _Pending(settle=1.0)
+        pending.touch(rom, now=0.0)
+        rom.unlink()
+
+        assert pending.settled(now=2.0) == []
+        assert pending.next_deadline(now=2.0) == 1.0
+
+
+class TestScanFiles:
+
+    def test_scans_only_given_files(self, tmp_path: Path):
+        src = tmp_path / "src"
+        src.mkdir()
+        wanted = src / "new.gba"
+        wanted.write_bytes(b"NEW" * 100)
+        (src / "other.gba").write_bytes(b"OTHER" * 100)
+        (src / "notes.txt").write_text("ignored")
+
+        with CacheDB(tmp_path / "test.db") as db:
+            stats = scan_files(
+                SourceDir(path=src, source_type="readonly"),
+                [wanted, src / "notes.txt", src / "missing.gba"],
+                db, tmp_path / "work",
+            )
+
+            assert stats.files_hashed == 1
+            assert db.get_scanned(str(wanted)) is not None
+            assert db.get_scanned(str(src / "other.gba")) is None
+
+
+class TestWatchSources:
+
+    def _start(self, tmp_path: Path, sources, batches: list) -> tuple[threading.Thread, threading.Event]:
+        stop = threading.Event()
+        ready = threading.Event()
+
+        def run() -> None:
+            with CacheDB(tmp_path / "test.db") as db:
+                ready.set()
+                watch_sources(
+                    sources, db, tmp_path / "work", settle=0.2,
+                    initial_scan=False, on_batch=batches.append, stop=stop,
+                )
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        ready.wait()
+        time.sleep(0.3)  # watches are added right after the DB opens
+        return thread, stop
+
+    def _scanned(self, tmp_path: Path, path: Path) -> bool:
+        with CacheDB(tmp_path / "test.db") as db:
+            return db.get_scanned(str(path)) is not None
+
+    def test_new_file_and_new_directory_scanned(self, tmp_path: Path):
+        src = tmp_path / "ingest"
+        src.mkdir()
+        batches: list = []
+        thread, stop = self._start(
+            tmp_path, [SourceDir(path=src, source_type="readonly")], batches,
+        )
+        try:
+            rom = src / "game.gba"
+            rom.write_bytes(b"ROM" * 1000)
+            assert _wait_for(lambda: self._scanned(tmp_path, rom))
+
+            nested = src / "incoming" / "deep"
+            nested.mkdir(parents=True)
+            late = nested / "late.gba"
+            late.write_bytes(b"LATE" * 1000)
+            assert _wait_for(lambda: self._scanned(tmp_path, late))
+        finally:
+            stop.set()
+            thread.join(timeout=10)
+
+        assert [rom] in batches
+        assert not thread.is_alive()
+
+    def test_romroot_not_watched(self, tmp_path: Path):
+        romroot = tmp_path / "romroot"
+        romroot.mkdir()
+        batches: list = []
+        thread, stop = self._start(
+            tmp_path, [SourceDir(path=romroot, source_type="romroot")], batches,
+        )
+        thread.join(timeout=10)
+        stop.set()
+
+        assert not thread.is_alive()
+        assert batches == []
+
+    def test_rescan_keeps_unwatched_cursors(self, tmp_path: Path):
+        romroot = tmp_path / "romroot"
+        (romroot / "GBA").mkdir(parents=True)
+        src = tmp_path / "ingest"
+        src.mkdir()
+        (src / "game.gba").write_bytes(b"ROM" * 1000)
+        stop = threading.Event()
+        stop.set()
+
+        with CacheDB(tmp_path / "test.db") as db:
+            # Left by an interrupted `collect run`
+            db.set_scan_cursor(str(romroot), str(romroot / "GBA"))
+            db.set_scan_cursor(str(src), str(src / "a.gba"))
+            watch_sources(
+                [SourceDir(path=romroot, source_type="romroot"),
+                 SourceDir(path=src, source_type="ingest")],
+                db, tmp_path / "work", stop=stop,
+            )
+
+            assert db.get_scanned(str(src / "game.gba")) is not None
+            assert db.get_scan_cursor(str(src)) is None
+            assert db.get_scan_cursor(str(romroot))["position"] == str(romroot / "GBA")